@@ -3,5 +3,14 @@ Module automatically picked up by pytest.
 """
 # pylint: disable=invalid-name
 
+import sys
+
 # Add the 'pytester' plugin that is used for testing pytest plugins.
 pytest_plugins = 'pytester'
+
+# Test modules that use syntax of newer Python versions.
+collect_ignore = []
+if sys.version_info[0:2] < (3, 7):
+    collect_ignore.append('unittest/test_asgi.py')
+if sys.version_info[0:2] < (3, 8):
+    collect_ignore.append('unittest/test_asyncleaks.py')
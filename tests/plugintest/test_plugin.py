@@ -5,6 +5,8 @@ Note: 'testdir' is a fixture provided by the pytester plugin of pytest.
 See https://docs.pytest.org/en/latest/reference.html#testdir for details.
 """
 
+import os
+import sys
 import pytest
 
 
@@ -20,6 +22,11 @@ def test_help_message(testdir):
         '* --yagot*',
         '* --yagot-leaks-only*',
         '* --yagot-ignore-types=*',
+        '* --yagot-filter-types=*',
+        '* --yagot-filter-reachable*',
+        '* --yagot-auto-collect*',
+        '* --yagot-retained*',
+        '* --yagot-history=PATH*',
     ])
     assert result.ret == 0
 
@@ -84,6 +91,45 @@ def test_collected_selfref(testdir):
     assert result.ret == 1
 
 
+def test_collected_selfref_fixture(testdir):
+    """
+    Test with the Yagot plugin enabled for collected objects and collected
+    objects produced as self-referencing dict in the setup and in the
+    teardown of a fixture.
+    """
+    test_code = """
+    import pytest
+
+    @pytest.fixture
+    def setup_selfref():
+        d1 = dict()
+        d1['self'] = d1
+        yield
+
+    @pytest.fixture
+    def teardown_selfref():
+        yield
+        d1 = dict()
+        d1['self'] = d1
+
+    def test_setup(setup_selfref):
+        pass
+
+    def test_teardown(teardown_selfref):
+        pass
+    """
+    testdir.makepyfile(test_code)
+    result = testdir.runpytest('--yagot')
+    result.assert_outcomes(passed=2, errors=2)
+    result.stdout.fnmatch_lines([
+        '*There were 1 collected or uncollectable object(s) '
+        'caused by function test_collected_selfref_fixture.py::test_setup*',
+        '*There were 1 collected or uncollectable object(s) '
+        'caused by function test_collected_selfref_fixture.py::'
+        'test_teardown*',
+    ])
+
+
 def test_collected_selfref_ignored(testdir):
     """
     Test with the Yagot plugin enabled for collected objects and collected
@@ -99,6 +145,663 @@ def test_collected_selfref_ignored(testdir):
     assert result.ret == 0
 
 
+def test_collected_selfref_filtered(testdir):
+    """
+    Test with the Yagot plugin enabled for collected objects and collected
+    objects produced as self-referencing dict and as self-referencing list,
+    removing list types individually.
+    """
+    test_code = """
+    def test_clean():
+        d1 = dict()
+        d1['self'] = d1
+        l1 = list()
+        l1.append(l1)
+    """
+    testdir.makepyfile(test_code)
+    result = testdir.runpytest('--yagot', '--yagot-filter-types=list')
+    result.stdout.fnmatch_lines([
+        '*yagot: Removing objects of types: list*',
+        '*There were 1 collected or uncollectable object(s) '
+        'caused by function test_collected_selfref_filtered.py::test_clean*',
+    ])
+    assert result.ret == 1
+
+
+def test_collected_selfref_filtered_env(testdir, monkeypatch):
+    """
+    Test with the Yagot plugin enabled for collected objects, removing list
+    types via the YAGOT_FILTER_TYPES env.var and dict types via the command
+    line option.
+    """
+    test_code = """
+    def test_clean():
+        d1 = dict()
+        d1['self'] = d1
+        l1 = list()
+        l1.append(l1)
+    """
+    testdir.makepyfile(test_code)
+    monkeypatch.setenv('YAGOT_FILTER_TYPES', 'list')
+    result = testdir.runpytest('--yagot', '--yagot-filter-types=dict')
+    result.stdout.fnmatch_lines([
+        '*yagot: Removing objects of types: list, dict*',
+    ])
+    result.assert_outcomes(passed=1)
+
+
+def test_collected_recurring_cycles(testdir):
+    """
+    Test with the Yagot plugin enabled for collected objects and the same
+    reference cycle produced by multiple test cases.
+    """
+    test_code = """
+    def make_cycle():
+        d1 = dict()
+        d1['self'] = d1
+
+    def test_1():
+        make_cycle()
+
+    def test_2():
+        make_cycle()
+
+    def test_3():
+        make_cycle()
+    """
+    testdir.makepyfile(test_code)
+    result = testdir.runpytest('--yagot')
+    result.stdout.fnmatch_lines([
+        '*There were 1 collected or uncollectable object(s) '
+        'caused by function test_collected_recurring_cycles.py::test_2*',
+        '*Cycle * (container) with 1 object(s) of type(s) dict, first '
+        'reported for function test_collected_recurring_cycles.py::test_1*',
+        '*yagot garbage cycles by pattern*',
+        'Pattern container: 1 distinct cycle(s) in 3 test(s)',
+        '*yagot recurring garbage cycles*',
+        '*Cycle * (container) with 1 object(s) of type(s) dict: first '
+        'reported for '
+        'function test_collected_recurring_cycles.py::test_1, also seen in 2 '
+        'test(s)*',
+    ])
+    assert result.stdout.str().count("<class 'dict'> object at 0x") == 1
+    assert result.ret == 1
+
+
+def test_collected_recurring_cycles_own(testdir):
+    """
+    Test with the Yagot plugin enabled for collected objects, a test case
+    that produces the same reference cycle multiple times, and a passing test
+    case with the same reference cycle within its budget. Neither counts as
+    having reported the cycle before.
+    """
+    test_code = """
+    import pytest
+
+    def make_cycle():
+        d1 = dict()
+        d1['self'] = d1
+
+    @pytest.mark.yagot(max_objects=3)
+    def test_1():
+        make_cycle()
+
+    def test_2():
+        for _ in range(4):
+            make_cycle()
+    """
+    testdir.makepyfile(test_code)
+    result = testdir.runpytest('--yagot')
+    result.stdout.fnmatch_lines([
+        '*There were 4 collected or uncollectable object(s) '
+        'caused by function test_collected_recurring_cycles_own.py::test_2*',
+    ])
+    assert 'first reported' not in result.stdout.str()
+    assert result.stdout.str().count("<class 'dict'> object at 0x") >= 1
+    result.assert_outcomes(passed=2, errors=1)
+
+
+def test_collected_history(testdir):
+    """
+    Test with the Yagot plugin enabled for collected objects and recording the
+    garbage history.
+    """
+    test_code = """
+    def test_clean():
+        _ = dict()
+
+    def test_selfref():
+        d1 = dict()
+        d1['self'] = d1
+    """
+    testdir.makepyfile(test_code)
+    history_path = str(testdir.tmpdir.join('history.db'))
+    for _ in range(2):
+        result = testdir.runpytest('--yagot', '--yagot-history', history_path)
+        result.stdout.fnmatch_lines([
+            '*yagot: Recording garbage history in: *history.db*',
+        ])
+        assert result.ret == 1
+
+    import yagot
+    store = yagot.HistoryStore(history_path)
+    assert [r[2:4] for r in store.runs()] == [(2, 1), (2, 1)]
+    assert [r[3] for r in store.trend(
+        'test_collected_history.py::test_selfref')] == [1, 1]
+    store.close()
+
+
+def test_collected_html(testdir):
+    """
+    Test with the Yagot plugin enabled for collected objects and writing the
+    HTML report.
+    """
+    test_code = """
+    def test_clean():
+        _ = dict()
+
+    def test_selfref():
+        d1 = dict()
+        d1['self'] = d1
+    """
+    testdir.makepyfile(test_code)
+    html_path = str(testdir.tmpdir.join('report.html'))
+    result = testdir.runpytest('--yagot', '--yagot-html', html_path)
+    result.stdout.fnmatch_lines([
+        '*yagot: Writing HTML report to: *report.html*',
+    ])
+    assert result.ret == 1
+
+    with open(html_path) as fp:
+        html = fp.read()
+    assert '<th>Tracking periods</th><td>2</td>' in html
+    assert 'test_collected_html.py::test_selfref' in html
+    assert '<td>container</td>' in html
+
+
+def test_collected_rerun(testdir):
+    """
+    Test with the Yagot plugin enabled for collected objects and rerunning
+    test cases with garbage in isolation, with a test case whose garbage is
+    created by a thread started in a previous test case.
+    """
+    test_code = """
+    import threading
+
+    EVENT = threading.Event()
+
+    def make_selfref():
+        EVENT.wait()
+        d1 = dict()
+        d1['self'] = d1
+
+    def test_start():
+        threading.Thread(target=make_selfref).start()
+
+    def test_blamed():
+        EVENT.set()
+        for thread in threading.enumerate():
+            if thread is not threading.current_thread():
+                thread.join()
+
+    def test_selfref():
+        d1 = dict()
+        d1['self'] = d1
+    """
+    testdir.makepyfile(test_code)
+    for cached_str in ("", " (cached)"):
+        result = testdir.runpytest('--yagot', '--yagot-rerun')
+        result.stdout.fnmatch_lines([
+            '*yagot: Rerunning test cases with garbage in isolation*',
+            '*There were 1 collected or uncollectable object(s) caused by '
+            'function test_collected_rerun.py::test_selfref*',
+            '*yagot isolation reruns*',
+            'Garbage of function test_collected_rerun.py::test_blamed was not '
+            'reproduced in isolation{}'.format(cached_str),
+        ])
+        assert 'first reported for function test_collected_rerun.py::' \
+            'test_blamed' not in result.stdout.str()
+        assert result.ret == 1
+
+
+def test_collected_bisect(testdir):
+    """
+    Test with the Yagot plugin enabled for collected objects and bisecting the
+    test cases before a test case whose garbage is caused by a module global
+    set in a previous test case.
+    """
+    test_code = """
+    STATE = []
+
+    def test_1():
+        _ = dict()
+
+    def test_2():
+        STATE.append(True)
+
+    def test_3():
+        _ = dict()
+
+    def test_4():
+        _ = dict()
+
+    def test_target():
+        if STATE:
+            d1 = dict()
+            d1['self'] = d1
+    """
+    testdir.makepyfile(test_code)
+    result = testdir.runpytest(
+        '--yagot', '--yagot-bisect=test_collected_bisect.py::test_target')
+    result.stdout.fnmatch_lines([
+        '*yagot: Bisecting the test cases before: '
+        'test_collected_bisect.py::test_target*',
+        '*yagot contamination bisection*',
+        'Function test_collected_bisect.py::test_target has garbage after '
+        'running 1 test case(s) (* subprocess runs):',
+        '  test_collected_bisect.py::test_2',
+    ])
+    assert result.ret == 0
+
+
+def test_marker(testdir):
+    """
+    Test the yagot marker overriding the plugin settings for test cases and
+    classes.
+    """
+    test_code = """
+    import pytest
+
+    def make_selfref():
+        d1 = dict()
+        d1['self'] = d1
+
+    @pytest.mark.yagot(enabled=False)
+    def test_disabled():
+        make_selfref()
+
+    @pytest.mark.yagot(max_objects=1, max_bytes=10000)
+    def test_tolerated():
+        make_selfref()
+
+    @pytest.mark.yagot(ignore_types='dict')
+    class TestIgnored(object):
+
+        def test_ignored(self):
+            make_selfref()
+
+        @pytest.mark.yagot(ignore_types=[])
+        def test_not_ignored(self):
+            make_selfref()
+    """
+    testdir.makepyfile(test_code)
+    result = testdir.runpytest('--yagot')
+    result.stdout.fnmatch_lines([
+        '*There were 1 collected or uncollectable object(s) '
+        'caused by function test_marker.py::test_not_ignored*',
+    ])
+    result.assert_outcomes(passed=4, errors=1)
+
+
+def test_marker_enabled(testdir):
+    """
+    Test the yagot marker enabling the plugin for a test case without the
+    --yagot option, and with invalid arguments.
+    """
+    test_code = """
+    import pytest
+
+    @pytest.mark.yagot(enabled=True)
+    def test_enabled():
+        d1 = dict()
+        d1['self'] = d1
+
+    def test_not_enabled():
+        d1 = dict()
+        d1['self'] = d1
+    """
+    testdir.makepyfile(test_code)
+    result = testdir.runpytest()
+    result.stdout.fnmatch_lines([
+        '*There were 1 collected or uncollectable object(s) '
+        'caused by function test_marker_enabled.py::test_enabled*',
+    ])
+    result.assert_outcomes(passed=2, errors=1)
+
+    testdir.makepyfile(test_code.replace('enabled=True', 'enable=True'))
+    result = testdir.runpytest()
+    result.stderr.fnmatch_lines([
+        '*Invalid arguments for yagot marker of '
+        'test_marker_enabled.py::test_enabled: enable*',
+    ])
+    assert result.ret == 4
+
+
+def test_collected_budget(testdir):
+    """
+    Test with the Yagot plugin enabled for collected objects and a garbage
+    budget, with test cases within and beyond the budget.
+    """
+    test_code = """
+    import pytest
+
+    def make_selfrefs(num):
+        for _ in range(num):
+            d1 = dict()
+            d1['self'] = d1
+
+    def test_within():
+        make_selfrefs(2)
+
+    def test_beyond():
+        make_selfrefs(4)
+
+    @pytest.mark.yagot(max_types={'dict': 1})
+    def test_beyond_type():
+        make_selfrefs(2)
+    """
+    testdir.makepyfile(test_code)
+    result = testdir.runpytest('--yagot', '--yagot-max-objects=3')
+    result.stdout.fnmatch_lines([
+        '*yagot: Tolerating garbage within budget: '
+        'GarbageBudget(max_objects=3, *',
+        '*Garbage budget exceeded: 4 objects exceed the budget of 3 by 1*',
+        '*Garbage budget exceeded: 2 objects of type dict exceed the budget '
+        'of 1 by 1*',
+    ])
+    result.assert_outcomes(passed=3, errors=2)
+
+
+def test_collected_budget_types_only(testdir):
+    """
+    Test with the Yagot plugin enabled for collected objects and a garbage
+    budget that limits only the number of objects of a type.
+    """
+    test_code = """
+    def test_within():
+        d1 = dict()
+        d1['self'] = d1
+
+    def test_beyond():
+        l1 = list()
+        l1.append(l1)
+    """
+    testdir.makepyfile(test_code)
+    result = testdir.runpytest('--yagot', '--yagot-max-types=dict=5')
+    result.stdout.fnmatch_lines([
+        '*Garbage budget exceeded: 1 objects exceed the budget of 0 by 1*',
+    ])
+    assert 'test_within:' not in result.stdout.str()
+    result.assert_outcomes(passed=2, errors=1)
+
+
+def test_collected_no_budget(testdir):
+    """
+    Test with the Yagot plugin enabled for collected objects without a
+    garbage budget, whose assertion message does not mention the budget.
+    """
+    test_code = """
+    def test_selfref():
+        d1 = dict()
+        d1['self'] = d1
+    """
+    testdir.makepyfile(test_code)
+    result = testdir.runpytest('--yagot')
+    result.stdout.fnmatch_lines([
+        '*There were 1 collected or uncollectable object(s) '
+        'caused by function test_collected_no_budget.py::test_selfref*',
+    ])
+    assert 'Garbage budget exceeded' not in result.stdout.str()
+    result.assert_outcomes(passed=1, errors=1)
+
+
+def test_invalid_max_objects_env(testdir, monkeypatch):
+    """
+    Test with an invalid value of the YAGOT_MAX_OBJECTS env.var, which is
+    reported as a usage error.
+    """
+    testdir.makepyfile("def test_clean():\n    pass\n")
+    monkeypatch.setenv('YAGOT_MAX_OBJECTS', 'bad')
+    result = testdir.runpytest('--yagot')
+    assert result.ret == 4
+    result.stderr.fnmatch_lines(['*--yagot-max-objects*'])
+
+
+def test_collected_auto_collect(testdir):
+    """
+    Test with the Yagot plugin enabled for collected objects and automatic
+    garbage collection kept active.
+    """
+    test_code = """
+    import gc
+
+    def test_clean():
+        _ = dict()
+
+    def test_selfref():
+        for _ in range(5):
+            d1 = dict()
+            d1['self'] = d1
+        gc.collect(0)
+    """
+    testdir.makepyfile(test_code)
+    result = testdir.runpytest('--yagot', '--yagot-auto-collect')
+    result.stdout.fnmatch_lines([
+        '*yagot: Keeping automatic garbage collection active*',
+        '*There were 5 collected or uncollectable object(s) caused by '
+        'function test_collected_auto_collect.py::test_selfref*',
+        '*Garbage collections during the tracking period: generation 0: *',
+        '*yagot garbage collections by generation*',
+        'Generation 0: *',
+        'Generation 1: *',
+        'Generation 2: *',
+    ])
+    assert result.ret == 1
+
+
+def test_retained(testdir):
+    """
+    Test with the Yagot plugin enabled for retained objects, with a test case
+    that retains a list in a module global.
+    """
+    test_code = """
+    CACHE = []
+
+    def test_clean():
+        _ = dict()
+
+    def test_cache():
+        CACHE.append([1])
+    """
+    testdir.makepyfile(test_code)
+    result = testdir.runpytest('--yagot', '--yagot-retained')
+    result.stdout.fnmatch_lines([
+        '*yagot: Detecting retained objects*',
+        '*yagot retained objects*',
+        'There were 1 retained object(s) caused by function '
+        'test_retained.py::test_cache:',
+        '1 object(s) of type list held by module test_retained: *',
+    ])
+    assert 'test_retained.py::test_clean:' not in result.stdout.str()
+    assert result.ret == 0
+
+
+def test_collected_exceptions(testdir):
+    """
+    Test with the Yagot plugin enabled for collected objects and exception
+    cycles, with a test case that keeps a caught exception in a local
+    variable, and a test case that uses pytest.raises().
+    """
+    test_code = """
+    import pytest
+
+    def test_raises():
+        with pytest.raises(ValueError):
+            raise ValueError("raises")
+
+    def test_saved():
+        try:
+            raise ValueError("saved")
+        except ValueError as exc:
+            saved_exc = exc
+    """
+    testdir.makepyfile(test_code)
+    result = testdir.runpytest('--yagot', '--yagot-exceptions')
+    result.stdout.fnmatch_lines([
+        '*yagot: Reporting reference cycles of caught exceptions*',
+        '*Reference cycles formed by caught exceptions:*',
+        '*Exception ValueError: saved*',
+        "*stored in: variable 'saved_exc' of function "
+        "test_collected_exceptions::test_saved*",
+    ])
+    assert result.ret == 1
+
+
+@pytest.mark.skipif(
+    not hasattr(os, 'register_at_fork') or sys.platform == 'win32',
+    reason="Child process tracking not supported on this platform")
+def test_collected_children(testdir):
+    """
+    Test with the Yagot plugin enabled for collected objects in child
+    processes, with a test case whose child process produces a
+    self-referencing dict.
+    """
+    test_code = """
+    import multiprocessing
+
+    def make_selfref():
+        d1 = dict()
+        d1['self'] = d1
+
+    def test_child():
+        ctx = multiprocessing.get_context('fork')
+        proc = ctx.Process(target=make_selfref)
+        proc.start()
+        proc.join()
+    """
+    testdir.makepyfile(test_code)
+    result = testdir.runpytest('--yagot', '--yagot-children')
+    result.stdout.fnmatch_lines([
+        '*yagot: Checking child processes*',
+        '*There were 1 collected or uncollectable object(s) in 1 child '
+        'process(es):*',
+        "*Reference cycle: dict?'self'? -> dict*",
+    ])
+    assert result.ret == 1
+
+
+@pytest.mark.skipif(
+    sys.version_info[0:2] < (3, 8),
+    reason="Pending asyncio futures are detected on Python 3.8 and higher")
+def test_async_leaks(testdir):
+    """
+    Test with the Yagot plugin enabled for pending asyncio objects, with a
+    test case that abandons a task and a test case that awaits its task.
+    """
+    test_code = """
+    import asyncio
+
+    LOOPS = []
+
+    async def sleeper():
+        await asyncio.sleep(3600)
+
+    def test_abandoned():
+        loop = asyncio.new_event_loop()
+        loop.create_task(sleeper())
+        LOOPS.append(loop)
+
+    def test_awaited():
+        loop = asyncio.new_event_loop()
+        loop.run_until_complete(asyncio.sleep(0))
+        loop.close()
+    """
+    testdir.makepyfile(test_code)
+    result = testdir.runpytest('--yagot', '--yagot-async-leaks')
+    result.stdout.fnmatch_lines([
+        '*yagot: Checking for pending asyncio objects*',
+        '*There were 3 asyncio object(s) still pending that were created by '
+        'function test_async_leaks.py::test_abandoned:*',
+        '*Pending task: <Task pending*sleeper()*',
+        '*Scheduled callback: <Handle *',
+        '*Unclosed event loop: *',
+    ])
+    assert 'test_awaited:' not in result.stdout.str()
+    assert result.ret == 1
+
+
+@pytest.mark.skipif(
+    not os.path.isdir('/proc/self/fd'),
+    reason="Open file descriptors are detected only with /proc/self/fd")
+def test_resources(testdir):
+    """
+    Test with the Yagot plugin enabled for resource leaks, with a test case
+    that drops an unclosed file, a test case that keeps a file open, and a
+    test case that closes its file.
+    """
+    test_code = """
+    FILES = []
+
+    def test_unclosed():
+        open(__file__)
+
+    def test_open():
+        FILES.append(open(__file__))
+
+    def test_closed():
+        with open(__file__) as fp:
+            fp.read()
+    """
+    testdir.makepyfile(test_code)
+    result = testdir.runpytest('--yagot', '--yagot-resources')
+    result.stdout.fnmatch_lines([
+        '*yagot: Checking for ResourceWarning warnings and open file '
+        'descriptors*',
+        '*There were 1 unclosed resource(s) (ResourceWarning or open file '
+        'descriptor) caused by function test_resources.py::test_unclosed:*',
+        '*ResourceWarning: unclosed file *test_resources.py*',
+        '*There were 1 unclosed resource(s) (ResourceWarning or open file '
+        'descriptor) caused by function test_resources.py::test_open:*',
+        '*Open file descriptor *: *test_resources.py*',
+    ])
+    assert 'test_closed:' not in result.stdout.str()
+    result.assert_outcomes(passed=3, errors=2)
+
+
+def test_finalizers(testdir):
+    """
+    Test with the Yagot plugin enabled for measuring finalizers, with a test
+    case that drops a reference cycle with a slow finalizer (tolerated by a
+    budget), and a test case without finalizers.
+    """
+    test_code = """
+    import time
+    import pytest
+
+    class Slow(object):
+        def __del__(self):
+            time.sleep(0.01)
+
+    @pytest.mark.yagot(max_objects=10)
+    def test_slow():
+        obj = Slow()
+        obj.self = obj
+
+    def test_none():
+        pass
+    """
+    testdir.makepyfile(test_code)
+    result = testdir.runpytest('--yagot', '--yagot-finalizers')
+    result.stdout.fnmatch_lines([
+        '*yagot: Measuring the time spent in finalizers*',
+        '*yagot slowest finalizers*',
+        '* s in 1 call(s) of finalizer for test_finalizers.Slow at '
+        '*test_finalizers.py:* (__del__) (slowest call: * s in function '
+        'test_finalizers.py::test_slow)*',
+    ])
+    result.assert_outcomes(passed=2)
+
+
 def test_collected_selfref_failed(testdir):
     """
     Test with the Yagot plugin enabled for collected objects and collected
@@ -0,0 +1,71 @@
+"""
+Test the ASGI middleware for sampled garbage tracking.
+"""
+
+from __future__ import absolute_import, print_function
+
+import asyncio
+from yagot import AsgiGarbageMiddleware
+
+
+def make_selfref():
+    "Create a self-referencing dict that becomes collected garbage"
+    d = dict()
+    d['self'] = d
+
+
+async def asgi_app(scope, receive, send):
+    """
+    ASGI application that creates one self-referencing dict per HTTP request
+    on path /cycle.
+    """
+    if scope['type'] == 'lifespan':
+        await receive()
+        return
+    await receive()
+    if scope['path'] == '/cycle':
+        make_selfref()
+    await send({'type': 'http.response.start', 'status': 200,
+                'headers': [(b'content-type', b'text/plain')]})
+    await send({'type': 'http.response.body', 'body': b'ok'})
+
+
+def request(app, path, scope_type='http'):
+    """
+    In-process ASGI test client: Issue a request to the application and
+    return the messages it sent.
+    """
+    scope = {'type': scope_type, 'method': 'GET', 'path': path}
+    messages = []
+
+    async def receive():
+        return {'type': 'http.request', 'body': b'', 'more_body': False}
+
+    async def send(message):
+        messages.append(message)
+
+    asyncio.run(app(scope, receive, send))
+    return messages
+
+
+def test_asgi_middleware_sampled():
+    """
+    Test aggregating the garbage of HTTP requests per route.
+    """
+    app = AsgiGarbageMiddleware(asgi_app, sample_rate=1.0)
+
+    # The code to be tested
+    for _ in range(2):
+        messages = request(app, '/cycle')
+        assert messages[0]['status'] == 200
+        assert messages[1]['body'] == b'ok'
+    request(app, '/clean')
+    request(app, '/', scope_type='lifespan')
+
+    stats = app.stats
+    assert set(stats) == set(['GET /cycle', 'GET /clean'])
+    cycle = stats['GET /cycle']
+    assert cycle.requests == 2
+    assert cycle.garbage_requests == 2
+    assert cycle.types == {'dict': 2}
+    assert stats['GET /clean'].num_objects == 0
@@ -0,0 +1,256 @@
+"""
+Test the detection of pending asyncio objects by GarbageTracker.
+"""
+
+from __future__ import absolute_import, print_function
+
+import gc
+import asyncio
+import weakref
+import pytest
+from yagot import GarbageTracker, AsyncLeaks, garbage_checked
+from yagot import _asyncleaks
+
+
+async def sleeper(buffer):
+    "Coroutine that keeps a buffer alive for a long time"
+    await asyncio.sleep(3600)
+    return buffer
+
+
+async def failing():
+    "Coroutine that raises an exception"
+    raise ValueError("failing")
+
+
+async def awaited():
+    "Coroutine that awaits a future and a task"
+    loop = asyncio.get_running_loop()
+    fut = loop.create_future()
+    loop.call_soon(fut.set_result, 42)
+    await fut
+    await asyncio.ensure_future(asyncio.sleep(0))
+
+
+async def abandon_task():
+    "Coroutine that abandons a pending task"
+    return asyncio.ensure_future(sleeper(bytearray(1000)))
+
+
+async def abandon_future():
+    "Coroutine that creates a future that is never awaited"
+    return asyncio.get_running_loop().create_future()
+
+
+async def abandon_exception():
+    "Coroutine that does not retrieve the exception of a task"
+    task = asyncio.ensure_future(failing())
+    await asyncio.sleep(0)
+    return task
+
+
+async def abandon_callback():
+    "Coroutine that schedules a callback"
+    return asyncio.get_running_loop().call_later(3600, print)
+
+
+def tracked_in_loop(coro_func):
+    """
+    Run a coroutine function in a new event loop, with a tracking period for
+    pending asyncio objects that starts and stops within the event loop.
+    Return the tracker.
+    """
+    tracker = GarbageTracker()
+    tracker.enable(async_leaks=True)
+    results = []
+
+    async def run():
+        "Run the coroutine function in a tracking period"
+        tracker.start()
+        results.append(await coro_func())
+        await asyncio.sleep(0)
+        tracker.stop()
+        # Clean up the pending objects for the next tests
+        result = results[0]
+        if isinstance(result, asyncio.Future):
+            if result.done():
+                result.exception()
+            else:
+                result.cancel()
+        elif isinstance(result, asyncio.Handle):
+            result.cancel()
+
+    loop = asyncio.new_event_loop()
+    try:
+        loop.run_until_complete(run())
+    finally:
+        loop.close()
+    return tracker
+
+
+@pytest.mark.parametrize(
+    "coro_func, exp_counts", [
+        (awaited,
+         dict(tasks=0, futures=0, callbacks=0, loops=0)),
+        (abandon_task,
+         dict(tasks=1, futures=0, callbacks=1, loops=0)),
+        (abandon_future,
+         dict(tasks=0, futures=1, callbacks=0, loops=0)),
+        (abandon_exception,
+         dict(tasks=0, futures=1, callbacks=0, loops=0)),
+        (abandon_callback,
+         dict(tasks=0, futures=0, callbacks=1, loops=0)),
+    ])
+def test_asyncleaks_in_loop(coro_func, exp_counts):
+    """
+    Test pending asyncio objects of tracking periods within an event loop.
+    """
+    tracker = tracked_in_loop(coro_func)
+
+    leaks = tracker.async_leaks
+    assert isinstance(leaks, AsyncLeaks)
+    assert leaks.counts() == exp_counts
+    assert len(leaks) == sum(exp_counts.values())
+    assert tracker.summary()['async_leaks'] == exp_counts
+    msg = tracker.assert_message("test")
+    if leaks:
+        assert "There were {} asyncio object(s) still pending".format(
+            len(leaks)) in msg
+    else:
+        assert "asyncio" not in msg
+
+
+def test_asyncleaks_task_format():
+    """
+    Test the formatting of a pending task.
+    """
+    tracker = tracked_in_loop(abandon_task)
+
+    leaks = tracker.async_leaks
+    assert len(leaks.tasks) == 1
+    assert leaks.tasks[0].get_coro().__name__ == 'sleeper'
+    lines = leaks.format().splitlines()
+    assert lines[0].startswith("Pending task: <Task ")
+    assert "sleeper()" in lines[0]
+
+
+def test_asyncleaks_loop():
+    """
+    Test an event loop created and not closed during a tracking period,
+    outside of a running event loop.
+    """
+    tracker = GarbageTracker()
+    tracker.enable(async_leaks=True)
+    tracker.start()
+    loop = asyncio.new_event_loop()
+    coro = sleeper(None)
+    task = loop.create_task(coro)
+    tracker.stop()
+
+    leaks = tracker.async_leaks
+    assert leaks.loops == [loop]
+    assert leaks.tasks == [task]
+    assert len(leaks.callbacks) == 1
+
+    task.cancel()
+    loop.run_until_complete(asyncio.gather(task, return_exceptions=True))
+    loop.close()
+
+
+def test_asyncleaks_disabled():
+    """
+    Test that pending asyncio objects are not detected by default, and that
+    ignored tracking periods have none.
+    """
+    tracker = GarbageTracker()
+    tracker.enable()
+    tracker.start()
+    tracker.stop()
+    assert tracker.track_async_leaks is False
+    assert tracker.async_leaks is None
+    assert tracker.summary()['async_leaks'] is None
+
+    tracker.enable(async_leaks=True)
+    tracker.start()
+    tracker.ignore()
+    tracker.stop()
+    assert tracker.track_async_leaks is True
+    assert tracker.async_leaks is None
+
+
+def test_asyncleaks_decorator():
+    """
+    Test the garbage_checked decorator with pending asyncio objects, on the
+    event loop set for the thread.
+    """
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+
+    @garbage_checked(async_leaks=True)
+    def schedule():
+        "Decorated function that schedules a callback on a loop"
+        return loop.call_later(3600, print)
+
+    try:
+        with pytest.raises(AssertionError) as exc_info:
+            schedule()
+        assert "Scheduled callback: <TimerHandle" in str(exc_info.value)
+    finally:
+        asyncio.set_event_loop(None)
+        loop.close()
+
+
+def test_asyncleaks_dead_proxy():
+    """
+    Test tracking with async_leaks=True while a dead weak reference proxy,
+    for which isinstance() raises ReferenceError, is in the youngest
+    generation.
+    """
+
+    class Target(object):
+        # pylint: disable=too-few-public-methods
+        "Weakly referenced class"
+
+    thresholds = gc.get_threshold()
+    tracker = GarbageTracker()
+    tracker.enable(async_leaks=True)
+    tracker.start()
+    obj = Target()
+    proxy = weakref.proxy(obj)  # noqa: F841 pylint: disable=unused-variable
+    del obj
+
+    # The code to be tested
+    tracker.stop()
+
+    assert len(tracker.async_leaks) == 0
+    assert gc.get_threshold() == thresholds
+    tracker.release()
+
+
+def test_asyncleaks_candidates_fail(monkeypatch):
+    """
+    Test that the settings of the garbage collector are restored if the
+    detection of asyncio objects fails when stopping the tracking period.
+    """
+
+    def candidates(self):
+        # pylint: disable=unused-argument
+        "Failing replacement for AsyncSnapshot.candidates()"
+        raise ValueError("candidates failed")
+
+    monkeypatch.setattr(_asyncleaks.AsyncSnapshot, 'candidates', candidates)
+    thresholds = gc.get_threshold()
+    debug = gc.get_debug()
+    tracker = GarbageTracker()
+    tracker.enable(async_leaks=True)
+    tracker.start()
+
+    with pytest.raises(ValueError):
+
+        # The code to be tested
+        tracker.stop()
+
+    assert gc.get_threshold() == thresholds
+    assert gc.get_debug() == debug
+    tracker.stop()
+    tracker.release()
@@ -0,0 +1,115 @@
+"""
+Test the GarbageBudget class.
+"""
+
+from __future__ import absolute_import, print_function
+
+import pytest
+from yagot import GarbageBudget, GarbageTracker
+
+
+class SelfRef(object):
+    # pylint: disable=too-few-public-methods
+    "A self-referencing class"
+
+    def __init__(self):
+        self.ref = self
+
+
+def make_garbage():
+    "Create 2 SelfRef objects and a self-referencing dict"
+    SelfRef()
+    SelfRef()
+    d1 = dict()
+    d1['self'] = d1
+
+
+@pytest.fixture
+def tracker():
+    """
+    Fixture returning a garbage tracker with a stopped tracking period of
+    make_garbage().
+    """
+    tracker = GarbageTracker()
+    tracker.enable()
+    tracker.start()
+    make_garbage()
+    tracker.stop()
+    yield tracker
+    tracker.release()
+
+
+@pytest.mark.parametrize(
+    "kwargs, exp_violations", [
+        (
+            dict(),
+            [(u"objects", 3, 0)],
+        ),
+        (
+            dict(max_objects=3),
+            [],
+        ),
+        (
+            dict(max_objects=None),
+            [],
+        ),
+        (
+            dict(max_objects=None, max_types={SelfRef: 1, 'dict': 1}),
+            [(u"objects of type {}.SelfRef".format(__name__), 2, 1)],
+        ),
+        (
+            dict(max_types={SelfRef: 2, 'dict': 1}),
+            [],
+        ),
+        (
+            dict(max_types={'dict': 5}),
+            [(u"objects", 2, 0)],
+        ),
+        (
+            dict(max_objects=2, max_bytes=1),
+            [(u"objects", 3, 2), (u"Bytes", None, 1)],
+        ),
+        (
+            dict(max_objects=None, max_collect_time=0.0),
+            [(u"seconds of garbage collection time", None, 0.0)],
+        ),
+    ]
+)
+def test_GarbageBudget_violations(tracker, kwargs, exp_violations):
+    # pylint: disable=redefined-outer-name
+    """
+    Test function for GarbageBudget.violations().
+    """
+    budget = GarbageBudget(**kwargs)
+
+    # The code to be tested
+    violations = budget.violations(tracker)
+
+    assert len(violations) == len(exp_violations)
+    for violation, exp_violation in zip(violations, exp_violations):
+        what, value, limit = violation
+        exp_what, exp_value, exp_limit = exp_violation
+        assert what == exp_what
+        assert limit == exp_limit
+        if exp_value is None:
+            assert value > limit
+        else:
+            assert value == exp_value
+
+
+def test_GarbageBudget_format_violations():
+    """
+    Test function for GarbageBudget.format_violations().
+    """
+    violations = [(u"objects", 5, 2), (u"seconds of garbage collection time",
+                                       0.25, 0.125)]
+
+    # The code to be tested
+    message = GarbageBudget.format_violations(violations)
+
+    assert message.splitlines() == [
+        u"Garbage budget exceeded: 5 objects exceed the budget of 2 by 3",
+        u"Garbage budget exceeded: 0.25 seconds of garbage collection time "
+        u"exceed the budget of 0.125 by 0.125",
+    ]
+    assert GarbageBudget.format_violations([]) == u""
@@ -0,0 +1,110 @@
+"""
+Test the HeapCensus class.
+"""
+
+from __future__ import absolute_import, print_function
+
+import pytest
+from yagot import HeapCensus
+
+NUM_MARKERS = 1000
+
+
+class CensusMarker(object):
+    # pylint: disable=too-few-public-methods
+    "Class whose objects are counted in the tests"
+
+
+TYPE_NAME = '{}.CensusMarker'.format(__name__)
+
+
+@pytest.fixture
+def markers():
+    """
+    Fixture returning a list of marker objects.
+    """
+    return [CensusMarker() for _ in range(NUM_MARKERS)]
+
+
+def test_HeapCensus_step(markers):
+    # pylint: disable=redefined-outer-name,unused-argument
+    """
+    Test a census performed in steps of one chunk.
+    """
+    census = HeapCensus(chunk_size=1000)
+    assert census.counts is None
+    assert census.num_objects is None
+
+    # The code to be tested
+    num_steps = 1
+    while not census.step():
+        assert census.in_progress is True
+        assert census.counts is None
+        num_steps += 1
+
+    assert census.in_progress is False
+    assert census.num_censuses == 1
+    assert census.counts[TYPE_NAME] == NUM_MARKERS
+    assert census.num_objects >= NUM_MARKERS
+    # Each step counts at most one chunk of one part
+    assert num_steps >= census.num_objects // 1000
+    assert census.last_duration > 0
+    assert 0 < census.max_pause <= census.last_duration
+
+
+def test_HeapCensus_step_time_limit(markers):
+    # pylint: disable=redefined-outer-name,unused-argument
+    """
+    Test a census performed in steps with a time limit.
+    """
+    census = HeapCensus(chunk_size=100)
+
+    # The code to be tested
+    num_steps = 1
+    while not census.step(time_limit=3600):
+        num_steps += 1
+
+    # The time limit is not reached, so the census completes in one step
+    assert num_steps == 1
+    assert census.counts[TYPE_NAME] == NUM_MARKERS
+
+
+def test_HeapCensus_run(markers):
+    # pylint: disable=redefined-outer-name
+    """
+    Test function for HeapCensus.run(), for a new census and for finishing a
+    census in progress.
+    """
+    census = HeapCensus(chunk_size=1000)
+
+    # The code to be tested
+    counts = census.run()
+
+    assert counts is census.counts
+    assert counts[TYPE_NAME] == NUM_MARKERS
+
+    del markers[:]
+    census.step()
+
+    # The code to be tested
+    counts = census.run()
+
+    assert census.num_censuses == 2
+    assert TYPE_NAME not in counts
+
+
+def test_HeapCensus_cancel(markers):
+    # pylint: disable=redefined-outer-name,unused-argument
+    """
+    Test function for HeapCensus.cancel().
+    """
+    census = HeapCensus(chunk_size=1000)
+    census.run()
+    census.step()
+
+    # The code to be tested
+    census.cancel()
+
+    assert census.in_progress is False
+    assert census.num_censuses == 1
+    assert census.counts[TYPE_NAME] == NUM_MARKERS
@@ -0,0 +1,200 @@
+"""
+Test the child process tracking of GarbageTracker.
+"""
+
+from __future__ import absolute_import, print_function
+
+import os
+import sys
+import atexit
+import pytest
+from yagot import GarbageTracker
+
+try:
+    import multiprocessing
+    from concurrent.futures import ProcessPoolExecutor
+except ImportError:  # pragma: no cover
+    multiprocessing = None
+
+CHILDREN_SUPPORTED = hasattr(os, 'register_at_fork') and \
+    sys.platform != 'win32'
+
+pytestmark = pytest.mark.skipif(
+    not CHILDREN_SUPPORTED,
+    reason="Child process tracking not supported on this platform")
+
+
+def make_selfref(n=1):
+    "Function that creates n self-referencing dicts and returns n"
+    for _ in range(n):
+        obj = {}
+        obj['self'] = obj
+    return n
+
+
+def make_nothing(n=1):
+    "Function that creates no garbage and returns n"
+    return n
+
+
+def tracked(func, *args, **kwargs):
+    """
+    Run func in a tracking period with child process tracking and return the
+    tracker.
+    """
+    tracker = GarbageTracker()
+    tracker.enable(children=True)
+    tracker.start()
+    try:
+        func(*args, **kwargs)
+    finally:
+        tracker.stop()
+    return tracker
+
+
+def run_process(method, target, arg):
+    "Run target(arg) in a child process of the specified start method"
+    ctx = multiprocessing.get_context(method)
+    proc = ctx.Process(target=target, args=(arg,))
+    proc.start()
+    proc.join()
+    assert proc.exitcode == 0
+
+
+def run_pool(method, target, args):
+    "Run target in a process pool of the specified start method"
+    ctx = multiprocessing.get_context(method)
+    with ProcessPoolExecutor(2, mp_context=ctx) as executor:
+        assert list(executor.map(target, args)) == list(args)
+
+
+def run_fork(target, arg):
+    "Run target(arg) in a child process created with os.fork()"
+    pid = os.fork()
+    if pid == 0:
+        # The child process must not continue running the tests, so it exits
+        # with os._exit() after running the exit handlers like sys.exit().
+        try:
+            target(arg)
+        finally:
+            atexit._run_exitfuncs()  # pylint: disable=protected-access
+            os._exit(0)  # pylint: disable=protected-access
+    os.waitpid(pid, 0)
+
+
+@pytest.mark.parametrize(
+    "method", ['fork', 'spawn'])
+@pytest.mark.parametrize(
+    "target, exp_garbage", [
+        (make_selfref, 3),
+        (make_nothing, 0),
+    ])
+def test_children_process(method, target, exp_garbage):
+    """
+    Test child processes of multiprocessing.Process.
+    """
+    tracker = tracked(run_process, method, target, 3)
+
+    assert len(tracker.child_summaries) == 1
+    summary = tracker.child_summaries[0]
+    assert summary['num_objects'] == exp_garbage
+    assert tracker.child_garbage == exp_garbage
+    assert summary['pid'] != os.getpid()
+    if exp_garbage:
+        assert summary['types'] == {'dict': exp_garbage}
+        assert "child process {}".format(summary['pid']) in \
+            summary['message']
+        msg = tracker.assert_message("test")
+        assert "in 1 child process(es)" in msg
+    else:
+        assert summary['message'] is None
+
+
+@pytest.mark.parametrize(
+    "method", ['fork', 'spawn'])
+def test_children_pool(method):
+    """
+    Test the worker processes of ProcessPoolExecutor.
+    """
+    tracker = tracked(run_pool, method, make_selfref, [1, 2, 3])
+
+    assert len(tracker.child_summaries) == 2
+    # The spawned workers import this module when they receive the first
+    # work item, which causes additional garbage of other patterns.
+    num_selfref = sum(s['patterns'].get('container', 0)
+                      for s in tracker.child_summaries)
+    assert num_selfref == 6
+
+
+def test_children_fork():
+    """
+    Test a child process created with os.fork().
+    """
+    tracker = tracked(run_fork, make_selfref, 2)
+
+    assert len(tracker.child_summaries) == 1
+    assert tracker.child_garbage == 2
+
+
+def test_children_disabled():
+    """
+    Test that child processes are not tracked by default.
+    """
+    tracker = GarbageTracker()
+    tracker.enable()
+    tracker.start()
+    run_process('fork', make_selfref, 1)
+    tracker.stop()
+
+    assert tracker.track_children is False
+    assert tracker.child_summaries == []
+    assert tracker.child_garbage == 0
+    assert 'child' not in tracker.assert_message("test")
+
+
+def test_children_outside_period():
+    """
+    Test that child processes created outside of a tracking period are not
+    tracked, and that a tracking period does not include the summaries of
+    previous ones.
+    """
+    tracker = tracked(run_process, 'fork', make_selfref, 1)
+    assert tracker.child_garbage == 1
+
+    run_process('fork', make_selfref, 1)
+    run_process('spawn', make_selfref, 1)
+    tracker.start()
+    tracker.stop()
+
+    assert tracker.child_summaries == []
+
+
+def test_children_ignore():
+    """
+    Test that ignoring a tracking period ignores its child processes.
+    """
+    tracker = GarbageTracker()
+    tracker.enable(children=True)
+    tracker.start()
+    run_process('fork', make_selfref, 1)
+    tracker.ignore()
+    tracker.stop()
+
+    assert tracker.child_summaries == []
+
+
+def test_children_disable():
+    """
+    Test that disabling the tracker removes the socket of the child processes.
+    """
+    tracker = GarbageTracker()
+    tracker.enable(children=True)
+    # pylint: disable=protected-access
+    address = tracker._child_collector.address
+    assert os.path.exists(address)
+    assert tracker.track_children is True
+
+    tracker.disable()
+
+    assert not os.path.exists(address)
+    assert tracker.track_children is False
@@ -0,0 +1,250 @@
+"""
+Test the GarbageCycle class.
+"""
+
+from __future__ import absolute_import, print_function
+
+import weakref
+import pytest
+from yagot import GarbageCycle, ReferenceIndex, GarbageTracker, \
+    CYCLE_PATTERNS
+from yagot._cycles import classify_cycle
+
+
+def make_ring(types):
+    "Return a list of objects of the specified types that form a ring"
+    ring = [t() for t in types]
+    for i, item in enumerate(ring):
+        nxt = ring[(i + 1) % len(ring)]
+        if isinstance(item, dict):
+            item['next'] = nxt
+        else:
+            item.append(nxt)
+    return ring
+
+
+def test_GarbageCycle_from_index():
+    """
+    Test function for GarbageCycle.from_index().
+    """
+    ring = make_ring([dict, list, dict])
+    selfref = dict()
+    selfref['self'] = selfref
+    single = dict(ref=ring[0])
+
+    # The code to be tested
+    cycles = GarbageCycle.from_index(
+        ReferenceIndex([single] + ring + [selfref]))
+
+    assert len(cycles) == 2
+    assert cycles[0].objects == ring
+    assert len(cycles[0]) == 3
+    assert cycles[0].type_names == ['dict', 'list']
+    assert cycles[1].objects == [selfref]
+    assert cycles[1].type_names == ['dict']
+    assert cycles[0].fingerprint != cycles[1].fingerprint
+    assert repr(cycles[1]) == \
+        "GarbageCycle(fingerprint={!r}, pattern='container', " \
+        "types=['dict'])". \
+        format(cycles[1].fingerprint)
+
+
+def test_GarbageCycle_fingerprint():
+    """
+    Test function for GarbageCycle.fingerprint.
+    """
+    ring1 = make_ring([dict, list, dict])
+    ring2 = make_ring([list, dict, dict])  # Same ring, rotated
+    ring3 = make_ring([dict, list, list])
+    ring4 = make_ring([dict, list, dict, list])
+    ring2[0].append('other value')
+
+    # The code to be tested
+    cycles = GarbageCycle.from_index(
+        ReferenceIndex(ring1 + ring2 + ring3 + ring4))
+
+    fingerprints = [c.fingerprint for c in cycles]
+    assert len(fingerprints) == 4
+    assert fingerprints[0] == fingerprints[1]
+    assert fingerprints[0] != fingerprints[2]
+    assert fingerprints[0] != fingerprints[3]
+    assert len(fingerprints[0]) == 16
+
+
+def func_two_rings():
+    "Function that has two local rings of dicts"
+    _ = make_ring([dict, dict])
+    _ = make_ring([dict, dict])
+
+
+def test_GarbageTracker_cycles():
+    """
+    Test function for GarbageTracker.cycles and
+    GarbageTracker.assert_message() with known cycles.
+    """
+    tracker = GarbageTracker()
+    assert tracker.cycles == []
+    tracker.enable()
+    tracker.start()
+
+    func_two_rings()
+
+    tracker.stop()
+
+    # The code to be tested
+    cycles = tracker.cycles
+
+    assert len(cycles) == 2
+    assert cycles[0].fingerprint == cycles[1].fingerprint
+    assert tracker.cycles is cycles
+
+    msg = tracker.assert_message(
+        'mod::func', known_cycles={cycles[0].fingerprint: 'mod::other'})
+    assert "There were 4 collected or uncollectable object(s)" in msg
+    assert "object at 0x" not in msg
+    assert msg.count("first reported for function mod::other") == 2
+
+
+def func_exception_cycle():
+    "Function that keeps a caught exception in a local variable"
+    try:
+        raise ValueError("test")
+    except ValueError as exc:
+        saved_exc = exc
+    assert saved_exc
+
+
+class MethodHolder(object):
+    # pylint: disable=too-few-public-methods
+    "Class whose objects store a bound method of themselves"
+
+    def __init__(self):
+        self.callback = self.method
+
+    def method(self):
+        "Method that is stored on the object"
+        pass
+
+
+def func_bound_method_cycle():
+    "Function that has an object storing a bound method of itself"
+    _ = MethodHolder()
+
+
+def func_closure_cycle():
+    "Function that has a nested function that references itself"
+
+    def inner():
+        "Nested function"
+        return inner
+
+    assert inner
+
+
+def func_container_cycle():
+    "Function that has a local self-referencing dict"
+    d = dict()
+    d['self'] = d
+
+
+class CycleHolder(object):
+    # pylint: disable=too-few-public-methods
+    "Class whose objects reference each other"
+
+
+def func_other_cycle():
+    "Function that has two objects referencing each other"
+    obj1 = CycleHolder()
+    obj2 = CycleHolder()
+    obj1.peer = obj2
+    obj2.peer = obj1
+
+
+TESTCASES_GARBAGECYCLE_PATTERN = [
+    # Testcases for GarbageCycle.pattern
+    # Each list item is a testcase tuple with these items:
+    # * func: Function causing the reference cycle.
+    # * exp_pattern: Expected pattern of the reference cycle.
+    (func_exception_cycle, 'exception'),
+    (func_bound_method_cycle, 'bound-method'),
+    (func_closure_cycle, 'closure'),
+    (func_container_cycle, 'container'),
+    (func_other_cycle, 'other'),
+]
+
+
+@pytest.mark.parametrize(
+    "func, exp_pattern",
+    TESTCASES_GARBAGECYCLE_PATTERN)
+def test_GarbageCycle_pattern(func, exp_pattern):
+    """
+    Test function for GarbageCycle.pattern and GarbageCycle.hint.
+    """
+    tracker = GarbageTracker()
+    tracker.enable()
+    tracker.start()
+
+    func()
+
+    tracker.stop()
+
+    # The code to be tested
+    patterns = [c.pattern for c in tracker.cycles]
+
+    assert patterns == [exp_pattern]
+    cycle = tracker.cycles[0]
+    assert cycle.hint == dict(CYCLE_PATTERNS).get(exp_pattern)
+    assert tracker.cycles_by_pattern() == {exp_pattern: [cycle]}
+    assert tracker.summary()['patterns'] == {exp_pattern: 1}
+    message = tracker.assert_message()
+    if cycle.hint:
+        assert "({}) with".format(exp_pattern) in message
+        assert cycle.hint in message
+    else:
+        assert "Patterns of the reference cycles" not in message
+
+
+def test_GarbageCycle_pattern_generator():
+    """
+    Test function for GarbageCycle.pattern of an unfinished generator that
+    references itself. Such cycles are not tested with GarbageTracker,
+    because the garbage collector closes unfinished generators on Python 3,
+    which breaks the cycle.
+    """
+
+    def gen():
+        "Generator that keeps the value sent to it"
+        _ = yield
+        yield
+
+    g = gen()
+    next(g)
+    g.send(g)
+
+    # The code to be tested
+    cycles = GarbageCycle.from_index(ReferenceIndex([g, g.gi_frame]))
+
+    assert [c.pattern for c in cycles] == ['generator']
+    assert 'Close it' in cycles[0].hint
+    g.close()
+
+
+def test_classify_cycle_dead_proxy():
+    """
+    Test function for classify_cycle() with a dead weak reference proxy, for
+    which isinstance() raises ReferenceError.
+    """
+
+    class Target(object):
+        # pylint: disable=too-few-public-methods
+        "Weakly referenced class"
+
+    obj = Target()
+    proxy = weakref.proxy(obj)
+    del obj
+    holder = dict(proxy=proxy)
+
+    # The code to be tested
+    pattern = classify_cycle([holder, proxy])
+
+    assert pattern == 'other'
@@ -5,7 +5,7 @@ Test the garbage_checked decorator.
 from __future__ import absolute_import, print_function
 
 import pytest
-from yagot import garbage_checked
+from yagot import garbage_checked, GarbageBudget
 
 
 class SelfRef(object):
@@ -57,3 +57,53 @@ def test_leaks_selfref_3():
     collected objects but ignoring SelfRef types.
     """
     _ = SelfRef()
+
+
+@garbage_checked(filter_types=['subclass:dict'], filter_reachable=True)
+def test_leaks_selfref_4():
+    """
+    Test function with self-referencing dict collectable object when checking
+    for collected objects but removing dict objects individually.
+    """
+    d = dict()
+    d['self'] = d
+
+
+@garbage_checked(budget=GarbageBudget(max_objects=2))
+def test_leaks_selfref_5():
+    """
+    Test function with SelfRef collectable object when checking for
+    collected objects with a budget that tolerates them.
+    """
+    _ = SelfRef()
+
+
+@pytest.mark.xfail(raises=AssertionError, strict=True)
+@garbage_checked(budget=GarbageBudget(max_objects=None,
+                                      max_types={SelfRef: 0}))
+def test_leaks_selfref_6():
+    """
+    Test function with SelfRef collectable object when checking for
+    collected objects with a budget that tolerates no SelfRef objects,
+    causing the check to raise AssertionError.
+    """
+    _ = SelfRef()
+
+
+def test_leaks_selfref_message():
+    """
+    Test that the assertion message of the decorator does not mention the
+    budget if no budget was specified.
+    """
+
+    @garbage_checked()
+    def leaky():
+        "Decorated function with self-referencing dict collectable object"
+        d = dict()
+        d['self'] = d
+
+    with pytest.raises(AssertionError) as exc_info:
+        leaky()
+    message = str(exc_info.value)
+    assert "There were 1 collected or uncollectable object(s)" in message
+    assert "Garbage budget exceeded" not in message
@@ -0,0 +1,176 @@
+"""
+Test the ExceptionCycle class and the exception cycle mode of GarbageTracker.
+"""
+
+from __future__ import absolute_import, print_function
+
+import weakref
+import pytest
+from yagot import GarbageTracker, ExceptionCycle
+
+
+def func_exception_local():
+    "Function that keeps a caught exception in a local variable"
+    try:
+        raise ValueError("local")
+    except ValueError as exc:
+        saved_exc = exc
+    assert saved_exc
+
+
+class ErrorHolder(object):
+    # pylint: disable=too-few-public-methods
+    "Class whose objects keep a caught exception in an attribute"
+
+    def __init__(self):
+        self.error = None
+
+    def run(self):
+        "Method that keeps a caught exception in an attribute"
+        try:
+            raise KeyError("attr")
+        except KeyError as exc:
+            self.error = exc
+
+
+def func_exception_attr():
+    "Function that keeps a caught exception in an attribute of an object"
+    holder = ErrorHolder()
+    holder.run()
+
+
+def func_exception_proxy():
+    """
+    Function that keeps a caught exception in a local variable and in the
+    callback of a weak reference proxy, which is dead when the cycle is
+    collected.
+    """
+    try:
+        raise ValueError("proxy")
+    except ValueError as exc:
+        saved_exc = exc
+    target = ErrorHolder()
+    target.error = saved_exc
+    proxy = weakref.proxy(target, lambda ref, exc=saved_exc: None)
+    assert proxy.error
+
+
+def func_pytest_raises():
+    "Function that catches an exception with pytest.raises()"
+    with pytest.raises(ValueError) as exc_info:
+        raise ValueError("pytest")
+    assert exc_info.value
+
+
+def track(func, exceptions=True):
+    "Return a garbage tracker after tracking a call of the function"
+    tracker = GarbageTracker()
+    tracker.enable(exceptions=exceptions)
+    tracker.start()
+    tracker.ignore_types(type_list=None)
+    func()
+    tracker.stop()
+    return tracker
+
+
+def test_GarbageTracker_exceptions_local():
+    """
+    Test function for GarbageTracker.exception_cycles with an exception kept
+    in a local variable.
+    """
+
+    # The code to be tested
+    tracker = track(func_exception_local)
+
+    assert tracker.track_exceptions is True
+    assert tracker.ignored_type_names == []
+    cycles = tracker.exception_cycles
+    assert len(cycles) == 1
+    ec = cycles[0]
+    assert isinstance(ec, ExceptionCycle)
+    assert isinstance(ec.exception, ValueError)
+    assert ec.cycle.pattern == 'exception'
+    assert ec.holders == [
+        "variable 'saved_exc' of function {}::func_exception_local".
+        format(__name__)]
+    assert [frame.f_code.co_name for frame, _ in ec.frames] == \
+        ['func_exception_local']
+    assert ec.is_noise() is False
+    message = tracker.assert_message()
+    assert "Reference cycles formed by caught exceptions" in message
+    assert "Exception ValueError: local" in message
+    assert "keeps 1 frame(s) alive: {}::func_exception_local:".format(
+        __name__) in message
+
+
+def test_GarbageTracker_exceptions_attr():
+    """
+    Test function for GarbageTracker.exception_cycles with an exception kept
+    in an attribute of an object.
+    """
+
+    # The code to be tested
+    tracker = track(func_exception_attr)
+
+    cycles = tracker.exception_cycles
+    assert len(cycles) == 1
+    ec = cycles[0]
+    assert isinstance(ec.exception, KeyError)
+    holder_name = __name__ + '.ErrorHolder'
+    assert ec.holders in (
+        [holder_name + '.error'],
+        ["dict['error']"])
+    assert [frame.f_code.co_name for frame, _ in ec.frames] == ['run']
+
+
+def test_GarbageTracker_exceptions_proxy():
+    """
+    Test function for GarbageTracker.exception_cycles with a dead weak
+    reference proxy in the exception cycle, for which isinstance() raises
+    ReferenceError.
+    """
+
+    # The code to be tested
+    tracker = track(func_exception_proxy)
+
+    try:
+        cycles = tracker.exception_cycles
+        assert len(cycles) == 1
+        ec = cycles[0]
+        assert any(type(obj) is weakref.ProxyType
+                   for obj in ec.cycle.objects)
+        assert isinstance(ec.exception, ValueError)
+        assert "variable 'saved_exc' of function {}::func_exception_proxy". \
+            format(__name__) in ec.holders
+        assert ec.is_noise() is False
+    finally:
+        # The dead proxy must not remain in gc.garbage for other tests
+        tracker.release()
+
+
+def test_GarbageTracker_exceptions_noise():
+    """
+    Test function for the exception cycle mode with exceptions caught by
+    pytest.raises(), which are removed.
+    """
+
+    # The code to be tested
+    tracker = track(func_pytest_raises)
+
+    assert tracker.exception_cycles == []
+    assert tracker.garbage == []
+
+
+def test_GarbageTracker_exceptions_disabled():
+    """
+    Test function for GarbageTracker without the exception cycle mode, where
+    the tracking period with the exception cycle is ignored.
+    """
+
+    # The code to be tested
+    tracker = track(func_exception_local, exceptions=False)
+
+    assert tracker.track_exceptions is False
+    assert len(tracker.ignored_type_names) == 2
+    assert tracker.garbage == []
+    assert tracker.exception_cycles == []
@@ -0,0 +1,155 @@
+"""
+Test the FinalizerProfile class and the finalizer profiling of
+GarbageTracker.
+"""
+
+from __future__ import absolute_import, print_function
+
+import gc
+import sys
+import time
+import weakref
+import pytest
+from yagot import GarbageTracker, FinalizerProfile
+from yagot._typematcher import type2name
+
+pytestmark = pytest.mark.skipif(
+    not hasattr(gc, 'callbacks'),
+    reason="gc.callbacks is not supported on Python {}.{}".
+    format(*sys.version_info[0:2]))
+
+
+class SlowDel(object):
+    # pylint: disable=too-few-public-methods
+    "Class with a slow finalizer"
+
+    def __del__(self):
+        time.sleep(0.01)
+
+
+class Plain(object):
+    # pylint: disable=too-few-public-methods
+    "Class without a finalizer"
+
+
+def slow_callback(ref):
+    # pylint: disable=unused-argument
+    "Slow weak reference callback"
+    time.sleep(0.005)
+
+
+def slow_finalize():
+    "Slow function for weakref.finalize"
+    time.sleep(0.005)
+
+
+def cycle_del():
+    "Drop a reference cycle with a slow finalizer"
+    obj = SlowDel()
+    obj.self = obj
+
+
+def cycle_callback():
+    "Drop a reference cycle with a slow weak reference callback"
+    obj = Plain()
+    obj.self = obj
+    return weakref.ref(obj, slow_callback)
+
+
+def cycle_finalize():
+    "Drop a reference cycle with a slow weakref.finalize function"
+    obj = Plain()
+    obj.self = obj
+    return weakref.finalize(obj, slow_finalize)
+
+
+@pytest.mark.parametrize(
+    "func, exp_type, exp_name", [
+        (cycle_del, type2name(SlowDel), '__del__'),
+        (cycle_callback, 'weakref.ReferenceType', 'slow_callback'),
+        (cycle_finalize, '-', 'slow_finalize'),
+    ])
+def test_FinalizerProfile(func, exp_type, exp_name):
+    """
+    Test that FinalizerProfile attributes the time of finalizers during a
+    garbage collection.
+    """
+    gc.collect()
+    profile = FinalizerProfile()
+    profile.start()
+    assert profile.active
+    ref = func()  # noqa: F841 pylint: disable=unused-variable
+    gc.collect()
+    profile.stop()
+    assert not profile.active
+
+    stats = profile.stats()
+    assert len(stats) == 1
+    type_name, location, count, total, max_time = stats[0]
+    assert type_name == exp_type
+    assert location.endswith(u" ({})".format(exp_name))
+    assert u"test_finalizers.py:" in location
+    assert count == 1
+    assert total == max_time >= 0.005
+    assert profile.total_time == total
+    assert profile.num_collections == 1
+    assert profile.collect_time >= total
+    assert exp_type in profile.format()
+
+
+def test_FinalizerProfile_stopped():
+    """
+    Test that FinalizerProfile does not measure after it is stopped, and
+    restores the profile function and gc callbacks.
+    """
+    callbacks = list(gc.callbacks)
+    profile = FinalizerProfile()
+    profile.start()
+    profile.stop()
+    profile.stop()
+    cycle_del()
+    gc.collect()
+
+    assert profile.stats() == []
+    assert profile.num_collections == 0
+    assert gc.callbacks == callbacks
+    assert sys.getprofile() is None
+
+
+def test_GarbageTracker_finalizers():
+    """
+    Test the finalizer profile of GarbageTracker, including an automatic
+    collection during the tracking period.
+    """
+    tracker = GarbageTracker()
+    tracker.enable(auto_collect=True, finalizers=True)
+    tracker.start()
+    cycle_del()
+    gc.collect()
+    cycle_del()
+    tracker.stop()
+
+    profile = tracker.finalizer_profile
+    assert isinstance(profile, FinalizerProfile)
+    assert not profile.active
+    assert profile.num_collections >= 2
+    stats = profile.stats()
+    assert [s[0] for s in stats] == [type2name(SlowDel)]
+    assert stats[0][2] == 2
+    assert tracker.summary()['finalizer_time'] == profile.total_time
+    tracker.release()
+
+
+def test_GarbageTracker_finalizers_disabled():
+    """
+    Test that finalizers are not measured by default.
+    """
+    tracker = GarbageTracker()
+    tracker.enable()
+    tracker.start()
+    cycle_del()
+    tracker.stop()
+
+    assert tracker.finalizer_profile is None
+    assert tracker.summary()['finalizer_time'] is None
+    tracker.release()
@@ -4,6 +4,7 @@ Test the GarbageTracker class.
 
 from __future__ import absolute_import, print_function
 
+import gc
 from collections import OrderedDict
 from xml.dom.minidom import Document
 import six
@@ -41,12 +42,15 @@ def test_GarbageTracker_init():
         dict(),
         dict(leaks_only=False),
         dict(leaks_only=True),
+        dict(generation=0),
+        dict(leaks_only=True, generation=1),
     ])
 def test_GarbageTracker_enable(kwargs):
     """
     Test function for GarbageTracker.enable().
     """
     exp_leaks_only = kwargs.get('leaks_only', False)
+    exp_generation = kwargs.get('generation', 2)
     obj = GarbageTracker()
     assert obj.enabled is False
 
@@ -55,6 +59,7 @@ def test_GarbageTracker_enable(kwargs):
 
     assert obj.enabled is True
     assert obj.leaks_only == exp_leaks_only
+    assert obj.generation == exp_generation
 
     # Check that otherwise nothing happened
     assert obj.ignored is False
@@ -307,3 +312,282 @@ def test_GarbageTracker_track(desc, details, leaks_only, enable, ignore):
             garbage_types = [type(o) for o in obj.garbage]
             assert garbage_types == exp_garbage_types, \
                 "Garbage objects: {}".format(obj.garbage)
+
+
+def func_dict_list_cycle():
+    "Function that has a local dict and list referencing each other"
+    d = dict()
+    d['list'] = [d]
+
+
+def func_two_cycles():
+    "Function that has a local self-referencing dict and list"
+    d = dict()
+    d['a'] = d
+    lst = list()
+    lst.append(lst)
+
+
+def func_list_pins_dict_cycle():
+    "Function that has a self-referencing list referencing a dict cycle"
+    d = dict()
+    d['a'] = d
+    lst = list()
+    lst.append(lst)
+    lst.append(d)
+
+
+TESTCASES_GARBAGETRACKER_FILTER = [
+
+    # Testcases for filtering garbage using GarbageTracker.filter_types().
+
+    # Each list item is a testcase tuple with these items:
+    # * desc: Short testcase description.
+    # * details:
+    #   * func: Function that may create leaks.
+    #   * filter_types: List of type rules to filter.
+    #   * reachable: Boolean for also filtering reachable objects.
+    #   * exp_types: List of expected object types.
+
+    (
+        "Dict/list cycle, filtering no types",
+        dict(
+            func=func_dict_list_cycle,
+            filter_types=None,
+            reachable=False,
+            exp_types=[dict, list],
+        ),
+    ),
+    (
+        "Dict/list cycle, filtering list",
+        dict(
+            func=func_dict_list_cycle,
+            filter_types=['list'],
+            reachable=False,
+            exp_types=[dict],
+        ),
+    ),
+    (
+        "Dict/list cycle, filtering list and reachable objects",
+        dict(
+            func=func_dict_list_cycle,
+            filter_types=['list'],
+            reachable=True,
+            exp_types=[],
+        ),
+    ),
+    (
+        "Two cycles, filtering list and reachable objects",
+        dict(
+            func=func_two_cycles,
+            filter_types=[list],
+            reachable=True,
+            exp_types=[dict],
+        ),
+    ),
+    (
+        "List pinning dict cycle, filtering list",
+        dict(
+            func=func_list_pins_dict_cycle,
+            filter_types=['re:l.st'],
+            reachable=False,
+            exp_types=[dict],
+        ),
+    ),
+    (
+        "List pinning dict cycle, filtering list and reachable objects",
+        dict(
+            func=func_list_pins_dict_cycle,
+            filter_types=['re:l.st'],
+            reachable=True,
+            exp_types=[],
+        ),
+    ),
+    (
+        "List pinning dict cycle, filtering dict and reachable objects",
+        dict(
+            func=func_list_pins_dict_cycle,
+            filter_types=['subclass:dict'],
+            reachable=True,
+            exp_types=[list],
+        ),
+    ),
+]
+
+
+@pytest.mark.parametrize(
+    "desc, details",
+    TESTCASES_GARBAGETRACKER_FILTER)
+def test_GarbageTracker_filter(desc, details):
+    # pylint: disable=unused-argument
+    """
+    Test function for filtering garbage using GarbageTracker.filter_types().
+    """
+    func = details['func']
+    filter_types = details['filter_types']
+    reachable = details['reachable']
+    exp_types = details['exp_types']
+
+    obj = GarbageTracker()
+    obj.enable()
+    obj.start()
+
+    func()  # The code that might create leaks
+
+    # The code to be tested
+    obj.filter_types(filter_types, reachable=reachable)
+
+    obj.stop()
+
+    assert obj.type_filter.type_list == (filter_types or [])
+    assert obj.filter_reachable is reachable
+    garbage_types = sorted([type(o) for o in obj.garbage], key=str)
+    assert garbage_types == sorted(exp_types, key=str)
+    assert obj.reference_index.objects == obj.garbage
+
+
+def test_GarbageTracker_summary():
+    """
+    Test function for GarbageTracker.summary().
+    """
+    obj = GarbageTracker()
+    obj.enable()
+    obj.start()
+
+    func_dict_list_cycle()
+
+    obj.stop()
+
+    # The code to be tested
+    summary = obj.summary()
+
+    assert summary['num_objects'] == 2
+    assert summary['num_bytes'] > 0
+    assert summary['types'] == {'dict': 1, 'list': 1}
+    assert summary['fingerprints'] == [obj.cycles[0].fingerprint]
+    assert summary['collect_time'] == obj.collect_time
+    assert summary['collect_time'] > 0
+
+
+def test_GarbageTracker_generation_release():
+    """
+    Test function for tracking with young generation collections, and for
+    GarbageTracker.release().
+    """
+    obj = GarbageTracker()
+    obj.enable(generation=0)
+    obj.start()
+
+    func_dict_list_cycle()
+
+    obj.stop()
+
+    assert len(obj.garbage) == 2
+    num_garbage = len(gc.garbage)
+
+    # The code to be tested
+    obj.release()
+
+    assert obj.garbage == []
+    assert len(obj.reference_index) == 0
+    assert len(gc.garbage) == num_garbage - 2
+
+
+def test_GarbageTracker_generation_stats():
+    """
+    Test function for GarbageTracker.generation_stats with automatic garbage
+    collection kept active.
+    """
+    obj = GarbageTracker()
+    obj.enable(auto_collect=True)
+    obj.start()
+
+    func_dict_list_cycle()
+    gc.collect(0)
+    func_dict_list_cycle()
+
+    obj.stop()
+
+    # The code to be tested
+    gen_stats = obj.generation_stats
+
+    # The final collection by the tracker is not included
+    if six.PY2:
+        assert gen_stats is None
+    else:
+        assert len(gen_stats) == 3
+        assert gen_stats[0]['collections'] >= 1
+        assert gen_stats[0]['collected'] >= 2
+        assert obj.summary()['generation_stats'] == gen_stats
+        assert "Garbage collections during the tracking period: " \
+            "generation 0" in obj.assert_message()
+    assert len(obj.garbage) == 4
+
+    with pytest.raises(ValueError):
+        obj.enable(generation=0, auto_collect=True)
+
+
+# Module global that holds retained objects in the tests
+RETAINED_HOLDER = []
+
+
+def func_retain_list():
+    "Function that retains nested lists in a module global"
+    RETAINED_HOLDER.append([[1]])
+
+
+def test_GarbageTracker_retained():
+    """
+    Test function for detecting retained objects.
+    """
+    obj = GarbageTracker()
+    obj.enable(retained=True)
+    assert obj.track_retained is True
+    obj.start()
+
+    func_retain_list()
+    func_dict_selfref()
+
+    obj.stop()
+
+    try:
+        # The code to be tested
+        retained = obj.retained
+        held = obj.retained_roots()
+        message = obj.retained_message('mod::func')
+
+        retained_ids = set(id(o) for o in retained)
+        assert id(RETAINED_HOLDER[0]) in retained_ids
+        assert id(RETAINED_HOLDER[0][0]) in retained_ids
+        # Garbage is not retained
+        assert len(obj.garbage) == 1
+        assert id(obj.garbage[0]) not in retained_ids
+        by_type = dict(obj.retained_by_type())
+        assert by_type['list'][0] is RETAINED_HOLDER[0]
+
+        held = [(o, root) for o, root, _ in held]
+        assert (RETAINED_HOLDER[0], "module " + __name__) in held
+        assert "caused by function mod::func" in message
+        assert "of type list held by module {}".format(__name__) in message
+
+        obj.detect_retained()
+        assert id(RETAINED_HOLDER[0]) in set(id(o) for o in obj.retained)
+        assert obj.retained_message(exclude_modules=[__name__]) is None
+    finally:
+        del RETAINED_HOLDER[:]
+        obj.release()
+    assert obj.retained == []
+
+
+def test_GarbageTracker_retained_empty():
+    """
+    Test function for an empty tracking period with retained objects, which
+    must not report the objects of the garbage tracker itself.
+    """
+    obj = GarbageTracker()
+    obj.enable(retained=True)
+    obj.start()
+    obj.stop()
+
+    assert obj.retained == []
+    assert obj.retained_message() is None
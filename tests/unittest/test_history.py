@@ -0,0 +1,158 @@
+"""
+Test the HistoryStore class and its command line interface.
+"""
+
+from __future__ import absolute_import, print_function
+
+import os
+import pytest
+from yagot import HistoryStore
+from yagot._history import main
+
+
+def summary(num_objects, fingerprints=None):
+    "Return a tracking period summary with the specified number of objects"
+    return dict(
+        num_objects=num_objects,
+        num_bytes=num_objects * 100,
+        types=dict(dict=num_objects) if num_objects else dict(),
+        fingerprints=fingerprints or [],
+        collect_time=0.25,
+    )
+
+
+@pytest.fixture
+def history_path(tmpdir):
+    """
+    Fixture returning the path name of a history database with 3 runs.
+    """
+    path = str(tmpdir.join('history.db'))
+    store = HistoryStore(path, batch_size=2)
+    for run in range(3):
+        store.start_run(description="run {}".format(run))
+        store.add('test_a', summary(0))
+        store.add('test_b', summary(run, ['fp{}'.format(run)]))
+        store.add('test_c', summary(1, ['fp0']))
+        store.end_run()
+    store.close()
+    return path
+
+
+def test_HistoryStore_runs(history_path):
+    # pylint: disable=redefined-outer-name
+    """
+    Test function for HistoryStore.runs().
+    """
+    store = HistoryStore(history_path)
+
+    # The code to be tested
+    rows = store.runs()
+
+    assert [r[0] for r in rows] == [1, 2, 3]
+    assert [r[2:] for r in rows] == [
+        (3, 1, 100, 0.75),
+        (3, 2, 200, 0.75),
+        (3, 3, 300, 0.75),
+    ]
+    assert [r[0] for r in store.runs(limit=2)] == [2, 3]
+    store.close()
+
+
+def test_HistoryStore_trend(history_path):
+    # pylint: disable=redefined-outer-name
+    """
+    Test function for HistoryStore.trend().
+    """
+    store = HistoryStore(history_path)
+
+    # The code to be tested
+    rows = store.trend('test_b')
+
+    assert [(r[0],) + r[2:] for r in rows] == [
+        (1, 1, 0, 0, 0.25),
+        (2, 1, 1, 100, 0.25),
+        (3, 1, 2, 200, 0.25),
+    ]
+    assert store.trend('test_x') == []
+    store.close()
+
+
+def test_HistoryStore_first_seen(history_path):
+    # pylint: disable=redefined-outer-name
+    """
+    Test function for HistoryStore.first_seen().
+    """
+    store = HistoryStore(history_path)
+
+    # The code to be tested
+    row0 = store.first_seen('fp0')
+    row2 = store.first_seen('fp2')
+    row_prefix = store.first_seen('fp')
+    row_none = store.first_seen('fpx')
+
+    assert (row0[0], row0[2], row0[3]) == (1, 'test_b', 'fp0')
+    assert (row2[0], row2[2], row2[3]) == (3, 'test_b', 'fp2')
+    assert row_prefix[0] == 1
+    assert row_none is None
+    store.close()
+
+
+def test_HistoryStore_batching(tmpdir):
+    """
+    Test function for HistoryStore.add() writing in batches.
+    """
+    path = str(tmpdir.join('history.db'))
+    store = HistoryStore(path, batch_size=2)
+    store.start_run()
+    reader = HistoryStore(path)
+
+    # The code to be tested
+    store.add('test_a', summary(1))
+
+    assert reader.runs() == []
+
+    # The code to be tested
+    store.add('test_b', summary(1))
+
+    assert reader.runs()[0][2] == 2
+    store.close()
+    reader.close()
+
+
+@pytest.mark.parametrize(
+    "args, exp_rc, exp_lines", [
+        (['trend'], 0, ["   Run  Started", "     3  "]),
+        (['trend', 'test_b', '-n', '1'], 0, ["     3  "]),
+        (['trend', 'test_x'], 1, ["No runs recorded"]),
+        (['first-seen', 'fp1'], 0,
+         ["Cycle fp1 was first recorded in run 2 started "]),
+        (['first-seen', 'fpx'], 1, ["Cycle fpx was never recorded"]),
+    ])
+def test_history_main(history_path, capsys, args, exp_rc, exp_lines):
+    # pylint: disable=redefined-outer-name
+    """
+    Test function for the command line interface of the history database.
+    """
+
+    # The code to be tested
+    rc = main([history_path] + args)
+
+    assert rc == exp_rc
+    out = capsys.readouterr()[0]
+    for line in exp_lines:
+        assert line in out
+
+
+def test_history_main_missing(tmpdir, capsys):
+    """
+    Test function for the command line interface with a history database
+    file that does not exist, which is not created.
+    """
+    path = str(tmpdir.join('missing.db'))
+
+    # The code to be tested
+    rc = main([path, 'trend'])
+
+    assert rc == 2
+    assert "History database file not found" in capsys.readouterr()[1]
+    assert not os.path.exists(path)
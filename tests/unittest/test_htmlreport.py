@@ -0,0 +1,134 @@
+"""
+Test the HtmlReport class.
+"""
+
+from __future__ import absolute_import, print_function
+
+import re
+import json
+import zlib
+import base64
+import io
+from yagot import HtmlReport, GarbageTracker
+
+
+def track(func):
+    "Return a garbage tracker with a stopped tracking period of func()"
+    tracker = GarbageTracker()
+    tracker.enable()
+    tracker.start()
+    func()
+    tracker.stop()
+    return tracker
+
+
+def make_selfref():
+    "Create a self-referencing dict"
+    d1 = dict()
+    d1['self'] = d1
+
+
+def make_clean():
+    "Create no garbage"
+    _ = dict()
+
+
+def embedded_details(html):
+    "Return the decompressed details embedded in an HTML report"
+    m = re.search(r'<script type="application/json" id="yagot-data">'
+                  r'(.*?)</script>', html, re.S)
+    return [json.loads(zlib.decompress(base64.b64decode(blob)).
+                       decode('utf-8'))
+            for blob in json.loads(m.group(1))]
+
+
+def test_HtmlReport_add():
+    """
+    Test function for HtmlReport.add().
+    """
+    report = HtmlReport()
+
+    # The code to be tested
+    for location, func in (('test_a', make_selfref),
+                           ('test_b', make_clean),
+                           ('test_c', make_selfref)):
+        tracker = track(func)
+        report.add(location, tracker)
+        tracker.release()
+
+    assert len(report) == 3
+    assert report.num_cycles == 1
+
+
+def test_HtmlReport_html():
+    """
+    Test function for HtmlReport.html().
+    """
+    report = HtmlReport()
+    for location, func in (('test_selfref', make_selfref),
+                           ('test_clean', make_clean)):
+        tracker = track(func)
+        report.add(location, tracker)
+        tracker.release()
+
+    # The code to be tested
+    html = report.html(title="My <report>")
+
+    assert html.startswith(u"<!DOCTYPE html>")
+    assert u"<title>My &lt;report&gt;</title>" in html
+    assert u"Worst tracking periods by Bytes" in html
+    assert u"Distinct reference cycles" in html
+    assert u"<td>container</td>" in html
+    # In the tables by Bytes, by objects and by garbage collection time
+    assert html.count(u"data-detail='0'") == 3
+    assert u"data-detail='1'" not in html
+
+    details = embedded_details(html)
+    assert len(details) == 1
+    detail = details[0]
+    assert u"test_selfref" in detail['message']
+    assert [obj['type'] for obj in detail['objects']] == [u'dict']
+    assert detail['graph']['nodes'] == [u'dict']
+    assert detail['graph']['edges'] == [[0, 0, u"['self']"]]
+    assert detail['graph']['truncated'] is False
+
+
+def test_HtmlReport_html_escape():
+    """
+    Test that embedded details cannot end the script element of the data.
+    """
+    report = HtmlReport()
+
+    def make_script():
+        "Create garbage whose representation contains a script end tag"
+        d1 = dict(text=u"</script>")
+        d1['self'] = d1
+
+    tracker = track(make_script)
+    report.add('test_script', tracker, message=u"</script><b>")
+    tracker.release()
+
+    # The code to be tested
+    html = report.html()
+
+    assert html.count(u"</script>") == 2
+    assert embedded_details(html)[0]['message'] == u"</script><b>"
+
+
+def test_HtmlReport_write(tmpdir):
+    """
+    Test function for HtmlReport.write().
+    """
+    report = HtmlReport()
+    tracker = track(make_clean)
+    report.add('test_clean', tracker)
+    tracker.release()
+    path = str(tmpdir.join('report.html'))
+
+    # The code to be tested
+    report.write(path)
+
+    with io.open(path, encoding='utf-8') as fp:
+        html = fp.read()
+    assert u"<th>Tracking periods</th><td>1</td>" in html
+    assert embedded_details(html) == []
@@ -0,0 +1,143 @@
+"""
+Test the ImportTracker class.
+"""
+
+from __future__ import absolute_import, print_function
+
+import sys
+import pytest
+from yagot import ImportTracker, ImportCost
+
+PY2 = sys.version_info[0] == 2
+
+# Module that creates garbage at import time, and imports a child module
+MODULE_PARENT = """
+from . import child
+
+def _make_selfref():
+    d = dict()
+    d['self'] = d
+
+for _ in range(5):
+    _make_selfref()
+"""
+
+# Module that creates garbage at import time and keeps some objects
+MODULE_CHILD = """
+def _make_selfref():
+    d = dict()
+    d['self'] = d
+
+for _ in range(2):
+    _make_selfref()
+
+KEPT = [[i] for i in range(50)]
+"""
+
+
+@pytest.fixture
+def ytpkg(tmpdir):
+    """
+    Fixture that provides the name of a temporary package with modules that
+    create garbage at import time, and removes it from sys.modules afterwards.
+    """
+    pkgdir = tmpdir.mkdir('ytpkg')
+    pkgdir.join('__init__.py').write('')
+    pkgdir.join('parent.py').write(MODULE_PARENT)
+    pkgdir.join('child.py').write(MODULE_CHILD)
+    sys.path.insert(0, str(tmpdir))
+    yield 'ytpkg'
+    sys.path.remove(str(tmpdir))
+    for name in list(sys.modules):
+        if name == 'ytpkg' or name.startswith('ytpkg.'):
+            del sys.modules[name]
+
+
+def costs_by_name(tracker):
+    "Return the costs of the tracker as a dict by module name"
+    return dict((cost.name, cost) for cost in tracker.costs)
+
+
+@pytest.mark.skipif(PY2, reason="ImportTracker not supported on Python 2")
+def test_ImportTracker_install():
+    """
+    Test installing and uninstalling the import hook.
+    """
+    tracker = ImportTracker()
+    num_finders = len(sys.meta_path)
+    assert tracker.installed is False
+
+    with tracker:
+        assert tracker.installed is True
+        assert len(sys.meta_path) == num_finders + 1
+
+    assert tracker.installed is False
+    assert len(sys.meta_path) == num_finders
+    assert tracker.costs == []
+
+
+@pytest.mark.skipif(PY2, reason="ImportTracker not supported on Python 2")
+def test_ImportTracker_costs(ytpkg):
+    # pylint: disable=redefined-outer-name,unused-variable
+    """
+    Test the costs of imports, including attribution to nested imports.
+    """
+    tracker = ImportTracker()
+
+    # The code to be tested
+    with tracker:
+        __import__(ytpkg + '.parent')
+
+    costs = costs_by_name(tracker)
+    assert set(costs) == set(['ytpkg', 'ytpkg.parent', 'ytpkg.child'])
+    for cost in costs.values():
+        assert isinstance(cost, ImportCost)
+        assert cost.time >= 0.0
+        assert cost.cumulative_time >= cost.time
+
+    parent = costs['ytpkg.parent']
+    child = costs['ytpkg.child']
+    assert parent.parent is None
+    assert child.parent == 'ytpkg.parent'
+    assert parent.garbage == 5
+    assert child.garbage == 2
+    assert child.objects >= 50
+    assert parent.objects < child.objects
+    assert parent.cumulative_time >= child.cumulative_time
+
+    # The child import completes first
+    names = [cost.name for cost in tracker.costs]
+    assert names.index('ytpkg.child') < names.index('ytpkg.parent')
+
+    # The module has its original loader
+    module = sys.modules['ytpkg.parent']
+    assert type(module.__loader__).__name__ != '_TrackingLoader'
+
+
+@pytest.mark.skipif(PY2, reason="ImportTracker not supported on Python 2")
+def test_ImportTracker_report(ytpkg):
+    # pylint: disable=redefined-outer-name,unused-variable
+    """
+    Test sorting the costs and the formatted report.
+    """
+    tracker = ImportTracker()
+    with tracker:
+        __import__(ytpkg + '.parent')
+
+    # The code to be tested
+    by_garbage = tracker.sorted_costs('garbage')
+    by_objects = tracker.sorted_costs('objects')
+    report = tracker.report(max=1)
+
+    assert by_garbage[0].name == 'ytpkg.parent'
+    assert by_objects[0].name == 'ytpkg.child'
+    lines = report.splitlines()
+    assert len(lines) == 3
+    assert lines[0].split() == ['Garbage', 'Objects', 'GC', 'time', 'Time',
+                                'Module']
+    assert lines[1].split()[0] == '5'
+    assert lines[1].endswith('ytpkg.parent')
+    assert lines[2] == '... (2 more modules)'
+
+    with pytest.raises(ValueError):
+        tracker.sorted_costs('foo')
@@ -0,0 +1,182 @@
+"""
+Test the WSGI middleware for sampled garbage tracking.
+"""
+
+from __future__ import absolute_import, print_function
+
+import gc
+from wsgiref.util import setup_testing_defaults
+import pytest
+from yagot import GarbageMiddleware, RouteStats
+
+
+def make_selfref():
+    "Create a self-referencing dict that becomes collected garbage"
+    d = dict()
+    d['self'] = d
+
+
+def wsgi_app(environ, start_response):
+    """
+    WSGI application that creates one self-referencing dict per request on
+    path /cycle, and one more while the response is iterated.
+    """
+    if environ['PATH_INFO'] == '/error':
+        raise ValueError("error")
+    if environ['PATH_INFO'] == '/cycle':
+        make_selfref()
+    start_response('200 OK', [('Content-Type', 'text/plain')])
+    return ResponseBody(environ['PATH_INFO'] == '/cycle')
+
+
+class ResponseBody(object):
+    # pylint: disable=too-few-public-methods
+    "Response iterable that optionally creates garbage while iterated"
+
+    def __init__(self, selfref):
+        self.selfref = selfref
+        self.closed = False
+
+    def __iter__(self):
+        if self.selfref:
+            make_selfref()
+        yield b'ok'
+
+    def close(self):
+        "Called by the WSGI server"
+        self.closed = True
+
+
+def request(app, path, method='GET'):
+    """
+    In-process WSGI test client: Issue a request to the application and
+    return the status and body.
+    """
+    environ = {'PATH_INFO': path, 'REQUEST_METHOD': method}
+    setup_testing_defaults(environ)
+    status = []
+
+    def start_response(status_, headers):
+        # pylint: disable=unused-argument
+        status.append(status_)
+
+    result = app(environ, start_response)
+    try:
+        body = b''.join(result)
+    finally:
+        close = getattr(result, 'close', None)
+        if close is not None:
+            close()
+    return status[0], body
+
+
+def test_middleware_sampled():
+    """
+    Test aggregating the garbage of all requests per route.
+    """
+    summaries = []
+    app = GarbageMiddleware(
+        wsgi_app, sample_rate=1.0,
+        on_summary=lambda route, summary: summaries.append(route))
+    num_garbage = len(gc.garbage)
+
+    # The code to be tested
+    for _ in range(3):
+        assert request(app, '/cycle') == ('200 OK', b'ok')
+    assert request(app, '/clean', method='POST') == ('200 OK', b'ok')
+
+    stats = app.stats
+    assert set(stats) == set(['GET /cycle', 'POST /clean'])
+    cycle = stats['GET /cycle']
+    assert isinstance(cycle, RouteStats)
+    assert cycle.requests == 3
+    assert cycle.garbage_requests == 3
+    assert cycle.num_objects == 6
+    assert cycle.num_bytes > 0
+    assert cycle.types == {'dict': 6}
+    assert len(cycle.fingerprints) == 1
+    assert list(cycle.fingerprints.values()) == [3]
+    clean = stats['POST /clean']
+    assert clean.requests == 1
+    assert clean.garbage_requests == 0
+    assert clean.num_objects == 0
+    assert summaries == ['GET /cycle'] * 3 + ['POST /clean']
+
+    # The detected objects are released after each request
+    assert len(gc.garbage) == num_garbage
+
+    lines = app.report().splitlines()
+    assert len(lines) == 3
+    assert lines[1].split() == ['3', '3', '6', str(cycle.num_bytes),
+                                '{:.3f}s'.format(cycle.collect_time), 'GET',
+                                '/cycle']
+    assert lines[2].endswith('POST /clean')
+
+    app.reset()
+    assert app.stats == {}
+
+
+def test_middleware_not_sampled():
+    """
+    Test that requests are not tracked with a sample rate of 0.
+    """
+    app = GarbageMiddleware(wsgi_app, sample_rate=0.0)
+
+    # The code to be tested
+    assert request(app, '/cycle') == ('200 OK', b'ok')
+
+    assert app.stats == {}
+
+
+def test_middleware_route():
+    """
+    Test a route function and the handling of application errors.
+    """
+    app = GarbageMiddleware(
+        wsgi_app, sample_rate=1.0,
+        route=lambda environ: environ['PATH_INFO'].upper())
+
+    # The code to be tested
+    request(app, '/cycle')
+    with pytest.raises(ValueError):
+        request(app, '/error')
+    request(app, '/cycle')
+
+    stats = app.stats
+    assert list(stats) == ['/CYCLE']
+    assert stats['/CYCLE'].requests == 2
+
+
+def test_middleware_max_routes():
+    """
+    Test that the routes beyond the maximum number of routes are aggregated
+    under a fallback route.
+    """
+    app = GarbageMiddleware(wsgi_app, sample_rate=1.0, max_routes=2)
+
+    # The code to be tested
+    for item_id in range(4):
+        request(app, '/items/{}'.format(item_id))
+    request(app, '/items/0')
+
+    stats = app.stats
+    assert sorted(stats) == ['(other routes)', 'GET /items/0',
+                             'GET /items/1']
+    assert stats['GET /items/0'].requests == 2
+    assert stats['(other routes)'].requests == 2
+
+
+@pytest.mark.parametrize(
+    "kwargs", [
+        dict(sample_rate=1.5),
+        dict(sample_rate=-0.1),
+        dict(generation=3),
+        dict(max_routes=0),
+    ]
+)
+def test_middleware_invalid(kwargs):
+    """
+    Test invalid parameters.
+    """
+    with pytest.raises(ValueError):
+        GarbageMiddleware(wsgi_app, **kwargs)
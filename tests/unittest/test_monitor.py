@@ -0,0 +1,93 @@
+"""
+Test the Monitor class.
+"""
+
+from __future__ import absolute_import, print_function
+
+import gc
+import re
+from six.moves.urllib.request import urlopen
+from yagot import Monitor
+
+# Pattern for a sample line of the Prometheus text exposition format
+SAMPLE_PATTERN = re.compile(r'^([a-z_]+)(\{[^}]*\})? ([0-9.e+-]+)$')
+
+
+def parse_metrics(text):
+    "Parse metrics text into a dict of sample name with labels to value"
+    samples = {}
+    for line in text.splitlines():
+        if line.startswith('#'):
+            continue
+        m = SAMPLE_PATTERN.match(line)
+        assert m, "Invalid sample line: {!r}".format(line)
+        samples[m.group(1) + (m.group(2) or '')] = float(m.group(3))
+    return samples
+
+
+def test_Monitor_render():
+    """
+    Test the metrics produced by Monitor.render().
+    """
+    monitor = Monitor(prefix='test_gc')
+    with monitor:
+        assert monitor.running is True
+        gc.collect()
+        gc.collect(0)
+
+        # The code to be tested
+        text = monitor.render()
+
+    assert monitor.running is False
+    assert '# TYPE test_gc_pause_seconds histogram' in text
+    samples = parse_metrics(text)
+    assert samples['test_gc_collections_total{generation="2"}'] >= 1
+    assert samples['test_gc_pause_seconds_count{generation="2"}'] == 1
+    assert samples['test_gc_pause_seconds_count{generation="0"}'] >= 1
+    assert samples['test_gc_pause_seconds_bucket{generation="2",le="+Inf"}'] \
+        == 1
+    assert samples['test_gc_pause_seconds_sum{generation="2"}'] > 0
+    assert samples['test_gc_pause_max_seconds{generation="2"}'] == \
+        samples['test_gc_pause_seconds_sum{generation="2"}']
+    assert samples['test_gc_garbage_objects'] == len(gc.garbage)
+    assert samples['test_gc_threshold{generation="0"}'] == \
+        gc.get_threshold()[0]
+
+
+def test_Monitor_file(tmpdir):
+    """
+    Test writing the metrics to a file.
+    """
+    path = tmpdir.join('gc.prom')
+    monitor = Monitor(interval=0.01, path=str(path))
+
+    # The code to be tested
+    monitor.start()
+    gc.collect()
+    monitor.stop()
+
+    samples = parse_metrics(path.read())
+    assert samples['yagot_gc_pause_seconds_count{generation="2"}'] >= 1
+    assert [p.basename for p in tmpdir.listdir()] == ['gc.prom']
+
+
+def test_Monitor_http():
+    """
+    Test serving the metrics on the HTTP endpoint.
+    """
+    monitor = Monitor(port=0)
+    with monitor:
+        assert monitor.port > 0
+        gc.collect()
+
+        # The code to be tested
+        response = urlopen('http://127.0.0.1:{}/metrics'.format(monitor.port))
+        try:
+            assert response.getcode() == 200
+            assert response.info()['Content-Type'].startswith('text/plain')
+            text = response.read().decode('utf-8')
+        finally:
+            response.close()
+
+    samples = parse_metrics(text)
+    assert samples['yagot_gc_pause_seconds_count{generation="2"}'] >= 1
@@ -0,0 +1,196 @@
+"""
+Test the ReferenceIndex class.
+"""
+
+from __future__ import absolute_import, print_function
+
+import weakref
+import pytest
+from yagot import ReferenceIndex, GarbageTracker
+from yagot._refindex import _reference_label
+
+
+def make_ring(size):
+    "Return a list of dicts that reference each other in a ring"
+    ring = [dict(pos=i) for i in range(size)]
+    for i, item in enumerate(ring):
+        item['next'] = ring[(i + 1) % size]
+    return ring
+
+
+def test_ReferenceIndex_empty():
+    """
+    Test function for ReferenceIndex with no objects.
+    """
+
+    # The code to be tested
+    index = ReferenceIndex([])
+
+    assert len(index) == 0  # pylint: disable=len-as-condition
+    assert index.objects == []
+    assert dict() not in index
+
+
+def test_ReferenceIndex_referents_referrers():
+    """
+    Test function for ReferenceIndex.referents() and referrers().
+    """
+    ring = make_ring(3)
+    outsider = dict(ref=ring[0])
+
+    # The code to be tested
+    index = ReferenceIndex(ring + [ring[0]])
+
+    assert len(index) == 3
+    assert index.objects == ring
+    assert outsider not in index
+    for i, item in enumerate(ring):
+        assert item in index
+        assert index.referents(item) == [ring[(i + 1) % 3]]
+        assert index.referrers(item) == [ring[(i - 1) % 3]]
+    with pytest.raises(KeyError):
+        index.referrers(outsider)
+
+
+def test_ReferenceIndex_shortest_path():
+    """
+    Test function for ReferenceIndex.shortest_path().
+    """
+    ring = make_ring(4)
+    shortcut = dict(a=ring[0])
+    ring[2]['shortcut'] = shortcut
+    single = dict()
+
+    # The code to be tested
+    index = ReferenceIndex(ring + [shortcut, single])
+
+    assert index.shortest_path(ring[0], ring[2]) == \
+        [ring[0], ring[1], ring[2]]
+    assert index.shortest_path(ring[2], ring[0]) == \
+        [ring[2], ring[3], ring[0]]
+    assert index.shortest_path(ring[1], ring[1]) == [ring[1]]
+    assert index.shortest_path(ring[0], single) is None
+    with pytest.raises(KeyError):
+        index.shortest_path(ring[0], dict())
+
+
+def test_ReferenceIndex_shortest_cycle():
+    """
+    Test function for ReferenceIndex.shortest_cycle().
+    """
+    ring = make_ring(3)
+    selfref = dict()
+    selfref['self'] = selfref
+    single = dict()
+
+    # The code to be tested
+    index = ReferenceIndex(ring + [selfref, single])
+
+    assert index.shortest_cycle(ring[1]) == [ring[1], ring[2], ring[0], ring[1]]
+    assert index.shortest_cycle(selfref) == [selfref, selfref]
+    assert index.shortest_cycle(single) is None
+
+
+def func_dict_ring():
+    "Function that has a local ring of dicts"
+    _ = make_ring(2)
+
+
+def test_GarbageTracker_reference_index():
+    """
+    Test function for GarbageTracker.reference_index.
+    """
+    tracker = GarbageTracker()
+    assert tracker.reference_index.objects == []
+    tracker.enable()
+    tracker.start()
+
+    func_dict_ring()
+
+    tracker.stop()
+
+    # The code to be tested
+    index = tracker.reference_index
+
+    assert len(index) == 2
+    assert index.objects == tracker.garbage
+    obj = tracker.garbage[0]
+    assert len(index.shortest_cycle(obj)) == 3
+    assert "Reference cycle: dict['next'] -> dict['next'] -> dict" in \
+        tracker.assert_message()
+
+
+class PathNode(object):
+    # pylint: disable=too-few-public-methods
+    "Class whose objects reference themselves via a bound method"
+
+    def __init__(self):
+        self.callback = self.method
+
+    def method(self):
+        "Method that is referenced by the object"
+        pass
+
+
+def make_closure():
+    "Return a function that references itself via its closure"
+    def inner():
+        "Inner function"
+        return inner
+    return inner
+
+
+def test_ReferenceIndex_format_path():
+    """
+    Test function for ReferenceIndex.format_path().
+    """
+    ring = make_ring(2)
+    lst = [1]
+    lst.append(lst)
+    node = PathNode()
+    func = make_closure()
+    index = ReferenceIndex(ring + [lst, node, node.callback, func,
+                                   func.__closure__, func.__closure__[0]])
+
+    # The code to be tested
+    ring_str = ReferenceIndex.format_path(index.shortest_cycle(ring[0]))
+    lst_str = ReferenceIndex.format_path(index.shortest_cycle(lst))
+    node_str = ReferenceIndex.format_path(index.shortest_cycle(node))
+    func_str = ReferenceIndex.format_path(index.shortest_cycle(func))
+
+    assert ring_str == "dict['next'] -> dict['next'] -> dict"
+    assert lst_str == "list[1] -> list"
+    node_name = __name__ + '.PathNode'
+    assert node_str in (
+        "{0}.callback -> method.__self__ -> {0}".format(node_name),
+        "{0}.__dict__['callback'] -> method.__self__ -> {0}".format(
+            node_name),
+        "{0}.__dict__['callback'] -> instancemethod.__self__ -> {0}".format(
+            node_name))
+    assert func_str == \
+        "function.__closure__ -> tuple[0] -> cell.cell_contents -> function"
+    assert ReferenceIndex.format_path([]) == ""
+
+
+def test_reference_label_dead_proxy():
+    """
+    Test that reference labels and paths can be determined for dead weak
+    reference proxies, for which isinstance() raises ReferenceError.
+    """
+
+    class Target(object):
+        # pylint: disable=too-few-public-methods
+        "Weakly referenced class"
+
+    obj = Target()
+    proxy = weakref.proxy(obj)
+    del obj
+    holder = [proxy]
+
+    # The code to be tested
+    assert _reference_label(proxy, holder) == u""
+    assert _reference_label(holder, proxy) == u"[0]"
+
+    index = ReferenceIndex([holder, proxy])
+    assert index.format_path([holder, proxy]) == \
+        u"list[0] -> weakref.ProxyType"
@@ -0,0 +1,140 @@
+"""
+Test the detection of resource leaks by GarbageTracker.
+"""
+
+from __future__ import absolute_import, print_function
+
+import os
+import sys
+import warnings
+import pytest
+from yagot import GarbageTracker, ResourceLeaks, garbage_checked
+
+# Files kept open by the test functions
+OPEN_FILES = []
+
+HAS_FDS = os.path.isdir('/proc/self/fd')
+
+
+def drop_unclosed(path):
+    "Open a file and drop it without closing it"
+    open(path)
+
+
+def cycle_unclosed(path):
+    "Open a file in a reference cycle and drop it without closing it"
+    d1 = dict(fp=open(path))
+    d1['self'] = d1
+
+
+def keep_open(path):
+    "Open a file and keep it open"
+    OPEN_FILES.append(open(path))
+
+
+def close_properly(path):
+    "Open a file and close it"
+    with open(path) as fp:
+        fp.read()
+
+
+def tracked(func, path):
+    """
+    Run func(path) in a tracking period for resource leaks, and return the
+    tracker.
+    """
+    tracker = GarbageTracker()
+    tracker.enable(resources=True)
+    tracker.start()
+    func(path)
+    tracker.stop()
+    return tracker
+
+
+@pytest.fixture
+def path(tmpdir):
+    """
+    Fixture returning the path name of an existing file.
+    """
+    path = tmpdir.join('file.txt')
+    path.write('data')
+    yield str(path)
+    for fp in OPEN_FILES:
+        fp.close()
+    del OPEN_FILES[:]
+
+
+@pytest.mark.skipif(sys.version_info[0] < 3,
+                    reason="ResourceWarning is not issued on Python 2")
+@pytest.mark.parametrize(
+    "func, exp_warnings, exp_fds, exp_garbage", [
+        (drop_unclosed, 1, 0, False),
+        (cycle_unclosed, 1, 0, True),
+        (keep_open, 0, 1, False),
+        (close_properly, 0, 0, False),
+    ])
+def test_GarbageTracker_resources(
+        path, func, exp_warnings, exp_fds, exp_garbage):
+    # pylint: disable=redefined-outer-name
+    """
+    Test the detection of ResourceWarning warnings and open file descriptors.
+    """
+    filters = list(warnings.filters)
+    showwarning = warnings.showwarning
+
+    # The code to be tested
+    tracker = tracked(func, path)
+
+    leaks = tracker.resource_leaks
+    assert isinstance(leaks, ResourceLeaks)
+    assert len(leaks.warnings) == exp_warnings
+    for msg in leaks.warnings:
+        assert issubclass(msg.category, ResourceWarning)
+        assert path in str(msg.message)
+    if HAS_FDS:
+        assert len(leaks.fds) == exp_fds
+        for _, target in leaks.fds:
+            assert target == path
+    assert bool(tracker.garbage) is exp_garbage
+    assert tracker.summary()['resources'] == \
+        dict(warnings=exp_warnings, fds=len(leaks.fds))
+    if leaks:
+        message = tracker.assert_message('mod::func')
+        assert "unclosed resource(s) (ResourceWarning or open file " \
+            "descriptor) caused by function mod::func" in message
+    assert warnings.filters == filters
+    assert warnings.showwarning is showwarning
+    tracker.release()
+
+
+def test_GarbageTracker_resources_disabled(path):
+    # pylint: disable=redefined-outer-name
+    """
+    Test that resource leaks are not detected by default.
+    """
+    tracker = GarbageTracker()
+    tracker.enable()
+    tracker.start()
+    keep_open(path)
+    tracker.stop()
+
+    assert tracker.resource_leaks is None
+    assert tracker.summary()['resources'] is None
+
+
+@pytest.mark.skipif(not HAS_FDS,
+                    reason="Open file descriptors are not detected")
+def test_garbage_checked_resources(path):
+    # pylint: disable=redefined-outer-name
+    """
+    Test the garbage_checked decorator with resources=True.
+    """
+
+    @garbage_checked(resources=True)
+    def leaky(path):
+        "Decorated function that keeps a file open"
+        keep_open(path)
+
+    with pytest.raises(AssertionError) as exc_info:
+        leaky(path)
+    assert "Open file descriptor" in str(exc_info.value)
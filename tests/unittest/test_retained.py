@@ -0,0 +1,111 @@
+"""
+Test the support for detecting retained objects.
+"""
+
+from __future__ import absolute_import, print_function
+
+import gc
+from yagot import _retained
+from yagot._retained import IdSnapshot, find_roots
+
+# Module global that holds retained objects in the tests
+HOLDER = []
+
+
+class Holder(object):
+    # pylint: disable=too-few-public-methods
+    "Class whose class attribute holds retained objects in the tests"
+    items = []
+
+
+def test_IdSnapshot():
+    """
+    Test IdSnapshot with the objects tracked by the garbage collector.
+    """
+    old_obj = [1]
+
+    # The code to be tested
+    snapshot = IdSnapshot()
+
+    new_obj = [2]
+    assert len(snapshot) > 0
+    assert id(old_obj) in snapshot
+    assert id(new_obj) not in snapshot
+    new_objects = snapshot.new_objects()
+    new_ids = set(id(obj) for obj in new_objects)
+    assert id(new_obj) in new_ids
+    assert id(old_obj) not in new_ids
+    assert id(snapshot) not in new_ids
+    assert id(new_objects) not in new_ids
+    new_ids2 = set(id(obj) for obj in
+                   snapshot.new_objects(exclude_ids=set([id(new_obj)])))
+    assert id(new_obj) not in new_ids2
+
+
+def test_IdSnapshot_objects():
+    """
+    Test IdSnapshot with specified objects.
+    """
+    objs = [[i] for i in range(100)]
+
+    # The code to be tested
+    snapshot = IdSnapshot(objs)
+
+    assert len(snapshot) == 100
+    for obj in objs:
+        assert id(obj) in snapshot
+    assert id(gc) not in snapshot
+
+
+def test_IdSnapshot_buckets(monkeypatch):
+    """
+    Test IdSnapshot with more objects than are sorted at a time.
+    """
+    monkeypatch.setattr(_retained, 'SORT_BUCKET_SIZE', 16)
+    objs = [[i] for i in range(1000)]
+
+    # The code to be tested
+    snapshot = IdSnapshot(objs)
+
+    assert len(snapshot) == 1000
+    # pylint: disable=protected-access
+    assert list(snapshot._ids) == sorted(id(obj) for obj in objs)
+    for obj in objs:
+        assert id(obj) in snapshot
+    assert id(gc) not in snapshot
+
+
+def test_find_roots():
+    """
+    Test find_roots() with objects held by a module global and a class
+    attribute, and an object without root.
+    """
+    inner = {'a': 1}
+    outer = [inner]
+    HOLDER.append(outer)
+    attr = [42]
+    Holder.items.append(attr)
+    local = [3]
+    objects = [inner, outer, attr, local]
+    try:
+
+        # The code to be tested
+        roots = find_roots(objects, ignore=[objects])
+
+        assert id(local) not in roots
+        root, chain = roots[id(inner)]
+        assert root == "module {}".format(__name__)
+        assert chain[0] is globals()
+        assert chain[1:] == [HOLDER, outer, inner]
+        root, chain = roots[id(attr)]
+        assert root == "class {}.Holder".format(__name__)
+        assert chain[0] is Holder
+        assert chain[-1] is attr
+
+        # With excluded modules, no roots are found
+        roots = find_roots(objects, ignore=[objects],
+                           exclude_modules=[__name__])
+        assert roots == {}
+    finally:
+        del HOLDER[:]
+        del Holder.items[:]
@@ -0,0 +1,244 @@
+"""
+Test the command line interface for running scripts and modules under garbage
+tracking (python -m yagot).
+"""
+
+from __future__ import absolute_import, print_function
+
+import gc
+import sys
+import json
+import pytest
+from yagot._runner import main
+
+SCRIPT_SELFREF = """
+import sys
+
+def make_selfref():
+    d = dict()
+    d['self'] = d
+
+for _ in range(3):
+    make_selfref()
+print("args: {}".format(sys.argv[1:]))
+"""
+
+SCRIPT_CLEAN = """
+import sys
+_ = dict()
+sys.exit(3)
+"""
+
+SCRIPT_MODULE = """
+import sys
+
+class Clean(object):
+    pass
+
+def clean():
+    pass
+
+print("args: {}".format(sys.argv[1:]))
+"""
+
+SCRIPT_EXCEPTION = """
+def catch():
+    try:
+        raise ValueError('bad')
+    except ValueError as exc:
+        caught = exc
+
+catch()
+"""
+
+
+def run_main(capsys, args):
+    "Run main() and return exit code, stdout and stderr"
+    rc = main(args)
+    out, err = capsys.readouterr()
+    return rc, out, err
+
+
+def test_runner_script_selfref(tmpdir, capsys):
+    """
+    Test running a script that creates self-referencing dicts.
+    """
+    script = tmpdir.join('selfref.py')
+    script.write(SCRIPT_SELFREF)
+    output = tmpdir.join('out.json')
+
+    # The code to be tested
+    rc, out, err = run_main(
+        capsys, ['--details', '-o', str(output), str(script), 'a', '-b'])
+
+    assert rc == 0
+    assert "args: ['a', '-b']" in out
+    assert "yagot: Period 1 (" in err
+    assert "3 object(s)" in err
+    assert "3 cycle(s)" in err
+    assert ": 3 dict" in err
+    assert "There were 3 collected or uncollectable object(s)" in err
+    periods = json.loads(output.read())
+    assert len(periods) == 1
+    assert periods[0]['num_objects'] == 3
+    assert periods[0]['types'] == {'dict': 3}
+
+
+def test_runner_script_exit_code(tmpdir, capsys):
+    """
+    Test running a script that exits with an exit code.
+    """
+    script = tmpdir.join('clean.py')
+    script.write(SCRIPT_CLEAN)
+
+    # The code to be tested
+    rc, _, err = run_main(capsys, ['--leaks-only', str(script)])
+
+    assert rc == 3
+    assert "0 object(s)" in err
+
+
+def test_runner_script_filter(tmpdir, capsys):
+    """
+    Test running a script with filtered types.
+    """
+    script = tmpdir.join('selfref.py')
+    script.write(SCRIPT_SELFREF)
+
+    # The code to be tested
+    rc, _, err = run_main(capsys, ['--filter-types', 'dict', str(script)])
+
+    assert rc == 0
+    assert "0 object(s)" in err
+
+
+def test_runner_script_ignore_types(tmpdir, capsys):
+    """
+    Test running a script with ignored types, which does not ignore the frame
+    and code objects of a caught exception.
+    """
+    script = tmpdir.join('exc.py')
+    script.write(SCRIPT_EXCEPTION)
+
+    # The code to be tested
+    rc, _, err = run_main(capsys, ['--ignore-types', 'Foo', str(script)])
+
+    assert rc == 0
+    assert "0 object(s)" not in err
+    assert "frame" in err
+
+
+def test_runner_release(tmpdir, capsys):
+    """
+    Test that the garbage of the tracking periods is released, also in
+    periodic mode.
+    """
+    script = tmpdir.join('selfref.py')
+    script.write(SCRIPT_SELFREF + "import time\ntime.sleep(0.25)\n")
+    num_garbage = len(gc.garbage)
+
+    # The code to be tested
+    rc, _, err = run_main(capsys, ['--interval', '0.1', str(script)])
+
+    assert rc == 0
+    assert "yagot: Period 2 (" in err
+    assert len(gc.garbage) == num_garbage
+
+
+def test_runner_module(tmpdir, capsys, monkeypatch):
+    """
+    Test running a module with a class and a function, whose globals are not
+    detected as garbage.
+    """
+    tmpdir.join('yagot_clean_mod.py').write(SCRIPT_MODULE)
+    monkeypatch.syspath_prepend(str(tmpdir))
+
+    # The code to be tested
+    rc, out, err = run_main(capsys, ['-m', 'yagot_clean_mod', 'x'])
+
+    assert rc == 0
+    assert "args: ['x']" in out
+    assert "yagot: Period 1 (" in err
+    assert "0 object(s)" in err
+    sys.modules.pop('yagot_clean_mod', None)
+
+
+def test_runner_empty_sys_path(tmpdir, capsys, monkeypatch):
+    """
+    Test running a script with an empty sys.path.
+    """
+    script = tmpdir.join('clean.py')
+    script.write("_ = dict()\n")
+    monkeypatch.setattr(sys, 'path', [])
+
+    # The code to be tested
+    rc, _, err = run_main(capsys, [str(script)])
+
+    assert rc == 0
+    assert "0 object(s)" in err
+    assert sys.path == []
+
+
+def test_runner_interval(tmpdir, capsys):
+    """
+    Test running a script with periodic tracking periods.
+    """
+    script = tmpdir.join('sleep.py')
+    script.write("import time\ntime.sleep(0.35)\n")
+
+    # The code to be tested
+    rc, _, err = run_main(capsys, ['--interval', '0.1', str(script)])
+
+    assert rc == 0
+    assert "yagot: Period 1 (" in err
+    assert "yagot: Period 3 (" in err
+
+
+def test_runner_script_exception(tmpdir, capsys):
+    """
+    Test running a script that raises an exception.
+    """
+    script = tmpdir.join('raises.py')
+    script.write("raise ValueError('bad')\n")
+
+    # The code to be tested
+    rc, _, err = run_main(capsys, [str(script)])
+
+    assert rc == 1
+    assert "ValueError: bad" in err
+    assert "yagot: Period 1 (" in err
+
+
+def test_runner_no_target(capsys):
+    """
+    Test running without a target.
+    """
+    with pytest.raises(SystemExit):
+
+        # The code to be tested
+        main([])
+
+    assert "usage: python -m yagot" in capsys.readouterr()[1]
+
+
+def test_runner_imports(tmpdir, capsys):
+    """
+    Test the --imports option with a script that imports a module that
+    creates garbage at import time.
+    """
+    tmpdir.join('ytimpmod.py').write(SCRIPT_SELFREF)
+    script = tmpdir.join('importer.py')
+    script.write("import ytimpmod\n")
+
+    try:
+        # The code to be tested
+        rc, _, err = run_main(capsys, ['--imports', str(script)])
+    finally:
+        sys.modules.pop('ytimpmod', None)
+
+    assert rc == 0
+    assert "Garbage    Objects" in err
+    module_lines = [line for line in err.splitlines()
+                    if line.endswith(' ytimpmod')]
+    assert len(module_lines) == 1
+    assert module_lines[0].split()[0] == '3'
@@ -0,0 +1,134 @@
+"""
+Test the heap snapshot files and their offline comparison.
+"""
+
+from __future__ import absolute_import, print_function
+
+import gc
+import pytest
+from yagot import snapshot, SnapshotReader, diff_snapshots
+from yagot._snapshot import main
+
+
+class SnapshotNode(object):
+    # pylint: disable=too-few-public-methods
+    "Class whose objects form reference cycles"
+
+    def __init__(self):
+        self.peer = None
+
+
+def make_cycles(num):
+    "Return a list of reference cycles of two SnapshotNode objects"
+    cycles = []
+    for _ in range(num):
+        node1 = SnapshotNode()
+        node2 = SnapshotNode()
+        node1.peer = node2
+        node2.peer = node1
+        cycles.append(node1)
+    return cycles
+
+
+@pytest.fixture
+def snapshot_paths(tmpdir):
+    """
+    Fixture returning the path names of two snapshot files, where the second
+    snapshot has 3 additional reference cycles of SnapshotNode objects.
+    """
+    path_a = str(tmpdir.join('a.snap'))
+    path_b = str(tmpdir.join('b.snap'))
+    gc.collect()
+    snapshot(path_a)
+    cycles = make_cycles(3)
+    snapshot(path_b)
+    del cycles
+    return path_a, path_b
+
+
+def test_snapshot_reader(tmpdir):
+    """
+    Test function for snapshot() and SnapshotReader.
+    """
+    path = str(tmpdir.join('x.snap'))
+    obj = [[1], [2]]
+
+    # The code to be tested
+    num = snapshot(path, buffer_size=100)
+
+    with SnapshotReader(path) as reader:
+        assert len(reader) == num
+        records = dict((rec[0], rec) for rec in reader)
+        ids = [rec[0] for rec in reader]
+        assert ids == sorted(ids)
+        obj_id, type_index, size, referent_ids = records[id(obj)]
+        assert reader.type_names[type_index] == 'list'
+        assert size > 0
+        assert sorted(referent_ids) == sorted([id(obj[0]), id(obj[1])])
+        assert obj_id == id(obj)
+
+
+def test_snapshot_reader_invalid(tmpdir):
+    """
+    Test function for SnapshotReader with a file that is not a snapshot.
+    """
+    path = tmpdir.join('invalid.snap')
+    path.write('not a snapshot file, but long enough to be checked')
+
+    with pytest.raises(ValueError):
+
+        # The code to be tested
+        SnapshotReader(str(path))
+
+
+def test_diff_snapshots(snapshot_paths):
+    # pylint: disable=redefined-outer-name
+    """
+    Test function for diff_snapshots().
+    """
+
+    # The code to be tested
+    result = diff_snapshots(*snapshot_paths)
+
+    assert result['num_new'] >= 6
+    assert result['num_objects'][1] >= result['num_new']
+    node_types = [t for t in result['types']
+                  if t['type_name'].endswith('.SnapshotNode')]
+    assert len(node_types) == 1
+    assert node_types[0]['count_b'] - node_types[0]['count_a'] == 6
+    node_cycles = [c for c in result['cycles']
+                   if any(n.endswith('.SnapshotNode')
+                          for n in c['type_names'])]
+    assert len(node_cycles) == 1
+    assert node_cycles[0]['count'] == 3
+
+
+def test_snapshot_main(snapshot_paths, capsys):
+    # pylint: disable=redefined-outer-name
+    """
+    Test function for the command line interface of diff_snapshots().
+    """
+
+    # The code to be tested
+    rc = main(list(snapshot_paths))
+
+    assert rc == 0
+    out = capsys.readouterr()[0]
+    assert "new objects:" in out
+    assert "SnapshotNode" in out
+    assert "3 time(s)" in out
+
+
+def test_snapshot_main_error(tmpdir, capsys):
+    """
+    Test function for the command line interface with a missing file.
+    """
+    path = str(tmpdir.join('missing.snap'))
+
+    # The code to be tested
+    rc = main([path, path])
+
+    assert rc == 1
+    out, err = capsys.readouterr()
+    assert out == ""
+    assert "Error:" in err
@@ -0,0 +1,253 @@
+"""
+Stress test the GarbageTracker class and the garbage_checked decorator with
+many threads.
+"""
+
+from __future__ import absolute_import, print_function
+
+import gc
+import threading
+import pytest
+from yagot import GarbageTracker, garbage_checked
+
+NUM_THREADS = 8
+NUM_ITERATIONS = 5
+
+
+class Marker(object):
+    # pylint: disable=too-few-public-methods
+    "Class whose objects reference themselves and the creating thread"
+
+    def __init__(self, thread_index):
+        self.thread_index = thread_index
+        self.self = self
+
+
+def run_threads(func, num_threads=NUM_THREADS):
+    """
+    Run func(thread_index) in concurrently started threads, and return the
+    exceptions raised in the threads.
+    """
+    errors = []
+    # An event is used instead of threading.Barrier, which is not available
+    # on Python 2.
+    started = threading.Event()
+
+    def run(thread_index):
+        "Thread function"
+        try:
+            started.wait()
+            func(thread_index)
+        except Exception as exc:  # pylint: disable=broad-except
+            errors.append(exc)
+
+    threads = [threading.Thread(target=run, args=(i,))
+               for i in range(num_threads)]
+    for thread in threads:
+        thread.start()
+    started.set()
+    for thread in threads:
+        thread.join()
+    return errors
+
+
+@pytest.fixture
+def gc_settings():
+    """
+    Fixture that checks that the settings of the garbage collector are
+    restored after the test.
+    """
+    thresholds = gc.get_threshold()
+    debug = gc.get_debug()
+    yield
+    assert gc.get_threshold() == thresholds
+    assert gc.get_debug() == debug
+
+
+@pytest.mark.parametrize(
+    "leaks_only", [False, True])
+@pytest.mark.usefixtures('gc_settings')
+def test_threads_decorator_clean(leaks_only):
+    """
+    Test concurrent calls of a decorated function without garbage.
+    """
+
+    @garbage_checked(leaks_only=leaks_only)
+    def clean(thread_index):
+        "Decorated function without garbage"
+        return [thread_index] * 10
+
+    def func(thread_index):
+        "Thread function"
+        for _ in range(NUM_ITERATIONS):
+            assert clean(thread_index) == [thread_index] * 10
+
+    errors = run_threads(func)
+
+    assert errors == []
+
+
+@pytest.mark.usefixtures('gc_settings')
+def test_threads_decorator_raises():
+    """
+    Test concurrent calls of a decorated function that raises.
+    """
+
+    @garbage_checked()
+    def raises(thread_index):
+        "Decorated function that raises"
+        raise KeyError(thread_index)
+
+    def func(thread_index):
+        "Thread function"
+        for _ in range(NUM_ITERATIONS):
+            with pytest.raises(KeyError):
+                raises(thread_index)
+
+    errors = run_threads(func)
+
+    assert errors == []
+
+
+@pytest.mark.parametrize(
+    "generation, auto_collect", [
+        (2, False),
+        (0, False),
+        (2, True),
+    ])
+@pytest.mark.usefixtures('gc_settings')
+def test_threads_trackers(generation, auto_collect):
+    """
+    Test concurrent tracking periods of separate trackers with garbage. The
+    garbage of each tracking period includes the garbage of its own thread.
+    """
+    results = {}
+
+    def func(thread_index):
+        "Thread function"
+        tracker = GarbageTracker()
+        tracker.enable(generation=generation, auto_collect=auto_collect)
+        for iteration in range(NUM_ITERATIONS):
+            tracker.start()
+            Marker(thread_index)
+            tracker.stop()
+            own = [obj for obj in tracker.garbage
+                   if isinstance(obj, Marker) and
+                   obj.thread_index == thread_index]
+            results[thread_index, iteration] = len(own)
+            tracker.release()
+            # The objects of the thread must not be referenced in the next
+            # tracking period, in order not to be collected there again.
+            del own
+
+    errors = run_threads(func)
+
+    assert errors == []
+    assert len(results) == NUM_THREADS * NUM_ITERATIONS
+    assert set(results.values()) == set([1])
+    assert not any(isinstance(obj, Marker) for obj in gc.garbage)
+
+
+@pytest.mark.usefixtures('gc_settings')
+def test_threads_singleton():
+    """
+    Test concurrent starts and stops of the singleton tracker. The tracking
+    periods abandon each other, but the settings of the garbage collector
+    are restored.
+    """
+
+    def func(thread_index):
+        # pylint: disable=unused-argument
+        "Thread function"
+        tracker = GarbageTracker.get_tracker()
+        for _ in range(NUM_ITERATIONS):
+            tracker.enable()
+            tracker.start()
+            tracker.ignore()
+            tracker.stop()
+
+    errors = run_threads(func)
+
+    assert errors == []
+    tracker = GarbageTracker.get_tracker()
+    assert tracker.running is False
+    tracker.release()
+
+
+@pytest.mark.usefixtures('gc_settings')
+def test_threads_get_tracker():
+    """
+    Test that concurrent calls of get_tracker() return the same object.
+    """
+    saved_tracker = GarbageTracker._tracker  # pylint: disable=W0212
+    GarbageTracker._tracker = None  # pylint: disable=protected-access
+    trackers = []
+    try:
+        errors = run_threads(
+            lambda i: trackers.append(GarbageTracker.get_tracker()))
+    finally:
+        GarbageTracker._tracker = saved_tracker  # pylint: disable=W0212
+
+    assert errors == []
+    assert len(trackers) == NUM_THREADS
+    assert len(set(id(t) for t in trackers)) == 1
+
+
+@pytest.mark.usefixtures('gc_settings')
+def test_threads_overlap_settings():
+    """
+    Test the settings of the garbage collector during overlapping tracking
+    periods of two trackers.
+    """
+    thresholds = gc.get_threshold()
+    tracker1 = GarbageTracker()
+    tracker1.enable(leaks_only=True)
+    tracker2 = GarbageTracker()
+    tracker2.enable(auto_collect=True)
+
+    tracker1.start()
+    assert gc.get_threshold() == (0, 0, 0)
+    assert not gc.get_debug() & gc.DEBUG_SAVEALL
+    tracker2.start()
+    assert gc.get_threshold() == (0, 0, 0)
+    assert gc.get_debug() & gc.DEBUG_SAVEALL
+    tracker1.stop()
+    assert gc.get_threshold() == thresholds
+    assert gc.get_debug() & gc.DEBUG_SAVEALL
+    assert tracker1.running is False
+    assert tracker2.running is True
+    tracker2.stop()
+
+    tracker1.release()
+    tracker2.release()
+
+
+@pytest.mark.usefixtures('gc_settings')
+def test_finalizer_uses_tracker():
+    """
+    Test that a finalizer that runs a garbage checked function during the
+    garbage collection at the end of a tracking period does not hang.
+    """
+    inner_calls = []
+
+    @garbage_checked()
+    def inner():
+        "Garbage checked function called from a finalizer"
+        inner_calls.append(1)
+
+    class Finalized(object):
+        # pylint: disable=too-few-public-methods
+        "Class with a finalizer that calls a garbage checked function"
+
+        def __del__(self):
+            inner()
+
+    @garbage_checked(leaks_only=True)
+    def outer():
+        "Garbage checked function that drops an object with a finalizer"
+        obj = Finalized()
+        obj.self = obj
+
+    outer()
+
+    assert inner_calls == [1]
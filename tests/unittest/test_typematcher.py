@@ -0,0 +1,117 @@
+"""
+Test the TypeMatcher class.
+"""
+
+from __future__ import absolute_import, print_function
+
+from collections import OrderedDict
+import pytest
+from yagot import TypeMatcher
+from yagot._typematcher import type2name
+from .test_decorator import SelfRef
+
+
+class SelfRefChild(SelfRef):
+    # pylint: disable=too-few-public-methods
+    """
+    A subclass of the self-referencing class.
+    """
+    pass
+
+
+TESTCASES_TYPEMATCHER_MATCHES = [
+
+    # Testcases for TypeMatcher.matches()
+
+    # Each list item is a testcase tuple with these items:
+    # * desc: Short testcase description.
+    # * type_list: Type rules for the matcher.
+    # * obj: Object to be matched.
+    # * exp_result: Expected result of the match.
+
+    ("No rules", None, dict(), False),
+    ("Empty rules", [], dict(), False),
+    ("Type object matching", [dict], dict(), True),
+    ("Type object not matching subclass", [dict], OrderedDict(), False),
+    ("Type name matching", ['dict'], dict(), True),
+    ("Type name not matching", ['list'], dict(), False),
+    ("Qualified type name matching",
+     ['tests.unittest.test_decorator.SelfRef'], SelfRef(), True),
+    ("Glob pattern matching", ['tests.unittest.*'], SelfRef(), True),
+    ("Glob pattern not matching", ['tests.other.*'], SelfRef(), False),
+    ("Glob pattern matching complete name only", ['di?'], dict(), False),
+    ("Regexp matching", [r're:.*\.SelfRef(Child)?'], SelfRefChild(), True),
+    ("Regexp matching complete name only", ['re:Self'], SelfRef(), False),
+    ("Module matching", ['module:tests.unittest'], SelfRef(), True),
+    ("Module matching exact module",
+     ['module:tests.unittest.test_decorator'], SelfRef(), True),
+    ("Module not matching name prefix", ['module:tests.unit'], SelfRef(),
+     False),
+    ("Subclass matching type itself",
+     ['subclass:tests.unittest.test_decorator.SelfRef'], SelfRef(), True),
+    ("Subclass matching subclass",
+     ['subclass:tests.unittest.test_decorator.SelfRef'], SelfRefChild(),
+     True),
+    ("Subclass matching builtin base", ['subclass:dict'], OrderedDict(),
+     True),
+    ("Subclass not matching", ['subclass:list'], OrderedDict(), False),
+    ("Multiple rules, last matching", ['list', 'module:os', 're:d.ct'],
+     dict(), True),
+]
+
+
+@pytest.mark.parametrize(
+    "desc, type_list, obj, exp_result",
+    TESTCASES_TYPEMATCHER_MATCHES)
+def test_TypeMatcher_matches(desc, type_list, obj, exp_result):
+    # pylint: disable=unused-argument
+    """
+    Test function for TypeMatcher.matches().
+    """
+    matcher = TypeMatcher(type_list)
+
+    # The code to be tested
+    result = matcher.matches(obj)
+
+    assert result is exp_result
+
+    # Again, now from the cache
+    result = matcher.matches(obj)
+
+    assert result is exp_result
+
+
+def test_TypeMatcher_attrs():
+    """
+    Test function for TypeMatcher attributes and bool().
+    """
+
+    # The code to be tested
+    matcher = TypeMatcher([dict, 'list'])
+
+    assert matcher.type_list == [dict, 'list']
+    assert bool(matcher) is True
+    assert bool(TypeMatcher(None)) is False
+    assert repr(matcher) == "TypeMatcher([{!r}, 'list'])".format(dict)
+
+
+class ReprMeta(type):
+    "Metaclass that changes the representation of its classes"
+
+    def __repr__(cls):
+        return "<custom {}>".format(cls.__name__)
+
+
+ReprClass = ReprMeta('ReprClass', (object,), {})
+
+
+def test_type2name():
+    """
+    Test function for type2name(), including a type whose metaclass changes
+    its representation.
+    """
+
+    # The code to be tested
+    assert type2name(list) == 'list'
+    assert type2name(OrderedDict) == 'collections.OrderedDict'
+    assert type2name(ReprClass) == __name__ + '.ReprClass'
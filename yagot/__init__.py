@@ -14,8 +14,27 @@ a memory leak.
 
 from __future__ import absolute_import, print_function
 
+import sys
+
 # There are submodules, but users shouldn't need to know about them.
 # Importing just this module is enough.
 from ._decorators import *  # noqa: F403,F401
 from ._garbagetracker import *  # noqa: F403,F401
+from ._refindex import *  # noqa: F403,F401
+from ._typematcher import *  # noqa: F403,F401
+from ._cycles import *  # noqa: F403,F401
+from ._budget import *  # noqa: F403,F401
+from ._exceptions import *  # noqa: F403,F401
+from ._asyncleaks import *  # noqa: F403,F401
+from ._resources import *  # noqa: F403,F401
+from ._finalizers import *  # noqa: F403,F401
+from ._history import *  # noqa: F403,F401
+from ._htmlreport import *  # noqa: F403,F401
+from ._importtracker import *  # noqa: F403,F401
+from ._middleware import *  # noqa: F403,F401
+from ._monitor import *  # noqa: F403,F401
+from ._census import *  # noqa: F403,F401
+from ._snapshot import *  # noqa: F403,F401
+if sys.version_info[0:2] >= (3, 5):
+    from ._asgi import *  # noqa: F403,F401
 from ._version import __version__  # noqa: F401
@@ -0,0 +1,13 @@
+"""
+Entry point for running Python scripts and modules under garbage tracking::
+
+    python -m yagot [options] (script.py | -m module) [args ...]
+"""
+
+from __future__ import absolute_import, print_function
+
+import sys
+from ._runner import main
+
+if __name__ == '__main__':
+    sys.exit(main())
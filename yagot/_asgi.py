@@ -0,0 +1,66 @@
+"""
+ASGI middleware for sampled garbage tracking of the requests of web
+applications.
+
+This module requires Python 3.5 or higher.
+"""
+
+from __future__ import absolute_import, print_function
+
+from ._middleware import GarbageSampler
+
+__all__ = ['AsgiGarbageMiddleware']
+
+
+class AsgiGarbageMiddleware(GarbageSampler):
+    """
+    ASGI middleware that tracks the :term:`collected objects` and
+    :term:`uncollectable objects` caused by a sampled fraction of the HTTP
+    requests of an ASGI application, and aggregates them per route::
+
+        app = yagot.AsgiGarbageMiddleware(app, sample_rate=0.05)
+        ...
+        print(app.report())
+
+    The tracking period of a sampled request ends when the application has
+    returned, i.e. after the response has been sent, so that the garbage
+    collection at the end of the tracking period does not delay the response.
+    Requests of other types than 'http' (e.g. 'websocket' and 'lifespan') are
+    not sampled.
+
+    See :class:`~yagot.GarbageSampler` for the parameters and the
+    limitations. Note that the other tasks of the event loop continue to run
+    while a sampled request awaits, so the garbage they cause is attributed
+    to the sampled request.
+
+    The garbage collection at the end of a sampled request runs synchronously
+    on the event loop, and blocks the other tasks of the event loop while it
+    runs. Running it in another thread would not avoid that, because the
+    garbage collector holds the GIL for the entire collection. The default of
+    collecting only the youngest generation and a low sample rate keep these
+    pauses short and rare.
+
+    This class is available on Python 3.5 and higher.
+    """
+
+    def __init__(self, app, **kwargs):
+        """
+        Parameters:
+
+            app (callable): The ASGI application.
+
+            **kwargs: Parameters for :class:`~yagot.GarbageSampler`.
+        """
+        super(AsgiGarbageMiddleware, self).__init__(**kwargs)
+        self._app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope.get('type') != 'http' or not self._begin():
+            await self._app(scope, receive, send)
+            return
+        try:
+            await self._app(scope, receive, send)
+        except BaseException:
+            self._end(scope, failed=True)
+            raise
+        self._end(scope)
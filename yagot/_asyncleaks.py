@@ -0,0 +1,285 @@
+"""
+AsyncLeaks class and support for detecting asyncio tasks, futures and loop
+callbacks that were created during a tracking period and are still pending
+at its end.
+"""
+
+from __future__ import absolute_import, print_function
+
+import gc
+import sys
+import weakref
+try:
+    import asyncio
+except ImportError:  # Python 2
+    asyncio = None
+
+__all__ = ['AsyncLeaks']
+
+# Maximum length of the representation of an asyncio object in messages
+REPR_MAX = 200
+
+
+class AsyncSnapshot(object):
+    """
+    A snapshot of the pending asyncio tasks and scheduled callbacks of the
+    event loop of the current thread, taken at the begin of a tracking
+    period.
+
+    The snapshot only stores the ids of these objects. It must be taken right
+    after the garbage collection at the begin of the tracking period, so that
+    the youngest generation of the garbage collector contains only objects
+    created during the tracking period.
+    """
+
+    def __init__(self):
+        self._loop = _current_loop()
+        self._ids = set()
+        if self._loop is not None:
+            self._ids.update(id(task) for task in _all_tasks(self._loop))
+            self._ids.update(id(handle) for handle in _handles(self._loop))
+
+    def candidates(self):
+        """
+        Return weak references to the futures and event loops created during
+        the tracking period, taken from the youngest generation of the garbage
+        collector.
+
+        Weak references are used, so that the objects can still be collected
+        at the end of the tracking period. This must be called before the
+        garbage collection at the end of the tracking period. On Python
+        versions before 3.8, no futures and event loops are found this way.
+
+        Returns:
+
+            list: The weak references.
+        """
+        if asyncio is None or sys.version_info[0:2] < (3, 8):
+            return []
+        refs = []
+        # The type is determined with type(), because isinstance() fails with
+        # ReferenceError for dead weak reference proxies.
+        for obj in gc.get_objects(generation=0):
+            if issubclass(type(obj),
+                          (asyncio.Future, asyncio.AbstractEventLoop)):
+                try:
+                    refs.append(weakref.ref(obj))
+                except TypeError:  # Not weakly referenceable
+                    pass
+        return refs
+
+    def leaks(self, candidates, exclude_ids):
+        """
+        Return the asyncio objects created during the tracking period that are
+        still pending.
+
+        Parameters:
+
+            candidates (list): The weak references returned by
+              :meth:`candidates`.
+
+            exclude_ids (set): Ids of objects that are not reported, e.g.
+              because they are in the garbage of the tracking period.
+
+        Returns:
+
+            :class:`~yagot.AsyncLeaks`: The pending asyncio objects.
+        """
+        objects = [obj for obj in (ref() for ref in candidates)
+                   if obj is not None and id(obj) not in exclude_ids]
+        loops = [obj for obj in objects
+                 if issubclass(type(obj), asyncio.AbstractEventLoop) and
+                 not obj.is_closed()]
+        known_loops = [loop for loop in (self._loop, _current_loop())
+                       if loop is not None and not loop.is_closed()]
+        tasks = []
+        callbacks = []
+        seen = set()
+        for loop in known_loops + loops:
+            if id(loop) in seen:
+                continue
+            seen.add(id(loop))
+            tasks.extend(task for task in _all_tasks(loop)
+                         if id(task) not in self._ids and
+                         id(task) not in exclude_ids)
+            callbacks.extend(handle for handle in _handles(loop)
+                             if id(handle) not in self._ids and
+                             not handle.cancelled())
+        task_ids = set(id(task) for task in tasks)
+        futures = [obj for obj in objects
+                   if issubclass(type(obj), asyncio.Future) and
+                   id(obj) not in task_ids and _never_awaited(obj)]
+        return AsyncLeaks(tasks, futures, callbacks, loops)
+
+
+class AsyncLeaks(object):
+    """
+    The :mod:`py:asyncio` objects that were created during a tracking period
+    and are still pending at its end:
+
+    * Tasks that have not finished. Abandoned tasks are referenced by their
+      event loop and keep the objects referenced by their coroutine alive.
+    * Futures that were never awaited: Futures that are pending without any
+      callbacks (i.e. no task awaits them), and futures or tasks that have
+      finished with an exception that was never retrieved.
+    * Callbacks that are scheduled on the event loop and have not run yet.
+    * Event loops that have not been closed.
+
+    These objects are not necessarily garbage, so they are reported in
+    addition to the :term:`collected objects` and
+    :term:`uncollectable objects`.
+
+    The event loops that are checked are the event loop of the thread that
+    started the tracking period, the event loop of the thread that stopped
+    it, and the event loops created during the tracking period.
+
+    This class is available on Python 3.5 and higher. Futures and event
+    loops created during the tracking period are found on Python 3.8 and
+    higher, and only if automatic garbage collection is disabled during the
+    tracking period.
+    """
+
+    def __init__(self, tasks, futures, callbacks, loops):
+        """
+        Parameters:
+
+            tasks (list): The pending tasks.
+
+            futures (list): The futures that were never awaited.
+
+            callbacks (list): The scheduled callbacks, as
+              :class:`py:asyncio.Handle` objects.
+
+            loops (list): The event loops that have not been closed.
+        """
+        self._tasks = tasks
+        self._futures = futures
+        self._callbacks = callbacks
+        self._loops = loops
+
+    def __len__(self):
+        return len(self._tasks) + len(self._futures) + \
+            len(self._callbacks) + len(self._loops)
+
+    def __repr__(self):
+        return "AsyncLeaks(tasks={}, futures={}, callbacks={}, loops={})". \
+            format(len(self._tasks), len(self._futures),
+                   len(self._callbacks), len(self._loops))
+
+    @property
+    def tasks(self):
+        """
+        list: The :class:`py:asyncio.Task` objects that have not finished.
+        """
+        return self._tasks
+
+    @property
+    def futures(self):
+        """
+        list: The :class:`py:asyncio.Future` objects that were never awaited.
+        """
+        return self._futures
+
+    @property
+    def callbacks(self):
+        """
+        list: The scheduled callbacks that have not run yet, as
+        :class:`py:asyncio.Handle` objects.
+        """
+        return self._callbacks
+
+    @property
+    def loops(self):
+        """
+        list: The event loops that have not been closed.
+        """
+        return self._loops
+
+    def counts(self):
+        """
+        Return the number of pending objects by kind.
+
+        Returns:
+
+            dict: Dictionary with items tasks, futures, callbacks, loops.
+        """
+        return dict(tasks=len(self._tasks), futures=len(self._futures),
+                    callbacks=len(self._callbacks), loops=len(self._loops))
+
+    def format(self):
+        """
+        Return a formatted multi-line string listing the pending objects.
+
+        Returns:
+
+            :term:`unicode string`: Formatted string.
+        """
+        lines = []
+        for kind, objects in (('Pending task', self._tasks),
+                              ('Never awaited future', self._futures),
+                              ('Scheduled callback', self._callbacks),
+                              ('Unclosed event loop', self._loops)):
+            for obj in objects:
+                lines.append(u"{}: {}".format(kind, _short_repr(obj)))
+        return u"\n".join(lines)
+
+
+def _current_loop():
+    """
+    Return the event loop of the current thread (running or set), or `None`.
+    The event loop policy is not asked to create an event loop.
+    """
+    if asyncio is None:
+        return None
+    loop = asyncio.events._get_running_loop()  # pylint: disable=W0212
+    if loop is None:
+        # pylint: disable=protected-access
+        local = getattr(asyncio.get_event_loop_policy(), '_local', None)
+        loop = getattr(local, '_loop', None)
+    if loop is not None and loop.is_closed():
+        return None
+    return loop
+
+
+def _all_tasks(loop):
+    """
+    Return the tasks of an event loop that have not finished.
+    """
+    if hasattr(asyncio, 'all_tasks'):
+        return list(asyncio.all_tasks(loop))
+    # Python 3.5 and 3.6
+    all_tasks = asyncio.Task.all_tasks  # pylint: disable=no-member
+    return [task for task in all_tasks(loop) if not task.done()]
+
+
+def _handles(loop):
+    """
+    Return the callbacks scheduled on an event loop, from the internals of
+    the event loop implementation of asyncio. Other event loop
+    implementations (e.g. uvloop) have no scheduled callbacks this way.
+    """
+    # pylint: disable=protected-access
+    return list(getattr(loop, '_ready', ())) + \
+        list(getattr(loop, '_scheduled', ()))
+
+
+def _never_awaited(future):
+    """
+    Return whether a future was never awaited: It is pending without
+    callbacks, or it has finished with an exception that was never
+    retrieved.
+    """
+    # pylint: disable=protected-access
+    if not future.done():
+        return not getattr(future, '_callbacks', None)
+    return bool(getattr(future, '_log_traceback', False))
+
+
+def _short_repr(obj):
+    """
+    Return the representation of an object, shortened to REPR_MAX.
+    """
+    text = repr(obj)
+    if len(text) > REPR_MAX:
+        text = text[:REPR_MAX - 3] + '...'
+    return text
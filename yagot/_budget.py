@@ -0,0 +1,170 @@
+"""
+GarbageBudget class.
+"""
+
+from __future__ import absolute_import, print_function
+
+from collections import Counter
+import six
+from ._typematcher import type2name
+from ._garbagetracker import _getsizeof
+
+__all__ = ['GarbageBudget']
+
+
+class GarbageBudget(object):
+    """
+    A budget for the garbage of a tracking period, that tolerates a bounded
+    volume of :term:`collected objects` and :term:`uncollectable objects`
+    instead of failing on any single object.
+
+    Some code legitimately produces small bounded reference cycles. A budget
+    limits the number of objects, their size in Bytes, the number of objects
+    of specific types, and the time the garbage collection at the end of the
+    tracking period took. Each limit can be `None` to disable it.
+
+    The default budget (``GarbageBudget()``) tolerates no objects, which is
+    the behavior without a budget.
+    """
+
+    def __init__(self, max_objects=0, max_bytes=None, max_types=None,
+                 max_collect_time=None):
+        """
+        Parameters:
+
+            max_objects (int): `None` or maximum number of objects in
+              :attr:`~yagot.GarbageTracker.garbage`, not counting the objects
+              of the types limited by `max_types`.
+
+            max_bytes (int): `None` or maximum sum of the sizes of these
+              objects in Bytes, as returned by :func:`py:sys.getsizeof`.
+
+            max_types (dict): `None` or dictionary with the maximum number of
+              these objects by type, with key: type name as represented by
+              the ``str(type)`` function (for example, "dict" or
+              "mymodule.MyClass") or type object, value: maximum number.
+              Objects of these types are limited only by `max_types`, so
+              that e.g. ``GarbageBudget(max_types={'dict': 5})`` tolerates
+              up to 5 dict objects and no other objects. Objects of other
+              types are limited only by `max_objects`.
+
+            max_collect_time (float): `None` or maximum time in seconds the
+              garbage collection at the end of the tracking period took, see
+              :attr:`~yagot.GarbageTracker.collect_time`.
+        """
+        self._max_objects = max_objects
+        self._max_bytes = max_bytes
+        self._max_types = dict(
+            (name if isinstance(name, six.string_types) else type2name(name),
+             num) for name, num in (max_types or {}).items())
+        self._max_collect_time = max_collect_time
+
+    def __repr__(self):
+        return "GarbageBudget(max_objects={!r}, max_bytes={!r}, " \
+            "max_types={!r}, max_collect_time={!r})". \
+            format(self._max_objects, self._max_bytes, self._max_types,
+                   self._max_collect_time)
+
+    @property
+    def max_objects(self):
+        """
+        int: Maximum number of objects, or `None`.
+        """
+        return self._max_objects
+
+    @property
+    def max_bytes(self):
+        """
+        int: Maximum sum of the sizes of the objects in Bytes, or `None`.
+        """
+        return self._max_bytes
+
+    @property
+    def max_types(self):
+        """
+        dict: Maximum number of objects by type name. May be empty.
+        """
+        return self._max_types
+
+    @property
+    def max_collect_time(self):
+        """
+        float: Maximum time in seconds the garbage collection at the end of
+        the tracking period took, or `None`.
+        """
+        return self._max_collect_time
+
+    def violations(self, tracker):
+        """
+        Check the last tracking period of a garbage tracker against the
+        budget.
+
+        Parameters:
+
+            tracker (:class:`~yagot.GarbageTracker`): The garbage tracker,
+              whose tracking period has been stopped.
+
+        Returns:
+
+            list: The violations of the budget, as tuples (what, value,
+            limit), with `what` describing the measured quantity (e.g.
+            "objects of type dict"). An empty list means that the tracking
+            period is within the budget.
+        """
+        garbage = tracker.garbage
+        result = []
+        type_counts = Counter(type2name(type(obj)) for obj in garbage)
+        if self._max_objects is not None:
+            num_objects = len(garbage) - sum(
+                type_counts[name] for name in self._max_types)
+            if num_objects > self._max_objects:
+                result.append((u"objects", num_objects, self._max_objects))
+        if self._max_bytes is not None:
+            num_bytes = sum(_getsizeof(obj) for obj in garbage)
+            if num_bytes > self._max_bytes:
+                result.append((u"Bytes", num_bytes, self._max_bytes))
+        if self._max_types:
+            for name in sorted(self._max_types):
+                if type_counts[name] > self._max_types[name]:
+                    result.append((u"objects of type {}".format(name),
+                                   type_counts[name], self._max_types[name]))
+        if self._max_collect_time is not None and \
+                tracker.collect_time > self._max_collect_time:
+            result.append((u"seconds of garbage collection time",
+                           tracker.collect_time, self._max_collect_time))
+        return result
+
+    @staticmethod
+    def format_violations(violations):
+        """
+        Return a formatted multi-line string for violations of a budget,
+        showing how far the budget was exceeded.
+
+        Parameters:
+
+            violations (list): The violations, as returned by
+              :meth:`~yagot.GarbageBudget.violations`.
+
+        Returns:
+
+            :term:`unicode string`: Formatted multi-line string, or an empty
+            string if there are no violations.
+        """
+        lines = []
+        for what, value, limit in violations:
+            lines.append(
+                u"Garbage budget exceeded: {value} {what} exceed the budget "
+                u"of {limit} by {excess}".
+                format(value=_format_number(value), what=what,
+                       limit=_format_number(limit),
+                       excess=_format_number(value - limit)))
+        return u"\n".join(lines)
+
+
+def _format_number(value):
+    """
+    Return an int or float value as a string.
+    """
+    if isinstance(value, float):
+        return u"{:.4g}".format(value)
+    return u"{}".format(value)
@@ -0,0 +1,242 @@
+"""
+HeapCensus class.
+"""
+
+from __future__ import absolute_import, print_function
+
+import gc
+import sys
+from collections import Counter
+from timeit import default_timer
+from ._typematcher import type2name
+
+__all__ = ['HeapCensus']
+
+# Default number of objects counted per step
+CHUNK_SIZE = 10000
+
+# Number of garbage collector generations
+NUM_GENERATIONS = 3
+
+
+class HeapCensus(object):
+    """
+    A census of the objects tracked by the garbage collector, counted by type
+    name, that is performed incrementally in bounded steps.
+
+    A full pass with :func:`py:gc.get_objects` over a large heap pauses the
+    program for a noticeable time. The census spreads that work over many
+    calls of :meth:`~yagot.HeapCensus.step`, that can be interleaved with
+    the normal work of the program, or called from an idle callback or a
+    timer::
+
+        census = yagot.HeapCensus(chunk_size=10000)
+        ...
+        # in the idle callback:
+        if census.step(time_limit=0.002):
+            print(census.counts.most_common(10))
+
+    The census walks the heap one generation of the garbage collector at a
+    time (on Python 3.8 and higher, via the `generation` parameter of
+    :func:`py:gc.get_objects`; on earlier versions, the whole heap is one
+    part). Getting the list of the objects of a generation is a fast
+    operation, while counting the objects by type is done in chunks of
+    `chunk_size` objects per step. The objects that have been counted are
+    released from that list right away, so that they are not kept alive
+    until the end of the census.
+
+    The counts of the parts are merged into the result when the census is
+    complete. Because the program continues to run during the census, the
+    result is not an exact snapshot: Objects created or deleted during the
+    census may or may not be counted, and objects that move to an older
+    generation during the census may be counted twice. For watching the
+    growth of object counts over time (e.g. for leak monitoring), this is
+    consistent enough.
+
+    The census is not thread-safe: :meth:`~yagot.HeapCensus.step` must not
+    be called concurrently.
+    """
+
+    def __init__(self, chunk_size=CHUNK_SIZE):
+        """
+        Parameters:
+
+            chunk_size (int): Maximum number of objects counted in one chunk.
+        """
+        self._chunk_size = chunk_size
+        self._counts = None
+        self._num_censuses = 0
+        self._last_duration = None
+        self._max_pause = 0.0
+        self._reset()
+
+    def _reset(self):
+        """
+        Reset the state of the census in progress.
+        """
+        self._generation = None  # Generation of the part in progress
+        self._objects = None  # Objects of that part not counted yet
+        self._partial = Counter()  # Counts by type object
+        self._duration = 0.0
+
+    @property
+    def chunk_size(self):
+        """
+        int: Maximum number of objects counted in one chunk.
+        """
+        return self._chunk_size
+
+    @property
+    def in_progress(self):
+        """
+        bool: Boolean indicating whether a census has been started and is not
+        complete yet.
+        """
+        return self._generation is not None
+
+    @property
+    def counts(self):
+        """
+        :class:`py:collections.Counter`: Number of objects by type name of the
+        last complete census, or `None` if no census has been completed yet.
+        """
+        return self._counts
+
+    @property
+    def num_objects(self):
+        """
+        int: Number of objects counted in the last complete census, or `None`
+        if no census has been completed yet.
+        """
+        if self._counts is None:
+            return None
+        return sum(self._counts.values())
+
+    @property
+    def num_censuses(self):
+        """
+        int: Number of censuses completed so far.
+        """
+        return self._num_censuses
+
+    @property
+    def last_duration(self):
+        """
+        float: Sum of the durations of the steps of the last complete census
+        in seconds, or `None` if no census has been completed yet.
+        """
+        return self._last_duration
+
+    @property
+    def max_pause(self):
+        """
+        float: Longest duration of a single call of
+        :meth:`~yagot.HeapCensus.step` so far, in seconds.
+        """
+        return self._max_pause
+
+    def step(self, time_limit=None):
+        """
+        Perform the next step of the census, starting a new census if none is
+        in progress.
+
+        A step counts one chunk of objects. If a time limit is specified,
+        further chunks are counted until the time limit is reached (the
+        duration of a step may exceed the time limit by the duration of one
+        chunk).
+
+        Parameters:
+
+            time_limit (float): `None` or time limit for the step in seconds.
+
+        Returns:
+
+            bool: Boolean indicating whether the census has been completed in
+            this step. Its result is then available in
+            :attr:`~yagot.HeapCensus.counts`.
+        """
+        start_time = default_timer()
+        if self._generation is None:
+            self._generation = 0
+        complete = False
+        while True:
+            if self._objects is None:
+                self._objects = _get_objects(self._generation)
+            self._count_chunk()
+            if not self._objects:
+                self._objects = None
+                if _has_generations() and \
+                        self._generation < NUM_GENERATIONS - 1:
+                    self._generation += 1
+                else:
+                    complete = True
+                    break
+            if time_limit is None or \
+                    default_timer() - start_time >= time_limit:
+                break
+        pause = default_timer() - start_time
+        self._duration += pause
+        if pause > self._max_pause:
+            self._max_pause = pause
+        if complete:
+            self._complete()
+        return complete
+
+    def run(self):
+        """
+        Perform a complete census at once, finishing a census in progress.
+
+        Returns:
+
+            :class:`py:collections.Counter`: Number of objects by type name.
+        """
+        while not self.step():
+            pass
+        return self._counts
+
+    def cancel(self):
+        """
+        Cancel the census in progress, if any. The result of the last complete
+        census remains available.
+        """
+        self._reset()
+
+    def _count_chunk(self):
+        """
+        Count the next chunk of the objects of the part in progress, and
+        release them.
+        """
+        objects = self._objects
+        chunk = objects[-self._chunk_size:]
+        del objects[-self._chunk_size:]
+        self._partial.update(map(type, chunk))
+
+    def _complete(self):
+        """
+        Merge the counts of the census in progress into its result.
+        """
+        counts = Counter()
+        for type_, num in self._partial.items():
+            counts[type2name(type_)] += num
+        self._counts = counts
+        self._last_duration = self._duration
+        self._num_censuses += 1
+        self._reset()
+
+
+def _has_generations():
+    """
+    Return whether gc.get_objects() supports the generation parameter.
+    """
+    return sys.version_info[0:2] >= (3, 8)
+
+
+def _get_objects(generation):
+    """
+    Return a list of the objects of a generation of the garbage collector,
+    or of all generations if that is not supported. The list does not include
+    itself.
+    """
+    if _has_generations():
+        return gc.get_objects(generation=generation)
+    return gc.get_objects()
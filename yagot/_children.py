@@ -0,0 +1,383 @@
+"""
+Support for tracking garbage in child processes.
+
+While child process tracking is active in a process, each child process
+created by :func:`py:os.fork` (including the children of
+:mod:`py:multiprocessing` and :class:`py:concurrent.futures.ProcessPoolExecutor`
+with the 'fork' start method) or by the 'spawn' start method of
+:mod:`py:multiprocessing` runs a tracking period from its start until it
+exits. At exit, the child process sends the summary of its tracking period to
+the parent process over a local socket, as one line of JSON. The parent
+process receives the summaries of the child processes that have exited when
+its own tracking period ends.
+"""
+
+from __future__ import absolute_import, print_function
+
+import os
+import sys
+import json
+import atexit
+import shutil
+import select
+import socket
+import tempfile
+
+__all__ = []
+
+# Environment variable with the socket address, for spawned child processes
+ADDRESS_ENV = 'YAGOT_CHILD_ADDRESS'
+
+# Environment variable with the tracker settings, for spawned child processes
+SETTINGS_ENV = 'YAGOT_CHILD_SETTINGS'
+
+# Code that is prepended to the command of spawned child processes
+BOOTSTRAP_CODE = \
+    "import yagot._children as _yc; _yc.bootstrap_child(); del _yc; "
+
+# Maximum number of objects in the assertion message of a child process
+CHILD_MESSAGE_MAX = 5
+
+# The active collector of this process, or None. The collector of the parent
+# process is inherited by forked child processes.
+_ACTIVE = None
+
+# The state of the tracking period of this process as a child process: dict
+# with items tracker, address, settings, pid, done, or None.
+_CHILD = None
+
+# The address and settings for a spawned child process: dict with items
+# address, settings, or None.
+_SPAWNED = None
+
+
+class _Anchor(object):
+    # pylint: disable=too-few-public-methods
+    "Object for registering functions with multiprocessing.util"
+
+
+# Registrations with multiprocessing.util.register_after_fork() last as long
+# as the registered object
+_ANCHOR = _Anchor()
+
+# Boolean indicating whether the fork handler has been registered
+_FORK_HANDLER_REGISTERED = False
+
+
+class ChildCollector(object):
+    """
+    Receives the summaries of the tracking periods of child processes, and
+    starts these tracking periods in child processes while it is active.
+    """
+
+    def __init__(self, leaks_only=False, generation=2):
+        """
+        Parameters:
+
+            leaks_only (bool): Boolean to limit the tracking in the child
+              processes to only :term:`uncollectable objects`.
+
+            generation (int): The oldest generation that is collected at the
+              begin and end of the tracking periods in the child processes.
+
+        Raises:
+
+            NotImplementedError: Not supported on this platform.
+        """
+        if not hasattr(os, 'register_at_fork') or \
+                not hasattr(socket, 'AF_UNIX'):
+            raise NotImplementedError(
+                "Child process tracking is not supported on Python {}.{} on "
+                "{}".format(sys.version_info[0], sys.version_info[1],
+                            sys.platform))
+        self._settings = dict(leaks_only=leaks_only, generation=generation)
+        self._tmpdir = tempfile.mkdtemp(prefix='yagot-')
+        self._address = os.path.join(self._tmpdir, 'children.sock')
+        self._socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self._socket.bind(self._address)
+        self._socket.listen(socket.SOMAXCONN)
+        self._saved_env = None
+        self._saved_command_line = None
+        self._active = False
+
+    @property
+    def address(self):
+        """
+        :term:`string`: Path name of the socket the summaries are received on.
+        """
+        return self._address
+
+    @property
+    def settings(self):
+        """
+        dict: The settings for the trackers of the child processes.
+        """
+        return self._settings
+
+    def activate(self):
+        """
+        Start tracking periods in the child processes created from now on.
+        """
+        global _ACTIVE  # pylint: disable=global-statement
+        if self._active:
+            return
+        _register_fork_handler()
+        self._saved_env = (os.environ.get(ADDRESS_ENV),
+                           os.environ.get(SETTINGS_ENV))
+        os.environ[ADDRESS_ENV] = self._address
+        os.environ[SETTINGS_ENV] = json.dumps(self._settings)
+        try:
+            from multiprocessing import spawn
+        except ImportError:
+            spawn = None
+        if spawn is not None:
+            self._saved_command_line = spawn.get_command_line
+            spawn.get_command_line = _make_command_line(
+                self._saved_command_line)
+        _ACTIVE = self
+        self._active = True
+
+    def collect(self):
+        """
+        Return the summaries sent by child processes since the last call,
+        without waiting for child processes that are still running.
+
+        Returns:
+
+            list: The summaries of the tracking periods of the child
+            processes, as returned by :meth:`~yagot.GarbageTracker.summary`,
+            with the additional items ``pid`` (process ID of the child
+            process) and ``message`` (assertion message of the child process,
+            or `None` if it had no garbage).
+        """
+        summaries = []
+        while select.select([self._socket], [], [], 0)[0]:
+            conn, _ = self._socket.accept()
+            try:
+                data = _recv_all(conn)
+            finally:
+                conn.close()
+            for line in data.decode('utf-8').splitlines():
+                if line.strip():
+                    summaries.append(json.loads(line))
+        return summaries
+
+    def deactivate(self):
+        """
+        Stop starting tracking periods in the child processes created from now
+        on. The summaries of the child processes that are still running can
+        still be collected.
+        """
+        global _ACTIVE  # pylint: disable=global-statement
+        if self._active:
+            for name, value in zip((ADDRESS_ENV, SETTINGS_ENV),
+                                   self._saved_env):
+                if value is None:
+                    os.environ.pop(name, None)
+                else:
+                    os.environ[name] = value
+            if self._saved_command_line is not None:
+                from multiprocessing import spawn
+                spawn.get_command_line = self._saved_command_line
+                self._saved_command_line = None
+            if _ACTIVE is self:
+                _ACTIVE = None
+            self._active = False
+
+    def close(self):
+        """
+        Stop starting tracking periods in new child processes, and remove the
+        socket.
+        """
+        self.deactivate()
+        if self._socket is not None:
+            self._socket.close()
+            self._socket = None
+            shutil.rmtree(self._tmpdir, ignore_errors=True)
+
+
+def bootstrap_child():
+    """
+    Prepare the tracking period of a spawned child process of the
+    multiprocessing package, if the parent process has child process tracking
+    active.
+
+    This function is called by the command of spawned child processes.
+    """
+    address = os.environ.get(ADDRESS_ENV)
+    settings = os.environ.get(SETTINGS_ENV)
+    if not address or not settings:
+        return
+    global _SPAWNED  # pylint: disable=global-statement
+    _SPAWNED = dict(address=address, settings=json.loads(settings))
+    try:
+        from multiprocessing import process
+    except ImportError:
+        return
+    # Spawned processes do not run the functions registered with
+    # multiprocessing.util.register_after_fork(), so the process object is
+    # set up when it starts running in this process.
+    bootstrap = process.BaseProcess._bootstrap  # pylint: disable=W0212
+
+    def bootstrap_tracked(self, *args, **kwargs):
+        "Run the process object in a tracking period"
+        _track_run(self)
+        return bootstrap(self, *args, **kwargs)
+
+    process.BaseProcess._bootstrap = bootstrap_tracked  # pylint: disable=W0212
+
+
+def _register_fork_handler():
+    """
+    Register the handler for forked child processes, once per process.
+    """
+    global _FORK_HANDLER_REGISTERED  # pylint: disable=global-statement
+    if not _FORK_HANDLER_REGISTERED:
+        os.register_at_fork(after_in_child=_after_fork_in_child)
+        try:
+            from multiprocessing import util
+        except ImportError:
+            pass
+        else:
+            # Forked processes of the multiprocessing package run the
+            # functions registered this way when they start.
+            util.register_after_fork(_ANCHOR, _after_process_start)
+        _FORK_HANDLER_REGISTERED = True
+
+
+def _after_fork_in_child():
+    """
+    Handler that is called in forked child processes. It starts a tracking
+    period that lasts until the child process exits.
+    """
+    global _ACTIVE  # pylint: disable=global-statement
+    if _ACTIVE is not None:
+        # pylint: disable=protected-access
+        address = _ACTIVE._address
+        settings = _ACTIVE._settings
+        # The socket of the parent process is not used by the child
+        _ACTIVE = None
+    elif _CHILD is not None:
+        # A child process of a child process
+        address = _CHILD['address']
+        settings = _CHILD['settings']
+    else:
+        return
+    _start_child(address, settings)
+    atexit.register(_end_child)
+
+
+def _after_process_start(obj=None):
+    # pylint: disable=unused-argument
+    """
+    Handler that is called when a forked process of the multiprocessing
+    package has started, after its process object has been set up. It
+    replaces the tracking period that was started when the process was forked
+    by a tracking period that lasts while the run() method of the process
+    object runs, so that the setup and cleanup of the process by the
+    multiprocessing package are not included.
+    """
+    if _CHILD is None:
+        return
+    if not _CHILD['done']:
+        _CHILD['done'] = True
+        _CHILD['tracker'].stop()
+        _CHILD['tracker'].release()
+    import multiprocessing
+    _track_run(multiprocessing.current_process(), _CHILD['address'],
+               _CHILD['settings'])
+
+
+def _track_run(process, address=None, settings=None):
+    """
+    Wrap the run() method of a process object of the multiprocessing package
+    so that it runs in a tracking period.
+    """
+    if address is None:
+        address = _SPAWNED['address']
+        settings = _SPAWNED['settings']
+    run = process.run
+
+    def run_tracked():
+        "Run the process in a tracking period"
+        _start_child(address, settings)
+        try:
+            run()
+        finally:
+            _end_child()
+
+    process.run = run_tracked
+
+
+def _start_child(address, settings):
+    """
+    Start the tracking period of this child process.
+    """
+    global _CHILD  # pylint: disable=global-statement
+    from ._garbagetracker import GarbageTracker
+    _register_fork_handler()
+    tracker = GarbageTracker()
+    tracker.enable(**settings)
+    tracker.start()
+    tracker.ignore_types(type_list=None)
+    _CHILD = dict(tracker=tracker, address=address, settings=settings,
+                  pid=os.getpid(), done=False)
+
+
+def _end_child():
+    """
+    End the tracking period of this child process and send its summary to
+    the parent process.
+    """
+    child = _CHILD
+    if child is None or child['done'] or child['pid'] != os.getpid():
+        return
+    child['done'] = True
+    tracker = child['tracker']
+    tracker.stop()
+    summary = tracker.summary()
+    summary['pid'] = os.getpid()
+    summary['message'] = tracker.assert_message(
+        u"in child process {}".format(os.getpid()),
+        max=CHILD_MESSAGE_MAX) if tracker.garbage else None
+    tracker.release()
+    data = (json.dumps(summary) + "\n").encode('utf-8')
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.connect(child['address'])
+        sock.sendall(data)
+    except (EnvironmentError, socket.error):
+        # The parent process is no longer collecting
+        pass
+    finally:
+        sock.close()
+
+
+def _make_command_line(get_command_line):
+    """
+    Return a replacement for multiprocessing.spawn.get_command_line() that
+    starts the tracking period in the spawned child process.
+    """
+
+    def get_command_line_tracked(**kwds):
+        "Command line of a spawned child process with the bootstrap code"
+        cmd = get_command_line(**kwds)
+        if '-c' in cmd:
+            i = cmd.index('-c') + 1
+            cmd[i] = BOOTSTRAP_CODE + cmd[i]
+        return cmd
+
+    return get_command_line_tracked
+
+
+def _recv_all(conn):
+    """
+    Receive data from a connected socket until the peer closes it.
+    """
+    chunks = []
+    while True:
+        chunk = conn.recv(65536)
+        if not chunk:
+            break
+        chunks.append(chunk)
+    return b''.join(chunks)
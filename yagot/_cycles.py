@@ -0,0 +1,287 @@
+"""
+GarbageCycle class.
+"""
+
+from __future__ import absolute_import, print_function
+
+import hashlib
+import types
+from ._typematcher import type2name
+
+__all__ = ['GarbageCycle', 'CYCLE_PATTERNS']
+
+# Maximum number of refinement rounds for computing the fingerprint of a
+# reference cycle. Type graphs of cycles in practice are distinguished after
+# few rounds, and the limit keeps the cost linear for large cycles.
+FINGERPRINT_ROUNDS = 8
+
+# Number of hex digits of the fingerprints
+FINGERPRINT_LENGTH = 16
+
+#: The patterns of reference cycles that are recognized (see
+#: :attr:`~yagot.GarbageCycle.pattern`), in the order they are checked, as a
+#: list of tuples (pattern, hint for fixing the cycle).
+CYCLE_PATTERNS = [
+    ('exception',
+     "An exception references the frame that handles it via its traceback. "
+     "Delete the variable holding the exception (or the result of "
+     "sys.exc_info()) when done, e.g. in a finally clause."),
+    ('generator',
+     "A generator or coroutine that was not run to completion references "
+     "itself via its frame. Close it explicitly (e.g. with "
+     "contextlib.closing()) or run it to completion."),
+    ('bound-method',
+     "A bound method of an object is stored on the object itself (e.g. as a "
+     "callback). Store a weakref.WeakMethod instead, or the unbound function."),
+    ('closure',
+     "A nested function references itself via its closure. Pass the function "
+     "explicitly instead, or delete the variable referencing it when done."),
+    ('container',
+     "Built-in containers reference each other or themselves. Remove the "
+     "reference before releasing the containers, or use a weak reference."),
+]
+
+# Pattern of reference cycles that match none of the patterns
+OTHER_PATTERN = 'other'
+
+# Types of objects whose unfinished execution keeps their frame alive
+GENERATOR_TYPES = tuple(
+    getattr(types, name) for name in
+    ('GeneratorType', 'CoroutineType', 'AsyncGeneratorType')
+    if hasattr(types, name))
+
+# Types of built-in containers
+CONTAINER_TYPES = (dict, list, set, tuple)
+
+# Type of closure cells
+CellType = type((lambda x: lambda: x)(0).__closure__[0])
+
+
+class GarbageCycle(object):
+    """
+    A reference cycle among the :term:`collected objects` or
+    :term:`uncollectable objects` detected during a tracking period.
+
+    The cycle has a structural fingerprint that depends only on the types of
+    its objects and on the shape of the references between them, and not on
+    object identities or values. Cycles created by the same code therefore
+    have the same fingerprint, also across tracking periods and processes.
+    """
+
+    def __init__(self, objects, fingerprint):
+        """
+        Parameters:
+
+            objects (list): The objects of the reference cycle.
+
+            fingerprint (:term:`string`): The fingerprint of the cycle.
+        """
+        self._objects = objects
+        self._fingerprint = fingerprint
+        self._pattern = None
+
+    def __len__(self):
+        return len(self._objects)
+
+    def __repr__(self):
+        return "GarbageCycle(fingerprint={!r}, pattern={!r}, types={!r})". \
+            format(self._fingerprint, self.pattern, self.type_names)
+
+    @property
+    def objects(self):
+        """
+        list: The objects of the reference cycle.
+        """
+        return self._objects
+
+    @property
+    def fingerprint(self):
+        """
+        :term:`string`: The structural fingerprint of the reference cycle, as a
+        string of hex digits.
+        """
+        return self._fingerprint
+
+    @property
+    def type_names(self):
+        """
+        list: The sorted distinct type names of the objects of the reference
+        cycle, as represented by the ``str(type)`` function.
+        """
+        return sorted(set(type2name(type(obj)) for obj in self._objects))
+
+    @property
+    def pattern(self):
+        """
+        :term:`string`: The common pattern of the reference cycle, as one of
+        the pattern names in :data:`~yagot.CYCLE_PATTERNS`, or 'other' if
+        the cycle matches none of them. The patterns are:
+
+        * 'exception': An exception, its traceback and the frame that handles
+          the exception.
+        * 'generator': A generator, coroutine or asynchronous generator that
+          was not run to completion, and its frame. On Python 3.4 and higher,
+          the garbage collector closes such generators, which usually breaks
+          the cycle.
+        * 'bound-method': A bound method stored on its own object.
+        * 'closure': A nested function that references itself via its
+          closure.
+        * 'container': Only built-in containers (dict, list, set, tuple), e.g.
+          a dictionary that references itself.
+
+        The pattern is determined when this property is accessed for the
+        first time, with a single pass over the objects of the cycle.
+        """
+        if self._pattern is None:
+            self._pattern = classify_cycle(self._objects)
+        return self._pattern
+
+    @property
+    def hint(self):
+        """
+        :term:`string`: A hint for fixing the reference cycle, based on its
+        pattern, or `None` if it matches none of the patterns.
+        """
+        return dict(CYCLE_PATTERNS).get(self.pattern)
+
+    @staticmethod
+    def from_index(index):
+        """
+        Return the reference cycles between the objects of a reference index,
+        with their fingerprints.
+
+        Parameters:
+
+            index (:class:`~yagot.ReferenceIndex`): The reference index.
+
+        Returns:
+
+            list: The reference cycles as :class:`~yagot.GarbageCycle`
+            objects, in the order of the indexed objects.
+        """
+        return [GarbageCycle(objects, cycle_fingerprint(index, objects))
+                for objects in index.cycles()]
+
+
+def cycle_fingerprint(index, objects):
+    """
+    Return the structural fingerprint of a reference cycle.
+
+    The fingerprint is computed by canonical hashing of the type graph of the
+    cycle: Each object is first labeled with its type name. Then, in each
+    round, the label of each object is replaced by a hash of its label and
+    the sorted labels of the cycle objects it refers to, until the labels no
+    longer distinguish more objects than in the previous round. The
+    fingerprint is a hash of the sorted final labels.
+
+    Parameters:
+
+        index (:class:`~yagot.ReferenceIndex`): The reference index containing
+          the objects.
+
+        objects (list): The objects of the reference cycle.
+
+    Returns:
+
+        :term:`string`: The fingerprint, as a string of hex digits.
+    """
+    member_ids = set(id(obj) for obj in objects)
+    referents = dict(
+        (id(obj), [id(ref) for ref in index.referents(obj)
+                   if id(ref) in member_ids])
+        for obj in objects)
+    labels = dict((id(obj), type2name(type(obj))) for obj in objects)
+    return graph_fingerprint(referents, labels)
+
+
+def classify_cycle(objects):
+    """
+    Return the pattern of a reference cycle, see
+    :attr:`~yagot.GarbageCycle.pattern`.
+
+    Parameters:
+
+        objects (list): The objects of the reference cycle.
+
+    Returns:
+
+        :term:`string`: The name of the pattern.
+    """
+    # The types are determined with type(), because isinstance() fails with
+    # ReferenceError for dead weak reference proxies.
+    member_ids = set(id(obj) for obj in objects)
+    found = set()
+    containers_only = True
+    for obj in objects:
+        obj_type = type(obj)
+        if issubclass(obj_type, BaseException):
+            found.add('exception')
+        elif issubclass(obj_type, (types.TracebackType, types.FrameType)):
+            found.add('frame')
+        elif issubclass(obj_type, GENERATOR_TYPES):
+            found.add('generator')
+        elif issubclass(obj_type, types.MethodType):
+            if id(obj.__self__) in member_ids:
+                found.add('bound-method')
+        elif issubclass(obj_type, CellType):
+            try:
+                contents = obj.cell_contents
+            except ValueError:  # Empty cell
+                contents = None
+            if issubclass(type(contents), types.FunctionType) and \
+                    id(contents) in member_ids:
+                found.add('closure')
+        if obj_type not in CONTAINER_TYPES:
+            containers_only = False
+    if 'exception' in found and 'frame' not in found:
+        found.discard('exception')
+    if containers_only:
+        found.add('container')
+    for pattern, _ in CYCLE_PATTERNS:
+        if pattern in found:
+            return pattern
+    return OTHER_PATTERN
+
+
+def graph_fingerprint(referents, labels):
+    """
+    Return the structural fingerprint of a reference cycle that is specified
+    as a graph, see :func:`cycle_fingerprint`.
+
+    This allows computing the same fingerprints for reference cycles that
+    are not available as objects, e.g. in heap snapshot files.
+
+    Parameters:
+
+        referents (dict): The references between the objects of the cycle,
+          with key: node, value: list of the nodes of the cycle the node
+          refers to.
+
+        labels (dict): The type names of the objects of the cycle, with key:
+          node, value: type name as returned by ``type2name()``.
+
+    Returns:
+
+        :term:`string`: The fingerprint, as a string of hex digits.
+    """
+    num_labels = len(set(labels.values()))
+    for _ in range(FINGERPRINT_ROUNDS):
+        new_labels = dict(
+            (node, _hash(u"{}({})".format(
+                labels[node],
+                u",".join(sorted(labels[ref] for ref in refs)))))
+            for node, refs in referents.items())
+        labels = new_labels
+        new_num_labels = len(set(labels.values()))
+        if new_num_labels == num_labels:
+            break
+        num_labels = new_num_labels
+    return _hash(u"\n".join(sorted(labels.values())))
+
+
+def _hash(text):
+    """
+    Return a shortened hex digest of a unicode string.
+    """
+    digest = hashlib.sha1(text.encode('utf-8')).hexdigest()
+    return digest[:FINGERPRINT_LENGTH]
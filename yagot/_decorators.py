@@ -5,15 +5,20 @@ Decorators for garbage tracking in specific functions or methods.
 from __future__ import absolute_import, print_function
 import functools
 from ._garbagetracker import GarbageTracker
+from ._budget import GarbageBudget
 
 __all__ = ['garbage_checked']
 
 
-def garbage_checked(leaks_only=False, ignore_types=None):
+def garbage_checked(leaks_only=False, ignore_types=None, filter_types=None,
+                    filter_reachable=False, exceptions=False,
+                    children=False, async_leaks=False, resources=False,
+                    budget=None):
     """
     Decorator that checks for :term:`uncollectable objects` and optionally for
     :term:`collected objects` caused by the decorated function or method, and
-    raises AssertionError if such objects are detected.
+    raises AssertionError if such objects are detected (beyond an optional
+    budget).
 
     The decorated function or method needs to make sure that any objects it
     creates are deleted again, either implicitly (e.g. by a local variable
@@ -22,6 +27,10 @@ def garbage_checked(leaks_only=False, ignore_types=None):
     decorator tests for. Also, it is possible that your code is clean but
     other modules your code uses are not clean, and that will surface this way.
 
+    The decorated function or method can be called concurrently from multiple
+    threads. Since the garbage collector is process-global, the garbage of
+    other threads that is collected during a call is detected as well.
+
     Note that this decorator has arguments, so it must be specified with
     parenthesis, even when relying on the default argument values::
 
@@ -38,7 +47,7 @@ def garbage_checked(leaks_only=False, ignore_types=None):
         ignore_types (:term:`py:iterable`): `None` or iterable of Python
           types or type names that are set as additional garbage types to
           ignore, in addition to :class:`py:frame` and :class:`py:code` that
-          are always ignored.
+          are always ignored (unless `exceptions` is set).
 
           If any detected object has one of the types to be ignored, the entire
           set of objects caused by the decorated function or method is ignored.
@@ -48,7 +57,48 @@ def garbage_checked(leaks_only=False, ignore_types=None):
           example, "int" or "mymodule.MyClass").
 
           `None` or an empty iterable means not to ignore any types.
+
+        filter_types (:term:`py:iterable`): `None` or iterable of type rules
+          as supported by :class:`~yagot.TypeMatcher`, for objects that are
+          removed individually from the detected objects, without ignoring
+          the other detected objects.
+
+          `None` or an empty iterable means not to remove any objects.
+
+        filter_reachable (bool): Boolean controlling whether objects that are
+          reachable only from objects removed by `filter_types` are removed as
+          well.
+
+        exceptions (bool): Boolean controlling whether reference cycles formed
+          by caught exceptions are reported (with the variable the exception
+          is stored in and the frames it keeps alive), instead of ignoring
+          :class:`py:frame` and :class:`py:code` objects. See
+          :attr:`~yagot.GarbageTracker.exception_cycles`.
+
+        children (bool): Boolean controlling whether the child processes
+          created by the decorated function or method are checked as well,
+          see :attr:`~yagot.GarbageTracker.child_summaries`.
+
+        async_leaks (bool): Boolean controlling whether the :mod:`py:asyncio`
+          tasks, futures, scheduled callbacks and event loops created by the
+          decorated function or method that are still pending when it
+          returns are checked for as well, see
+          :attr:`~yagot.GarbageTracker.async_leaks`.
+
+        resources (bool): Boolean controlling whether the
+          :class:`py:ResourceWarning` warnings issued and the file descriptors
+          opened and not closed by the decorated function or method are
+          checked for as well, see
+          :attr:`~yagot.GarbageTracker.resource_leaks`.
+
+        budget (:class:`~yagot.GarbageBudget`): `None` or budget for the
+          :term:`collected objects` and :term:`uncollectable objects` that is
+          tolerated. `None` means that no such objects are tolerated.
     """
+    # Without a budget, the assertion message does not mention it
+    budget_message = budget is not None
+    if budget is None:
+        budget = GarbageBudget()
 
     def decorator_garbage_checked(func):
         "Decorator function for the garbage_checked decorator"
@@ -56,15 +106,29 @@ def garbage_checked(leaks_only=False, ignore_types=None):
         @functools.wraps(func)
         def wrapper_garbage_checked(*args, **kwargs):
             "Wrapper function for the garbage_checked decorator"
-            tracker = GarbageTracker.get_tracker()
-            tracker.enable(leaks_only=leaks_only)
+            # Each call uses its own tracker, so that the decorated function
+            # can be called concurrently from multiple threads.
+            tracker = GarbageTracker()
+            tracker.enable(leaks_only=leaks_only, exceptions=exceptions,
+                           children=children, async_leaks=async_leaks,
+                           resources=resources)
             tracker.start()
             tracker.ignore_types(type_list=ignore_types)
-            ret = func(*args, **kwargs)  # The decorated function
-            tracker.stop()
+            tracker.filter_types(type_list=filter_types,
+                                 reachable=filter_reachable)
+            try:
+                ret = func(*args, **kwargs)  # The decorated function
+                tracker.stop()
+            finally:
+                # Abandons the tracking period if the function raised
+                tracker.disable()
             location = "{module}::{function}".format(
                 module=func.__module__, function=func.__name__)
-            assert not tracker.garbage, tracker.assert_message(location)
+            violations = budget.violations(tracker)
+            assert not violations and not tracker.child_garbage and \
+                not tracker.async_leaks and not tracker.resource_leaks, \
+                (budget.format_violations(violations) if budget_message
+                 else u"") + tracker.assert_message(location)
             return ret
 
         return wrapper_garbage_checked
@@ -0,0 +1,201 @@
+"""
+ExceptionCycle class.
+"""
+
+from __future__ import absolute_import, print_function
+
+import types
+from ._typematcher import type2name
+from ._refindex import _reference_label
+from ._retained import _in_modules
+
+__all__ = ['ExceptionCycle']
+
+# Modules whose exception cycles are not reported in exception cycle mode,
+# because they are created by the test framework when catching exceptions
+# (e.g. pytest.raises() stores the exception in an ExceptionInfo object).
+EXCEPTION_NOISE_MODULES = ['_pytest', 'pytest']
+
+
+class ExceptionCycle(object):
+    """
+    A reference cycle among the :term:`collected objects` or
+    :term:`uncollectable objects` of a tracking period that is formed by a
+    caught exception: The exception references its traceback, the traceback
+    references the frames the exception passed through, and one of these
+    frames (or an object it references) stores the exception.
+
+    Such cycles keep all the frames on the traceback alive, including their
+    local variables, until the garbage collector runs.
+    """
+
+    def __init__(self, cycle, index):
+        """
+        Parameters:
+
+            cycle (:class:`~yagot.GarbageCycle`): The reference cycle, with
+              pattern 'exception'.
+
+            index (:class:`~yagot.ReferenceIndex`): The reference index
+              containing the objects of the cycle.
+        """
+        self._cycle = cycle
+        members = cycle.objects
+        # The types are determined with type(), because isinstance() fails with
+        # ReferenceError for dead weak reference proxies.
+        tracebacks = [obj for obj in members
+                      if issubclass(type(obj), types.TracebackType)]
+        next_ids = set(id(tb.tb_next) for tb in tracebacks)
+        heads = [tb for tb in tracebacks if id(tb) not in next_ids]
+        exceptions = [obj for obj in members
+                      if issubclass(type(obj), BaseException)]
+        self._exception = None
+        for exc in exceptions:
+            if any(getattr(exc, '__traceback__', None) is tb for tb in heads):
+                self._exception = exc
+                break
+        else:
+            if exceptions:
+                self._exception = exceptions[0]
+        tb = getattr(self._exception, '__traceback__', None) or \
+            (heads[0] if heads else None)
+        self._frames = []
+        while tb is not None:
+            self._frames.append((tb.tb_frame, tb.tb_lineno))
+            tb = tb.tb_next
+        self._holders = []
+        if self._exception is not None and self._exception in index:
+            for ref in index.referrers(self._exception):
+                self._holders.append(_holder_str(ref, self._exception))
+
+    def __repr__(self):
+        return "ExceptionCycle(exception={!r}, holders={!r})". \
+            format(self._exception, self._holders)
+
+    @property
+    def cycle(self):
+        """
+        :class:`~yagot.GarbageCycle`: The reference cycle.
+        """
+        return self._cycle
+
+    @property
+    def exception(self):
+        """
+        :exc:`py:BaseException`: The exception that holds the traceback, or
+        `None` if the cycle contains no exception.
+        """
+        return self._exception
+
+    @property
+    def frames(self):
+        """
+        list: The frames on the traceback of the exception that are kept
+        alive by the cycle, as tuples (frame, line number), from the frame
+        that caught the exception to the frame that raised it.
+        """
+        return self._frames
+
+    @property
+    def holders(self):
+        """
+        list: Descriptions of where the exception is stored within the cycle,
+        e.g. "variable 'exc' of function mymodule::myfunc" or
+        "mymodule.MyClass.error".
+        """
+        return self._holders
+
+    @property
+    def locations(self):
+        """
+        list: The locations of the frames on the traceback, as strings in
+        the notation "module::function:line".
+        """
+        return [_frame_location(frame, lineno)
+                for frame, lineno in self._frames]
+
+    def is_noise(self, modules=None):
+        """
+        Return whether the cycle was created by the code of a test framework
+        that catches exceptions (e.g. :func:`pytest.raises`), i.e. the
+        exception is stored in a frame of a function of one of the modules,
+        or the cycle contains an object of a class defined in one of the
+        modules.
+
+        Parameters:
+
+            modules (list): `None` or list of module names. Submodules are
+              included. `None` means to use the modules of pytest.
+
+        Returns:
+
+            bool: Boolean indicating whether the cycle is noise.
+        """
+        if modules is None:
+            modules = EXCEPTION_NOISE_MODULES
+        for obj in self._cycle.objects:
+            if issubclass(type(obj), types.FrameType):
+                module = obj.f_globals.get('__name__')
+                if _in_modules(module, modules) and \
+                        any(value is self._exception
+                            for value in _frame_locals(obj).values()):
+                    return True
+            elif _in_modules(type(obj).__module__, modules):
+                return True
+        return False
+
+    def format(self):
+        """
+        Return a formatted multi-line string describing the exception, where
+        it is stored, and the frames it keeps alive.
+
+        Returns:
+
+            :term:`unicode string`: Formatted string.
+        """
+        exc = self._exception
+        exc_str = u"{}: {}".format(type2name(type(exc)), exc) \
+            if exc is not None else u"(no exception)"
+        lines = [u"Exception {}".format(exc_str)]
+        lines.append(u"  stored in: {}".format(
+            u", ".join(self._holders) or u"(unknown)"))
+        lines.append(u"  keeps {} frame(s) alive: {}".format(
+            len(self._frames), u" -> ".join(self.locations)))
+        return u"\n".join(lines)
+
+
+def _holder_str(referrer, exc):
+    """
+    Return a description of how an object refers to an exception.
+    """
+    if issubclass(type(referrer), types.FrameType):
+        location = _frame_location(referrer)
+        for name, value in _frame_locals(referrer).items():
+            if value is exc:
+                return u"variable {!r} of function {}".format(
+                    str(name), location)
+        return u"frame of function {}".format(location)
+    return type2name(type(referrer)) + _reference_label(referrer, exc)
+
+
+def _frame_location(frame, lineno=None):
+    """
+    Return the location of a frame in the notation "module::function" or,
+    if a line number is specified, "module::function:line".
+    """
+    location = u"{}::{}".format(frame.f_globals.get('__name__'),
+                                frame.f_code.co_name)
+    if lineno is not None:
+        location += u":{}".format(lineno)
+    return location
+
+
+def _frame_locals(frame):
+    """
+    Return the local variables of a frame, or an empty dict if they cannot
+    be accessed.
+    """
+    try:
+        return frame.f_locals
+    except Exception:  # pylint: disable=broad-except
+        return {}
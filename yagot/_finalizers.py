@@ -0,0 +1,275 @@
+"""
+FinalizerProfile class for measuring the time spent in finalizers and weak
+reference callbacks during garbage collections.
+"""
+
+from __future__ import absolute_import, print_function
+
+import gc
+import sys
+import threading
+import weakref
+from timeit import default_timer
+from ._typematcher import type2name
+
+__all__ = ['FinalizerProfile']
+
+# Source files whose functions only dispatch to the actual finalizer (e.g.
+# weakref.finalize), so that the time is attributed to the function called
+# from them.
+DISPATCH_FILES = (weakref.__file__.rstrip('co'),)
+
+# Lock for the state of profiling. It is reentrant, because finalizers may
+# run while it is held.
+_PROFILE_LOCK = threading.RLock()
+
+# The profiles that are currently active
+_PROFILES = []
+
+# State of profiling, with items:
+# - previous: The profile function of the collecting thread that is replaced
+#   during a collection.
+# - start_time: Time the current collection started.
+# - callbacks: Code objects of the gc callback functions, which are not
+#   finalizers.
+# - stack: Stack of the Python function calls during the current collection,
+#   as lists [code, frame, start_time].
+_PROFILE_STATE = dict(previous=None, start_time=None, callbacks=(), stack=[])
+
+
+class FinalizerProfile(object):
+    """
+    A profile of the time spent in finalizers (``__del__`` methods) and weak
+    reference callbacks (including :class:`py:weakref.finalize`) during the
+    garbage collections of a tracking period, including automatic collections
+    and the collection at the end of the tracking period.
+
+    Objects with finalizers and weak reference callbacks can make a garbage
+    collection take much longer than the number of collected objects
+    suggests. The profile attributes the time to the type of the finalized
+    object and to the code location of the finalizer.
+
+    During each garbage collection, a profile function (see
+    :func:`py:sys.setprofile`) measures the Python functions that are called
+    by the garbage collector. A profile function that is already set in the
+    collecting thread (e.g. by :mod:`py:cProfile`) is suspended during the
+    collection. Finalizers implemented in C (e.g. closing a file) are not
+    measured.
+
+    Requires :data:`py:gc.callbacks` (Python 3.3 and higher).
+    """
+
+    def __init__(self):
+        # Dict with key: tuple (type_name, location), value: list [count,
+        # total_time, max_time]
+        self._stats = {}
+        self._num_collections = 0
+        self._collect_time = 0.0
+        self._active = False
+
+    def __repr__(self):
+        return "FinalizerProfile(finalizers={}, time={:.6f})". \
+            format(len(self._stats), self.total_time)
+
+    @property
+    def active(self):
+        """
+        bool: Boolean indicating whether the profile is active.
+        """
+        return self._active
+
+    @property
+    def num_collections(self):
+        """
+        int: Number of garbage collections while the profile was active.
+        """
+        return self._num_collections
+
+    @property
+    def collect_time(self):
+        """
+        float: Total duration in seconds of the garbage collections while the
+        profile was active, including the time of the finalizers.
+        """
+        return self._collect_time
+
+    @property
+    def total_time(self):
+        """
+        float: Total time in seconds spent in finalizers.
+        """
+        return sum(entry[1] for entry in self._stats.values())
+
+    def start(self):
+        """
+        Start profiling the finalizers of garbage collections.
+
+        Raises:
+
+            NotImplementedError: Not supported on this Python version.
+        """
+        if not hasattr(gc, 'callbacks'):
+            raise NotImplementedError(
+                "Finalizer profiling is not supported on Python {}.{}".
+                format(*sys.version_info[0:2]))
+        with _PROFILE_LOCK:
+            if self._active:
+                return
+            if not _PROFILES:
+                gc.callbacks.append(_gc_callback)
+            _PROFILES.append(self)
+            self._active = True
+
+    def stop(self):
+        """
+        Stop profiling. Can be called multiple times.
+        """
+        with _PROFILE_LOCK:
+            if not self._active:
+                return
+            _PROFILES.remove(self)
+            if not _PROFILES:
+                gc.callbacks.remove(_gc_callback)
+            self._active = False
+
+    def stats(self):
+        """
+        Return the time spent in finalizers by type and code location.
+
+        Returns:
+
+            list: List of tuples (type_name, location, count, total_time,
+            max_time), sorted by decreasing total time. `type_name` is the
+            type of the finalized object (for weak reference callbacks, the
+            type of the first argument, e.g. the weak reference), `location`
+            is "file:line (function)" of the finalizer, and the times are in
+            seconds.
+        """
+        result = [key + tuple(value) for key, value in self._stats.items()]
+        return sorted(result, key=lambda r: (-r[3], r[0], r[1]))
+
+    def format(self, max=10):
+        # pylint: disable=redefined-builtin
+        """
+        Return a formatted multi-line string listing the slowest finalizers.
+
+        Parameters:
+
+            max (int): Maximum number of finalizers to be listed.
+
+        Returns:
+
+            :term:`unicode string`: Formatted string.
+        """
+        lines = []
+        for type_name, location, count, total, max_time in self.stats()[:max]:
+            lines.append(
+                u"{total:.6f} s in {count} call(s) of finalizer for {type} at "
+                u"{loc} (slowest call: {max:.6f} s)".
+                format(total=total, count=count, type=type_name, loc=location,
+                       max=max_time))
+        return u"\n".join(lines)
+
+    def objects(self):
+        """
+        Return the objects created for the profile data.
+        """
+        return [self._stats] + list(self._stats.keys()) + \
+            list(self._stats.values())
+
+    def _add(self, type_name, location, duration):
+        """
+        Add a finalizer call.
+        """
+        key = (type_name, location)
+        entry = self._stats.get(key)
+        if entry is None:
+            self._stats[key] = [1, duration, duration]
+        else:
+            entry[0] += 1
+            entry[1] += duration
+            if duration > entry[2]:
+                entry[2] = duration
+
+
+def _gc_callback(phase, info):
+    # pylint: disable=unused-argument
+    """
+    Callback function for gc.callbacks, that sets the profile function during
+    each garbage collection.
+    """
+    with _PROFILE_LOCK:
+        if phase == 'start':
+            _PROFILE_STATE['previous'] = sys.getprofile()
+            _PROFILE_STATE['start_time'] = default_timer()
+            _PROFILE_STATE['callbacks'] = _callback_codes()
+            del _PROFILE_STATE['stack'][:]
+            sys.setprofile(_profile)
+            return
+        if _PROFILE_STATE['start_time'] is None:
+            return
+        sys.setprofile(_PROFILE_STATE['previous'])
+        duration = default_timer() - _PROFILE_STATE['start_time']
+        _PROFILE_STATE['previous'] = None
+        _PROFILE_STATE['start_time'] = None
+        _PROFILE_STATE['callbacks'] = ()
+        del _PROFILE_STATE['stack'][:]
+        for profile in _PROFILES:
+            # pylint: disable=protected-access
+            profile._num_collections += 1
+            profile._collect_time += duration
+
+
+def _profile(frame, event, arg):
+    # pylint: disable=unused-argument
+    """
+    Profile function during a garbage collection, that measures the Python
+    functions called by the garbage collector.
+    """
+    if event == 'call':
+        _PROFILE_STATE['stack'].append([frame.f_code, frame, default_timer()])
+    elif event == 'return':
+        stack = _PROFILE_STATE['stack']
+        if not stack:
+            # The return from the gc callback function
+            return
+        code, frame, start_time = stack.pop()
+        if stack:
+            if stack[0][0].co_filename.endswith(DISPATCH_FILES) and \
+                    len(stack) == 1:
+                # The function called from the dispatch function
+                _record(code, frame, default_timer() - start_time)
+            return
+        if code not in _PROFILE_STATE['callbacks'] and \
+                not code.co_filename.endswith(DISPATCH_FILES):
+            _record(code, frame, default_timer() - start_time)
+
+
+def _record(code, frame, duration):
+    """
+    Record a finalizer call in the active profiles.
+    """
+    type_name = u"-"
+    if code.co_argcount:
+        first_arg = frame.f_locals.get(code.co_varnames[0], None)
+        if first_arg is not None:
+            type_name = type2name(type(first_arg))
+    location = u"{}:{} ({})".format(code.co_filename, code.co_firstlineno,
+                                    code.co_name)
+    with _PROFILE_LOCK:
+        for profile in _PROFILES:
+            # pylint: disable=protected-access
+            profile._add(type_name, location, duration)
+
+
+def _callback_codes():
+    """
+    Return the code objects of the functions in gc.callbacks.
+    """
+    codes = []
+    for callback in gc.callbacks:
+        func = getattr(callback, '__func__', callback)
+        code = getattr(func, '__code__', None)
+        if code is not None:
+            codes.append(code)
+    return tuple(codes)
@@ -4,42 +4,145 @@ GarbageTracker class.
 
 from __future__ import absolute_import, print_function
 
+import os
+import sys
 import types
 import re
 import gc
+import time
+import threading
+import weakref
+from timeit import default_timer
 import pprint
 import inspect
 from datetime import datetime
+from collections import OrderedDict
 import six
 try:
     import objgraph
 except ImportError:
     objgraph = None
+from ._refindex import ReferenceIndex
+from ._typematcher import TypeMatcher, type2name
+from ._cycles import GarbageCycle
+from ._retained import IdSnapshot, find_roots
+from ._exceptions import ExceptionCycle
+from ._children import ChildCollector
+from ._asyncleaks import AsyncSnapshot
+from ._resources import ResourceSnapshot
+from ._finalizers import FinalizerProfile
 
 __all__ = ['GarbageTracker']
 
+try:
+    _get_ident = threading.get_ident
+except AttributeError:  # Python 2
+    import thread  # pylint: disable=import-error
+    _get_ident = thread.get_ident
+
 # Regexp pattern for pprint recursion text
 PPRINT_RECURSION_PATTERN = re.compile(r"<Recursion on (.*) with id=([0-9]+)>")
 
+# Lock for the process-global settings of the garbage collector and the
+# gc.garbage list, which are shared by the tracking periods of all trackers.
+# It is reentrant because a garbage collection may run finalizers that use a
+# tracker.
+_GC_LOCK = threading.RLock()
+
+# The state of the active tracking periods of all trackers in this process,
+# guarded by _GC_LOCK:
+# - periods: Number of active tracking periods.
+# - saveall: Number of active tracking periods that need gc.DEBUG_SAVEALL.
+# - no_auto: Number of active tracking periods that disable automatic
+#   garbage collection.
+# - thresholds, debug: The settings of the garbage collector before the first
+#   of the active tracking periods started, restored when the last one stops.
+# - release_index: Lowest index into gc.garbage of the objects of released
+#   tracking periods that have not yet been removed, or None.
+_GC_STATE = dict(periods=0, saveall=0, no_auto=0, thresholds=None,
+                 debug=None, release_index=None)
+
+# The ranges of gc.garbage of the tracking periods that have not been
+# released, guarded by _GC_LOCK, as a dict with key: tracker, value: list
+# [start index, end index or None while the period is running]. Objects in
+# these ranges are not removed from gc.garbage, because they would be
+# collected again once the tracker no longer references them.
+_GARBAGE_RANGES = weakref.WeakKeyDictionary()
+
+# Thread idents of the threads that started a garbage collection while
+# tracking periods are active, recorded by _gc_callback().
+_COLLECTING_THREADS = set()
+
+# Thread-local state with attribute 'collecting', that is set by
+# _gc_callback() while a garbage collection started by the thread is in
+# progress (e.g. while it runs finalizers).
+_THREAD_STATE = threading.local()
+
+# Delay in seconds before retrying a garbage collection that was skipped
+# because a collection was already in progress in another thread.
+COLLECT_RETRY_DELAY = 0.001
+
+# Maximum number of retries of a skipped garbage collection.
+COLLECT_MAX_RETRIES = 1000
+
 
 class GarbageTracker(object):
     """
     The GarbageTracker class provides a singleton garbage tracker that can track
     :term:`uncollectable objects` and optionally :term:`collected objects`
     that emerged during a tracking period.
+
+    The methods of a garbage tracker can be called from multiple threads. The
+    settings of the garbage collector are process-global, so tracking periods
+    of different trackers can overlap: The settings are changed when the
+    first of the overlapping tracking periods starts and are restored when
+    the last one stops. Because :data:`py:gc.garbage` is process-global as
+    well, the garbage of a tracking period includes the garbage of other
+    threads that is collected while it is active.
     """
 
     # The singleton GarbageTracker object
     _tracker = None
 
+    # Lock for creating the singleton GarbageTracker object
+    _tracker_lock = threading.Lock()
+
     def __init__(self):
+        self._lock = threading.RLock()
+        self._running = False
+        self._period_settings = None
         self._enabled = False
         self._leaks_only = False
+        self._generation = 2
+        self._auto_collect = False
+        self._track_retained = False
+        self._track_exceptions = False
+        self._track_children = False
+        self._child_collector = None
+        self._child_summaries = []
+        self._track_async_leaks = False
+        self._async_snapshot = None
+        self._async_leaks = None
+        self._track_resources = False
+        self._resource_snapshot = None
+        self._resource_leaks = None
+        self._track_finalizers = False
+        self._finalizer_profile = None
+        self._start_ids = None
+        self._retained = []
         self._ignored = False
         self._ignored_type_names = []
+        self._type_filter = TypeMatcher(None)
+        self._filter_reachable = False
         self._saved_thresholds = None
         self._garbage_index = 0
         self._garbage = []
+        self._reference_index = ReferenceIndex([])
+        self._cycles = None
+        self._exception_cycles = None
+        self._collect_time = 0.0
+        self._stats_start = None
+        self._generation_stats = None
 
     @staticmethod
     def get_tracker():
@@ -50,7 +153,9 @@ class GarbageTracker(object):
         time.
         """
         if GarbageTracker._tracker is None:
-            GarbageTracker._tracker = GarbageTracker()
+            with GarbageTracker._tracker_lock:
+                if GarbageTracker._tracker is None:
+                    GarbageTracker._tracker = GarbageTracker()
         return GarbageTracker._tracker
 
     @property
@@ -60,6 +165,14 @@ class GarbageTracker(object):
         """
         return self._enabled
 
+    @property
+    def running(self):
+        """
+        bool: Boolean indicating whether a tracking period of the garbage
+        tracker has been started and not yet stopped.
+        """
+        return self._running
+
     @property
     def ignored(self):
         """
@@ -80,6 +193,163 @@ class GarbageTracker(object):
         """
         return self._leaks_only
 
+    @property
+    def generation(self):
+        """
+        int: The oldest generation that is collected at the begin and end of
+        a tracking period (0, 1 or 2).
+
+        This value can be set via :meth:`~yagot.GarbageTracker.enable`.
+        """
+        return self._generation
+
+    @property
+    def auto_collect(self):
+        """
+        bool: Boolean indicating whether automatic garbage collection remains
+        active during a tracking period.
+
+        This flag can be set via :meth:`~yagot.GarbageTracker.enable`.
+        """
+        return self._auto_collect
+
+    @property
+    def track_retained(self):
+        """
+        bool: Boolean indicating whether the tracker detects retained objects,
+        see :attr:`~yagot.GarbageTracker.retained`.
+
+        This flag can be set via :meth:`~yagot.GarbageTracker.enable`.
+        """
+        return self._track_retained
+
+    @property
+    def track_exceptions(self):
+        """
+        bool: Boolean indicating whether the tracker reports reference cycles
+        formed by caught exceptions instead of ignoring frames and code
+        objects, see :attr:`~yagot.GarbageTracker.exception_cycles`.
+
+        This flag can be set via :meth:`~yagot.GarbageTracker.enable`.
+        """
+        return self._track_exceptions
+
+    @property
+    def track_children(self):
+        """
+        bool: Boolean indicating whether the tracker tracks the child
+        processes created during a tracking period, see
+        :attr:`~yagot.GarbageTracker.child_summaries`.
+
+        This flag can be set via :meth:`~yagot.GarbageTracker.enable`.
+        """
+        return self._track_children
+
+    @property
+    def track_async_leaks(self):
+        """
+        bool: Boolean indicating whether the tracker detects the asyncio
+        objects created during a tracking period that are still pending at
+        its end, see :attr:`~yagot.GarbageTracker.async_leaks`.
+
+        This flag can be set via :meth:`~yagot.GarbageTracker.enable`.
+        """
+        return self._track_async_leaks
+
+    @property
+    def async_leaks(self):
+        """
+        :class:`~yagot.AsyncLeaks`: The :mod:`py:asyncio` tasks, futures,
+        scheduled callbacks and event loops created during the last tracking
+        period that are still pending at its end, or `None` if they are not
+        tracked (see :meth:`~yagot.GarbageTracker.enable`) or the tracking
+        period was ignored.
+        """
+        return self._async_leaks
+
+    @property
+    def track_resources(self):
+        """
+        bool: Boolean indicating whether the tracker detects the
+        :class:`py:ResourceWarning` warnings issued and the file descriptors
+        opened during a tracking period, see
+        :attr:`~yagot.GarbageTracker.resource_leaks`.
+
+        This flag can be set via :meth:`~yagot.GarbageTracker.enable`.
+        """
+        return self._track_resources
+
+    @property
+    def resource_leaks(self):
+        """
+        :class:`~yagot.ResourceLeaks`: The :class:`py:ResourceWarning`
+        warnings issued during the last tracking period (including the
+        garbage collection at its end) and the file descriptors opened during
+        it that are still open at its end, or `None` if they are not tracked
+        (see :meth:`~yagot.GarbageTracker.enable`) or the tracking period was
+        ignored.
+        """
+        return self._resource_leaks
+
+    @property
+    def track_finalizers(self):
+        """
+        bool: Boolean indicating whether the tracker measures the time spent
+        in finalizers and weak reference callbacks during the garbage
+        collections of a tracking period, see
+        :attr:`~yagot.GarbageTracker.finalizer_profile`.
+
+        This flag can be set via :meth:`~yagot.GarbageTracker.enable`.
+        """
+        return self._track_finalizers
+
+    @property
+    def finalizer_profile(self):
+        """
+        :class:`~yagot.FinalizerProfile`: The time spent in finalizers and
+        weak reference callbacks during the automatic garbage collections of
+        the last tracking period and the garbage collection at its end, or
+        `None` if it is not measured (see
+        :meth:`~yagot.GarbageTracker.enable`) or the tracking period was
+        ignored.
+        """
+        return self._finalizer_profile
+
+    @property
+    def child_summaries(self):
+        """
+        list: The summaries of the tracking periods of the child processes
+        that exited during the last tracking period, if child processes are
+        tracked (see :meth:`~yagot.GarbageTracker.enable`).
+
+        Each child process created during a tracking period runs its own
+        tracking period from its start until it exits, with the same settings
+        for `leaks_only` and `generation`. At exit, it sends the summary of
+        its tracking period (see :meth:`~yagot.GarbageTracker.summary`) to the
+        parent process. Each summary has the additional items ``pid`` (process
+        ID of the child process) and ``message`` (assertion message of the
+        child process, or `None` if it had no garbage).
+
+        Child processes are tracked if they are created with
+        :func:`py:os.fork` (including :mod:`py:multiprocessing` and
+        :class:`py:concurrent.futures.ProcessPoolExecutor` with the 'fork'
+        start method), or with the 'spawn' start method of
+        :mod:`py:multiprocessing`. Child processes that end with
+        :func:`py:os._exit` outside of :mod:`py:multiprocessing`, and child
+        processes that are still running at the end of the tracking period
+        are not included.
+        """
+        return self._child_summaries
+
+    @property
+    def child_garbage(self):
+        """
+        int: The total number of :term:`collected objects` or
+        :term:`uncollectable objects` of the child processes in
+        :attr:`~yagot.GarbageTracker.child_summaries`.
+        """
+        return sum(s['num_objects'] for s in self._child_summaries)
+
     @property
     def garbage(self):
         """
@@ -89,14 +359,106 @@ class GarbageTracker(object):
         """
         return self._garbage
 
+    @property
+    def retained(self):
+        """
+        list: List of the objects tracked by the garbage collector that were
+        created during the last tracking period and are still alive at its
+        end (retained objects), excluding the objects in
+        :attr:`~yagot.GarbageTracker.garbage`.
+
+        Retained objects are only detected if enabled via
+        :meth:`~yagot.GarbageTracker.enable`.
+        """
+        return self._retained
+
+    @property
+    def collect_time(self):
+        """
+        float: Time in seconds the garbage collection at the end of the last
+        tracking period took.
+        """
+        return self._collect_time
+
+    @property
+    def generation_stats(self):
+        """
+        list: The garbage collections during the last tracking period, as a
+        list with one item per generation (0, 1, 2). Each item is a dictionary
+        with the differences of the per-generation statistics of
+        :func:`py:gc.get_stats` between the begin and end of the tracking
+        period:
+
+        * ``collections`` (int): Number of collections of the generation.
+        * ``collected`` (int): Number of objects collected in the generation.
+        * ``uncollectable`` (int): Number of uncollectable objects found in
+          the generation.
+
+        The garbage collections at the begin and end of the tracking period
+        performed by the tracker itself are not included. Unless automatic
+        garbage collection was kept active (see
+        :meth:`~yagot.GarbageTracker.enable`), only explicit collections by
+        the tracked code are included.
+
+        Objects collected in generation 0 were short-lived, while objects
+        collected in generation 2 survived multiple collections, which is
+        more expensive in programs with many objects.
+
+        `None`, if :func:`py:gc.get_stats` is not supported (Python 2).
+        """
+        return self._generation_stats
+
+    @property
+    def reference_index(self):
+        """
+        :class:`~yagot.ReferenceIndex`: Index of the references between the
+        objects in :attr:`~yagot.GarbageTracker.garbage`.
+
+        The index is built once when the tracking period is stopped, and
+        allows looking up referrers and reference paths between these objects
+        without scanning all objects tracked by the garbage collector.
+        """
+        return self._reference_index
+
+    @property
+    def cycles(self):
+        """
+        list: The reference cycles among the objects in
+        :attr:`~yagot.GarbageTracker.garbage`, as
+        :class:`~yagot.GarbageCycle` objects.
+
+        The cycles and their fingerprints are determined when this property is
+        accessed for the first time after the tracking period was stopped.
+        """
+        if self._cycles is None:
+            self._cycles = GarbageCycle.from_index(self._reference_index)
+        return self._cycles
+
+    @property
+    def exception_cycles(self):
+        """
+        list: The reference cycles among the objects in
+        :attr:`~yagot.GarbageTracker.garbage` that are formed by caught
+        exceptions, as :class:`~yagot.ExceptionCycle` objects.
+
+        These cycles are only present if exception cycles are tracked (see
+        :meth:`~yagot.GarbageTracker.enable`), because otherwise the frames
+        they contain cause the tracking period to be ignored.
+        """
+        if self._exception_cycles is None:
+            self._exception_cycles = [
+                ExceptionCycle(c, self._reference_index) for c in self.cycles
+                if c.pattern == 'exception']
+        return self._exception_cycles
+
     @property
     def ignored_type_names(self):
         """
         Return the Python type names to be ignored as :term:`collected objects`
         or :term:`uncollectable objects`.
 
-        The types :class:`py:frame` and :class:`py:code` that are always
-        ignored are included in the returned list.
+        The types :class:`py:frame` and :class:`py:code` that are ignored
+        unless exception cycles are tracked are included in the returned list.
 
         Returns:
 
@@ -106,7 +468,32 @@ class GarbageTracker(object):
         """
         return self._ignored_type_names
 
-    def enable(self, leaks_only=False):
+    @property
+    def type_filter(self):
+        """
+        :class:`~yagot.TypeMatcher`: Matcher for the types of
+        :term:`collected objects` or :term:`uncollectable objects` that are
+        removed individually from the objects detected during a tracking
+        period.
+
+        The matcher can be set via :meth:`~yagot.GarbageTracker.filter_types`.
+        """
+        return self._type_filter
+
+    @property
+    def filter_reachable(self):
+        """
+        bool: Boolean indicating whether objects that are only reachable from
+        objects removed by :attr:`~yagot.GarbageTracker.type_filter` are
+        removed as well.
+
+        This flag can be set via :meth:`~yagot.GarbageTracker.filter_types`.
+        """
+        return self._filter_reachable
+
+    def enable(self, leaks_only=False, generation=2, auto_collect=False,
+               retained=False, exceptions=False, children=False,
+               async_leaks=False, resources=False, finalizers=False):
         """
         Enable the garbage tracker and control what objects it checks for.
 
@@ -114,39 +501,156 @@ class GarbageTracker(object):
 
             leaks_only (bool): Boolean limiting the checks to
               :term:`uncollectable objects` (=leaks) only.
+
+            generation (int): The oldest generation that is collected at the
+              begin and end of a tracking period (0, 1 or 2).
+
+              Since automatic garbage collection is disabled during a tracking
+              period, the objects created during the tracking period remain in
+              the youngest generation until its end. Collecting only the
+              youngest generation (0) is therefore much faster on large heaps
+              and still detects the reference cycles among the objects created
+              during the tracking period. It does not detect reference cycles
+              that also include objects that existed before the tracking
+              period.
+
+            auto_collect (bool): Boolean controlling whether automatic garbage
+              collection remains active during a tracking period, with the
+              current thresholds. By default, it is disabled during a tracking
+              period. Keeping it active shows in
+              :attr:`~yagot.GarbageTracker.generation_stats` in which
+              generations the garbage of the tracked code is collected. The
+              objects collected by automatic collections are still detected.
+              This requires `generation` to be 2.
+
+            retained (bool): Boolean controlling whether the tracker detects
+              retained objects, see :attr:`~yagot.GarbageTracker.retained`.
+              This takes a snapshot of the ids of all objects tracked by the
+              garbage collector at the begin of each tracking period, which
+              takes time and memory proportional to the number of objects.
+
+            exceptions (bool): Boolean controlling whether reference cycles
+              formed by caught exceptions are reported (see
+              :attr:`~yagot.GarbageTracker.exception_cycles`), instead of
+              ignoring all tracking periods with frames or code objects (see
+              :meth:`~yagot.GarbageTracker.ignore_types`). Exception cycles
+              created by pytest when catching exceptions (e.g. with
+              :func:`pytest.raises`) are removed, including the objects only
+              reachable from them (see
+              :meth:`~yagot.ExceptionCycle.is_noise`).
+
+            children (bool): Boolean controlling whether the child processes
+              created during a tracking period are tracked, see
+              :attr:`~yagot.GarbageTracker.child_summaries`. This is supported
+              on Python 3.7 and higher, on platforms with Unix domain sockets.
+
+            async_leaks (bool): Boolean controlling whether the
+              :mod:`py:asyncio` tasks, futures, scheduled callbacks and event
+              loops created during a tracking period that are still pending
+              at its end are detected, see
+              :attr:`~yagot.GarbageTracker.async_leaks`. This takes a
+              snapshot of the tasks and callbacks of the event loop at the
+              begin of the tracking period, and scans the youngest generation
+              of the garbage collector at its end.
+
+            resources (bool): Boolean controlling whether the
+              :class:`py:ResourceWarning` warnings issued and the file
+              descriptors opened during a tracking period are detected, see
+              :attr:`~yagot.GarbageTracker.resource_leaks`. Unclosed files
+              and sockets often issue their ResourceWarning only when they
+              are finalized during the garbage collection at the end of the
+              tracking period, which is therefore included.
+
+            finalizers (bool): Boolean controlling whether the time spent in
+              finalizers (``__del__`` methods) and weak reference callbacks
+              during the garbage collections of a tracking period is
+              measured, see :attr:`~yagot.GarbageTracker.finalizer_profile`.
+              This sets a profile function during each garbage collection,
+              and is supported on Python 3.3 and higher.
+
+        Raises:
+
+            ValueError: Invalid generation, or auto_collect specified with a
+              generation other than 2.
+
+            NotImplementedError: Child process tracking or finalizer profiling
+              is not supported on this platform.
         """
-        self._enabled = True
-        self._leaks_only = leaks_only
+        if finalizers and not hasattr(gc, 'callbacks'):
+            raise NotImplementedError(
+                "Finalizer profiling is not supported on Python {}.{}".
+                format(*sys.version_info[0:2]))
+        if generation not in (0, 1, 2):
+            raise ValueError(
+                "Invalid generation: {!r}".format(generation))
+        if auto_collect and generation != 2:
+            raise ValueError(
+                "Invalid generation for auto_collect: {!r}".format(generation))
+        with self._lock:
+            self._enabled = True
+            self._leaks_only = leaks_only
+            self._generation = generation
+            self._auto_collect = auto_collect
+            self._track_retained = retained
+            self._track_exceptions = exceptions
+            settings = dict(leaks_only=leaks_only, generation=generation)
+            if self._child_collector is not None and \
+                    (not children or
+                     self._child_collector.settings != settings):
+                self._child_collector.close()
+                self._child_collector = None
+            if children and self._child_collector is None:
+                self._child_collector = ChildCollector(**settings)
+            self._track_children = children
+            self._track_async_leaks = async_leaks
+            self._track_resources = resources
+            self._track_finalizers = finalizers
 
     def disable(self):
         """
         Disable the garbage tracker.
+
+        A tracking period that is still running is abandoned, and the settings
+        of the garbage collector it changed are restored (unless other
+        tracking periods are still running).
         """
-        self._enabled = False
+        with self._lock:
+            if self._running:
+                self._end_period()
+            self._enabled = False
+            if self._child_collector is not None:
+                self._child_collector.close()
+                self._child_collector = None
+            self._track_children = False
 
     def ignore(self):
         """
         Ignore the current tracking period for this garbage tracker, if it is
         enabled. This causes :attr:`~yagot.GarbageTracker.ignored` to be set.
         """
-        if self.enabled:
-            self._ignored = True
+        with self._lock:
+            if self.enabled:
+                self._ignored = True
 
-    def ignore_types(self, type_list):
+    def ignore_types(self, type_list, implicit=True):
         """
         Set additional Python types to be ignored as :term:`collected objects`
         or :term:`uncollectable objects`.
 
         The specified types are in addition to the following list of types that
         are aways ignored because they often appear as collectable objects
-        when catching exceptions (e.g. when using :func:`pytest.raises`):
+        when catching exceptions (e.g. when using :func:`pytest.raises`),
+        unless exception cycles are tracked (see
+        :meth:`~yagot.GarbageTracker.enable`) or `implicit` is `False`:
 
         * :class:`py:frame`
         * :class:`py:code`
 
         If the list of collected or uncollectable objects detected during the
         tracking period contains an object with a type that is to be ignored,
-        the entire tracking period is ignored.
+        the entire tracking period is ignored. In order to remove only the
+        matching objects, use :meth:`~yagot.GarbageTracker.filter_types`
+        instead.
 
         Parameters:
 
@@ -155,84 +659,363 @@ class GarbageTracker(object):
 
               Each type can be specified as a type object or as a string with
               the type name as represented by the ``str(type)`` function (for
-              example, "int" or "mymodule.MyClass").
+              example, "int" or "mymodule.MyClass"). Strings can also be any
+              of the other type rules supported by :class:`~yagot.TypeMatcher`.
 
               `None` or an empty iterable means not to set additional types.
+
+            implicit (bool): Boolean controlling whether the types listed
+              above are ignored in addition to the specified types.
         """
-        self._ignored_type_names = [
-            _type2name(types.FrameType),
-            _type2name(types.CodeType),
-        ]
+        if self._track_exceptions or not implicit:
+            self._ignored_type_names = []
+        else:
+            self._ignored_type_names = [
+                type2name(types.FrameType),
+                type2name(types.CodeType),
+            ]
         if type_list:
             for t in type_list:
                 if isinstance(t, type):
-                    type_name = _type2name(t)
+                    type_name = type2name(t)
                 else:
                     assert isinstance(t, six.string_types)
                     type_name = t
                 self._ignored_type_names.append(type_name)
 
+    def filter_types(self, type_list, reachable=False):
+        """
+        Set Python types of :term:`collected objects` or
+        :term:`uncollectable objects` that are removed individually from the
+        objects detected during the tracking period.
+
+        In contrast to :meth:`~yagot.GarbageTracker.ignore_types`, the tracking
+        period is not ignored as a whole, so that any other objects are still
+        detected.
+
+        Parameters:
+
+            type_list (:term:`py:iterable`): Iterable of type rules as
+              supported by :class:`~yagot.TypeMatcher`, or `None`.
+
+              `None` or an empty iterable means not to remove any objects.
+
+            reachable (bool): Boolean controlling whether objects that are
+              reachable only from the removed objects are removed as well.
+              Objects that are also reachable from objects that are not
+              removed, are kept.
+        """
+        self._type_filter = TypeMatcher(type_list)
+        self._filter_reachable = reachable
+
     def start(self):
         """
         Start the tracking period for this garbage tracker.
 
-        Must be called before the code to be tracked is run.
+        Must be called before the code to be tracked is run. If a tracking
+        period of this tracker is still running, it is abandoned.
         """
-        if self.enabled:
+        with self._lock:
+            if not self.enabled:
+                return
+            if self._running:
+                self._end_period()
+            with _GC_LOCK:
+                # The objects of the previous tracking period are kept
+                _GARBAGE_RANGES.pop(self, None)
             self._ignored = False
             self._garbage = []
-            self._saved_thresholds = gc.get_threshold()
-            gc.set_threshold(0, 0, 0)
-            gc.set_debug(0)
-            gc.collect()
-            if not self.leaks_only:
-                gc.set_debug(gc.DEBUG_SAVEALL)
-            # If we delete the gc.garbage items, they will re-appear, so we
-            # remember the last position.
-            self._garbage_index = len(gc.garbage)
+            self._reference_index = ReferenceIndex([])
+            self._cycles = None
+            self._exception_cycles = None
+            self._collect_time = 0.0
+            self._generation_stats = None
+            self._retained = []
+            self._start_ids = None
+            self._child_summaries = []
+            self._async_leaks = None
+            self._resource_leaks = None
+            self._finalizer_profile = None
+            if self._child_collector is not None:
+                # Summaries of children of previous tracking periods
+                self._child_collector.collect()
+                self._child_collector.activate()
+            self._period_settings = (self._generation, self._auto_collect,
+                                     not self._leaks_only)
+            with _GC_LOCK:
+                self._garbage_index = _begin_gc_period(
+                    *self._period_settings)
+                _GARBAGE_RANGES[self] = [self._garbage_index, None]
+                # The youngest generation is empty right after the collection
+                self._async_snapshot = AsyncSnapshot() \
+                    if self._track_async_leaks else None
+                self._stats_start = _gc_stats()
+                self._running = True
+            self._resource_snapshot = ResourceSnapshot() \
+                if self._track_resources else None
+            if self._track_finalizers:
+                # The finalizers of the collection at the begin are excluded
+                self._finalizer_profile = FinalizerProfile()
+                self._finalizer_profile.start()
+            if self._track_retained:
+                self._start_ids = IdSnapshot()
 
     def stop(self):
         """
         Stop the tracking period for this garbage tracker.
 
-        Must be called after the code to be tracked is run.
+        Must be called after the code to be tracked is run. If no tracking
+        period of this tracker is running, nothing happens.
         """
-        if self.enabled:
-            gc.collect()
-            gc.set_debug(0)
-            gc.set_threshold(*self._saved_thresholds)
+        with self._lock:
+            if not self.enabled or not self._running:
+                return
+            with _GC_LOCK:
+                try:
+                    stats_end = _gc_stats()
+                    if stats_end is not None:
+                        self._generation_stats = [
+                            dict((key, end[key] - start[key]) for key in end)
+                            for start, end in zip(self._stats_start,
+                                                  stats_end)]
+                    async_candidates = self._async_snapshot.candidates() \
+                        if self._async_snapshot is not None else []
+                except BaseException:
+                    # The settings of the garbage collector are restored
+                    self._end_period()
+                    self._async_snapshot = None
+                    self._resource_snapshot = None
+                    raise
+                collect_start = default_timer()
+                garbage = self._end_period()
+                self._collect_time = default_timer() - collect_start
+            if self._child_collector is not None:
+                self._child_collector.deactivate()
+                self._child_summaries = self._child_collector.collect()
 
-            # Eliminate previous content of the gc.garbage list in order to
-            # show just the garbage added since start(). New uncollectable
-            # objects are always appended to the end of the gc.garbage list,
-            # so we only need to remember the previous index into the list.
+            if self._start_ids is not None:
+                # The statistics objects created by this method, the captured
+                # warnings and the finalizer profile data are excluded
+                resource_objects = self._resource_snapshot.objects() \
+                    if self._resource_snapshot is not None else []
+                if self._finalizer_profile is not None:
+                    resource_objects += self._finalizer_profile.objects()
+                self._retained = self._new_objects(
+                    [self._generation_stats, stats_end, garbage,
+                     async_candidates, resource_objects] + async_candidates +
+                    resource_objects +
+                    (self._generation_stats or []) + (stats_end or []))
+
+            # The garbage is just the garbage added to the gc.garbage list
+            # since start(). New uncollectable objects are always appended to
+            # the end of the gc.garbage list, so the previous content of the
+            # list has been eliminated using the index remembered at start().
             if self._ignored:
                 # If the testcase execution has decided to ignore this tracking
                 # period, do so.
                 self._garbage = []
+                self._child_summaries = []
+                self._finalizer_profile = None
             else:
+                # A loop is used instead of a generator expression, because
+                # the latter would create a cell object for the matcher when
+                # this method is called, that is reported as retained.
+                ignore_matcher = TypeMatcher(self.ignored_type_names)
                 ignore = False
-                for i in range(self._garbage_index, len(gc.garbage)):
-                    # There are cases with weakly referenced objects where
-                    # isinstance(item, ...) fails with ReferenceError.
-                    # Therefore, we use direct type comparison. Also, we
-                    # don't want to match object of subclasses anyway.
-                    type_name = _type2name(type(gc.garbage[i]))
-                    if type_name in self.ignored_type_names:
+                for obj in garbage:
+                    if ignore_matcher.matches(obj):
                         ignore = True
                         break
-                if ignore:
-                    self._garbage = []
-                else:
-                    self._garbage = gc.garbage[self._garbage_index:]
+                self._garbage = [] if ignore else garbage
+                if self._async_snapshot is not None:
+                    self._async_leaks = self._async_snapshot.leaks(
+                        async_candidates, set(id(obj) for obj in garbage))
+                if self._resource_snapshot is not None:
+                    self._resource_leaks = self._resource_snapshot.leaks()
+            self._async_snapshot = None
+            self._resource_snapshot = None
+            self._reference_index = ReferenceIndex(self._garbage)
+            self._cycles = None
+            self._exception_cycles = None
+            if self._type_filter and self._garbage:
+                self._apply_type_filter()
+            if self._track_exceptions and self._garbage:
+                self._remove_exception_noise()
+
+    def _end_period(self):
+        """
+        End the running tracking period for the settings of the garbage
+        collector, and return the objects added to :data:`py:gc.garbage`
+        during the tracking period.
+        """
+        with _GC_LOCK:
+            garbage = _end_gc_period(self._garbage_index,
+                                     *self._period_settings)
+            self._running = False
+            garbage_range = _GARBAGE_RANGES.get(self)
+            if garbage_range is not None:
+                garbage_range[1] = self._garbage_index + len(garbage)
+            _release_garbage()
+        if self._resource_snapshot is not None:
+            # The warnings of finalizers during the collection are included
+            self._resource_snapshot.stop()
+        if self._finalizer_profile is not None:
+            # The finalizers during the collection are included
+            self._finalizer_profile.stop()
+        return garbage
+
+    def release(self):
+        """
+        Release the :term:`collected objects` and :term:`uncollectable
+        objects` of the last tracking period, by removing them from
+        :data:`py:gc.garbage` and from :attr:`~yagot.GarbageTracker.garbage`.
+
+        Since :data:`py:gc.garbage` keeps all objects detected during tracking
+        periods, this should be called by long-running programs that
+        run many tracking periods, once the results of a tracking period have
+        been evaluated.
+
+        The objects are removed from :data:`py:gc.garbage` once they are no
+        longer part of the tracking periods of other trackers that are still
+        running or have not been released.
+
+        Must be called after :meth:`~yagot.GarbageTracker.stop` and before the
+        next tracking period is started.
+        """
+        with self._lock:
+            with _GC_LOCK:
+                garbage_range = _GARBAGE_RANGES.pop(self, None)
+                if garbage_range is not None:
+                    index = _GC_STATE['release_index']
+                    _GC_STATE['release_index'] = garbage_range[0] \
+                        if index is None else min(index, garbage_range[0])
+                    _release_garbage()
+            self._garbage = []
+            self._retained = []
+            self._start_ids = None
+            self._reference_index = ReferenceIndex([])
+            self._cycles = None
+            self._exception_cycles = None
+
+    def _apply_type_filter(self):
+        """
+        Remove the objects matching the type filter (and if requested, the
+        objects only reachable from them) from the garbage, and rebuild the
+        reference index for the remaining objects.
+        """
+        remaining = _remove_matching(
+            self._garbage, self._reference_index, self._type_filter.matches,
+            self._filter_reachable)
+        if remaining is None:
+            return
+        self._garbage = remaining
+        self._reference_index = ReferenceIndex(self._garbage)
+        self._cycles = None
+        self._exception_cycles = None
+
+    def _remove_exception_noise(self):
+        """
+        Remove the exception cycles created by the test framework (and the
+        objects only reachable from them) from the garbage, and rebuild the
+        reference index for the remaining objects.
+        """
+        noise_ids = set(id(obj) for ec in self.exception_cycles
+                        if ec.is_noise() for obj in ec.cycle.objects)
+        if not noise_ids:
+            return
+        remaining = _remove_matching(
+            self._garbage, self._reference_index,
+            lambda obj: id(obj) in noise_ids, True)
+        self._garbage = remaining
+        self._reference_index = ReferenceIndex(self._garbage)
+        self._cycles = None
+        self._exception_cycles = None
+
+    def summary(self):
+        """
+        Return a compact summary of the last tracking period, that contains
+        only basic Python types and can therefore be stored or transferred.
+
+        Returns:
+
+            dict: Summary, with the following items:
 
-    def assert_message(self, location=None, max=10):
+            * ``num_objects`` (int): Number of objects in
+              :attr:`~yagot.GarbageTracker.garbage`.
+            * ``num_bytes`` (int): Sum of the sizes of these objects in Bytes,
+              as returned by :func:`py:sys.getsizeof`.
+            * ``types`` (dict): Number of these objects by type name.
+            * ``fingerprints`` (list): Sorted fingerprints of the reference
+              cycles among these objects, see
+              :attr:`~yagot.GarbageTracker.cycles`.
+            * ``collect_time`` (float): See
+              :attr:`~yagot.GarbageTracker.collect_time`.
+            * ``generation_stats`` (list): See
+              :attr:`~yagot.GarbageTracker.generation_stats`.
+            * ``patterns`` (dict): Number of the reference cycles among these
+              objects by pattern, see :attr:`~yagot.GarbageCycle.pattern`.
+            * ``children`` (list): See
+              :attr:`~yagot.GarbageTracker.child_summaries`.
+            * ``async_leaks`` (dict): Number of the pending asyncio objects
+              by kind, see :meth:`~yagot.AsyncLeaks.counts`, or `None`.
+            * ``resources`` (dict): Number of the resource leaks by kind, see
+              :meth:`~yagot.ResourceLeaks.counts`, or `None`.
+            * ``finalizer_time`` (float): Time in seconds spent in finalizers,
+              see :attr:`~yagot.FinalizerProfile.total_time`, or `None`.
+        """
+        num_bytes = 0
+        type_counts = {}
+        for obj in self.garbage:
+            num_bytes += _getsizeof(obj)
+            type_name = type2name(type(obj))
+            type_counts[type_name] = type_counts.get(type_name, 0) + 1
+        return dict(
+            num_objects=len(self.garbage),
+            num_bytes=num_bytes,
+            types=type_counts,
+            fingerprints=sorted(c.fingerprint for c in self.cycles),
+            collect_time=self.collect_time,
+            generation_stats=self.generation_stats,
+            patterns=dict((pattern, len(cycles)) for pattern, cycles in
+                          self.cycles_by_pattern().items()),
+            children=self._child_summaries,
+            async_leaks=self._async_leaks.counts()
+            if self._async_leaks is not None else None,
+            resources=self._resource_leaks.counts()
+            if self._resource_leaks is not None else None,
+            finalizer_time=self._finalizer_profile.total_time
+            if self._finalizer_profile is not None else None,
+        )
+
+    def cycles_by_pattern(self):
+        """
+        Return the reference cycles among the objects in
+        :attr:`~yagot.GarbageTracker.garbage` grouped by their pattern (see
+        :attr:`~yagot.GarbageCycle.pattern`).
+
+        Returns:
+
+            dict: The reference cycles, with key: pattern, value: list of
+            :class:`~yagot.GarbageCycle` objects.
+        """
+        groups = {}
+        for cycle in self.cycles:
+            groups.setdefault(cycle.pattern, []).append(cycle)
+        return groups
+
+    def assert_message(self, location=None, max=10, known_cycles=None):
         # pylint: disable=redefined-builtin
         """
         Return a formatted multi-line string for the assertion message for
         the :term:`collected objects` or :term:`uncollectable objects`
         detected during the tracking period.
 
+        For each object that is part of a reference cycle, the shortest
+        reference path from the object back to itself is shown (see
+        :meth:`~yagot.ReferenceIndex.format_path`). For each reference cycle
+        with a common pattern, a hint for fixing it is shown (see
+        :attr:`~yagot.GarbageCycle.hint`).
+
         Parameters:
 
             location (:term:`string`): Location of the function that created
@@ -241,6 +1024,13 @@ class GarbageTracker(object):
             max (int): Maximum number of objects to be included in the
               returned string.
 
+            known_cycles (dict): `None` or dictionary of reference cycles that
+              have already been reported before, with key: fingerprint of the
+              cycle (see :attr:`~yagot.GarbageCycle.fingerprint`), value:
+              location where the cycle was first reported. The objects of such
+              cycles are not formatted again, but summarized in one line per
+              cycle.
+
         Returns:
 
             :term:`unicode string`: Formatted multi-line string.
@@ -250,12 +1040,209 @@ class GarbageTracker(object):
         ret_str = u"\nThere were {num} {kind} object(s) caused by function " \
             u"{loc}:\n". \
             format(num=len(self.garbage), kind=kind_str, loc=location)
-        for i, obj in enumerate(self.garbage):
+        if known_cycles:
+            reported_cycles = [c for c in self.cycles
+                               if c.fingerprint in known_cycles]
+        else:
+            reported_cycles = []
+        reported_ids = set(id(obj) for c in reported_cycles
+                           for obj in c.objects)
+        objs = [obj for obj in self.garbage if id(obj) not in reported_ids]
+        for i, obj in enumerate(objs):
             # self._generate_objgraph(obj)
             if i >= max:
                 ret_str += u"\n...\n"
                 break
             ret_str += u"\n{}: {}\n".format(i + 1, self.format_obj(obj))
+            if obj in self._reference_index:
+                path = self._reference_index.shortest_cycle(obj)
+                if path:
+                    ret_str += u"Reference cycle: {}\n".format(
+                        ReferenceIndex.format_path(path))
+        gen_str = format_generation_stats(self.generation_stats)
+        if gen_str:
+            ret_str += u"\nGarbage collections during the tracking period: " \
+                u"{}\n".format(gen_str)
+        new_cycles = [c for c in self.cycles
+                      if c not in reported_cycles and c.hint]
+        if new_cycles:
+            ret_str += u"\nPatterns of the reference cycles:\n"
+            for c in new_cycles:
+                ret_str += u"\nCycle {fp} ({pattern}) with {num} object(s) " \
+                    u"of type(s) {types}: {hint}\n". \
+                    format(fp=c.fingerprint, pattern=c.pattern, num=len(c),
+                           types=', '.join(c.type_names), hint=c.hint)
+        child_messages = [s['message'] for s in self._child_summaries
+                          if s['message']]
+        if child_messages:
+            ret_str += u"\nThere were {num} {kind} object(s) in {n} child " \
+                u"process(es):\n". \
+                format(num=self.child_garbage, kind=kind_str,
+                       n=len(child_messages))
+            for message in child_messages:
+                ret_str += message
+        if self._async_leaks:
+            ret_str += u"\nThere were {num} asyncio object(s) still pending " \
+                u"that were created by function {loc}:\n\n{objs}\n". \
+                format(num=len(self._async_leaks), loc=location,
+                       objs=self._async_leaks.format())
+        if self._resource_leaks:
+            ret_str += u"\nThere were {num} unclosed resource(s) " \
+                u"(ResourceWarning or open file descriptor) caused by " \
+                u"function {loc}:\n\n{res}\n". \
+                format(num=len(self._resource_leaks), loc=location,
+                       res=self._resource_leaks.format())
+        if self._track_exceptions and self.exception_cycles:
+            ret_str += u"\nReference cycles formed by caught exceptions:\n"
+            for ec in self.exception_cycles:
+                ret_str += u"\n{}\n".format(ec.format())
+        if reported_cycles:
+            ret_str += u"\nObjects in reference cycles that have been " \
+                u"reported before:\n"
+            for c in reported_cycles:
+                ret_str += u"\nCycle {fp} ({pattern}) with {num} object(s) " \
+                    u"of type(s) {types}, first reported for function " \
+                    u"{loc}\n". \
+                    format(fp=c.fingerprint, pattern=c.pattern, num=len(c),
+                           types=', '.join(c.type_names),
+                           loc=known_cycles[c.fingerprint])
+        return ret_str
+
+    def detect_retained(self):
+        """
+        Detect the retained objects of the last tracking period again (see
+        :attr:`~yagot.GarbageTracker.retained`), e.g. after resources used by
+        the tracked code have been cleaned up after the end of the tracking
+        period.
+
+        Must be called after :meth:`~yagot.GarbageTracker.stop` with
+        retained objects enabled, and before the next tracking period is
+        started.
+        """
+        if self._start_ids is not None:
+            self._retained = self._new_objects()
+
+    def _new_objects(self, exclude=None):
+        """
+        Return the objects created since the start of the tracking period
+        that are still alive, excluding the objects of the tracking period in
+        gc.garbage (which keeps them alive), the objects of this tracker, and
+        the specified objects.
+        """
+        exclude_ids = set(id(obj) for obj in
+                          gc.garbage[self._garbage_index:])
+        exclude_ids.update(id(obj) for obj in [self._garbage, self._retained])
+        if exclude:
+            exclude_ids.add(id(exclude))
+            exclude_ids.update(id(obj) for obj in exclude)
+        new_objects = self._start_ids.new_objects(exclude_ids)
+        # The bound __exit__ method of the lock of this tracker is kept by the
+        # 'with' statement in stop() while the new objects are determined. A
+        # loop is used, because a list comprehension would create cell
+        # objects on some Python versions.
+        method_type = type(self._lock.__exit__)
+        for index, obj in enumerate(new_objects):
+            if type(obj) is method_type and obj.__self__ is self._lock:
+                del new_objects[index]
+                break
+        return new_objects
+
+    def retained_by_type(self):
+        """
+        Return the retained objects of the last tracking period (see
+        :attr:`~yagot.GarbageTracker.retained`) grouped by type.
+
+        Returns:
+
+            list: List of tuples (type_name, objects), sorted by decreasing
+            number of objects.
+        """
+        groups = {}
+        for obj in self._retained:
+            groups.setdefault(type2name(type(obj)), []).append(obj)
+        return sorted(groups.items(), key=lambda item: (-len(item[1]),
+                                                        item[0]))
+
+    def retained_roots(self, exclude_modules=None):
+        """
+        Return the roots that hold the retained objects of the last tracking
+        period alive (see :attr:`~yagot.GarbageTracker.retained`), with a
+        referrer chain from the root to each object.
+
+        The roots are module globals and class attributes. They are searched
+        with a breadth-first search over the referrers of the retained
+        objects, which is limited to chains of 10 objects.
+
+        Parameters:
+
+            exclude_modules (:term:`py:iterable`): `None` or iterable of
+              module names. Roots in these modules or their submodules are
+              not considered, and chains do not pass through instances of
+              classes defined in these modules, so that retained objects held
+              only by these modules are not returned. This allows leaving out
+              the objects held by a test framework.
+
+        Returns:
+
+            list: List of tuples (obj, root, chain) for the retained objects
+            for which a root was found, in the order of
+            :attr:`~yagot.GarbageTracker.retained`. root is a string
+            describing the root (e.g. "module mymodule" or "class
+            mymodule.MyClass"), and chain is the list of objects from the root
+            to the object.
+        """
+        found = find_roots(self._retained, ignore=[self._retained],
+                           exclude_modules=list(exclude_modules or []))
+        return [(obj,) + found[id(obj)] for obj in self._retained
+                if id(obj) in found]
+
+    def retained_message(self, location=None, max=10, exclude_modules=None):
+        # pylint: disable=redefined-builtin
+        """
+        Return a formatted multi-line string for the retained objects of the
+        last tracking period that are held by a root, grouped by type and
+        root, with the referrer chain from the root for one object of each
+        group.
+
+        Parameters:
+
+            location (:term:`string`): Location of the function that created
+              the objects, e.g. in the notation "module::function".
+
+            max (int): Maximum number of groups to be included in the
+              returned string.
+
+            exclude_modules (:term:`py:iterable`): `None` or iterable of
+              module names whose roots are not considered, see
+              :meth:`~yagot.GarbageTracker.retained_roots`.
+
+        Returns:
+
+            :term:`unicode string`: Formatted multi-line string, or `None` if
+            no retained objects are held by a root.
+        """
+        held = self.retained_roots(exclude_modules)
+        if not held:
+            return None
+        groups = OrderedDict()
+        for obj, root, chain in held:
+            key = (type2name(type(obj)), root)
+            if key not in groups:
+                groups[key] = [0, chain]
+            groups[key][0] += 1
+        ret_str = u"\nThere were {num} retained object(s) caused by " \
+            u"function {loc}:\n".format(num=len(held), loc=location)
+        items = sorted(groups.items(), key=lambda item: -item[1][0])
+        for i, ((type_name, root), (num, chain)) in enumerate(items):
+            if i >= max:
+                ret_str += u"\n...\n"
+                break
+            chain_str = u" -> ".join(
+                u"{} at 0x{:x}".format(type2name(type(o)), id(o))
+                for o in chain)
+            ret_str += u"\n{num} object(s) of type {type} held by {root}: " \
+                u"{chain}\n". \
+                format(num=num, type=type_name, root=root, chain=chain_str)
         return ret_str
 
     @staticmethod
@@ -316,6 +1303,25 @@ class GarbageTracker(object):
                 refcounts=True)
 
 
+def format_generation_stats(generation_stats):
+    """
+    Return a one-line string for the garbage collections of a tracking period
+    (see :attr:`~yagot.GarbageTracker.generation_stats`), or an empty string
+    if there were none.
+    """
+    if not generation_stats:
+        return u""
+    items = []
+    for gen, st in enumerate(generation_stats):
+        if st['collections'] or st['collected'] or st['uncollectable']:
+            items.append(
+                u"generation {}: {} collection(s), {} collected, "
+                u"{} uncollectable".format(gen, st['collections'],
+                                           st['collected'],
+                                           st['uncollectable']))
+    return u"; ".join(items)
+
+
 def _id2addr(matchobj):
     """
     Regexp substituion function to reformat pprint recursion text.
@@ -325,11 +1331,211 @@ def _id2addr(matchobj):
     return ret
 
 
-def _type2name(type_obj):
+def _getsizeof(obj):
+    """
+    Return the size of an object in Bytes, or 0 if it cannot be determined.
+    """
+    try:
+        return sys.getsizeof(obj)
+    except Exception:  # pylint: disable=broad-except
+        # There are cases with weakly referenced objects where this fails
+        # with ReferenceError.
+        return 0
+
+
+def _remove_matching(objects, index, matches, reachable):
+    """
+    Return the objects without the objects for which a match function returns
+    True and, if requested, without the objects only reachable from them, or
+    `None` if no object matches.
+    """
+    matched = [obj for obj in objects if matches(obj)]
+    if not matched:
+        return None
+    if reachable:
+        # Objects reachable from the matched objects are removed, unless
+        # they are also reachable from objects that are not removed.
+        from_matched = set(id(obj) for obj in index.reachable(matched))
+        roots = [obj for obj in objects if id(obj) not in from_matched]
+        from_roots = set(id(obj) for obj in
+                         index.reachable(roots, exclude=matched))
+        removed = from_matched - from_roots
+    else:
+        removed = set(id(obj) for obj in matched)
+    return [obj for obj in objects if id(obj) not in removed]
+
+
+def _begin_gc_period(generation, auto_collect, saveall):
+    """
+    Begin a tracking period for the process-global settings of the garbage
+    collector: Save the settings if this is the first active tracking period,
+    collect the garbage that existed before, and change the settings as
+    needed by the active tracking periods.
+
+    Must be called with _GC_LOCK held.
+
+    Returns:
+
+        int: The index into :data:`py:gc.garbage` from which on the garbage of
+        the tracking period is added.
+    """
+    state = _GC_STATE
+    if state['periods'] == 0:
+        state['thresholds'] = gc.get_threshold()
+        state['debug'] = gc.get_debug()
+        if hasattr(gc, 'callbacks'):
+            gc.callbacks.append(_gc_callback)
+    state['periods'] += 1
+    if not auto_collect:
+        state['no_auto'] += 1
+    # The objects collected now are saved only for other active tracking
+    # periods that need that.
+    _apply_gc_settings()
+    _collect(generation)
+    if saveall:
+        state['saveall'] += 1
+        _apply_gc_settings()
+    return len(gc.garbage)
+
+
+def _end_gc_period(garbage_index, generation, auto_collect, saveall):
+    """
+    End a tracking period for the process-global settings of the garbage
+    collector: Collect the garbage, and restore the settings if this was the
+    last active tracking period, or change them as needed by the remaining
+    active tracking periods.
+
+    Must be called with _GC_LOCK held.
+
+    Returns:
+
+        list: The objects added to :data:`py:gc.garbage` since the begin of
+        the tracking period.
+    """
+    state = _GC_STATE
+    _collect(generation)
+    garbage = gc.garbage[garbage_index:]
+    state['periods'] -= 1
+    if not auto_collect:
+        state['no_auto'] -= 1
+    if saveall:
+        state['saveall'] -= 1
+    if state['periods'] == 0:
+        gc.set_debug(state['debug'])
+        gc.set_threshold(*state['thresholds'])
+        if hasattr(gc, 'callbacks'):
+            gc.callbacks.remove(_gc_callback)
+    else:
+        _apply_gc_settings()
+    return garbage
+
+
+def _release_garbage():
+    """
+    Remove the objects of released tracking periods from the end of
+    :data:`py:gc.garbage`, as far as they are not in the ranges of tracking
+    periods that have not been released.
+
+    Must be called with _GC_LOCK held.
+    """
+    index = _GC_STATE['release_index']
+    if index is None:
+        return
+    for _, end in _GARBAGE_RANGES.values():
+        if end is None:
+            # A running tracking period uses the end of gc.garbage
+            return
+        index = max(index, end)
+    del gc.garbage[index:]
+    if index == _GC_STATE['release_index']:
+        _GC_STATE['release_index'] = None
+
+
+def _collect(generation):
+    """
+    Run a garbage collection of the generation in the current thread.
+
+    :func:`py:gc.collect` does nothing if a garbage collection is already in
+    progress in another thread (e.g. an automatic collection that runs
+    finalizers). This is detected via :data:`py:gc.callbacks` and the
+    collection is retried, up to COLLECT_MAX_RETRIES times. If the collection
+    in progress was started by the current thread (i.e. a finalizer uses a
+    tracker), retrying would never succeed, so the collection is attempted
+    only once. Must be called with _GC_LOCK held, while tracking periods are
+    active.
+    """
+    if not hasattr(gc, 'callbacks') or \
+            getattr(_THREAD_STATE, 'collecting', False):
+        gc.collect(generation)
+        return
+    ident = _get_ident()
+    for _ in range(COLLECT_MAX_RETRIES):
+        _COLLECTING_THREADS.discard(ident)
+        gc.collect(generation)
+        if ident in _COLLECTING_THREADS:
+            _COLLECTING_THREADS.discard(ident)
+            return
+        time.sleep(COLLECT_RETRY_DELAY)
+
+
+def _gc_callback(phase, info):
+    # pylint: disable=unused-argument
+    """
+    Callback of the garbage collector that records the threads that start a
+    garbage collection, and whether a collection of the current thread is in
+    progress.
+    """
+    if phase == 'start':
+        _COLLECTING_THREADS.add(_get_ident())
+        _THREAD_STATE.collecting = True
+    else:
+        _THREAD_STATE.collecting = False
+
+
+def _apply_gc_settings():
+    """
+    Change the settings of the garbage collector as needed by the active
+    tracking periods.
+
+    Must be called with _GC_LOCK held.
+    """
+    state = _GC_STATE
+    if state['no_auto']:
+        gc.set_threshold(0, 0, 0)
+    else:
+        gc.set_threshold(*state['thresholds'])
+    debug = state['debug'] & ~gc.DEBUG_SAVEALL
+    if state['saveall']:
+        debug |= gc.DEBUG_SAVEALL
+    gc.set_debug(debug)
+
+
+def _reset_gc_state():
+    """
+    Reset the state of the tracking periods in a forked child process, where
+    the tracking periods of the parent process are not running.
+    """
+    global _GC_LOCK  # pylint: disable=global-statement
+    _GC_LOCK = threading.RLock()
+    if _GC_STATE['periods']:
+        gc.set_debug(_GC_STATE['debug'])
+        gc.set_threshold(*_GC_STATE['thresholds'])
+        if _gc_callback in gc.callbacks:
+            gc.callbacks.remove(_gc_callback)
+    _GC_STATE.update(periods=0, saveall=0, no_auto=0, release_index=None)
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_gc_state)
+
+
+def _gc_stats():
     """
-    Return type name of a type object, as represented by `str(type_obj)`.
+    Return the per-generation statistics of the garbage collector as a list
+    of dicts with items collections, collected, uncollectable, or `None` if
+    not supported (Python 2).
     """
-    m = re.match(r"<(class|type) '(.*)'>", str(type_obj))
-    assert m is not None
-    type_name = m.group(2)
-    return type_name
+    if not hasattr(gc, 'get_stats'):
+        return None
+    return [dict(collections=st['collections'], collected=st['collected'],
+                 uncollectable=st['uncollectable']) for st in gc.get_stats()]
@@ -0,0 +1,330 @@
+"""
+HistoryStore class and command line interface for querying it.
+"""
+
+from __future__ import absolute_import, print_function
+
+import os
+import sys
+import json
+import sqlite3
+import argparse
+import platform
+from datetime import datetime
+from ._version import __version__
+
+__all__ = ['HistoryStore']
+
+# Version of the database schema, stored in the user_version pragma
+SCHEMA_VERSION = 1
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    run_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    started TEXT NOT NULL,
+    finished TEXT,
+    python_version TEXT,
+    yagot_version TEXT,
+    description TEXT
+);
+CREATE TABLE IF NOT EXISTS results (
+    run_id INTEGER NOT NULL REFERENCES runs(run_id),
+    test_id TEXT NOT NULL,
+    num_objects INTEGER NOT NULL,
+    num_bytes INTEGER NOT NULL,
+    collect_time REAL NOT NULL,
+    types TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS fingerprints (
+    run_id INTEGER NOT NULL REFERENCES runs(run_id),
+    test_id TEXT NOT NULL,
+    fingerprint TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS results_test_id ON results (test_id, run_id);
+CREATE INDEX IF NOT EXISTS fingerprints_fingerprint
+    ON fingerprints (fingerprint, run_id);
+"""
+
+
+class HistoryStore(object):
+    """
+    A local SQLite database that stores the summaries of tracking periods
+    (see :meth:`~yagot.GarbageTracker.summary`) across runs, for example one
+    summary per test case and one run per test session.
+
+    Summaries are buffered and written in batches, each batch in a single
+    transaction, so that recording the summaries of many tracking periods is
+    cheap.
+    """
+
+    def __init__(self, path, batch_size=1000):
+        """
+        Parameters:
+
+            path (:term:`string`): Path name of the SQLite database file. The
+              file is created if it does not exist.
+
+            batch_size (int): Number of buffered summaries that causes the
+              buffer to be written to the database.
+        """
+        self._path = path
+        self._batch_size = batch_size
+        self._conn = sqlite3.connect(path)
+        self._conn.executescript(SCHEMA)
+        self._conn.execute("PRAGMA user_version = {}".format(SCHEMA_VERSION))
+        self._conn.commit()
+        self._run_id = None
+        self._results = []
+        self._fingerprints = []
+
+    @property
+    def path(self):
+        """
+        :term:`string`: Path name of the SQLite database file.
+        """
+        return self._path
+
+    @property
+    def run_id(self):
+        """
+        int: ID of the current run, or `None` if no run has been started.
+        """
+        return self._run_id
+
+    def start_run(self, description=None):
+        """
+        Start a new run, to which subsequently added summaries belong.
+
+        Parameters:
+
+            description (:term:`string`): Optional description of the run,
+              e.g. the command line.
+
+        Returns:
+
+            int: ID of the new run.
+        """
+        with self._conn:
+            cursor = self._conn.execute(
+                "INSERT INTO runs (started, python_version, yagot_version, "
+                "description) VALUES (?, ?, ?, ?)",
+                (_now(), platform.python_version(), __version__, description))
+        self._run_id = cursor.lastrowid
+        return self._run_id
+
+    def add(self, test_id, summary):
+        """
+        Add the summary of a tracking period to the current run.
+
+        The summary is buffered and written to the database when the buffer
+        reaches the batch size, or when :meth:`~yagot.HistoryStore.flush`
+        or :meth:`~yagot.HistoryStore.end_run` is called.
+
+        Parameters:
+
+            test_id (:term:`string`): ID of the tracked code, e.g. the pytest
+              node ID of a test case.
+
+            summary (dict): Summary of the tracking period, as returned by
+              :meth:`~yagot.GarbageTracker.summary`.
+        """
+        assert self._run_id is not None, "No run has been started"
+        self._results.append((
+            self._run_id, test_id, summary['num_objects'],
+            summary['num_bytes'], summary['collect_time'],
+            json.dumps(summary['types'], sort_keys=True)))
+        for fp in sorted(set(summary['fingerprints'])):
+            self._fingerprints.append((self._run_id, test_id, fp))
+        if len(self._results) >= self._batch_size:
+            self.flush()
+
+    def flush(self):
+        """
+        Write the buffered summaries to the database, in a single transaction.
+        """
+        if self._results or self._fingerprints:
+            with self._conn:
+                self._conn.executemany(
+                    "INSERT INTO results (run_id, test_id, num_objects, "
+                    "num_bytes, collect_time, types) "
+                    "VALUES (?, ?, ?, ?, ?, ?)", self._results)
+                self._conn.executemany(
+                    "INSERT INTO fingerprints (run_id, test_id, fingerprint) "
+                    "VALUES (?, ?, ?)", self._fingerprints)
+            self._results = []
+            self._fingerprints = []
+
+    def end_run(self):
+        """
+        Write the buffered summaries to the database and end the current run.
+        """
+        self.flush()
+        if self._run_id is not None:
+            with self._conn:
+                self._conn.execute(
+                    "UPDATE runs SET finished = ? WHERE run_id = ?",
+                    (_now(), self._run_id))
+            self._run_id = None
+
+    def close(self):
+        """
+        End any current run and close the database.
+        """
+        self.end_run()
+        self._conn.close()
+
+    def runs(self, limit=None):
+        """
+        Return the most recent runs, with totals over their summaries.
+
+        Parameters:
+
+            limit (int): Maximum number of runs, or `None` for all runs.
+
+        Returns:
+
+            list: List of tuples (run_id, started, num_tests, num_objects,
+            num_bytes, collect_time) in ascending order of runs.
+        """
+        return self._trend(None, limit)
+
+    def trend(self, test_id, limit=None):
+        """
+        Return the summaries of a tracked code in the most recent runs.
+
+        Parameters:
+
+            test_id (:term:`string`): ID of the tracked code.
+
+            limit (int): Maximum number of runs, or `None` for all runs.
+
+        Returns:
+
+            list: List of tuples (run_id, started, num_tests, num_objects,
+            num_bytes, collect_time) in ascending order of runs, for the runs
+            that have a summary for the tracked code.
+        """
+        return self._trend(test_id, limit)
+
+    def _trend(self, test_id, limit):
+        """
+        Implementation of runs() and trend().
+        """
+        where = "WHERE results.test_id = ? " if test_id is not None else ""
+        params = (test_id,) if test_id is not None else ()
+        rows = self._conn.execute(
+            "SELECT runs.run_id, runs.started, COUNT(results.test_id), "
+            "COALESCE(SUM(results.num_objects), 0), "
+            "COALESCE(SUM(results.num_bytes), 0), "
+            "COALESCE(SUM(results.collect_time), 0.0) "
+            "FROM runs JOIN results ON results.run_id = runs.run_id " +
+            where +
+            "GROUP BY runs.run_id ORDER BY runs.run_id DESC" +
+            (" LIMIT {:d}".format(limit) if limit is not None else ""),
+            params).fetchall()
+        rows.reverse()
+        return rows
+
+    def first_seen(self, fingerprint):
+        """
+        Return the first run in which a reference cycle was recorded.
+
+        Parameters:
+
+            fingerprint (:term:`string`): Fingerprint of the reference cycle
+              (see :attr:`~yagot.GarbageCycle.fingerprint`), or a prefix of it.
+
+        Returns:
+
+            tuple: Tuple (run_id, started, test_id, fingerprint) for the first
+            recorded occurrence, or `None` if the cycle was never recorded.
+        """
+        return self._conn.execute(
+            "SELECT runs.run_id, runs.started, fingerprints.test_id, "
+            "fingerprints.fingerprint "
+            "FROM fingerprints JOIN runs ON runs.run_id = fingerprints.run_id "
+            "WHERE fingerprints.fingerprint LIKE ? "
+            "ORDER BY runs.run_id, fingerprints.rowid LIMIT 1",
+            (fingerprint + '%',)).fetchone()
+
+
+def _now():
+    """
+    Return the current local time as an ISO 8601 string.
+    """
+    return datetime.now().replace(microsecond=0).isoformat(' ')
+
+
+def main(argv=None):
+    """
+    Command line interface for querying a history database, invoked with
+    ``python -m yagot.history``.
+
+    Parameters:
+
+        argv (list): Command line arguments without the program name, or
+          `None` for using ``sys.argv``.
+
+    Returns:
+
+        int: Exit code.
+    """
+    parser = argparse.ArgumentParser(
+        prog='python -m yagot.history',
+        description="Show the garbage history recorded by Yagot, e.g. with "
+        "the --yagot-history option of the pytest plugin.")
+    parser.add_argument(
+        'path', metavar='PATH',
+        help="Path name of the history database file.")
+    subparsers = parser.add_subparsers(dest='command', metavar='COMMAND')
+    subparsers.required = True
+    trend_parser = subparsers.add_parser(
+        'trend',
+        help="Show the garbage totals of the most recent runs, or of a "
+        "single test case in the most recent runs.")
+    trend_parser.add_argument(
+        'test_id', metavar='TESTID', nargs='?', default=None,
+        help="ID of the test case (e.g. pytest node ID). Default: All test "
+        "cases.")
+    trend_parser.add_argument(
+        '--limit', '-n', type=int, default=20,
+        help="Maximum number of runs to show. Default: 20.")
+    first_parser = subparsers.add_parser(
+        'first-seen',
+        help="Show the first run in which a reference cycle was recorded.")
+    first_parser.add_argument(
+        'fingerprint', metavar='FINGERPRINT',
+        help="Fingerprint of the reference cycle, or a prefix of it.")
+    args = parser.parse_args(argv)
+
+    # Opening a missing file would create an empty history database
+    if not os.path.isfile(args.path):
+        print("Error: History database file not found: {}".format(args.path),
+              file=sys.stderr)
+        return 2
+    store = HistoryStore(args.path)
+    try:
+        if args.command == 'trend':
+            rows = store.trend(args.test_id, args.limit) \
+                if args.test_id is not None else store.runs(args.limit)
+            if not rows:
+                print("No runs recorded")
+                return 1
+            print("{:>6}  {:<19}  {:>7}  {:>9}  {:>11}  {:>10}".format(
+                "Run", "Started", "Tests", "Objects", "Bytes", "GC time"))
+            for run_id, started, num_tests, num_objects, num_bytes, \
+                    collect_time in rows:
+                print("{:>6}  {:<19}  {:>7}  {:>9}  {:>11}  {:>9.3f}s".format(
+                    run_id, started, num_tests, num_objects, num_bytes,
+                    collect_time))
+        else:
+            row = store.first_seen(args.fingerprint)
+            if row is None:
+                print("Cycle {} was never recorded".format(args.fingerprint))
+                return 1
+            run_id, started, test_id, fingerprint = row
+            print("Cycle {} was first recorded in run {} started {}, in test "
+                  "case {}".format(fingerprint, run_id, started, test_id))
+    finally:
+        store.close()
+    return 0
@@ -0,0 +1,463 @@
+"""
+HtmlReport class for a self-contained HTML report of the tracking periods of
+a session (e.g. of the test cases of a pytest run).
+"""
+
+from __future__ import absolute_import, print_function
+
+import io
+import json
+import zlib
+import base64
+import heapq
+import platform
+from datetime import datetime
+from ._typematcher import type2name
+from ._refindex import _reference_label
+from ._garbagetracker import GarbageTracker, _getsizeof
+from ._version import __version__
+
+__all__ = ['HtmlReport']
+
+# Maximum number of objects in the graph of a tracking period
+GRAPH_MAX_NODES = 200
+
+# Maximum length of the representation of an object in the details
+REPR_MAX = 1000
+
+
+class HtmlReport(object):
+    """
+    A report of the tracking periods of a session (e.g. one tracking period
+    per test case), that is written as a single self-contained HTML file.
+
+    The report lists the tracking periods with the most garbage by number of
+    Bytes and by number of objects, the tracking periods with the slowest
+    garbage collections, the patterns of the reference cycles and the
+    distinct reference cycles (by fingerprint). These tables are static
+    HTML, so the report opens quickly also for many tracking periods.
+
+    For each tracking period with garbage, the assertion message, the
+    formatted objects and the graph of the references between the objects
+    are embedded in the HTML file as compressed JSON. They are decompressed
+    and rendered in the browser only when the details of a tracking period
+    are expanded. Rendering requires a browser that supports the
+    DecompressionStream API.
+
+    The data for the report is extracted from the garbage tracker when a
+    tracking period is added, so the objects of the tracking period are not
+    kept alive by the report.
+    """
+
+    def __init__(self, max_rows=25, max_objects=10):
+        """
+        Parameters:
+
+            max_rows (int): Maximum number of tracking periods in each of the
+              tables of the worst tracking periods.
+
+            max_objects (int): Maximum number of objects whose details are
+              included for each tracking period.
+        """
+        self._max_rows = max_rows
+        self._max_objects = max_objects
+        # List of tuples (location, num_objects, num_bytes, collect_time,
+        # patterns, detail_index) of the tracking periods
+        self._periods = []
+        # Compressed details as base64 strings, by detail index
+        self._details = []
+        # Distinct reference cycles, by fingerprint
+        self._cycles = {}
+        self._total_objects = 0
+        self._total_bytes = 0
+        self._total_collect_time = 0.0
+
+    def __len__(self):
+        return len(self._periods)
+
+    @property
+    def num_cycles(self):
+        """
+        int: The number of distinct reference cycles (by fingerprint) of the
+        tracking periods in the report.
+        """
+        return len(self._cycles)
+
+    def add(self, location, tracker, message=None):
+        """
+        Add the last tracking period of a garbage tracker to the report.
+
+        Parameters:
+
+            location (:term:`string`): Location of the tracking period, e.g.
+              the test ID or "module::function".
+
+            tracker (:class:`~yagot.GarbageTracker`): The garbage tracker,
+              whose tracking period has been stopped.
+
+            message (:term:`string`): The assertion message of the tracking
+              period (see :meth:`~yagot.GarbageTracker.assert_message`), or
+              `None`, in which case it is created if the tracking period has
+              garbage, garbage in child processes, pending asyncio objects
+              or resource leaks.
+        """
+        summary = tracker.summary()
+        num_objects = summary['num_objects']
+        detail_index = None
+        if num_objects or tracker.child_garbage or tracker.async_leaks or \
+                tracker.resource_leaks:
+            if message is None:
+                message = tracker.assert_message(
+                    location, max=self._max_objects)
+            details = dict(
+                message=message,
+                objects=[_object_details(obj) for obj in
+                         tracker.garbage[:self._max_objects]],
+                graph=_graph(tracker.reference_index),
+            )
+            detail_index = len(self._details)
+            self._details.append(_compress(details))
+        self._periods.append((location, num_objects, summary['num_bytes'],
+                              summary['collect_time'], summary['patterns'],
+                              detail_index))
+        self._total_objects += num_objects
+        self._total_bytes += summary['num_bytes']
+        self._total_collect_time += summary['collect_time']
+        for cycle in tracker.cycles:
+            entry = self._cycles.get(cycle.fingerprint)
+            if entry is None:
+                entry = dict(pattern=cycle.pattern, size=len(cycle),
+                             type_names=cycle.type_names, first=location,
+                             locations=set())
+                self._cycles[cycle.fingerprint] = entry
+            entry['locations'].add(location)
+
+    def html(self, title="Yagot report"):
+        """
+        Return the report as a self-contained HTML document.
+
+        Parameters:
+
+            title (:term:`string`): Title of the report.
+
+        Returns:
+
+            :term:`unicode string`: The HTML document.
+        """
+        periods = self._periods
+        num_garbage = sum(1 for p in periods if p[1])
+        overview = [
+            (u"Tracking periods", len(periods)),
+            (u"Tracking periods with garbage", num_garbage),
+            (u"Garbage objects", self._total_objects),
+            (u"Garbage Bytes", self._total_bytes),
+            (u"Distinct reference cycles", len(self._cycles)),
+            (u"Total garbage collection time",
+             u"{:.3f} s".format(self._total_collect_time)),
+            (u"Created", datetime.now().strftime('%Y-%m-%d %H:%M:%S')),
+            (u"Python", platform.python_version()),
+            (u"Yagot", __version__),
+        ]
+        parts = [u"<h1>{}</h1>".format(_escape(title)), u"<table>"]
+        for name, value in overview:
+            parts.append(u"<tr><th>{}</th><td>{}</td></tr>".format(
+                _escape(name), _escape(value)))
+        parts.append(u"</table>")
+
+        with_garbage = [p for p in periods if p[1]]
+        parts.append(self._periods_table(
+            u"Worst tracking periods by Bytes",
+            heapq.nlargest(self._max_rows, with_garbage, key=lambda p: p[2])))
+        parts.append(self._periods_table(
+            u"Worst tracking periods by objects",
+            heapq.nlargest(self._max_rows, with_garbage, key=lambda p: p[1])))
+        parts.append(self._periods_table(
+            u"Slowest garbage collections",
+            heapq.nlargest(self._max_rows, periods, key=lambda p: p[3])))
+        parts.append(self._patterns_table())
+        parts.append(self._cycles_table())
+
+        data = json.dumps(self._details, separators=(',', ':'))
+        # Prevent the end of the script element within the data
+        data = data.replace(u"</", u"<\\/")
+        return HTML_TEMPLATE. \
+            replace(u"@TITLE@", _escape(title)). \
+            replace(u"@BODY@", u"\n".join(parts)). \
+            replace(u"@DATA@", data)
+
+    def write(self, path, title="Yagot report"):
+        """
+        Write the report to an HTML file.
+
+        Parameters:
+
+            path (:term:`string`): Path name of the HTML file.
+
+            title (:term:`string`): Title of the report.
+        """
+        with io.open(path, 'w', encoding='utf-8') as fp:
+            fp.write(self.html(title))
+
+    def _periods_table(self, heading, periods):
+        """
+        Return the HTML for a table of tracking periods.
+        """
+        if not periods:
+            return u""
+        rows = [u"<h2>{}</h2>".format(_escape(heading)),
+                u"<table class='periods'><tr><th>Location</th>"
+                u"<th>Objects</th><th>Bytes</th><th>GC time (s)</th>"
+                u"<th>Patterns</th><th></th></tr>"]
+        for location, num_objects, num_bytes, collect_time, patterns, \
+                detail_index in periods:
+            patterns_str = u", ".join(
+                u"{} ({})".format(name, num)
+                for name, num in sorted(patterns.items()))
+            button = u"<button data-detail='{}'>Details</button>". \
+                format(detail_index) if detail_index is not None else u""
+            rows.append(
+                u"<tr><td class='loc'>{}</td><td>{}</td><td>{}</td>"
+                u"<td>{:.4f}</td><td>{}</td><td>{}</td></tr>".format(
+                    _escape(location), num_objects, num_bytes, collect_time,
+                    _escape(patterns_str), button))
+        rows.append(u"</table>")
+        return u"\n".join(rows)
+
+    def _patterns_table(self):
+        """
+        Return the HTML for the table of the reference cycles by pattern.
+        """
+        patterns = {}
+        for entry in self._cycles.values():
+            item = patterns.setdefault(entry['pattern'], [0, set()])
+            item[0] += 1
+            item[1].update(entry['locations'])
+        if not patterns:
+            return u""
+        rows = [u"<h2>Reference cycles by pattern</h2>",
+                u"<table><tr><th>Pattern</th><th>Distinct cycles</th>"
+                u"<th>Tracking periods</th></tr>"]
+        for pattern, (num, locations) in sorted(
+                patterns.items(), key=lambda item: -item[1][0]):
+            rows.append(u"<tr><td>{}</td><td>{}</td><td>{}</td></tr>".format(
+                _escape(pattern), num, len(locations)))
+        rows.append(u"</table>")
+        return u"\n".join(rows)
+
+    def _cycles_table(self):
+        """
+        Return the HTML for the table of the distinct reference cycles.
+        """
+        if not self._cycles:
+            return u""
+        rows = [u"<h2>Distinct reference cycles</h2>",
+                u"<table><tr><th>Fingerprint</th><th>Pattern</th>"
+                u"<th>Objects</th><th>Types</th><th>Tracking periods</th>"
+                u"<th>First seen in</th></tr>"]
+        cycles = sorted(self._cycles.items(),
+                        key=lambda item: -len(item[1]['locations']))
+        for fp, entry in cycles:
+            rows.append(
+                u"<tr><td><code>{}</code></td><td>{}</td><td>{}</td>"
+                u"<td>{}</td><td>{}</td><td class='loc'>{}</td></tr>".format(
+                    fp, _escape(entry['pattern']), entry['size'],
+                    _escape(u", ".join(entry['type_names'])),
+                    len(entry['locations']), _escape(entry['first'])))
+        rows.append(u"</table>")
+        return u"\n".join(rows)
+
+
+def _object_details(obj):
+    """
+    Return the details of an object for the report.
+    """
+    text = GarbageTracker.format_obj(obj)
+    if len(text) > REPR_MAX:
+        text = text[:REPR_MAX - 3] + u"..."
+    return dict(type=type2name(type(obj)), addr=u"0x{:x}".format(id(obj)),
+                size=_getsizeof(obj), text=text)
+
+
+def _graph(index):
+    """
+    Return the graph of the references between the objects of a reference
+    index, as a dict with items nodes (list of type names) and edges (list of
+    [referrer node, referent node, label]).
+    """
+    objects = index.objects[:GRAPH_MAX_NODES]
+    node_of = dict((id(obj), i) for i, obj in enumerate(objects))
+    edges = []
+    for i, obj in enumerate(objects):
+        for ref in index.referents(obj):
+            j = node_of.get(id(ref))
+            if j is not None:
+                edges.append([i, j, _reference_label(obj, ref)])
+    return dict(nodes=[type2name(type(obj)) for obj in objects], edges=edges,
+                truncated=len(index.objects) > len(objects))
+
+
+def _compress(data):
+    """
+    Return data as compressed JSON, encoded as a base64 string.
+    """
+    text = json.dumps(data, separators=(',', ':'), default=str)
+    compressed = zlib.compress(text.encode('utf-8'), 9)
+    return base64.b64encode(compressed).decode('ascii')
+
+
+def _escape(value):
+    """
+    Return a value as a string escaped for HTML.
+    """
+    text = u"{}".format(value)
+    return text.replace(u"&", u"&amp;").replace(u"<", u"&lt;"). \
+        replace(u">", u"&gt;").replace(u"'", u"&#39;"). \
+        replace(u'"', u"&quot;")
+
+
+HTML_TEMPLATE = u"""<!DOCTYPE html>
+<html>
+<head>
+<meta charset="utf-8">
+<title>@TITLE@</title>
+<style>
+body { font-family: sans-serif; margin: 2em; color: #222; }
+table { border-collapse: collapse; margin-bottom: 1em; }
+th, td { border: 1px solid #ccc; padding: 0.2em 0.5em; text-align: left;
+         vertical-align: top; }
+th { background: #f0f0f0; }
+td.loc { font-family: monospace; }
+pre { background: #f8f8f8; padding: 0.5em; overflow-x: auto; }
+.details td { background: #fcfcfc; }
+svg text { font-size: 10px; font-family: monospace; }
+</style>
+</head>
+<body>
+@BODY@
+<script type="application/json" id="yagot-data">@DATA@</script>
+<script>
+"use strict";
+var details = JSON.parse(document.getElementById("yagot-data").textContent);
+
+function inflate(b64) {
+  var bytes = Uint8Array.from(atob(b64), function (c) {
+    return c.charCodeAt(0);
+  });
+  var stream = new Blob([bytes]).stream().pipeThrough(
+    new DecompressionStream("deflate"));
+  return new Response(stream).text().then(JSON.parse);
+}
+
+function element(tag, text) {
+  var elem = document.createElement(tag);
+  if (text !== undefined) {
+    elem.textContent = text;
+  }
+  return elem;
+}
+
+function renderGraph(graph) {
+  var ns = "http://www.w3.org/2000/svg";
+  var n = graph.nodes.length;
+  var radius = Math.max(60, n * 12);
+  var size = 2 * radius + 160;
+  var svg = document.createElementNS(ns, "svg");
+  svg.setAttribute("width", size);
+  svg.setAttribute("height", size);
+  var marker = document.createElementNS(ns, "marker");
+  marker.setAttribute("id", "arrow");
+  marker.setAttribute("viewBox", "0 0 10 10");
+  marker.setAttribute("refX", "18");
+  marker.setAttribute("refY", "5");
+  marker.setAttribute("markerWidth", "6");
+  marker.setAttribute("markerHeight", "6");
+  marker.setAttribute("orient", "auto");
+  var tip = document.createElementNS(ns, "path");
+  tip.setAttribute("d", "M0,0 L10,5 L0,10 z");
+  marker.appendChild(tip);
+  var defs = document.createElementNS(ns, "defs");
+  defs.appendChild(marker);
+  svg.appendChild(defs);
+  var pos = graph.nodes.map(function (_, i) {
+    var angle = 2 * Math.PI * i / Math.max(n, 1);
+    return [size / 2 + radius * Math.cos(angle),
+            size / 2 + radius * Math.sin(angle)];
+  });
+  graph.edges.forEach(function (edge) {
+    var a = pos[edge[0]], b = pos[edge[1]];
+    var line = document.createElementNS(ns, "path");
+    if (edge[0] === edge[1]) {
+      line.setAttribute("d", "M" + a[0] + "," + (a[1] - 8) + " a12,12 0 1,1 "
+                        + "8,8");
+    } else {
+      line.setAttribute("d", "M" + a[0] + "," + a[1] + " L" + b[0] + ","
+                        + b[1]);
+    }
+    line.setAttribute("stroke", "#888");
+    line.setAttribute("fill", "none");
+    line.setAttribute("marker-end", "url(#arrow)");
+    var title = document.createElementNS(ns, "title");
+    title.textContent = graph.nodes[edge[0]] + edge[2] + " -> "
+      + graph.nodes[edge[1]];
+    line.appendChild(title);
+    svg.appendChild(line);
+  });
+  graph.nodes.forEach(function (type, i) {
+    var circle = document.createElementNS(ns, "circle");
+    circle.setAttribute("cx", pos[i][0]);
+    circle.setAttribute("cy", pos[i][1]);
+    circle.setAttribute("r", "8");
+    circle.setAttribute("fill", "#6a9fd8");
+    svg.appendChild(circle);
+    var label = document.createElementNS(ns, "text");
+    label.setAttribute("x", pos[i][0] + 10);
+    label.setAttribute("y", pos[i][1] - 10);
+    label.textContent = i + ": " + type;
+    svg.appendChild(label);
+  });
+  return svg;
+}
+
+function renderDetails(data) {
+  var container = element("div");
+  container.appendChild(element("pre", data.message));
+  data.objects.forEach(function (obj) {
+    container.appendChild(element("pre", obj.size + " Bytes, " + obj.text));
+  });
+  var heading = "Reference graph";
+  if (data.graph.truncated) {
+    heading += " (truncated)";
+  }
+  container.appendChild(element("h3", heading));
+  container.appendChild(renderGraph(data.graph));
+  return container;
+}
+
+document.addEventListener("click", function (event) {
+  var button = event.target;
+  if (!button.hasAttribute || !button.hasAttribute("data-detail")) {
+    return;
+  }
+  var row = button.closest("tr");
+  var next = row.nextElementSibling;
+  if (next && next.classList.contains("details")) {
+    next.remove();
+    return;
+  }
+  var detailRow = element("tr");
+  detailRow.className = "details";
+  var cell = element("td", "Loading...");
+  cell.colSpan = row.children.length;
+  detailRow.appendChild(cell);
+  row.parentNode.insertBefore(detailRow, row.nextSibling);
+  inflate(details[button.getAttribute("data-detail")]).then(function (data) {
+    cell.textContent = "";
+    cell.appendChild(renderDetails(data));
+  }, function (error) {
+    cell.textContent = "Cannot render the details: " + error;
+  });
+});
+</script>
+</body>
+</html>
+"""
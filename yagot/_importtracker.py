@@ -0,0 +1,361 @@
+"""
+ImportTracker class.
+"""
+
+from __future__ import absolute_import, print_function
+
+import sys
+import gc
+import threading
+from timeit import default_timer
+try:
+    from importlib.abc import MetaPathFinder
+except ImportError:
+    # Python 2
+    MetaPathFinder = object
+
+__all__ = ['ImportTracker', 'ImportCost']
+
+# Attributes of ImportCost objects that can be used for sorting
+SORT_KEYS = ('garbage', 'objects', 'gc_time', 'time')
+
+
+class ImportCost(object):
+    # pylint: disable=too-few-public-methods
+    """
+    The cost attributed to the import of a single module, as measured by
+    :class:`~yagot.ImportTracker`.
+
+    The cost excludes the cost of the imports of other modules that were
+    triggered by the import of the module (e.g. by import statements in the
+    module), because that cost is attributed to these other modules.
+    """
+
+    def __init__(self, name, parent):
+        #: :term:`string`: Name of the module.
+        self.name = name
+        #: :term:`string`: Name of the module whose import triggered the
+        #: import of this module, or `None` if it was imported at the top
+        #: level.
+        self.parent = parent
+        #: int: Number of :term:`collected objects` and
+        #: :term:`uncollectable objects` caused by the import.
+        self.garbage = 0
+        #: int: Growth in the number of live objects tracked by the garbage
+        #: collector caused by the import.
+        self.objects = 0
+        #: float: Time in seconds spent in automatic garbage collections
+        #: during the import.
+        self.gc_time = 0.0
+        #: float: Time in seconds for executing the module, excluding the
+        #: overhead of the measurement.
+        self.time = 0.0
+        #: float: Like :attr:`time`, but including the imports of other
+        #: modules that were triggered by the import of this module.
+        self.cumulative_time = 0.0
+
+    def __repr__(self):
+        return "ImportCost(name={s.name!r}, garbage={s.garbage}, " \
+            "objects={s.objects}, gc_time={s.gc_time:.6f}, " \
+            "time={s.time:.6f})".format(s=self)
+
+
+class _Measurement(object):
+    # pylint: disable=too-few-public-methods
+    """
+    The measurement for an import that is in progress.
+    """
+
+    def __init__(self, cost):
+        self.cost = cost
+        self.garbage = 0
+        self.objects = 0
+        self.gc_time = 0.0
+        self.overhead = 0.0
+        self.start = 0.0
+        # Totals of the imports triggered by this import
+        self.child_garbage = 0
+        self.child_objects = 0
+        self.child_gc_time = 0.0
+        self.child_time = 0.0
+
+
+class ImportTracker(object):
+    """
+    The ImportTracker class provides a meta path import hook that measures
+    the cost of each module import: the number of :term:`collected objects`
+    and :term:`uncollectable objects`, the growth in live objects, and the
+    time spent in automatic garbage collections.
+
+    Each module import is measured in its own tracking period, by running a
+    full garbage collection and counting the objects tracked by the garbage
+    collector before and after executing the module. This makes imports
+    considerably slower while the hook is installed, so it should be used
+    only for analyzing imports, for example at program startup::
+
+        tracker = yagot.ImportTracker()
+        with tracker:
+            import mypackage
+        print(tracker.report())
+
+    Only modules whose loader supports ``exec_module()`` are measured, which
+    covers all modules on Python 3.4 and higher. The import hook is not
+    supported on Python 2.
+
+    Garbage collection is a process-wide activity, so imports in multiple
+    threads at the same time are not attributed precisely.
+    """
+
+    def __init__(self):
+        if MetaPathFinder is object:
+            raise NotImplementedError(
+                "ImportTracker is not supported on Python {}.{}".
+                format(*sys.version_info[0:2]))
+        self._hook = _ImportHook(self)
+        self._costs = []
+        self._local = threading.local()
+        self._gc_time = 0.0
+        self._gc_start = None
+        self._garbage = 0
+        self._forced = False
+        self._overhead = 0.0
+        self._installed = False
+
+    def __enter__(self):
+        self.install()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.uninstall()
+
+    @property
+    def installed(self):
+        """
+        bool: Boolean indicating whether the import hook is installed.
+        """
+        return self._installed
+
+    @property
+    def costs(self):
+        """
+        list: The costs of the module imports measured so far, as
+        :class:`~yagot.ImportCost` objects in the order in which the imports
+        completed.
+        """
+        return self._costs
+
+    def install(self):
+        """
+        Install the import hook at the beginning of :data:`py:sys.meta_path`,
+        so that subsequent module imports are measured.
+        """
+        if not self._installed:
+            sys.meta_path.insert(0, self._hook)
+            gc.callbacks.append(self._gc_callback)
+            self._installed = True
+
+    def uninstall(self):
+        """
+        Remove the import hook, so that subsequent module imports are no
+        longer measured.
+        """
+        if self._installed:
+            sys.meta_path.remove(self._hook)
+            gc.callbacks.remove(self._gc_callback)
+            self._installed = False
+
+    def sorted_costs(self, sort_by='garbage'):
+        """
+        Return the costs of the module imports, sorted by decreasing cost.
+
+        Parameters:
+
+            sort_by (:term:`string`): Attribute of :class:`~yagot.ImportCost`
+              to sort by: 'garbage', 'objects', 'gc_time' or 'time'.
+
+        Returns:
+
+            list: The sorted :class:`~yagot.ImportCost` objects.
+        """
+        if sort_by not in SORT_KEYS:
+            raise ValueError("Invalid sort_by value: {!r}".format(sort_by))
+        return sorted(self._costs, key=lambda c: getattr(c, sort_by),
+                      reverse=True)
+
+    def report(self, sort_by='garbage', max=20):
+        # pylint: disable=redefined-builtin
+        """
+        Return a formatted multi-line string with a table of the costs of the
+        module imports, sorted by decreasing cost.
+
+        Parameters:
+
+            sort_by (:term:`string`): Attribute of :class:`~yagot.ImportCost`
+              to sort by: 'garbage', 'objects', 'gc_time' or 'time'.
+
+            max (int): Maximum number of modules to be included, or `None`.
+
+        Returns:
+
+            :term:`unicode string`: Formatted multi-line string.
+        """
+        costs = self.sorted_costs(sort_by)
+        lines = [u"{:>9}  {:>9}  {:>10}  {:>10}  {}".format(
+            "Garbage", "Objects", "GC time", "Time", "Module")]
+        for cost in costs[:max]:
+            lines.append(u"{:>9}  {:>9}  {:>9.3f}s  {:>9.3f}s  {}".format(
+                cost.garbage, cost.objects, cost.gc_time, cost.time,
+                cost.name))
+        if max is not None and len(costs) > max:
+            lines.append(u"... ({} more modules)".format(len(costs) - max))
+        return u"\n".join(lines)
+
+    def _gc_callback(self, phase, info):
+        """
+        Callback function for gc.callbacks, that accumulates the number of
+        objects found unreachable by all garbage collections, and the time
+        spent in automatic garbage collections.
+        """
+        if phase == 'start':
+            self._gc_start = None if self._forced else default_timer()
+        else:
+            self._garbage += info['collected'] + info['uncollectable']
+            if self._gc_start is not None:
+                self._gc_time += default_timer() - self._gc_start
+                self._gc_start = None
+
+    def _collect(self):
+        """
+        Run a full garbage collection that is not counted as automatic
+        collection.
+        """
+        self._forced = True
+        try:
+            gc.collect()
+        finally:
+            self._forced = False
+
+    def _begin(self, name):
+        """
+        Begin the measurement for the import of a module.
+        """
+        overhead_start = default_timer()
+        stack = getattr(self._local, 'stack', None)
+        if stack is None:
+            stack = self._local.stack = []
+        parent = stack[-1] if stack else None
+        # Garbage created by the parent so far is attributed to the parent
+        self._collect()
+        m = _Measurement(ImportCost(name, parent.cost.name if parent else None))
+        m.garbage = self._garbage
+        m.objects = len(gc.get_objects())
+        m.gc_time = self._gc_time
+        stack.append(m)
+        now = default_timer()
+        self._overhead += now - overhead_start
+        m.overhead = self._overhead
+        m.start = now
+        return m
+
+    def _end(self, m):
+        """
+        End the measurement for the import of a module.
+        """
+        end = default_timer()
+        total_time = end - m.start - (self._overhead - m.overhead)
+        self._collect()
+        total_garbage = self._garbage - m.garbage
+        total_objects = len(gc.get_objects()) - m.objects
+        total_gc_time = self._gc_time - m.gc_time
+        stack = self._local.stack
+        stack.pop()
+        cost = m.cost
+        cost.garbage = total_garbage - m.child_garbage
+        cost.objects = total_objects - m.child_objects
+        cost.gc_time = total_gc_time - m.child_gc_time
+        cost.time = total_time - m.child_time
+        cost.cumulative_time = total_time
+        if stack:
+            parent = stack[-1]
+            parent.child_garbage += total_garbage
+            parent.child_objects += total_objects
+            parent.child_gc_time += total_gc_time
+            parent.child_time += total_time
+        self._costs.append(cost)
+        self._overhead += default_timer() - end
+
+
+class _ImportHook(MetaPathFinder):
+    """
+    Meta path finder that finds module specs via the other meta path finders
+    and wraps their loaders, so that module execution is measured.
+    """
+
+    def __init__(self, tracker):
+        self._tracker = tracker
+
+    def find_spec(self, fullname, path, target=None):
+        """
+        Find the module spec using the other meta path finders.
+        """
+        for finder in sys.meta_path:
+            if finder is self:
+                continue
+            find_spec = getattr(finder, 'find_spec', None)
+            if find_spec is None:
+                continue
+            spec = find_spec(fullname, path, target)
+            if spec is not None:
+                break
+        else:
+            return None
+        if spec.loader is not None and \
+                hasattr(spec.loader, 'exec_module') and \
+                not isinstance(spec.loader, _TrackingLoader):
+            spec.loader = _TrackingLoader(spec.loader, self._tracker)
+        return spec
+
+    def invalidate_caches(self):
+        """
+        Nothing to invalidate, the other meta path finders are called
+        directly by the import system.
+        """
+        pass
+
+
+class _TrackingLoader(object):
+    """
+    Loader that wraps another loader and measures module execution.
+    """
+
+    def __init__(self, loader, tracker):
+        self._loader = loader
+        self._tracker = tracker
+
+    def __getattr__(self, name):
+        return getattr(self._loader, name)
+
+    def create_module(self, spec):
+        """
+        Delegate module creation to the wrapped loader.
+        """
+        create_module = getattr(self._loader, 'create_module', None)
+        if create_module is None:
+            return None
+        return create_module(spec)
+
+    def exec_module(self, module):
+        """
+        Execute the module with the wrapped loader, and measure it.
+        """
+        # Let the module see its original loader.
+        module.__loader__ = self._loader
+        spec = getattr(module, '__spec__', None)
+        if spec is not None:
+            spec.loader = self._loader
+        # pylint: disable=protected-access
+        m = self._tracker._begin(module.__name__)
+        try:
+            self._loader.exec_module(module)
+        finally:
+            self._tracker._end(m)
@@ -0,0 +1,388 @@
+"""
+Middleware for sampled garbage tracking of the requests of web applications.
+"""
+
+from __future__ import absolute_import, print_function
+
+import random
+import threading
+from ._garbagetracker import GarbageTracker
+
+__all__ = ['RouteStats', 'GarbageSampler', 'GarbageMiddleware']
+
+# Attributes of RouteStats objects that can be used for sorting
+SORT_KEYS = ('num_objects', 'num_bytes', 'garbage_requests', 'requests',
+             'collect_time')
+
+# Route under which the requests of routes beyond the maximum number of
+# routes are aggregated
+OTHER_ROUTE = u"(other routes)"
+
+
+class RouteStats(object):
+    # pylint: disable=too-few-public-methods
+    """
+    Aggregated garbage statistics of the sampled requests for one route of a
+    web application.
+    """
+
+    def __init__(self, route):
+        #: :term:`string`: The route.
+        self.route = route
+        #: int: Number of sampled requests.
+        self.requests = 0
+        #: int: Number of sampled requests that caused
+        #: :term:`collected objects` or :term:`uncollectable objects`.
+        self.garbage_requests = 0
+        #: int: Total number of :term:`collected objects` and
+        #: :term:`uncollectable objects` caused by the sampled requests.
+        self.num_objects = 0
+        #: int: Total size in Bytes of these objects.
+        self.num_bytes = 0
+        #: float: Total time in seconds of the garbage collections at the end
+        #: of the sampled requests.
+        self.collect_time = 0.0
+        #: dict: Total number of these objects by type name.
+        self.types = {}
+        #: dict: Number of sampled requests by fingerprint of the reference
+        #: cycles they caused (see :attr:`~yagot.GarbageCycle.fingerprint`).
+        self.fingerprints = {}
+
+    def __repr__(self):
+        return "RouteStats(route={s.route!r}, requests={s.requests}, " \
+            "garbage_requests={s.garbage_requests}, " \
+            "num_objects={s.num_objects}, num_bytes={s.num_bytes})". \
+            format(s=self)
+
+    def add(self, summary):
+        """
+        Add the summary of the tracking period of a sampled request.
+
+        Parameters:
+
+            summary (dict): Summary of the tracking period, as returned by
+              :meth:`~yagot.GarbageTracker.summary`.
+        """
+        self.requests += 1
+        if summary['num_objects']:
+            self.garbage_requests += 1
+        self.num_objects += summary['num_objects']
+        self.num_bytes += summary['num_bytes']
+        self.collect_time += summary['collect_time']
+        for type_name, num in summary['types'].items():
+            self.types[type_name] = self.types.get(type_name, 0) + num
+        for fp in set(summary['fingerprints']):
+            self.fingerprints[fp] = self.fingerprints.get(fp, 0) + 1
+
+
+class GarbageSampler(object):
+    """
+    Base class for middleware that tracks the :term:`collected objects` and
+    :term:`uncollectable objects` caused by a sampled fraction of the requests
+    of a web application, and aggregates them per route.
+
+    At most one request is tracked at a time; requests arriving while a
+    sampled request is in progress are not sampled. Garbage collection is a
+    process-wide activity, so garbage caused by requests that run concurrently
+    with a sampled request (in other threads, or in other tasks of the same
+    event loop) is attributed to the sampled request.
+
+    The middleware uses its own :class:`~yagot.GarbageTracker` object, so it
+    can be used in the same process as the :func:`~yagot.garbage_checked`
+    decorator or the pytest plugin (e.g. in the tests of a web application).
+
+    The statistics are kept for at most `max_routes` routes, so that routes
+    with IDs in the path do not make them grow without limit in a
+    long-running server. The requests of any further routes are aggregated
+    under the route "(other routes)".
+    """
+
+    def __init__(self, sample_rate=0.01, route=None, leaks_only=False,
+                 ignore_types=None, filter_types=None, filter_reachable=False,
+                 generation=0, on_summary=None, max_routes=1000):
+        """
+        Parameters:
+
+            sample_rate (float): Fraction of the requests to be tracked,
+              between 0.0 (none) and 1.0 (all).
+
+            route (callable): `None` or function that is called with the
+              request (WSGI environ or ASGI scope) after the request has been
+              handled and returns the route of the request as a string. This
+              allows using the route templates of web frameworks that store
+              them in the request. `None` means to use the HTTP method and
+              path of the request, where paths with IDs result in separate
+              routes.
+
+            leaks_only (bool): Boolean to limit the tracking to only
+              :term:`uncollectable objects`.
+
+            ignore_types (:term:`py:iterable`): `None` or iterable of type
+              rules for objects whose presence causes a sampled request to be
+              ignored, see :meth:`~yagot.GarbageTracker.ignore_types`.
+
+            filter_types (:term:`py:iterable`): `None` or iterable of type
+              rules for objects that are removed individually, see
+              :meth:`~yagot.GarbageTracker.filter_types`.
+
+            filter_reachable (bool): Boolean controlling whether objects that
+              are reachable only from objects removed by `filter_types` are
+              removed as well.
+
+            generation (int): The oldest generation that is collected at the
+              begin and end of a sampled request, see
+              :meth:`~yagot.GarbageTracker.enable`. The default of collecting
+              only the youngest generation keeps the collections short on
+              large heaps.
+
+            on_summary (callable): `None` or function that is called with the
+              route and the summary (see
+              :meth:`~yagot.GarbageTracker.summary`) of each sampled request,
+              e.g. for logging.
+
+            max_routes (int): Maximum number of routes with separate
+              statistics. The requests of further routes are aggregated under
+              the route "(other routes)".
+
+        Raises:
+
+            ValueError: Invalid sample rate, generation or maximum number of
+              routes.
+        """
+        if not 0.0 <= sample_rate <= 1.0:
+            raise ValueError(
+                "Invalid sample rate: {!r}".format(sample_rate))
+        if max_routes < 1:
+            raise ValueError(
+                "Invalid maximum number of routes: {!r}".format(max_routes))
+        self._sample_rate = sample_rate
+        self._route = route
+        self._ignore_types = ignore_types
+        self._filter_types = filter_types
+        self._filter_reachable = filter_reachable
+        self._on_summary = on_summary
+        self._max_routes = max_routes
+        self._tracker = GarbageTracker()
+        self._tracker.enable(leaks_only=leaks_only, generation=generation)
+        self._random = random.Random()
+        self._sample_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._stats = {}
+
+    @property
+    def sample_rate(self):
+        """
+        float: Fraction of the requests to be tracked.
+        """
+        return self._sample_rate
+
+    @property
+    def stats(self):
+        """
+        dict: The aggregated statistics of the sampled requests, with key:
+        route, value: :class:`~yagot.RouteStats` object.
+
+        The returned dictionary is a copy, but the :class:`~yagot.RouteStats`
+        objects continue to be updated.
+        """
+        with self._stats_lock:
+            return dict(self._stats)
+
+    def reset(self):
+        """
+        Remove the aggregated statistics of the sampled requests.
+        """
+        with self._stats_lock:
+            self._stats = {}
+
+    def report(self, sort_by='num_objects', max=20):
+        # pylint: disable=redefined-builtin
+        """
+        Return a formatted multi-line string with a table of the aggregated
+        statistics per route, sorted by decreasing value.
+
+        Parameters:
+
+            sort_by (:term:`string`): Attribute of :class:`~yagot.RouteStats`
+              to sort by: 'num_objects', 'num_bytes', 'garbage_requests',
+              'requests' or 'collect_time'.
+
+            max (int): Maximum number of routes to be included, or `None`.
+
+        Returns:
+
+            :term:`unicode string`: Formatted multi-line string.
+
+        Raises:
+
+            ValueError: Invalid sort_by value.
+        """
+        if sort_by not in SORT_KEYS:
+            raise ValueError("Invalid sort_by value: {!r}".format(sort_by))
+        stats = sorted(self.stats.values(),
+                       key=lambda s: (-getattr(s, sort_by), s.route))
+        lines = [u"{:>8}  {:>8}  {:>9}  {:>11}  {:>10}  {}".format(
+            "Requests", "Garbage", "Objects", "Bytes", "GC time", "Route")]
+        for s in stats[:max]:
+            lines.append(u"{:>8}  {:>8}  {:>9}  {:>11}  {:>9.3f}s  {}".format(
+                s.requests, s.garbage_requests, s.num_objects, s.num_bytes,
+                s.collect_time, s.route))
+        if max is not None and len(stats) > max:
+            lines.append(u"... ({} more routes)".format(len(stats) - max))
+        return u"\n".join(lines)
+
+    def _begin(self):
+        """
+        Decide whether the current request is sampled, and if so, start its
+        tracking period.
+
+        Returns:
+
+            bool: Boolean indicating whether the request is sampled. If so,
+            :meth:`_end` must be called at the end of the request.
+        """
+        if self._sample_rate <= 0.0 or \
+                self._random.random() >= self._sample_rate:
+            return False
+        if not self._sample_lock.acquire(False):
+            return False
+        try:
+            self._tracker.start()
+            self._tracker.ignore_types(type_list=self._ignore_types)
+            self._tracker.filter_types(type_list=self._filter_types,
+                                       reachable=self._filter_reachable)
+        except BaseException:
+            self._sample_lock.release()
+            raise
+        return True
+
+    def _end(self, request, failed=False):
+        """
+        Stop the tracking period of a sampled request and add its summary to
+        the statistics of its route.
+
+        Parameters:
+
+            request: The request (WSGI environ or ASGI scope).
+
+            failed (bool): Boolean indicating that the application raised an
+              exception, in which case the tracking period is ignored.
+        """
+        try:
+            if failed:
+                self._tracker.ignore()
+            self._tracker.stop()
+            summary = self._tracker.summary()
+            self._tracker.release()
+            if failed:
+                return
+            route = self._route(request) if self._route \
+                else self._default_route(request)
+        finally:
+            self._sample_lock.release()
+        with self._stats_lock:
+            if route not in self._stats and \
+                    len(self._stats) >= self._max_routes:
+                route = OTHER_ROUTE
+            stats = self._stats.get(route)
+            if stats is None:
+                stats = self._stats[route] = RouteStats(route)
+            stats.add(summary)
+        if self._on_summary:
+            self._on_summary(route, summary)
+
+    @staticmethod
+    def _default_route(request):
+        """
+        Return the HTTP method and path of a request (WSGI environ or ASGI
+        scope), as the route for when no route function was specified.
+        """
+        method = request.get('REQUEST_METHOD') or request.get('method') or \
+            'GET'
+        path = request.get('PATH_INFO') or request.get('path') or '/'
+        return u"{} {}".format(method, path)
+
+
+class GarbageMiddleware(GarbageSampler):
+    """
+    WSGI middleware that tracks the :term:`collected objects` and
+    :term:`uncollectable objects` caused by a sampled fraction of the requests
+    of a WSGI application, and aggregates them per route::
+
+        app = yagot.GarbageMiddleware(app, sample_rate=0.05)
+        ...
+        print(app.report())
+
+    The tracking period of a sampled request ends when the WSGI server closes
+    the response iterable, i.e. after the response has been sent, so that
+    the garbage collection at the end of the tracking period does not delay
+    the response. The objects created while iterating the response are
+    included.
+
+    See :class:`~yagot.GarbageSampler` for the parameters and the
+    limitations.
+    """
+
+    def __init__(self, app, **kwargs):
+        """
+        Parameters:
+
+            app (callable): The WSGI application.
+
+            **kwargs: Parameters for :class:`~yagot.GarbageSampler`.
+        """
+        super(GarbageMiddleware, self).__init__(**kwargs)
+        self._app = app
+
+    def __call__(self, environ, start_response):
+        if not self._begin():
+            return self._app(environ, start_response)
+        try:
+            result = self._app(environ, start_response)
+        except BaseException:
+            self._end(environ, failed=True)
+            raise
+        return _ClosingIterable(result, self, environ)
+
+
+class _ClosingIterable(object):
+    """
+    Response iterable of a sampled WSGI request that ends the tracking period
+    when it is closed.
+    """
+
+    def __init__(self, result, middleware, environ):
+        self._result = result
+        self._middleware = middleware
+        self._environ = environ
+        self._failed = False
+        self._closed = False
+
+    def __iter__(self):
+        try:
+            for data in self._result:
+                yield data
+        except BaseException:
+            self._failed = True
+            raise
+
+    def close(self):
+        """
+        Close the wrapped response iterable and end the tracking period.
+        """
+        if self._closed:
+            return
+        self._closed = True
+        # pylint: disable=protected-access
+        try:
+            close = getattr(self._result, 'close', None)
+            if close is not None:
+                close()
+        except BaseException:
+            self._failed = True
+            raise
+        finally:
+            self._result = None
+            environ = self._environ
+            self._environ = None
+            self._middleware._end(environ, failed=self._failed)
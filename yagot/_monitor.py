@@ -0,0 +1,328 @@
+"""
+Monitor class.
+"""
+
+from __future__ import absolute_import, print_function
+
+import os
+import sys
+import gc
+import threading
+from timeit import default_timer
+from six.moves import BaseHTTPServer
+
+__all__ = ['Monitor']
+
+# Upper bounds in seconds of the buckets of the GC pause time histogram
+PAUSE_BUCKETS = (0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0)
+
+# Number of garbage collector generations
+NUM_GENERATIONS = 3
+
+# Content type of the Prometheus text exposition format
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+class Monitor(object):
+    """
+    The Monitor class provides a background thread that exports metrics of
+    the garbage collector in the Prometheus text exposition format, for
+    watching the garbage collection pressure of long-running programs.
+
+    The exported metrics (with a configurable name prefix) are:
+
+    * ``<prefix>_collections_total``, ``<prefix>_collected_objects_total``
+      and ``<prefix>_uncollectable_objects_total``: Counters per generation,
+      from :func:`py:gc.get_stats`.
+    * ``<prefix>_tracked_objects`` and ``<prefix>_threshold``: Gauges per
+      generation, from :func:`py:gc.get_count` and
+      :func:`py:gc.get_threshold`.
+    * ``<prefix>_garbage_objects``: Gauge with the length of
+      :data:`py:gc.garbage`.
+    * ``<prefix>_pause_seconds``: Histogram per generation of the durations
+      of the garbage collections, measured via :data:`py:gc.callbacks`.
+    * ``<prefix>_pause_max_seconds``: Gauge per generation with the longest
+      duration of a garbage collection since the monitor was started.
+
+    The metrics can be written periodically to a file (e.g. for the textfile
+    collector of the Prometheus node exporter), or served on a local HTTP
+    endpoint for scraping, or both::
+
+        monitor = yagot.Monitor(port=9101)
+        monitor.start()
+
+    The overhead while the monitor is running consists of a callback
+    invocation at the begin and end of each garbage collection that updates a
+    few counters, and of producing the metrics once per interval or scrape.
+
+    The monitor is not supported on Python 2.
+    """
+
+    def __init__(self, interval=15.0, path=None, port=None, host='127.0.0.1',
+                 prefix='yagot_gc'):
+        """
+        Parameters:
+
+            interval (float): Interval in seconds for writing the metrics to
+              the file.
+
+            path (:term:`string`): `None` or path name of the file the
+              metrics are written to. The file is replaced atomically, so that
+              readers never see a partially written file.
+
+            port (int): `None` or TCP port of the HTTP endpoint that serves
+              the metrics. 0 means to use a free port, see
+              :attr:`~yagot.Monitor.port`.
+
+            host (:term:`string`): Host name or IP address the HTTP endpoint
+              listens on.
+
+            prefix (:term:`string`): Prefix for the names of the metrics.
+        """
+        if not hasattr(gc, 'callbacks') or not hasattr(gc, 'get_stats'):
+            raise NotImplementedError(
+                "Monitor is not supported on Python {}.{}".
+                format(*sys.version_info[0:2]))
+        self._interval = interval
+        self._path = path
+        self._port = port
+        self._host = host
+        self._prefix = prefix
+        self._pause_start = None
+        # Per generation: Histogram bucket counts, sum, count, max of pauses
+        self._pause_buckets = [[0] * len(PAUSE_BUCKETS)
+                               for _ in range(NUM_GENERATIONS)]
+        self._pause_sum = [0.0] * NUM_GENERATIONS
+        self._pause_count = [0] * NUM_GENERATIONS
+        self._pause_max = [0.0] * NUM_GENERATIONS
+        self._stopped = threading.Event()
+        self._thread = None
+        self._server = None
+        self._server_thread = None
+        self._running = False
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
+    @property
+    def running(self):
+        """
+        bool: Boolean indicating whether the monitor is running.
+        """
+        return self._running
+
+    @property
+    def path(self):
+        """
+        :term:`string`: Path name of the file the metrics are written to, or
+        `None`.
+        """
+        return self._path
+
+    @property
+    def port(self):
+        """
+        int: TCP port of the HTTP endpoint, or `None`. While the monitor is
+        running, this is the actual port, also if 0 was specified.
+        """
+        if self._server is not None:
+            return self._server.server_address[1]
+        return self._port
+
+    def start(self):
+        """
+        Start monitoring the garbage collector, and start the thread that
+        writes the metrics file and the HTTP endpoint, as configured.
+        """
+        if self._running:
+            return
+        gc.callbacks.append(self._gc_callback)
+        self._running = True
+        self._stopped.clear()
+        if self._port is not None:
+            self._server = BaseHTTPServer.HTTPServer(
+                (self._host, self._port), _make_handler(self))
+            self._server_thread = threading.Thread(
+                target=self._server.serve_forever, name='yagot-monitor-http')
+            self._server_thread.daemon = True
+            self._server_thread.start()
+        if self._path is not None:
+            self.write()
+            self._thread = threading.Thread(
+                target=self._run, name='yagot-monitor')
+            self._thread.daemon = True
+            self._thread.start()
+
+    def stop(self):
+        """
+        Stop monitoring the garbage collector, and stop the thread and the
+        HTTP endpoint. If a metrics file is configured, it is written a last
+        time.
+        """
+        if not self._running:
+            return
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server_thread.join()
+            self._server = None
+            self._server_thread = None
+        if self._path is not None:
+            self.write()
+        gc.callbacks.remove(self._gc_callback)
+        self._running = False
+
+    def write(self):
+        """
+        Write the current metrics to the metrics file, replacing it
+        atomically.
+        """
+        tmp_path = "{}.{}.tmp".format(self._path, os.getpid())
+        with open(tmp_path, 'w') as fp:
+            fp.write(self.render())
+        if hasattr(os, 'replace'):
+            os.replace(tmp_path, self._path)
+        else:
+            os.rename(tmp_path, self._path)
+
+    def render(self):
+        """
+        Return the current metrics in the Prometheus text exposition format.
+
+        Returns:
+
+            :term:`unicode string`: The metrics, as multiple lines.
+        """
+        prefix = self._prefix
+        lines = []
+
+        def metric(name, mtype, help_text, samples):
+            "Add the lines for a metric with its samples"
+            lines.append(u"# HELP {}_{} {}".format(prefix, name, help_text))
+            lines.append(u"# TYPE {}_{} {}".format(prefix, name, mtype))
+            for suffix, labels, value in samples:
+                label_str = u",".join(u'{}="{}"'.format(k, v)
+                                      for k, v in labels)
+                lines.append(u"{}_{}{}{} {}".format(
+                    prefix, name, suffix,
+                    u"{" + label_str + u"}" if label_str else u"",
+                    _format_value(value)))
+
+        stats = gc.get_stats()
+        counts = gc.get_count()
+        thresholds = gc.get_threshold()
+        gens = range(NUM_GENERATIONS)
+        metric('collections_total', 'counter',
+               "Number of garbage collections of the generation.",
+               [('', [('generation', g)], stats[g]['collections'])
+                for g in gens])
+        metric('collected_objects_total', 'counter',
+               "Number of objects collected in the generation.",
+               [('', [('generation', g)], stats[g]['collected'])
+                for g in gens])
+        metric('uncollectable_objects_total', 'counter',
+               "Number of uncollectable objects found in the generation.",
+               [('', [('generation', g)], stats[g]['uncollectable'])
+                for g in gens])
+        metric('tracked_objects', 'gauge',
+               "Current collection count of the generation "
+               "(see gc.get_count()).",
+               [('', [('generation', g)], counts[g]) for g in gens])
+        metric('threshold', 'gauge',
+               "Collection threshold of the generation.",
+               [('', [('generation', g)], thresholds[g]) for g in gens])
+        metric('garbage_objects', 'gauge',
+               "Number of objects in gc.garbage.",
+               [('', [], len(gc.garbage))])
+        samples = []
+        for g in gens:
+            # Copy the values first, since collections may run concurrently
+            buckets = list(self._pause_buckets[g])
+            pause_sum = self._pause_sum[g]
+            pause_count = self._pause_count[g]
+            cumulative = 0
+            for bound, num in zip(PAUSE_BUCKETS, buckets):
+                cumulative += num
+                samples.append(('_bucket', [('generation', g),
+                                            ('le', _format_value(bound))],
+                                cumulative))
+            samples.append(('_bucket', [('generation', g), ('le', '+Inf')],
+                            pause_count))
+            samples.append(('_sum', [('generation', g)], pause_sum))
+            samples.append(('_count', [('generation', g)], pause_count))
+        metric('pause_seconds', 'histogram',
+               "Duration of the garbage collections of the generation.",
+               samples)
+        metric('pause_max_seconds', 'gauge',
+               "Longest duration of a garbage collection of the generation.",
+               [('', [('generation', g)], self._pause_max[g]) for g in gens])
+        return u"\n".join(lines) + u"\n"
+
+    def _gc_callback(self, phase, info):
+        """
+        Callback function for gc.callbacks, that measures the pause time of
+        each garbage collection.
+        """
+        if phase == 'start':
+            self._pause_start = default_timer()
+            return
+        if self._pause_start is None:
+            return
+        pause = default_timer() - self._pause_start
+        self._pause_start = None
+        g = info['generation']
+        self._pause_sum[g] += pause
+        self._pause_count[g] += 1
+        if pause > self._pause_max[g]:
+            self._pause_max[g] = pause
+        for i, bound in enumerate(PAUSE_BUCKETS):
+            if pause <= bound:
+                self._pause_buckets[g][i] += 1
+                break
+
+    def _run(self):
+        "Thread function that writes the metrics file at the interval"
+        while not self._stopped.wait(self._interval):
+            self.write()
+
+
+def _format_value(value):
+    """
+    Return a metric value or bucket bound as a string.
+    """
+    if isinstance(value, float):
+        return repr(value)
+    return str(value)
+
+
+def _make_handler(monitor):
+    """
+    Return a request handler class for the HTTP endpoint of a monitor.
+    """
+
+    class MetricsHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+        "Request handler that serves the metrics on GET"
+
+        def do_GET(self):  # pylint: disable=invalid-name
+            "Serve the metrics for any path"
+            body = monitor.render().encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', CONTENT_TYPE)
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            # pylint: disable=redefined-builtin
+            "Suppress logging of requests to stderr"
+            pass
+
+    return MetricsHandler
@@ -0,0 +1,441 @@
+"""
+ReferenceIndex class.
+"""
+
+from __future__ import absolute_import, print_function
+
+import gc
+import types
+from collections import deque
+from ._typematcher import type2name
+
+__all__ = ['ReferenceIndex']
+
+# Attributes that are checked for a reference from an object to another
+# object, for labeling the references of reference paths. Instance attributes
+# and slots are checked in addition.
+REFERENCE_ATTRS = (
+    '__dict__', '__self__', '__func__', '__closure__', 'cell_contents',
+    '__globals__', '__defaults__', '__kwdefaults__', '__wrapped__',
+    '__traceback__', '__context__', '__cause__', 'tb_frame', 'tb_next',
+    'f_back', 'f_locals', 'gi_frame', 'cr_frame', '__class__', '__bases__',
+    '__mro__')
+
+
+class ReferenceIndex(object):
+    """
+    An index of the references between the objects of a fixed set of objects,
+    for example the :term:`collected objects` or :term:`uncollectable objects`
+    of a tracking period.
+
+    The index is built once, with a single call to :func:`py:gc.get_referents`
+    per object, and contains only references between objects of the set.
+    After that, looking up the referrers or referents of an object is
+    O(degree), in contrast to :func:`py:gc.get_referrers` which scans all
+    objects tracked by the garbage collector on each call.
+
+    The index keeps the indexed objects alive, so it should not be kept around
+    longer than needed.
+    """
+
+    def __init__(self, objects):
+        """
+        Parameters:
+
+            objects (:term:`py:iterable`): The objects to be indexed. Multiple
+              occurrences of the same object are indexed only once.
+        """
+        self._objects = []
+        self._by_id = {}
+        for obj in objects:
+            if id(obj) not in self._by_id:
+                self._by_id[id(obj)] = obj
+                self._objects.append(obj)
+
+        # Adjacency lists by object id, in both directions. The lists are
+        # ordered by first occurrence of the references, so that results
+        # are deterministic.
+        self._referents = {}
+        self._referrers = dict((id(obj), []) for obj in self._objects)
+        for obj in self._objects:
+            obj_id = id(obj)
+            referent_ids = []
+            seen = set()
+            for ref in gc.get_referents(obj):
+                ref_id = id(ref)
+                if ref_id in self._by_id and ref_id not in seen:
+                    seen.add(ref_id)
+                    referent_ids.append(ref_id)
+                    self._referrers[ref_id].append(obj_id)
+            self._referents[obj_id] = referent_ids
+
+    def __len__(self):
+        return len(self._objects)
+
+    def __contains__(self, obj):
+        return id(obj) in self._by_id
+
+    @property
+    def objects(self):
+        """
+        list: The indexed objects, in the order in which they were specified.
+        """
+        return self._objects
+
+    def referents(self, obj):
+        """
+        Return the indexed objects the specified object refers to.
+
+        Parameters:
+
+            obj (object): The object. Must be one of the indexed objects.
+
+        Returns:
+
+            list: The indexed objects referred to by `obj`.
+
+        Raises:
+
+            KeyError: The object is not indexed.
+        """
+        return [self._by_id[i] for i in self._referents[id(obj)]]
+
+    def referrers(self, obj):
+        """
+        Return the indexed objects that refer to the specified object.
+
+        Parameters:
+
+            obj (object): The object. Must be one of the indexed objects.
+
+        Returns:
+
+            list: The indexed objects referring to `obj`.
+
+        Raises:
+
+            KeyError: The object is not indexed.
+        """
+        return [self._by_id[i] for i in self._referrers[id(obj)]]
+
+    def reachable(self, objects, exclude=None):
+        """
+        Return the indexed objects that are reachable from the specified
+        objects via indexed references.
+
+        Parameters:
+
+            objects (:term:`py:iterable`): The indexed objects to start at.
+              These objects are included in the result.
+
+            exclude (:term:`py:iterable`): `None` or iterable of indexed
+              objects that are not traversed. These objects are not included
+              in the result, even if they are in `objects`.
+
+        Returns:
+
+            list: The reachable objects, in the order of the indexed objects.
+
+        Raises:
+
+            KeyError: One of the start objects is not indexed.
+        """
+        excluded_ids = set(id(obj) for obj in exclude or [])
+        seen_ids = set()
+        stack = []
+        for obj in objects:
+            obj_id = id(obj)
+            if obj_id not in self._by_id:
+                raise KeyError(obj_id)
+            if obj_id not in excluded_ids and obj_id not in seen_ids:
+                seen_ids.add(obj_id)
+                stack.append(obj_id)
+        while stack:
+            cur_id = stack.pop()
+            for ref_id in self._referents[cur_id]:
+                if ref_id not in excluded_ids and ref_id not in seen_ids:
+                    seen_ids.add(ref_id)
+                    stack.append(ref_id)
+        return [obj for obj in self._objects if id(obj) in seen_ids]
+
+    def cycles(self):
+        """
+        Return the reference cycles between the indexed objects.
+
+        Each reference cycle is a strongly connected component of the
+        reference graph that consists of more than one object, or of a single
+        object that refers to itself. Indexed objects that are not part of a
+        reference cycle (e.g. objects that are only referenced from a cycle)
+        are not included in the result.
+
+        Returns:
+
+            list: The reference cycles, each as a list of objects in the order
+            of the indexed objects.
+        """
+        components = strongly_connected_components(
+            [id(obj) for obj in self._objects], self._referents.__getitem__)
+        cycle_num_of = {}
+        for num, component in enumerate(components):
+            if len(component) == 1 and \
+                    component[0] not in self._referents[component[0]]:
+                continue
+            for obj_id in component:
+                cycle_num_of[obj_id] = num
+        cycles_by_num = {}
+        cycle_nums = []
+        for obj in self._objects:
+            num = cycle_num_of.get(id(obj))
+            if num is None:
+                continue
+            if num not in cycles_by_num:
+                cycles_by_num[num] = []
+                cycle_nums.append(num)
+            cycles_by_num[num].append(obj)
+        return [cycles_by_num[num] for num in cycle_nums]
+
+    def shortest_path(self, source, target):
+        """
+        Return the shortest reference path from one indexed object to another
+        indexed object, using a breadth-first search over the indexed
+        references.
+
+        Parameters:
+
+            source (object): The object the path starts at.
+
+            target (object): The object the path ends at.
+
+        Returns:
+
+            list: The objects on the path, starting with `source` and ending
+            with `target`, or `None` if `target` cannot be reached from
+            `source`. If `source` and `target` are the same object, the
+            path is just that object; use
+            :meth:`~yagot.ReferenceIndex.shortest_cycle` for the path of an
+            object back to itself.
+
+        Raises:
+
+            KeyError: One of the objects is not indexed.
+        """
+        source_id = id(source)
+        target_id = id(target)
+        if source_id not in self._by_id:
+            raise KeyError(source_id)
+        if target_id not in self._by_id:
+            raise KeyError(target_id)
+        if source_id == target_id:
+            return [source]
+        return self._bfs_path(source_id, target_id)
+
+    def shortest_cycle(self, obj):
+        """
+        Return the shortest reference path from an indexed object back to
+        itself, using a breadth-first search over the indexed references.
+
+        Parameters:
+
+            obj (object): The object.
+
+        Returns:
+
+            list: The objects on the path, starting and ending with `obj`,
+            or `None` if the object is not part of a reference cycle within
+            the indexed objects.
+
+        Raises:
+
+            KeyError: The object is not indexed.
+        """
+        obj_id = id(obj)
+        if obj_id not in self._by_id:
+            raise KeyError(obj_id)
+        return self._bfs_path(obj_id, obj_id)
+
+    @staticmethod
+    def format_path(path):
+        """
+        Return a compact one-line string for a reference path, that names the
+        attributes, dictionary keys and container indices of the references
+        on the path, e.g. for a path of an object of a class ``Foo`` back to
+        itself (as returned by :meth:`~yagot.ReferenceIndex.shortest_cycle`)::
+
+            mymodule.Foo.__dict__['cb'] -> method.__self__ -> mymodule.Foo
+
+        References whose kind cannot be determined are shown without a name.
+
+        Parameters:
+
+            path (list): The objects on the reference path.
+
+        Returns:
+
+            :term:`unicode string`: Formatted string for the path.
+        """
+        items = []
+        via_dict = False
+        for obj, next_obj in zip(path, path[1:]):
+            label = _reference_label(obj, next_obj)
+            # An instance dictionary is shown as part of its instance
+            if via_dict:
+                items[-1] += label
+            else:
+                items.append(type2name(type(obj)) + label)
+            via_dict = label == u'.__dict__' and \
+                issubclass(type(next_obj), dict)
+        if path and not via_dict:
+            items.append(type2name(type(path[-1])))
+        return u" -> ".join(items)
+
+    def _bfs_path(self, source_id, target_id):
+        """
+        Breadth-first search from the referents of the source object to the
+        target object. Returns the list of objects on the path including
+        source and target, or `None`.
+        """
+        predecessors = {}
+        queue = deque()
+        for ref_id in self._referents[source_id]:
+            if ref_id not in predecessors:
+                predecessors[ref_id] = source_id
+                queue.append(ref_id)
+        while queue:
+            cur_id = queue.popleft()
+            if cur_id == target_id:
+                path_ids = [cur_id]
+                cur_id = predecessors[cur_id]
+                while cur_id != source_id:
+                    path_ids.append(cur_id)
+                    cur_id = predecessors[cur_id]
+                path_ids.append(source_id)
+                path_ids.reverse()
+                return [self._by_id[i] for i in path_ids]
+            for ref_id in self._referents[cur_id]:
+                if ref_id not in predecessors:
+                    predecessors[ref_id] = cur_id
+                    queue.append(ref_id)
+        return None
+
+
+def strongly_connected_components(nodes, successors):
+    """
+    Return the strongly connected components of a directed graph, using an
+    iterative version of Tarjan's algorithm that runs in linear time and does
+    not hit the recursion limit on large graphs.
+
+    Parameters:
+
+        nodes (list): The hashable nodes of the graph.
+
+        successors (callable): Function that returns the list of successor
+          nodes of a node. Successor nodes that are not in `nodes` must not
+          be returned.
+
+    Returns:
+
+        list: The strongly connected components, each as a list of nodes.
+    """
+    index_of = {}
+    lowlink = {}
+    on_stack = set()
+    stack = []
+    components = []
+    next_index = 0
+    for root in nodes:
+        if root in index_of:
+            continue
+        index_of[root] = lowlink[root] = next_index
+        next_index += 1
+        stack.append(root)
+        on_stack.add(root)
+        work = [(root, iter(successors(root)))]
+        while work:
+            node, succ_iter = work[-1]
+            pushed = False
+            for succ in succ_iter:
+                if succ not in index_of:
+                    index_of[succ] = lowlink[succ] = next_index
+                    next_index += 1
+                    stack.append(succ)
+                    on_stack.add(succ)
+                    work.append((succ, iter(successors(succ))))
+                    pushed = True
+                    break
+                elif succ in on_stack:
+                    lowlink[node] = min(lowlink[node], index_of[succ])
+            if pushed:
+                continue
+            work.pop()
+            if work:
+                parent = work[-1][0]
+                lowlink[parent] = min(lowlink[parent], lowlink[node])
+            if lowlink[node] == index_of[node]:
+                component = []
+                while True:
+                    member = stack.pop()
+                    on_stack.discard(member)
+                    component.append(member)
+                    if member == node:
+                        break
+                components.append(component)
+    return components
+
+
+def _reference_label(referrer, referent):
+    """
+    Return a string naming the reference from an object to another object,
+    e.g. "['key']" for a dictionary item, "[2]" for a list item, or ".attr"
+    for an attribute, or an empty string if it cannot be determined.
+
+    The type of the referrer is determined with ``type(referrer)``, because
+    ``isinstance()`` fails with ReferenceError for dead weak reference
+    proxies.
+    """
+    referrer_type = type(referrer)
+    if issubclass(referrer_type, dict):
+        for key, value in referrer.items():
+            if value is referent:
+                return u"[{!r}]".format(key)
+        for key in referrer:
+            if key is referent:
+                return u" key"
+    elif issubclass(referrer_type, (list, tuple)):
+        for i, item in enumerate(referrer):
+            if item is referent:
+                return u"[{}]".format(i)
+    elif issubclass(referrer_type, (set, frozenset)):
+        return u" item"
+    elif issubclass(referrer_type, types.FrameType):
+        try:
+            frame_locals = referrer.f_locals
+        except Exception:  # pylint: disable=broad-except
+            frame_locals = {}
+        for name, value in frame_locals.items():
+            if value is referent:
+                return u".f_locals[{!r}]".format(name)
+    for name in REFERENCE_ATTRS:
+        try:
+            value = object.__getattribute__(referrer, name)
+        except Exception:  # pylint: disable=broad-except
+            continue
+        if value is referent:
+            return u".{}".format(name)
+    # Instance attributes, including those whose dictionary is not
+    # materialized, and slots.
+    try:
+        attrs = object.__getattribute__(referrer, '__dict__')
+    except Exception:  # pylint: disable=broad-except
+        attrs = {}
+    for name, value in attrs.items():
+        if value is referent:
+            return u".{}".format(name)
+    for cls in type(referrer).__mro__:
+        for name in cls.__dict__.get('__slots__', ()):
+            try:
+                value = object.__getattribute__(referrer, name)
+            except Exception:  # pylint: disable=broad-except
+                continue
+            if value is referent:
+                return u".{}".format(name)
+    return u""
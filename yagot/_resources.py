@@ -0,0 +1,257 @@
+"""
+ResourceLeaks class and support for detecting the ResourceWarning warnings
+issued and the file descriptors opened during a tracking period.
+"""
+
+from __future__ import absolute_import, print_function
+
+import os
+import threading
+import warnings
+from six.moves import builtins
+
+__all__ = ['ResourceLeaks']
+
+# Directory with an entry for each open file descriptor of the process
+FD_DIR = '/proc/self/fd'
+
+# ResourceWarning, or None on Python 2
+_RESOURCE_WARNING = getattr(builtins, 'ResourceWarning', None)
+
+# Lock for the state of capturing warnings. It is reentrant, because
+# finalizers that issue warnings may run in any thread while it is held.
+_CAPTURE_LOCK = threading.RLock()
+
+# The snapshots that currently capture warnings
+_CAPTURES = []
+
+# State of capturing warnings, with items:
+# - showwarning: The warnings.showwarning() function that was replaced.
+# - filter: The warnings filter that was added.
+_CAPTURE_STATE = dict(showwarning=None, filter=None)
+
+
+class ResourceSnapshot(object):
+    """
+    A snapshot of the open file descriptors of the process, taken at the
+    begin of a tracking period, that also captures the ResourceWarning
+    warnings issued until it is stopped.
+
+    The snapshot must be stopped after the garbage collection at the end of
+    the tracking period, because unclosed files and sockets issue their
+    ResourceWarning when they are finalized, which is often during that
+    garbage collection.
+    """
+
+    def __init__(self):
+        self._fds = open_fds()
+        self._warnings = []
+        self._capturing = False
+        if _RESOURCE_WARNING is not None:
+            _start_capture(self)
+            self._capturing = True
+
+    def record(self, message):
+        """
+        Record a captured warning.
+
+        Parameters:
+
+            message (:class:`py:warnings.WarningMessage`): The warning.
+        """
+        self._warnings.append(message)
+
+    def objects(self):
+        """
+        Return the objects created for the captured warnings.
+        """
+        objects = []
+        for msg in self._warnings:
+            objects.extend([msg, msg.message])
+        return objects
+
+    def stop(self):
+        """
+        Stop capturing warnings. Can be called multiple times.
+        """
+        if self._capturing:
+            _stop_capture(self)
+            self._capturing = False
+
+    def leaks(self):
+        """
+        Stop capturing warnings, and return the ResourceWarning warnings
+        captured and the file descriptors opened since the snapshot was
+        taken.
+
+        Returns:
+
+            :class:`~yagot.ResourceLeaks`: The resource leaks.
+        """
+        self.stop()
+        fds = open_fds()
+        if fds is None or self._fds is None:
+            new_fds = []
+        else:
+            # File descriptors that existed before are not reported, also if
+            # their target changed (e.g. by the output capturing of pytest)
+            new_fds = sorted((fd, target) for fd, target in fds.items()
+                             if fd not in self._fds)
+        return ResourceLeaks(self._warnings, new_fds)
+
+
+class ResourceLeaks(object):
+    """
+    The resources that were not released properly during a tracking period:
+
+    * The :class:`py:ResourceWarning` warnings issued during the tracking
+      period, including the garbage collection at its end. Such warnings are
+      issued when unclosed files, sockets, subprocesses or event loops are
+      finalized.
+    * The file descriptors that were opened during the tracking period and
+      are still open at its end, with their targets (e.g. the path name of a
+      file, or "socket:[12345]"). File descriptors whose number was already
+      open at the begin of the tracking period are not reported.
+
+    The captured ResourceWarning warnings are reported only here, and are
+    not shown otherwise. File descriptors are detected only on platforms that
+    provide /proc/self/fd (e.g. Linux), and ResourceWarning warnings only on
+    Python 3.
+    """
+
+    def __init__(self, warnings_, fds):
+        """
+        Parameters:
+
+            warnings_ (list): The ResourceWarning warnings, as
+              :class:`py:warnings.WarningMessage` objects.
+
+            fds (list): The file descriptors that are still open, as tuples
+              (fd, target).
+        """
+        self._warnings = warnings_
+        self._fds = fds
+
+    def __len__(self):
+        return len(self._warnings) + len(self._fds)
+
+    def __repr__(self):
+        return "ResourceLeaks(warnings={}, fds={})". \
+            format(len(self._warnings), len(self._fds))
+
+    @property
+    def warnings(self):
+        """
+        list: The :class:`py:ResourceWarning` warnings issued during the
+        tracking period, as :class:`py:warnings.WarningMessage` objects.
+        """
+        return self._warnings
+
+    @property
+    def fds(self):
+        """
+        list: The file descriptors opened during the tracking period that are
+        still open at its end, as tuples (fd, target).
+        """
+        return self._fds
+
+    def counts(self):
+        """
+        Return the number of resource leaks by kind.
+
+        Returns:
+
+            dict: Dictionary with items warnings, fds.
+        """
+        return dict(warnings=len(self._warnings), fds=len(self._fds))
+
+    def format(self):
+        """
+        Return a formatted multi-line string listing the resource leaks.
+
+        Returns:
+
+            :term:`unicode string`: Formatted string.
+        """
+        lines = []
+        for msg in self._warnings:
+            lines.append(u"ResourceWarning: {} ({}:{})".format(
+                msg.message, msg.filename, msg.lineno))
+        for fd, target in self._fds:
+            lines.append(u"Open file descriptor {}: {}".format(fd, target))
+        return u"\n".join(lines)
+
+
+def open_fds():
+    """
+    Return the open file descriptors of the process as a dict with key: fd,
+    value: target of the fd, or `None` if they cannot be determined on this
+    platform.
+    """
+    if not os.path.isdir(FD_DIR):
+        return None
+    fds = {}
+    for name in os.listdir(FD_DIR):
+        try:
+            fds[int(name)] = os.readlink(os.path.join(FD_DIR, name))
+        except OSError:
+            # The fd used for listing the directory, which is closed now
+            pass
+    return fds
+
+
+def _start_capture(snapshot):
+    """
+    Start capturing ResourceWarning warnings for a snapshot. The first
+    snapshot replaces warnings.showwarning() and adds a warnings filter that
+    always issues ResourceWarning warnings.
+    """
+    with _CAPTURE_LOCK:
+        if not _CAPTURES:
+            _CAPTURE_STATE['showwarning'] = warnings.showwarning
+            warnings.showwarning = _showwarning
+            warnings.filterwarnings('always', category=_RESOURCE_WARNING)
+            _CAPTURE_STATE['filter'] = warnings.filters[0]
+        _CAPTURES.append(snapshot)
+
+
+def _stop_capture(snapshot):
+    """
+    Stop capturing ResourceWarning warnings for a snapshot. The last snapshot
+    restores warnings.showwarning() and removes the warnings filter.
+    """
+    with _CAPTURE_LOCK:
+        _CAPTURES.remove(snapshot)
+        if _CAPTURES:
+            return
+        if warnings.showwarning is _showwarning:
+            warnings.showwarning = _CAPTURE_STATE['showwarning']
+        try:
+            warnings.filters.remove(_CAPTURE_STATE['filter'])
+        except ValueError:  # The filters have been reset meanwhile
+            pass
+        else:
+            # pylint: disable=protected-access
+            if hasattr(warnings, '_filters_mutated'):
+                warnings._filters_mutated()
+        _CAPTURE_STATE['showwarning'] = None
+        _CAPTURE_STATE['filter'] = None
+
+
+def _showwarning(message, category, filename, lineno, file=None, line=None):
+    # pylint: disable=redefined-builtin
+    """
+    Replacement for warnings.showwarning() while warnings are captured. It
+    records ResourceWarning warnings in the capturing snapshots, and passes
+    other warnings on.
+    """
+    if issubclass(category, _RESOURCE_WARNING):
+        msg = warnings.WarningMessage(message, category, filename, lineno,
+                                      file, line)
+        with _CAPTURE_LOCK:
+            for snapshot in list(_CAPTURES):
+                snapshot.record(msg)
+        return
+    showwarning = _CAPTURE_STATE['showwarning']
+    if showwarning is not None:
+        showwarning(message, category, filename, lineno, file, line)
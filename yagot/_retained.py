@@ -0,0 +1,219 @@
+"""
+Support for detecting the objects that were created during a tracking period
+and are still alive at its end (retained objects).
+"""
+
+from __future__ import absolute_import, print_function
+
+import sys
+import gc
+import struct
+import types
+from array import array
+from bisect import bisect_left, bisect_right
+
+__all__ = []
+
+# Array type code for object ids, i.e. for unsigned integers of pointer size
+ID_TYPECODE = [code for code in ('L', 'Q')
+               if array(code).itemsize >= struct.calcsize('P')][0]
+
+# Maximum length of root chains
+ROOT_CHAIN_DEPTH = 10
+
+# Number of ids that are sorted at a time when taking an id snapshot
+SORT_BUCKET_SIZE = 65536
+
+
+def _sorted_ids(objects):
+    """
+    Return the ids of the objects as a sorted array.
+
+    The ids are sorted in buckets of about SORT_BUCKET_SIZE ids, so that only
+    the ids of one bucket exist as int objects at a time, instead of a list
+    of int objects for all ids. The bucket boundaries are taken from a sample
+    of the ids, because object addresses are not evenly distributed.
+    """
+    ids = array(ID_TYPECODE, map(id, objects))
+    if len(ids) <= SORT_BUCKET_SIZE:
+        return array(ID_TYPECODE, sorted(ids))
+    step = SORT_BUCKET_SIZE // 4
+    bounds = sorted(ids[::step])[4::4]
+    buckets = [array(ID_TYPECODE) for _ in range(len(bounds) + 1)]
+    appends = [bucket.append for bucket in buckets]
+    for obj_id in ids:
+        appends[bisect_right(bounds, obj_id)](obj_id)
+    del ids
+    del appends
+    result = array(ID_TYPECODE)
+    while buckets:
+        result.extend(sorted(buckets.pop(0)))
+    return result
+
+
+class IdSnapshot(object):
+    """
+    A snapshot of the ids of the objects tracked by the garbage collector.
+
+    The ids are stored in a sorted array of unsigned integers, which takes
+    8 Bytes per object on 64-bit platforms (compared to about 60 Bytes per
+    object for a set of int objects), and are looked up with a binary search.
+    """
+
+    def __init__(self, objects=None):
+        """
+        Parameters:
+
+            objects (list): `None` or the objects whose ids are taken. `None`
+              means to take the ids of all objects tracked by the garbage
+              collector.
+        """
+        if objects is None:
+            objects = gc.get_objects()
+        self._ids = _sorted_ids(objects)
+
+    def __len__(self):
+        return len(self._ids)
+
+    def __contains__(self, obj_id):
+        ids = self._ids
+        i = bisect_left(ids, obj_id)
+        return i < len(ids) and ids[i] == obj_id
+
+    def new_objects(self, exclude_ids=None):
+        """
+        Return the objects tracked by the garbage collector whose ids are not
+        in the snapshot.
+
+        The snapshot itself and the objects created by this method are not
+        returned.
+
+        Parameters:
+
+            exclude_ids (set): `None` or set of ids of objects that are not
+              returned. The set is extended by this method.
+
+        Returns:
+
+            list: The new objects.
+        """
+        if exclude_ids is None:
+            exclude_ids = set()
+        new_objects = []
+        exclude_ids.update((id(self), id(self._ids), id(exclude_ids),
+                            id(new_objects)))
+        # A loop is used instead of a list comprehension, because the latter
+        # would create function objects on some Python versions.
+        for obj in gc.get_objects():
+            obj_id = id(obj)
+            if obj_id not in self and obj_id not in exclude_ids:
+                new_objects.append(obj)
+        return new_objects
+
+
+def find_roots(objects, ignore=None, exclude_modules=None,
+               max_depth=ROOT_CHAIN_DEPTH):
+    """
+    Find the roots that hold objects alive, and a referrer chain from a root
+    to each object.
+
+    The roots are the dictionaries of modules (i.e. module globals) and
+    classes (i.e. class attributes). The roots are found with a breadth-first
+    search over the referrers of the objects, that determines the referrers
+    of all objects of a level with a single call to
+    :func:`py:gc.get_referrers`, so that the number of scans over all objects
+    tracked by the garbage collector is limited by the maximum chain length.
+    Frames are not followed.
+
+    Parameters:
+
+        objects (list): The objects.
+
+        ignore (list): `None` or list of objects that are not followed as
+          referrers, e.g. containers of the caller that hold the objects.
+
+        exclude_modules (list): `None` or list of module names. Roots in
+          these modules or their submodules are not considered, and chains do
+          not pass through instances of classes defined in these modules.
+
+        max_depth (int): Maximum number of objects in a chain.
+
+    Returns:
+
+        dict: The objects for which a root was found, with key: id of the
+        object, value: tuple (root, chain), where root is a string describing
+        the root (e.g. "module mymodule" or "class mymodule.MyClass") and
+        chain is the list of objects from the root to the object.
+    """
+    module_dicts = dict((id(m.__dict__), name) for name, m in
+                        list(sys.modules.items()) if m is not None)
+    frontier = list(objects)
+    nodes = dict((id(obj), obj) for obj in frontier)
+    ignore_ids = set(id(o) for o in ignore or [])
+    ignore_ids.add(id(nodes))
+    roots = {}  # id of root -> description
+    edges = {}  # id of referrer -> ids of explored objects it refers to
+    for _ in range(max_depth - 1):
+        if not frontier:
+            break
+        referrers = gc.get_referrers(*frontier)
+        next_frontier = []
+        for ref in referrers:
+            ref_id = id(ref)
+            if ref_id in ignore_ids or ref is referrers or \
+                    ref is frontier or ref is next_frontier or \
+                    isinstance(ref, types.FrameType):
+                continue
+            # Computed again if already explored, for the new objects
+            edges[ref_id] = [id(child) for child in gc.get_referents(ref)
+                             if id(child) in nodes]
+            if ref_id in nodes:
+                continue
+            nodes[ref_id] = ref
+            if ref_id in module_dicts:
+                if not _in_modules(module_dicts[ref_id], exclude_modules):
+                    roots[ref_id] = u"module {}".format(module_dicts[ref_id])
+            elif isinstance(ref, type):
+                if not _in_modules(ref.__module__, exclude_modules):
+                    roots[ref_id] = u"class {}.{}".format(ref.__module__,
+                                                          ref.__name__)
+            elif not _in_modules(type(ref).__module__, exclude_modules):
+                next_frontier.append(ref)
+        del referrers
+        frontier = next_frontier
+    del frontier
+
+    # Breadth-first search from the roots over the explored references, for
+    # the shortest chains.
+    predecessors = dict((root_id, None) for root_id in roots)
+    root_of = dict((root_id, root_id) for root_id in roots)
+    queue = list(roots)
+    for cur_id in queue:
+        for child_id in edges.get(cur_id, []):
+            if child_id not in predecessors and child_id not in roots:
+                predecessors[child_id] = cur_id
+                root_of[child_id] = root_of[cur_id]
+                queue.append(child_id)
+    result = {}
+    for obj in objects:
+        obj_id = id(obj)
+        if obj_id not in predecessors:
+            continue
+        chain = []
+        cur_id = obj_id
+        while cur_id is not None:
+            chain.append(nodes[cur_id])
+            cur_id = predecessors[cur_id]
+        chain.reverse()
+        result[obj_id] = (roots[root_of[obj_id]], chain)
+    return result
+
+
+def _in_modules(module_name, modules):
+    """
+    Return whether a module name is one of the modules or their submodules.
+    """
+    if not modules or not module_name:
+        return False
+    return any(module_name == m or module_name.startswith(m + '.')
+               for m in modules)
@@ -0,0 +1,275 @@
+"""
+Command line interface for running Python scripts and modules under garbage
+tracking, invoked with ``python -m yagot``.
+"""
+
+from __future__ import absolute_import, print_function
+
+import os
+import sys
+import json
+import runpy
+import argparse
+import threading
+import traceback
+from timeit import default_timer
+from ._garbagetracker import GarbageTracker
+from ._importtracker import ImportTracker, SORT_KEYS
+
+
+class PeriodRunner(object):
+    """
+    Runs tracking periods with the singleton garbage tracker, either a single
+    period or periodic periods of a fixed interval, and collects the summaries
+    of the periods.
+    """
+
+    def __init__(self, leaks_only=False, ignore_types=None, filter_types=None,
+                 filter_reachable=False, interval=None):
+        self.tracker = GarbageTracker.get_tracker()
+        self.leaks_only = leaks_only
+        self.ignore_types = ignore_types
+        self.filter_types = filter_types
+        self.filter_reachable = filter_reachable
+        self.interval = interval
+        self.periods = []  # List of summaries of finished periods
+        self.messages = []  # List of assert messages of finished periods
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._thread = None
+        self._time0 = None
+        self._period_start = None
+
+    def start(self):
+        """
+        Start the first tracking period, and if an interval was specified,
+        the thread that starts subsequent periods.
+        """
+        self._time0 = default_timer()
+        self.tracker.enable(leaks_only=self.leaks_only)
+        self._start_period()
+        if self.interval:
+            self._thread = threading.Thread(target=self._run_periodic)
+            self._thread.daemon = True
+            self._thread.start()
+
+    def stop(self):
+        """
+        Stop the thread for periodic periods and the last tracking period.
+        """
+        self._stopped.set()
+        if self._thread:
+            self._thread.join()
+        with self._lock:
+            self._stop_period()
+        self.tracker.disable()
+
+    def _run_periodic(self):
+        "Thread function that stops and starts periods at the interval"
+        while not self._stopped.wait(self.interval):
+            with self._lock:
+                if self._stopped.is_set():
+                    break
+                self._stop_period()
+                self._start_period()
+
+    def _start_period(self):
+        "Start a tracking period"
+        self._period_start = default_timer()
+        self.tracker.start()
+        # Unlike the decorator and the pytest plugin, frame and code objects
+        # are not ignored
+        self.tracker.ignore_types(type_list=self.ignore_types, implicit=False)
+        self.tracker.filter_types(type_list=self.filter_types,
+                                  reachable=self.filter_reachable)
+
+    def _stop_period(self):
+        "Stop a tracking period and record its summary"
+        self.tracker.stop()
+        end = default_timer()
+        summary = self.tracker.summary()
+        summary['period'] = len(self.periods) + 1
+        summary['start'] = self._period_start - self._time0
+        summary['end'] = end - self._time0
+        self.periods.append(summary)
+        location = "period {} ({:.3f}s - {:.3f}s)".format(
+            summary['period'], summary['start'], summary['end'])
+        self.messages.append(
+            self.tracker.assert_message(location) if self.tracker.garbage
+            else None)
+        # The objects of reported periods are removed from gc.garbage, so
+        # that it does not grow in long-running programs
+        self.tracker.release()
+
+
+def format_summary(summary, max_types=5):
+    """
+    Return a one-line string for the summary of a tracking period, with the
+    most frequent types.
+    """
+    types = sorted(summary['types'].items(), key=lambda kv: (-kv[1], kv[0]))
+    types_str = ', '.join("{} {}".format(n, t) for t, n in types[:max_types])
+    if len(types) > max_types:
+        types_str += ', ...'
+    return "yagot: Period {period} ({start:.3f}s - {end:.3f}s): " \
+        "{num} object(s), {bytes} bytes, {cycles} cycle(s), " \
+        "GC time {gc:.3f}s{types}". \
+        format(period=summary['period'], start=summary['start'],
+               end=summary['end'], num=summary['num_objects'],
+               bytes=summary['num_bytes'],
+               cycles=len(summary['fingerprints']),
+               gc=summary['collect_time'],
+               types=": " + types_str if types_str else "")
+
+
+def create_parser():
+    """
+    Return the argument parser for the command line interface.
+    """
+    parser = argparse.ArgumentParser(
+        prog='python -m yagot',
+        usage='python -m yagot [options] (script.py | -m module) [args ...]',
+        description="Run a Python script or module under garbage tracking "
+        "and show the collected and uncollectable objects it caused. Unlike "
+        "the decorator and the pytest plugin, objects of type frame and code "
+        "are not ignored by default.")
+    parser.add_argument(
+        '-m', dest='module', action='store_true',
+        help="Run the target as a module (like 'python -m').")
+    parser.add_argument(
+        '--leaks-only', action='store_true',
+        help="Limit the checking to only uncollectable (=leak) objects.")
+    parser.add_argument(
+        '--ignore-types', metavar='TYPE[,TYPE[...]]', action='append',
+        default=[],
+        help="Type rule for objects whose presence causes a tracking period "
+        "to be ignored. Can be specified multiple times.")
+    parser.add_argument(
+        '--filter-types', metavar='RULE[,RULE[...]]', action='append',
+        default=[],
+        help="Type rule for objects that are removed individually. Can be "
+        "specified multiple times.")
+    parser.add_argument(
+        '--filter-reachable', action='store_true',
+        help="Also remove objects only reachable from objects removed by "
+        "--filter-types.")
+    parser.add_argument(
+        '--interval', metavar='SECONDS', type=float, default=None,
+        help="Run periodic tracking periods of this duration, instead of a "
+        "single tracking period for the entire program.")
+    parser.add_argument(
+        '--details', action='store_true',
+        help="Show the detected objects of each tracking period, in addition "
+        "to its summary.")
+    parser.add_argument(
+        '--imports', action='store_true',
+        help="Also measure the cost of each module import of the program and "
+        "show the modules sorted by decreasing cost.")
+    parser.add_argument(
+        '--imports-sort', metavar='KEY', default='garbage', choices=SORT_KEYS,
+        help="Cost to sort the modules by with --imports: {}. "
+        "Default: garbage.".format(', '.join(SORT_KEYS)))
+    parser.add_argument(
+        '--output', '-o', metavar='FILE', default=None,
+        help="Export the summaries of the tracking periods to FILE in JSON "
+        "format.")
+    parser.add_argument(
+        'target', metavar='script.py | module',
+        help="Python script or module to run.")
+    parser.add_argument(
+        'args', nargs=argparse.REMAINDER,
+        help="Arguments for the script or module.")
+    return parser
+
+
+def _split(comma_list):
+    "Split a list of comma-separated strings into a list of items"
+    return [item for comma_item in comma_list
+            for item in comma_item.split(',') if item]
+
+
+def main(argv=None):
+    """
+    Command line interface for running a Python script or module under garbage
+    tracking, invoked with ``python -m yagot``.
+
+    Parameters:
+
+        argv (list): Command line arguments without the program name, or
+          `None` for using ``sys.argv``.
+
+    Returns:
+
+        int: Exit code of the script or module.
+    """
+    args = create_parser().parse_args(argv)
+
+    runner = PeriodRunner(
+        leaks_only=args.leaks_only,
+        ignore_types=_split(args.ignore_types),
+        filter_types=_split(args.filter_types),
+        filter_reachable=args.filter_reachable,
+        interval=args.interval)
+
+    saved_argv = sys.argv[:]
+    saved_path0 = sys.path[0] if sys.path else None
+    exit_code = 0
+    # The globals of a script or module are kept until after the tracking has
+    # stopped, so that they are not detected as garbage when it ends.
+    script_globals = None
+    import_tracker = ImportTracker() if args.imports else None
+    runner.start()
+    if import_tracker:
+        import_tracker.install()
+    try:
+        sys.argv[:] = [args.target] + args.args
+        if args.module:
+            script_globals = runpy.run_module(
+                args.target, run_name='__main__', alter_sys=True)
+        else:
+            script_dir = os.path.dirname(os.path.abspath(args.target))
+            if sys.path:
+                sys.path[0] = script_dir
+            else:
+                sys.path.insert(0, script_dir)
+            with open(args.target, 'rb') as fp:
+                code = compile(fp.read(), args.target, 'exec')
+            script_globals = {
+                '__file__': args.target,
+                '__name__': '__main__',
+                '__package__': None,
+                '__cached__': None,
+            }
+            exec(code, script_globals)  # pylint: disable=exec-used
+    except SystemExit as exc:
+        if exc.code is None:
+            exit_code = 0
+        elif isinstance(exc.code, int):
+            exit_code = exc.code
+        else:
+            print(exc.code, file=sys.stderr)
+            exit_code = 1
+    except Exception:  # pylint: disable=broad-except
+        traceback.print_exc()
+        exit_code = 1
+    finally:
+        if import_tracker:
+            import_tracker.uninstall()
+        runner.stop()
+        sys.argv[:] = saved_argv
+        if saved_path0 is not None:
+            sys.path[0] = saved_path0
+        elif sys.path and not args.module:
+            # The script directory was inserted into an empty sys.path
+            del sys.path[0]
+
+    for summary, message in zip(runner.periods, runner.messages):
+        print(format_summary(summary), file=sys.stderr)
+        if args.details and message:
+            print(message, file=sys.stderr)
+    if import_tracker:
+        print(import_tracker.report(sort_by=args.imports_sort), file=sys.stderr)
+    if args.output:
+        with open(args.output, 'w') as fp:
+            json.dump(runner.periods, fp, indent=2, sort_keys=True)
+    return exit_code
@@ -0,0 +1,416 @@
+"""
+Heap snapshot files and their offline comparison.
+
+A heap snapshot file contains one binary record per object tracked by the
+garbage collector, with the id, type, size and the ids of the tracked objects
+it refers to. The file layout is:
+
+* Header: Magic bytes, format version.
+* Records, in ascending order of object ids. Each record is the object id,
+  the index of its type in the type table, its size in Bytes, the number of
+  referents, followed by the ids of the referents.
+* Type table: For each type, the length and the UTF-8 encoded type name.
+* Trailer: Offset of the type table, number of records, number of types,
+  magic bytes.
+
+All integers are unsigned and little-endian.
+"""
+
+from __future__ import absolute_import, print_function
+
+import gc
+import mmap
+import sys
+import struct
+import argparse
+from array import array
+from bisect import bisect_left
+from ._typematcher import type2name
+from ._garbagetracker import _getsizeof
+from ._refindex import strongly_connected_components
+from ._cycles import graph_fingerprint
+from ._retained import ID_TYPECODE
+
+__all__ = ['snapshot', 'SnapshotReader', 'diff_snapshots']
+
+# Magic bytes at the begin and end of a heap snapshot file
+HEADER_MAGIC = b'YAGOTSNP'
+TRAILER_MAGIC = b'YAGOTEND'
+
+# Version of the heap snapshot file format
+FORMAT_VERSION = 1
+
+# Magic bytes, format version, reserved
+HEADER = struct.Struct('<8sII')
+
+# Object id, type index, size, number of referents
+RECORD = struct.Struct('<QIQI')
+
+# Size of a referent id
+REFERENT_SIZE = 8
+
+# Length of a type name
+NAME_LENGTH = struct.Struct('<I')
+
+# Offset of type table, number of records, number of types, magic bytes
+TRAILER = struct.Struct('<QQQ8s')
+
+# Default size of the write buffer in Bytes
+BUFFER_SIZE = 1024 * 1024
+
+
+def snapshot(path, buffer_size=BUFFER_SIZE):
+    """
+    Write a heap snapshot file with a record for each object tracked by the
+    garbage collector.
+
+    The records are written through a buffer, so that the objects of the
+    snapshot are not held in memory in addition to the objects themselves.
+    Two snapshot files can be compared offline with
+    :func:`~yagot.diff_snapshots` or ``python -m yagot.diff``.
+
+    Parameters:
+
+        path (:term:`string`): Path name of the snapshot file. An existing
+          file is overwritten.
+
+        buffer_size (int): Size of the write buffer in Bytes.
+
+    Returns:
+
+        int: Number of records written.
+    """
+    objects = gc.get_objects()
+    # Sorting by id allows comparing snapshot files by merging them
+    objects.sort(key=id)
+    type_index = {}
+    type_names = []
+    buf = bytearray()
+    with open(path, 'wb') as fp:
+        fp.write(HEADER.pack(HEADER_MAGIC, FORMAT_VERSION, 0))
+        for obj in objects:
+            obj_type = type(obj)
+            index = type_index.get(obj_type)
+            if index is None:
+                index = type_index[obj_type] = len(type_names)
+                type_names.append(type2name(obj_type))
+            # Objects not tracked by the garbage collector cannot be part of
+            # reference cycles, so their ids are not needed.
+            referent_ids = [id(ref) for ref in gc.get_referents(obj)
+                            if gc.is_tracked(ref)]
+            buf += RECORD.pack(id(obj), index, _getsizeof(obj),
+                               len(referent_ids))
+            if referent_ids:
+                buf += struct.pack('<{}Q'.format(len(referent_ids)),
+                                   *referent_ids)
+            if len(buf) >= buffer_size:
+                fp.write(buf)
+                del buf[:]
+        fp.write(buf)
+        table_offset = fp.tell()
+        for name in type_names:
+            name_bytes = name.encode('utf-8')
+            fp.write(NAME_LENGTH.pack(len(name_bytes)))
+            fp.write(name_bytes)
+        fp.write(TRAILER.pack(table_offset, len(objects), len(type_names),
+                              TRAILER_MAGIC))
+    return len(objects)
+
+
+class SnapshotReader(object):
+    """
+    Reader for a heap snapshot file written by :func:`~yagot.snapshot`.
+
+    The file is memory-mapped and its records are decoded while iterating
+    over the reader, so that the memory needed for reading a snapshot file
+    does not grow with its size.
+
+    Iterating over the reader yields a tuple (obj_id, type_index, size,
+    referent_ids) for each record, in ascending order of object ids. The
+    type name for a type index is available via
+    :attr:`~yagot.SnapshotReader.type_names`.
+    """
+
+    def __init__(self, path):
+        """
+        Parameters:
+
+            path (:term:`string`): Path name of the snapshot file.
+
+        Raises:
+
+            ValueError: The file is not a valid heap snapshot file.
+        """
+        self._path = path
+        self._fp = open(path, 'rb')
+        try:
+            self._mm = mmap.mmap(self._fp.fileno(), 0,
+                                 access=mmap.ACCESS_READ)
+        except (ValueError, EnvironmentError):
+            self._fp.close()
+            raise ValueError("Invalid heap snapshot file: {}".format(path))
+        try:
+            self._read_layout()
+        except (ValueError, struct.error):
+            self.close()
+            raise ValueError("Invalid heap snapshot file: {}".format(path))
+
+    def _read_layout(self):
+        """
+        Read and check the header, trailer and type table.
+        """
+        mm = self._mm
+        if len(mm) < HEADER.size + TRAILER.size:
+            raise ValueError("File too short")
+        magic, version, _ = HEADER.unpack_from(mm, 0)
+        if magic != HEADER_MAGIC or version != FORMAT_VERSION:
+            raise ValueError("Invalid header")
+        table_offset, num_records, num_types, magic = \
+            TRAILER.unpack_from(mm, len(mm) - TRAILER.size)
+        if magic != TRAILER_MAGIC:
+            raise ValueError("Invalid trailer")
+        self._num_records = num_records
+        self._table_offset = table_offset
+        self._type_names = []
+        offset = table_offset
+        for _ in range(num_types):
+            length, = NAME_LENGTH.unpack_from(mm, offset)
+            offset += NAME_LENGTH.size
+            self._type_names.append(
+                mm[offset:offset + length].decode('utf-8'))
+            offset += length
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def __len__(self):
+        return self._num_records
+
+    def __iter__(self):
+        mm = self._mm
+        unpack_record = RECORD.unpack_from
+        offset = HEADER.size
+        for _ in range(self._num_records):
+            obj_id, type_index, size, num_refs = unpack_record(mm, offset)
+            offset += RECORD.size
+            if num_refs:
+                referent_ids = struct.unpack_from(
+                    '<{}Q'.format(num_refs), mm, offset)
+                offset += num_refs * REFERENT_SIZE
+            else:
+                referent_ids = ()
+            yield obj_id, type_index, size, referent_ids
+
+    @property
+    def path(self):
+        """
+        :term:`string`: Path name of the snapshot file.
+        """
+        return self._path
+
+    @property
+    def type_names(self):
+        """
+        list: The type names of the type table, as represented by the
+        ``str(type)`` function, by type index.
+        """
+        return self._type_names
+
+    def close(self):
+        """
+        Close the snapshot file.
+        """
+        self._mm.close()
+        self._fp.close()
+
+
+def diff_snapshots(path_a, path_b):
+    """
+    Compare two heap snapshot files written by :func:`~yagot.snapshot`,
+    typically of the same process at two points in time.
+
+    The comparison streams both files at the same time. Only the objects that
+    are new in the second snapshot are held in memory, in order to find the
+    reference cycles among them. An object is considered new if its id is not
+    in the first snapshot, or if the object with that id has a different type
+    in the first snapshot.
+
+    Parameters:
+
+        path_a (:term:`string`): Path name of the first snapshot file.
+
+        path_b (:term:`string`): Path name of the second snapshot file.
+
+    Returns:
+
+        dict: The differences, with the following items:
+
+        * ``num_objects`` (tuple): Number of objects in the two snapshots.
+        * ``num_new`` (int): Number of new objects in the second snapshot.
+        * ``types`` (list): The types with a different number of objects or
+          size, as dicts with items ``type_name``, ``count_a``, ``count_b``,
+          ``bytes_a``, ``bytes_b``, sorted by decreasing growth of the number
+          of objects.
+        * ``cycles`` (list): The reference cycles among the new objects,
+          grouped by fingerprint (see :attr:`~yagot.GarbageCycle.fingerprint`),
+          as dicts with items ``fingerprint``, ``count`` (number of cycles),
+          ``size`` (number of objects of one cycle), ``type_names``, sorted
+          by decreasing number of cycles.
+
+    Raises:
+
+        ValueError: A file is not a valid heap snapshot file.
+    """
+    with SnapshotReader(path_a) as reader_a, \
+            SnapshotReader(path_b) as reader_b:
+        type_stats = {}
+        new_ids = array(ID_TYPECODE)
+        names_a = reader_a.type_names
+        names_b = reader_b.type_names
+
+        def account(type_name, size, column):
+            "Add an object to the statistics of its type"
+            stats = type_stats.get(type_name)
+            if stats is None:
+                stats = type_stats[type_name] = [0, 0, 0, 0]
+            stats[column] += 1
+            stats[column + 2] += size
+
+        # Merge the records of both files by object id
+        iter_a = iter(reader_a)
+        rec_a = next(iter_a, None)
+        for obj_id, type_index, size, _ in reader_b:
+            type_name = names_b[type_index]
+            account(type_name, size, 1)
+            while rec_a is not None and rec_a[0] < obj_id:
+                account(names_a[rec_a[1]], rec_a[2], 0)
+                rec_a = next(iter_a, None)
+            if rec_a is not None and rec_a[0] == obj_id:
+                account(names_a[rec_a[1]], rec_a[2], 0)
+                is_new = names_a[rec_a[1]] != type_name
+                rec_a = next(iter_a, None)
+            else:
+                is_new = True
+            if is_new:
+                new_ids.append(obj_id)
+        while rec_a is not None:
+            account(names_a[rec_a[1]], rec_a[2], 0)
+            rec_a = next(iter_a, None)
+
+        # Reference graph of the new objects
+        referents = {}
+        labels = {}
+        for obj_id, type_index, _, referent_ids in reader_b:
+            if _contains(new_ids, obj_id):
+                referents[obj_id] = [ref_id for ref_id in referent_ids
+                                     if _contains(new_ids, ref_id)]
+                labels[obj_id] = names_b[type_index]
+        num_objects = (len(reader_a), len(reader_b))
+
+    cycles = {}
+    for component in strongly_connected_components(
+            list(new_ids), referents.__getitem__):
+        if len(component) == 1 and component[0] not in \
+                referents[component[0]]:
+            continue
+        members = set(component)
+        fingerprint = graph_fingerprint(
+            dict((node, [ref for ref in referents[node] if ref in members])
+                 for node in component),
+            dict((node, labels[node]) for node in component))
+        entry = cycles.get(fingerprint)
+        if entry is None:
+            cycles[fingerprint] = dict(
+                fingerprint=fingerprint, count=1, size=len(component),
+                type_names=sorted(set(labels[node] for node in component)))
+        else:
+            entry['count'] += 1
+
+    types = [dict(type_name=name, count_a=st[0], count_b=st[1],
+                  bytes_a=st[2], bytes_b=st[3])
+             for name, st in type_stats.items()
+             if st[0] != st[1] or st[2] != st[3]]
+    types.sort(key=lambda t: (t['count_a'] - t['count_b'],
+                              t['bytes_a'] - t['bytes_b'], t['type_name']))
+    return dict(
+        num_objects=num_objects,
+        num_new=len(new_ids),
+        types=types,
+        cycles=sorted(cycles.values(),
+                      key=lambda c: (-c['count'], c['fingerprint'])),
+    )
+
+
+def _contains(sorted_array, value):
+    """
+    Return whether a sorted array contains a value.
+    """
+    i = bisect_left(sorted_array, value)
+    return i < len(sorted_array) and sorted_array[i] == value
+
+
+def main(argv=None):
+    """
+    Command line interface for comparing two heap snapshot files, invoked
+    with ``python -m yagot.diff``.
+
+    Parameters:
+
+        argv (list): Command line arguments without the program name, or
+          `None` for using ``sys.argv``.
+
+    Returns:
+
+        int: Exit code.
+    """
+    parser = argparse.ArgumentParser(
+        prog='python -m yagot.diff',
+        description="Compare two heap snapshot files written by "
+        "yagot.snapshot() and show the growth by type and the reference "
+        "cycles among the new objects.")
+    parser.add_argument(
+        'path_a', metavar='A',
+        help="Path name of the first (earlier) snapshot file.")
+    parser.add_argument(
+        'path_b', metavar='B',
+        help="Path name of the second (later) snapshot file.")
+    parser.add_argument(
+        '--limit', '-n', type=int, default=20,
+        help="Maximum number of types and of cycles to show. Default: 20.")
+    args = parser.parse_args(argv)
+
+    try:
+        result = diff_snapshots(args.path_a, args.path_b)
+    except (ValueError, EnvironmentError) as exc:
+        print("Error: {}".format(exc), file=sys.stderr)
+        return 1
+
+    print("Objects: {} -> {}, new objects: {}".format(
+        result['num_objects'][0], result['num_objects'][1],
+        result['num_new']))
+    print("")
+    print("{:>9}  {:>9}  {:>12}  {}".format(
+        "Count", "Change", "Bytes change", "Type"))
+    for t in result['types'][:args.limit]:
+        print("{:>9}  {:>+9}  {:>+12}  {}".format(
+            t['count_b'], t['count_b'] - t['count_a'],
+            t['bytes_b'] - t['bytes_a'], t['type_name']))
+    if len(result['types']) > args.limit:
+        print("... ({} more types)".format(
+            len(result['types']) - args.limit))
+    print("")
+    if result['cycles']:
+        print("Reference cycles among the new objects:")
+        for c in result['cycles'][:args.limit]:
+            print("Cycle {} with {} object(s) of type(s) {}: {} time(s)".format(
+                c['fingerprint'], c['size'], ', '.join(c['type_names']),
+                c['count']))
+        if len(result['cycles']) > args.limit:
+            print("... ({} more cycles)".format(
+                len(result['cycles']) - args.limit))
+    else:
+        print("No reference cycles among the new objects")
+    return 0
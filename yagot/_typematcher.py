@@ -0,0 +1,180 @@
+"""
+TypeMatcher class.
+"""
+
+from __future__ import absolute_import, print_function
+
+import re
+import fnmatch
+import six
+
+__all__ = ['TypeMatcher']
+
+# Prefixes of type rule strings that select a rule kind other than exact
+# type names and glob patterns
+REGEXP_PREFIX = 're:'
+MODULE_PREFIX = 'module:'
+SUBCLASS_PREFIX = 'subclass:'
+
+# Characters that make a type rule string a glob pattern
+GLOB_CHARS = re.compile(r"[*?\[]")
+
+
+class TypeMatcher(object):
+    """
+    A matcher for the types of objects, compiled from a list of type rules.
+
+    Each type rule can be specified as:
+
+    * A type object. Objects match if their type is exactly that type
+      (objects of subclasses do not match).
+
+    * A string with a type name as represented by the ``str(type)`` function
+      (for example, "int" or "mymodule.MyClass"). Objects match if the name of
+      their type is exactly that name.
+
+    * A string with a glob pattern (i.e. containing ``*``, ``?`` or ``[``)
+      that is matched against the type name (for example, "mymodule.*").
+
+    * A string ``"re:REGEXP"`` with a regular expression that must match the
+      complete type name.
+
+    * A string ``"module:MODULE"`` with a module name. Objects match if their
+      type is defined in that module or in one of its submodules.
+
+    * A string ``"subclass:NAME"`` with a type name. Objects match if their
+      type is the named type or a subclass of it.
+
+    All name based rules are compiled into a single matcher, and the result
+    is cached per type, so that matching many objects of few types is cheap.
+    """
+
+    def __init__(self, type_list):
+        """
+        Parameters:
+
+            type_list (:term:`py:iterable`): Iterable of type rules, or `None`.
+
+              `None` or an empty iterable means that no objects match.
+        """
+        self._type_list = list(type_list or [])
+        self._types = set()
+        self._names = set()
+        self._modules = []
+        self._subclass_names = set()
+        patterns = []
+        for t in self._type_list:
+            if isinstance(t, type):
+                self._types.add(t)
+                continue
+            assert isinstance(t, six.string_types)
+            if t.startswith(REGEXP_PREFIX):
+                patterns.append(t[len(REGEXP_PREFIX):])
+            elif t.startswith(MODULE_PREFIX):
+                self._modules.append(t[len(MODULE_PREFIX):])
+            elif t.startswith(SUBCLASS_PREFIX):
+                self._subclass_names.add(t[len(SUBCLASS_PREFIX):])
+            elif GLOB_CHARS.search(t):
+                patterns.append(fnmatch.translate(t))
+            else:
+                self._names.add(t)
+        if patterns:
+            self._pattern = re.compile(
+                r'(?:{})\Z'.format('|'.join(
+                    '(?:{})'.format(p) for p in patterns)))
+        else:
+            self._pattern = None
+        self._cache = {}
+
+    def __repr__(self):
+        return "TypeMatcher({!r})".format(self._type_list)
+
+    def __bool__(self):
+        return bool(self._type_list)
+
+    __nonzero__ = __bool__  # Python 2
+
+    @property
+    def type_list(self):
+        """
+        list: The type rules this matcher was compiled from.
+        """
+        return self._type_list
+
+    def matches(self, obj):
+        """
+        Test whether the type of an object matches any of the type rules.
+
+        The type of the object is determined with ``type(obj)``, because there
+        are cases with weakly referenced objects where ``isinstance()`` fails
+        with ReferenceError.
+
+        Parameters:
+
+            obj (object): The object.
+
+        Returns:
+
+            bool: Boolean indicating whether the object matches.
+        """
+        return self.matches_type(type(obj))
+
+    def matches_type(self, type_obj):
+        """
+        Test whether a type matches any of the type rules.
+
+        Parameters:
+
+            type_obj (type): The type.
+
+        Returns:
+
+            bool: Boolean indicating whether the type matches.
+        """
+        try:
+            return self._cache[type_obj]
+        except KeyError:
+            result = self._match_type(type_obj)
+            self._cache[type_obj] = result
+            return result
+
+    def _match_type(self, type_obj):
+        """
+        Uncached implementation of matches_type().
+        """
+        if type_obj in self._types:
+            return True
+        type_name = type2name(type_obj)
+        if type_name in self._names:
+            return True
+        if self._pattern and self._pattern.match(type_name):
+            return True
+        if self._modules:
+            module = getattr(type_obj, '__module__', None) or ''
+            for prefix in self._modules:
+                if module == prefix or module.startswith(prefix + '.'):
+                    return True
+        if self._subclass_names:
+            for base in getattr(type_obj, '__mro__', (type_obj,)):
+                if type2name(base) in self._subclass_names:
+                    return True
+        return False
+
+
+def type2name(type_obj):
+    """
+    Return type name of a type object, as represented by `str(type_obj)`.
+
+    For types whose metaclass changes that representation (e.g. enum
+    classes), the type name is built from the module and name of the type in
+    the same way.
+    """
+    m = re.match(r"<(class|type) '(.*)'>", str(type_obj))
+    if m is None:
+        module = getattr(type_obj, '__module__', None)
+        name = getattr(type_obj, '__qualname__', type_obj.__name__)
+        if module in (None, 'builtins', '__builtin__'):
+            return name
+        return "{}.{}".format(module, name)
+    type_name = m.group(2)
+    return type_name
@@ -0,0 +1,14 @@
+"""
+Command line interface for comparing two heap snapshot files written by
+``yagot.snapshot()``::
+
+    python -m yagot.diff A B [--limit N]
+"""
+
+from __future__ import absolute_import, print_function
+
+import sys
+from ._snapshot import main
+
+if __name__ == '__main__':
+    sys.exit(main())
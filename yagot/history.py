@@ -0,0 +1,14 @@
+"""
+Command line interface for querying the garbage history recorded by Yagot::
+
+    python -m yagot.history PATH trend [TESTID]
+    python -m yagot.history PATH first-seen FINGERPRINT
+"""
+
+from __future__ import absolute_import, print_function
+
+import sys
+from ._history import main
+
+if __name__ == '__main__':
+    sys.exit(main())
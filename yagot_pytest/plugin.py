@@ -5,6 +5,15 @@ A pytest plugin for Yagot.
 from __future__ import absolute_import, print_function
 
 import os
+import sys
+import json
+import hashlib
+import tempfile
+import subprocess
+from multiprocessing import cpu_count
+from multiprocessing.pool import ThreadPool
+from collections import OrderedDict
+import six
 import pytest
 
 # We import yagot in a deferred manner, because importing it globally causes
@@ -13,6 +22,45 @@ import pytest
 # loaded by pytest.
 
 
+# Modules whose module globals and classes are not reported as roots of
+# retained objects, because they hold objects used by pytest to run the test
+# cases.
+RETAINED_EXCLUDE_MODULES = ['_pytest', 'pytest', 'pluggy', 'py', 'yagot',
+                            'yagot_pytest', 'logging', 're']
+
+# Settings of the plugin that can be overridden for test cases with the
+# yagot marker, with the name of the corresponding command line option.
+MARKER_SETTINGS = OrderedDict([
+    ('enabled', 'yagot'),
+    ('leaks_only', 'yagot_leaks_only'),
+    ('ignore_types', 'yagot_ignore_types'),
+    ('filter_types', 'yagot_filter_types'),
+    ('filter_reachable', 'yagot_filter_reachable'),
+    ('auto_collect', 'yagot_auto_collect'),
+    ('retained', 'yagot_retained'),
+    ('exceptions', 'yagot_exceptions'),
+    ('children', 'yagot_children'),
+    ('async_leaks', 'yagot_async_leaks'),
+    ('resources', 'yagot_resources'),
+    ('finalizers', 'yagot_finalizers'),
+    ('max_objects', 'yagot_max_objects'),
+    ('max_bytes', 'yagot_max_bytes'),
+    ('max_types', 'yagot_max_types'),
+    ('max_collect_time', 'yagot_max_collect_time'),
+])
+
+# Settings that are lists of types.
+TYPE_LIST_SETTINGS = ('ignore_types', 'filter_types')
+
+# Key of the entry in the pytest cache with the results of isolation reruns.
+RERUN_CACHE_KEY = 'yagot/rerun'
+
+# Env.var that is set for the pytest subprocesses of isolation reruns and
+# bisections, with the path name of the file the results of the test cases
+# are written to.
+RERUN_RESULT_ENV = 'YAGOT_RERUN_RESULT'
+
+
 def pure_list(comma_list):
     """
     Transform a list with items that can be comma-separated strings, into
@@ -25,6 +73,460 @@ def pure_list(comma_list):
     return pure_items
 
 
+def session_settings(config):
+    """
+    Return the settings of the plugin from the command line options, as a
+    dict with the keys of MARKER_SETTINGS.
+    """
+    settings = {}
+    for name, dest in MARKER_SETTINGS.items():
+        if name in TYPE_LIST_SETTINGS:
+            settings[name] = pure_list(config.getvalue(dest))
+        elif name == 'max_types':
+            settings[name] = parse_max_types(config.getvalue(dest))
+        else:
+            settings[name] = config.getvalue(dest)
+    return settings
+
+
+def parse_max_types(comma_list):
+    """
+    Parse a list with items that can be comma-separated strings of TYPE=N
+    into a dict with key: type name, value: maximum number of objects.
+    """
+    max_types = {}
+    for item in pure_list(comma_list):
+        type_name, sep, num = item.rpartition('=')
+        try:
+            max_types[type_name] = int(num)
+        except ValueError:
+            sep = None
+        if not sep or not type_name:
+            raise pytest.UsageError(
+                "Invalid value for --yagot-max-types: {}".format(item))
+    return max_types
+
+
+def garbage_budget(settings):
+    """
+    Return the garbage budget for the settings of a test item.
+    """
+    import yagot
+    return yagot.GarbageBudget(
+        max_objects=settings['max_objects'],
+        max_bytes=settings['max_bytes'],
+        max_types=settings['max_types'],
+        max_collect_time=settings['max_collect_time'])
+
+
+def has_budget(settings):
+    """
+    Return whether a garbage budget is configured in the settings of a test
+    item (or of the session), i.e. some garbage is tolerated.
+    """
+    return bool(settings['max_objects'] or settings['max_types'] or
+                settings['max_bytes'] is not None or
+                settings['max_collect_time'] is not None)
+
+
+def item_settings(item):
+    """
+    Return the settings of the plugin for a test item: The settings from the
+    command line options, overridden by the keyword arguments of the yagot
+    markers of the test item, its class and its module (the closest marker
+    wins).
+
+    The settings are resolved once and cached on the test item.
+    """
+    settings = getattr(item, '_yagot_settings', None)
+    if settings is None:
+        # pylint: disable=protected-access
+        settings = dict(item.config._yagot_settings)
+        markers = list(item.iter_markers(name='yagot'))
+        for marker in reversed(markers):
+            invalid = sorted(set(marker.kwargs) - set(MARKER_SETTINGS))
+            if marker.args or invalid:
+                raise pytest.UsageError(
+                    "Invalid arguments for yagot marker of {}: {}".
+                    format(item.nodeid,
+                           ', '.join(invalid) or "positional arguments"))
+            for name, value in marker.kwargs.items():
+                if name in TYPE_LIST_SETTINGS:
+                    if isinstance(value, six.string_types):
+                        value = [value]
+                    value = pure_list(value)
+                settings[name] = value
+        item._yagot_settings = settings
+    return settings
+
+
+class GenerationTotals(object):
+    """
+    Session-wide totals of the garbage collections per generation during the
+    test cases, and the test cases whose objects were collected in older
+    generations.
+    """
+
+    def __init__(self):
+        # Totals per generation, as dicts with items collections, collected,
+        # uncollectable.
+        self.totals = [dict(collections=0, collected=0, uncollectable=0)
+                       for _ in range(3)]
+        # List of tuples (location, num_objects) with the number of objects
+        # collected in generations 1 and 2.
+        self.older = []
+
+    def add(self, generation_stats, location):
+        """
+        Add the garbage collections during a test case.
+
+        Parameters:
+
+            generation_stats (list): The garbage collections, see
+              yagot.GarbageTracker.generation_stats, or None.
+
+            location (string): Location of the test case.
+        """
+        if not generation_stats:
+            return
+        for total, st in zip(self.totals, generation_stats):
+            for key in total:
+                total[key] += st[key]
+        num_older = sum(st['collected'] for st in generation_stats[1:])
+        if num_older:
+            self.older.append((location, num_older))
+
+
+class FinalizerTotals(object):
+    """
+    Session-wide totals of the time spent in finalizers during the test cases,
+    by type and code location of the finalizer.
+    """
+
+    def __init__(self):
+        # Dict with key: tuple (type_name, location), value: dict with items
+        # count, total, max, max_location.
+        self.totals = {}
+
+    def add(self, profile, location):
+        """
+        Add the finalizers during a test case.
+
+        Parameters:
+
+            profile (yagot.FinalizerProfile): The finalizer profile of the
+              test case, or None.
+
+            location (string): Location of the test case.
+        """
+        if profile is None:
+            return
+        for type_name, loc, count, total, max_time in profile.stats():
+            entry = self.totals.setdefault(
+                (type_name, loc),
+                dict(count=0, total=0.0, max=0.0, max_location=None))
+            entry['count'] += count
+            entry['total'] += total
+            if max_time >= entry['max']:
+                entry['max'] = max_time
+                entry['max_location'] = location
+
+    def slowest(self, max=10):
+        # pylint: disable=redefined-builtin
+        """
+        Return the finalizers with the largest total time, as a list of tuples
+        (type_name, location, entry).
+        """
+        result = [key + (entry,) for key, entry in self.totals.items()]
+        result.sort(key=lambda r: (-r[2]['total'], r[0], r[1]))
+        return result[:max]
+
+
+class CycleIndex(object):
+    """
+    Session-wide index of the reference cycles detected in failing test cases,
+    by their fingerprint.
+
+    This is used to report each distinct reference cycle in full only for the
+    first test case it is detected in, and to list the test cases with
+    recurring reference cycles in the terminal summary.
+    """
+
+    def __init__(self):
+        # OrderedDict with key: fingerprint, value: dict with items:
+        # - size: Number of objects in the cycle.
+        # - type_names: Distinct type names of the objects in the cycle.
+        # - pattern: Pattern of the cycle.
+        # - locations: Locations of the test cases with the cycle.
+        self.cycles = OrderedDict()
+
+    def add(self, cycles, location):
+        """
+        Add the reference cycles detected in a test case to the index.
+
+        Parameters:
+
+            cycles (list): The reference cycles, as yagot.GarbageCycle
+              objects.
+
+            location (string): Location of the test case.
+
+        Returns:
+
+            dict: The specified cycles that were already in the index before
+            they were added (i.e. detected in a previous test case), with
+            key: fingerprint, value: location of the first test case with the
+            cycle.
+        """
+        known_cycles = dict(
+            (c.fingerprint, self.cycles[c.fingerprint]['locations'][0])
+            for c in cycles if c.fingerprint in self.cycles)
+        for cycle in cycles:
+            fp = cycle.fingerprint
+            if fp in self.cycles:
+                entry = self.cycles[fp]
+                if entry['locations'][-1] != location:
+                    entry['locations'].append(location)
+            else:
+                self.cycles[fp] = dict(
+                    size=len(cycle),
+                    type_names=cycle.type_names,
+                    pattern=cycle.pattern,
+                    locations=[location])
+        return known_cycles
+
+    def recurring(self):
+        """
+        Return the reference cycles that were detected in more than one test
+        case, as a list of tuples (fingerprint, entry).
+        """
+        return [(fp, entry) for fp, entry in self.cycles.items()
+                if len(entry['locations']) > 1]
+
+    def by_pattern(self):
+        """
+        Return the number of distinct reference cycles and of test cases with
+        these cycles by pattern, as a list of tuples (pattern, num_cycles,
+        num_tests), sorted by decreasing number of test cases.
+        """
+        totals = {}
+        for entry in self.cycles.values():
+            total = totals.setdefault(entry['pattern'], [0, set()])
+            total[0] += 1
+            total[1].update(entry['locations'])
+        result = [(pattern, total[0], len(total[1]))
+                  for pattern, total in totals.items()]
+        return sorted(result, key=lambda r: (-r[2], r[0]))
+
+
+class IsolationRerun(object):
+    """
+    Reruns of test cases with garbage in isolation, to confirm that the
+    garbage is caused by the test case itself and not by a previous test case
+    (e.g. by its deferred finalizers or background threads).
+
+    A test case is rerun alone in a fresh pytest subprocess with the same
+    Yagot options. The results are cached per test ID in the pytest cache,
+    together with a signature of the garbage, so that a test case is rerun
+    again only when its garbage changes.
+    """
+
+    def __init__(self, config):
+        self.config = config
+        self.cache = getattr(config, 'cache', None)
+        # Dict with key: test ID, value: list [signature, reproduced]
+        self.results = self.cache.get(RERUN_CACHE_KEY, {}) \
+            if self.cache is not None else {}
+        # List of tuples (location, cached) of the test cases whose garbage
+        # was not reproduced.
+        self.not_reproduced = []
+
+    def reproduces(self, item, location, summary):
+        """
+        Return whether the garbage of a test case is reproduced when the test
+        case is rerun in isolation.
+
+        Parameters:
+
+            item (pytest.Item): The test item.
+
+            location (string): Location of the test case.
+
+            summary (dict): Summary of the tracking period of the test case,
+              see yagot.GarbageTracker.summary().
+        """
+        signature = garbage_signature(summary)
+        entry = self.results.get(item.nodeid)
+        cached = entry is not None and entry[0] == signature
+        if cached:
+            reproduced = entry[1]
+        else:
+            reproduced = self.run_isolated(item)
+            self.results[item.nodeid] = [signature, reproduced]
+        if not reproduced:
+            self.not_reproduced.append((location, cached))
+        return reproduced
+
+    def run_isolated(self, item):
+        """
+        Rerun a test case alone in a pytest subprocess, and return whether
+        its garbage was reproduced. If the subprocess does not produce a
+        result (e.g. because the test case fails in isolation), the garbage
+        is considered reproduced.
+        """
+        result = run_subprocess(self.config, [item.nodeid])
+        return result.get(item.nodeid, True)
+
+    def save(self):
+        """
+        Save the results of the reruns in the pytest cache.
+        """
+        if self.cache is not None:
+            self.cache.set(RERUN_CACHE_KEY, self.results)
+
+
+class ContaminationBisect(object):
+    """
+    Bisection of the test cases that run before a target test case, to find
+    a minimal set of them that causes the target test case to have garbage
+    (e.g. through shared module state or lazily created singletons).
+
+    The bisection uses the delta debugging algorithm (ddmin) on the preceding
+    test cases. Each candidate set of test cases is run together with the
+    target test case in a pytest subprocess, and the candidate sets of each
+    step are run in parallel, using one subprocess per CPU.
+    """
+
+    def __init__(self, config, target, predecessors):
+        self.config = config
+        self.target = target
+        self.predecessors = predecessors
+        self.num_runs = 0
+        # Result of run()
+        self.minimal = None
+        # Dict with key: tuple of test IDs, value: target has garbage
+        self.results = {}
+
+    def has_garbage(self, nodeids):
+        """
+        Return whether the target test case has garbage when run after the
+        specified test cases. Test cases that were not run (e.g. because the
+        subprocess failed) are considered to have no garbage.
+        """
+        key = tuple(nodeids)
+        if key not in self.results:
+            self.num_runs += 1
+            result = run_subprocess(self.config, list(nodeids) + [self.target])
+            self.results[key] = result.get(self.target, False)
+        return self.results[key]
+
+    def run(self):
+        """
+        Perform the bisection.
+
+        Returns:
+
+            list: The test IDs of the minimal set of preceding test cases (also
+            stored in the `minimal` attribute), or None if the target test case
+            has garbage also when run alone, or has no garbage also when run
+            after all preceding test cases.
+        """
+        pool = ThreadPool(cpu_count())
+        try:
+            alone, after_all = pool.map(
+                self.has_garbage, [[], self.predecessors])
+            if alone or not after_all:
+                return None
+            nodeids = self.predecessors
+            n = 2
+            while len(nodeids) >= 2:
+                chunks = [nodeids[i * len(nodeids) // n:
+                                  (i + 1) * len(nodeids) // n]
+                          for i in range(n)]
+                complements = [[nid for nid in nodeids if nid not in chunk]
+                               for chunk in chunks] if n > 2 else []
+                results = pool.map(self.has_garbage, chunks + complements)
+                if any(results[:n]):
+                    nodeids = chunks[results.index(True)]
+                    n = 2
+                elif any(results[n:]):
+                    nodeids = complements[results[n:].index(True)]
+                    n = max(n - 1, 2)
+                elif n < len(nodeids):
+                    n = min(2 * n, len(nodeids))
+                else:
+                    break
+            self.minimal = nodeids
+            return nodeids
+        finally:
+            pool.close()
+            pool.join()
+
+
+def run_subprocess(config, nodeids):
+    """
+    Run test cases in a pytest subprocess with the Yagot options of the
+    session that affect the detection of garbage, and return whether they
+    had garbage, as a dict with key: test ID, value: bool. Test cases that
+    were not run have no entry.
+    """
+    rootdir = str(config.rootdir)
+    fd, result_path = tempfile.mkstemp(prefix='yagot-rerun-', suffix='.json')
+    os.close(fd)
+    # The Yagot options are passed as command line options only
+    env = dict((name, value) for name, value in os.environ.items()
+               if not name.startswith('YAGOT'))
+    env[RERUN_RESULT_ENV] = result_path
+    args = [sys.executable, '-m', 'pytest', '-q', '-p', 'no:cacheprovider',
+            '--rootdir', rootdir] + yagot_args(config) + list(nodeids)
+    try:
+        with open(os.devnull, 'w') as devnull:
+            subprocess.call(args, cwd=rootdir, env=env, stdout=devnull,
+                            stderr=subprocess.STDOUT)
+        with open(result_path) as fp:
+            lines = fp.read().splitlines()
+    finally:
+        os.remove(result_path)
+    result = {}
+    for line in lines:
+        entry = json.loads(line)
+        result[entry['nodeid']] = entry['garbage']
+    return result
+
+
+def garbage_signature(summary):
+    """
+    Return a signature of the garbage of a test case, from the summary of its
+    tracking period.
+    """
+    data = [sorted(summary['types'].items()), summary['fingerprints'],
+            len(summary['children'] or []), summary['async_leaks']]
+    text = json.dumps(data, sort_keys=True)
+    return hashlib.sha1(text.encode('utf-8')).hexdigest()
+
+
+def yagot_args(config):
+    """
+    Return the command line options for the Yagot options of the session
+    that affect the detection of garbage in a test case.
+    """
+    args = ['--yagot']
+    for name in ('leaks_only', 'filter_reachable', 'auto_collect',
+                 'exceptions', 'children', 'async_leaks', 'resources'):
+        if config.getvalue('yagot_' + name):
+            args.append('--yagot-' + name.replace('_', '-'))
+    for name in ('ignore_types', 'filter_types', 'max_types'):
+        types = pure_list(config.getvalue('yagot_' + name))
+        if types:
+            args.append('--yagot-{}={}'.format(name.replace('_', '-'),
+                                               ','.join(types)))
+    for name in ('max_objects', 'max_bytes', 'max_collect_time'):
+        value = config.getvalue('yagot_' + name)
+        if value is not None:
+            args.append('--yagot-{}={}'.format(name.replace('_', '-'), value))
+    return args
+
+
 def pytest_addoption(parser):
     """
     Add command line options and config (ini) parameters for this plugin.
@@ -66,9 +568,279 @@ specified on each option, and in addition the option can be specified multiple
 times. The types must be specified as represented by the str(type) function
 (for example, "int" or "mymodule.MyClass").
 Default: Env.var YAGOT_IGNORE_TYPES, or empty list.
+""")
+    group.addoption(
+        '--yagot-filter-types',
+        dest='yagot_filter_types',
+        metavar="RULE[,RULE[...]]",
+        action='append',
+        default=[os.getenv('YAGOT_FILTER_TYPES')]
+        if os.getenv('YAGOT_FILTER_TYPES') else list(),
+        help="""\
+Type rule for collected and uncollectable objects that are removed individually
+from the detected objects, without ignoring the test case. A rule is a type
+name as represented by the str(type) function, a glob pattern on the type name
+(e.g. "mymodule.*"), "re:REGEXP", "module:MODULE" or "subclass:TYPE". Multiple
+comma-separated rules can be specified on each option, and in addition the
+option can be specified multiple times.
+Default: Env.var YAGOT_FILTER_TYPES, or empty list.
+""")
+    group.addoption(
+        '--yagot-filter-reachable',
+        dest='yagot_filter_reachable',
+        action='store_true',
+        default=bool(os.getenv('YAGOT_FILTER_REACHABLE', False)),
+        help="""\
+Also removes objects that are reachable only from objects removed by
+--yagot-filter-types.
+Default: Env.var YAGOT_FILTER_REACHABLE (set to non-empty), or False.
+""")
+    group.addoption(
+        '--yagot-auto-collect',
+        dest='yagot_auto_collect',
+        action='store_true',
+        default=bool(os.getenv('YAGOT_AUTO_COLLECT', False)),
+        help="""\
+Keeps automatic garbage collection active during test cases, and reports in
+which generations the garbage of the test cases was collected. Garbage
+collected in older generations survived longer and is more expensive to
+collect.
+Default: Env.var YAGOT_AUTO_COLLECT (set to non-empty), or False.
+""")
+    group.addoption(
+        '--yagot-retained',
+        dest='yagot_retained',
+        action='store_true',
+        default=bool(os.getenv('YAGOT_RETAINED', False)),
+        help="""\
+Also detects objects created by test cases that are still alive after the test
+case (retained objects), and lists them grouped by type with a referrer chain
+in the terminal summary. Retained objects do not cause test cases to fail.
+Default: Env.var YAGOT_RETAINED (set to non-empty), or False.
+""")
+    group.addoption(
+        '--yagot-exceptions',
+        dest='yagot_exceptions',
+        action='store_true',
+        default=bool(os.getenv('YAGOT_EXCEPTIONS', False)),
+        help="""\
+Reports reference cycles formed by caught exceptions (with the variable the
+exception is stored in and the frames it keeps alive), instead of ignoring all
+test cases with frame or code objects. Exception cycles created by
+pytest.raises() and other pytest internals are still ignored.
+Default: Env.var YAGOT_EXCEPTIONS (set to non-empty), or False.
+""")
+    group.addoption(
+        '--yagot-children',
+        dest='yagot_children',
+        action='store_true',
+        default=bool(os.getenv('YAGOT_CHILDREN', False)),
+        help="""\
+Also checks the child processes created by test cases (with os.fork(), or with
+the 'fork' or 'spawn' start methods of multiprocessing, including
+ProcessPoolExecutor). Each child process is tracked until it exits, and its
+garbage causes the test case to fail.
+Default: Env.var YAGOT_CHILDREN (set to non-empty), or False.
+""")
+    group.addoption(
+        '--yagot-async-leaks',
+        dest='yagot_async_leaks',
+        action='store_true',
+        default=bool(os.getenv('YAGOT_ASYNC_LEAKS', False)),
+        help="""\
+Also checks for asyncio tasks that have not finished, futures that were never
+awaited, callbacks still scheduled on the event loop, and event loops not
+closed, that were created by test cases. Such objects cause the test case to
+fail.
+Default: Env.var YAGOT_ASYNC_LEAKS (set to non-empty), or False.
+""")
+    group.addoption(
+        '--yagot-resources',
+        dest='yagot_resources',
+        action='store_true',
+        default=bool(os.getenv('YAGOT_RESOURCES', False)),
+        help="""\
+Also checks for ResourceWarning warnings issued by test cases (including the
+garbage collection at their end, where unclosed files and sockets are often
+finalized), and for file descriptors opened by test cases that are still open
+(on platforms with /proc/self/fd). Such resources cause the test case to fail.
+Default: Env.var YAGOT_RESOURCES (set to non-empty), or False.
+""")
+    group.addoption(
+        '--yagot-finalizers',
+        dest='yagot_finalizers',
+        action='store_true',
+        default=bool(os.getenv('YAGOT_FINALIZERS', False)),
+        help="""\
+Measures the time spent in finalizers (__del__ methods) and weakref callbacks
+during the garbage collections of test cases (automatic collections and the
+collection at their end), and lists the slowest finalizers by type and code
+location in the terminal summary. Requires Python 3.3 or higher.
+Default: Env.var YAGOT_FINALIZERS (set to non-empty), or False.
+""")
+    group.addoption(
+        '--yagot-max-objects',
+        dest='yagot_max_objects',
+        metavar="N",
+        action='store',
+        type=int,
+        default=os.getenv('YAGOT_MAX_OBJECTS', '0'),
+        help="""\
+Tolerates up to N collected and uncollectable objects in a test case, not
+counting the objects of the types limited by --yagot-max-types.
+Default: Env.var YAGOT_MAX_OBJECTS, or 0.
+""")
+    group.addoption(
+        '--yagot-max-bytes',
+        dest='yagot_max_bytes',
+        metavar="N",
+        action='store',
+        type=int,
+        default=os.getenv('YAGOT_MAX_BYTES', None),
+        help="""\
+Tolerates collected and uncollectable objects in a test case up to a total
+size of N Bytes, as returned by sys.getsizeof().
+Default: Env.var YAGOT_MAX_BYTES, or no limit.
+""")
+    group.addoption(
+        '--yagot-max-types',
+        dest='yagot_max_types',
+        metavar="TYPE=N[,TYPE=N[...]]",
+        action='append',
+        default=[os.getenv('YAGOT_MAX_TYPES')]
+        if os.getenv('YAGOT_MAX_TYPES') else list(),
+        help="""\
+Limits the number of collected and uncollectable objects of a type in a test
+case to N, with the type name as represented by the str(type) function.
+Multiple comma-separated limits can be specified on each option, and in
+addition the option can be specified multiple times.
+Default: Env.var YAGOT_MAX_TYPES, or no limits.
+""")
+    group.addoption(
+        '--yagot-max-collect-time',
+        dest='yagot_max_collect_time',
+        metavar="SECONDS",
+        action='store',
+        type=float,
+        default=os.getenv('YAGOT_MAX_COLLECT_TIME', None),
+        help="""\
+Fails test cases whose garbage collection at the end of the test case takes
+longer than SECONDS.
+Default: Env.var YAGOT_MAX_COLLECT_TIME, or no limit.
+""")
+    group.addoption(
+        '--yagot-rerun',
+        dest='yagot_rerun',
+        action='store_true',
+        default=bool(os.getenv('YAGOT_RERUN', False)),
+        help="""\
+Reruns test cases with garbage alone in a fresh pytest subprocess, and fails
+them only if the garbage is reproduced there. This eliminates garbage caused by
+previous test cases (e.g. by deferred finalizers or background threads). The
+rerun results are cached per test ID in the pytest cache, and are reused as
+long as the garbage of the test case does not change.
+Default: Env.var YAGOT_RERUN (set to non-empty), or False.
+""")
+    group.addoption(
+        '--yagot-bisect',
+        dest='yagot_bisect',
+        metavar="TESTID",
+        action='store',
+        default=os.getenv('YAGOT_BISECT', None),
+        help="""\
+Instead of running the test cases, bisects the test cases that run before the
+test case TESTID to find a minimal set of them that causes TESTID to have
+garbage. The candidate sets are run together with TESTID in pytest
+subprocesses, in parallel on all CPUs.
+Default: Env.var YAGOT_BISECT, or no bisection.
+""")
+    group.addoption(
+        '--yagot-html',
+        dest='yagot_html',
+        metavar="PATH",
+        action='store',
+        default=os.getenv('YAGOT_HTML', None),
+        help="""\
+Writes a self-contained HTML report of the session to the file PATH, with the
+test cases with the most garbage by bytes and objects, the slowest garbage
+collections, and the distinct reference cycles with their patterns. The details
+of each test case with garbage are embedded as compressed JSON and rendered in
+the browser on demand.
+Default: Env.var YAGOT_HTML, or no report.
+""")
+    group.addoption(
+        '--yagot-history',
+        dest='yagot_history',
+        metavar="PATH",
+        action='store',
+        default=os.getenv('YAGOT_HISTORY', None),
+        help="""\
+Records the garbage summary of each test case (number of objects, bytes, types,
+reference cycle fingerprints, GC time) in the SQLite database file PATH, as a
+new run. Use 'python -m yagot.history PATH' to show the history.
+Default: Env.var YAGOT_HISTORY, or no recording.
 """)
 
 
+def pytest_configure(config):
+    """
+    py.test hook that is called after command line options have been parsed.
+
+    We use this hook to set up the session-wide state of the plugin.
+    """
+    # pylint: disable=protected-access
+    config.addinivalue_line(
+        'markers',
+        "yagot(enabled, leaks_only, ignore_types, filter_types, "
+        "filter_reachable, auto_collect, retained, exceptions, children, "
+        "async_leaks, resources, finalizers, max_objects, max_bytes, "
+        "max_types, max_collect_time): Override the Yagot settings for the "
+        "test case, class or module.")
+    config._yagot_settings = session_settings(config)
+    config._yagot_cycles = CycleIndex()
+    config._yagot_generations = GenerationTotals()
+    config._yagot_finalizers = FinalizerTotals()
+    config._yagot_retained = []
+    config._yagot_history = None
+    config._yagot_html = None
+    config._yagot_rerun = None
+    config._yagot_bisect = None
+    config._yagot_rerun_result = os.getenv(RERUN_RESULT_ENV, None)
+    enabled = config.getvalue('yagot')
+    if enabled and config.getvalue('yagot_rerun') and \
+            not config._yagot_rerun_result:
+        config._yagot_rerun = IsolationRerun(config)
+    if enabled and config.getvalue('yagot_html'):
+        import yagot
+        config._yagot_html = yagot.HtmlReport()
+    history_path = config.getvalue('yagot_history')
+    if enabled and history_path:
+        import yagot
+        config._yagot_history = yagot.HistoryStore(history_path)
+        config._yagot_history.start_run()
+
+
+def pytest_unconfigure(config):
+    """
+    py.test hook that is called before the test process is exited.
+
+    We use this hook to clean up the session-wide state of the plugin.
+    """
+    # pylint: disable=protected-access
+    history = getattr(config, '_yagot_history', None)
+    if history:
+        history.close()
+        config._yagot_history = None
+    html = getattr(config, '_yagot_html', None)
+    if html is not None:
+        html.write(config.getvalue('yagot_html'))
+        config._yagot_html = None
+    rerun = getattr(config, '_yagot_rerun', None)
+    if rerun is not None:
+        rerun.save()
+        config._yagot_rerun = None
+
+
 @pytest.hookimpl(hookwrapper=True)
 def pytest_sessionstart(session):
     """
@@ -85,12 +857,56 @@ def pytest_sessionstart(session):
     enabled = config.getvalue('yagot')
     leaks_only = config.getvalue('yagot_leaks_only')
     ignore_types = pure_list(config.getvalue('yagot_ignore_types'))
+    filter_types = pure_list(config.getvalue('yagot_filter_types'))
+    filter_reachable = config.getvalue('yagot_filter_reachable')
+    auto_collect = config.getvalue('yagot_auto_collect')
+    retained = config.getvalue('yagot_retained')
+    exceptions = config.getvalue('yagot_exceptions')
+    children = config.getvalue('yagot_children')
+    async_leaks = config.getvalue('yagot_async_leaks')
     if enabled:
         kind_str = "uncollectable" if leaks_only \
             else "collected and uncollectable"
         ignore_str = ', '.join(ignore_types) or "(none)"
         print("yagot: Checking for {} objects, ignoring types: {}".
               format(kind_str, ignore_str))
+        history_path = config.getvalue('yagot_history')
+        if history_path:
+            print("yagot: Recording garbage history in: {}".
+                  format(history_path))
+        html_path = config.getvalue('yagot_html')
+        if html_path:
+            print("yagot: Writing HTML report to: {}".format(html_path))
+        if filter_types:
+            reachable_str = " and objects only reachable from them" \
+                if filter_reachable else ""
+            print("yagot: Removing objects of types: {}{}".
+                  format(', '.join(filter_types), reachable_str))
+        if auto_collect:
+            print("yagot: Keeping automatic garbage collection active")
+        if retained:
+            print("yagot: Detecting retained objects")
+        if exceptions:
+            print("yagot: Reporting reference cycles of caught exceptions")
+        if children:
+            print("yagot: Checking child processes")
+        if async_leaks:
+            print("yagot: Checking for pending asyncio objects")
+        if config.getvalue('yagot_resources'):
+            print("yagot: Checking for ResourceWarning warnings and open "
+                  "file descriptors")
+        if config.getvalue('yagot_finalizers'):
+            print("yagot: Measuring the time spent in finalizers")
+        settings = config._yagot_settings  # pylint: disable=W0212
+        if has_budget(settings):
+            print("yagot: Tolerating garbage within budget: {!r}".
+                  format(garbage_budget(settings)))
+        if config.getvalue('yagot_rerun'):
+            print("yagot: Rerunning test cases with garbage in isolation")
+        bisect_target = config.getvalue('yagot_bisect')
+        if bisect_target:
+            print("yagot: Bisecting the test cases before: {}".
+                  format(bisect_target))
 
 
 def pytest_runtest_setup(item):
@@ -99,16 +915,22 @@ def pytest_runtest_setup(item):
 
     We use this hook to start tracking.
     """
-    config = item.config
-    enabled = config.getvalue('yagot')
-    leaks_only = config.getvalue('yagot_leaks_only')
-    ignore_types = pure_list(config.getvalue('yagot_ignore_types'))
-    if enabled:
+    settings = item_settings(item)
+    if settings['enabled']:
         import yagot
         tracker = yagot.GarbageTracker.get_tracker()
-        tracker.enable(leaks_only=leaks_only)
+        tracker.enable(leaks_only=settings['leaks_only'],
+                       auto_collect=settings['auto_collect'],
+                       retained=settings['retained'],
+                       exceptions=settings['exceptions'],
+                       children=settings['children'],
+                       async_leaks=settings['async_leaks'],
+                       resources=settings['resources'],
+                       finalizers=settings['finalizers'])
         tracker.start()
-        tracker.ignore_types(type_list=ignore_types)
+        tracker.ignore_types(type_list=settings['ignore_types'])
+        tracker.filter_types(type_list=settings['filter_types'],
+                             reachable=settings['filter_reachable'])
 
 
 @pytest.hookimpl(trylast=True, hookwrapper=True)
@@ -122,27 +944,215 @@ def pytest_runtest_makereport(item, call):
     objects that would distract from the garbage produced by the tested code.
     """
     report = (yield).get_result()  # pytest.TestReport
-    config = item.config
-    enabled = config.getvalue('yagot')
-    if enabled:
+    if item_settings(item)['enabled']:
         if report.when == "call" and not report.passed:
             import yagot
             tracker = yagot.GarbageTracker.get_tracker()
             tracker.ignore()
 
 
+@pytest.hookimpl(trylast=True)
 def pytest_runtest_teardown(item):
     """
     py.test hook that is called when tearing down a test item.
 
-    We use this hook to stop tracking and check the track result.
+    We use this hook to stop tracking and check the track result. It is
+    called after the other teardown hooks, so that the garbage of fixture
+    teardown is tracked like the garbage of fixture setup, and so that the
+    test item has been torn down properly when the check fails, and
+    subsequent test items can run. If isolation reruns are enabled, a test
+    case with garbage fails only if its garbage is reproduced when rerun in
+    isolation.
     """
     config = item.config
-    enabled = config.getvalue('yagot')
-    if enabled:
+    settings = item_settings(item)
+    if settings['enabled']:
         import yagot
         tracker = yagot.GarbageTracker.get_tracker()
         tracker.stop()
         location = "{file}::{func}". \
             format(file=item.location[0], func=item.name)
-        assert not tracker.garbage, tracker.assert_message(location)
+        # pylint: disable=protected-access
+        if config._yagot_history:
+            config._yagot_history.add(item.nodeid, tracker.summary())
+        if config._yagot_html is not None:
+            config._yagot_html.add(item.nodeid, tracker)
+        config._yagot_generations.add(tracker.generation_stats, location)
+        config._yagot_finalizers.add(tracker.finalizer_profile, location)
+        budget = garbage_budget(settings)
+        violations = budget.violations(tracker)
+        has_garbage = bool(violations or tracker.child_garbage or
+                           tracker.async_leaks or tracker.resource_leaks)
+        if config._yagot_rerun_result:
+            with open(config._yagot_rerun_result, 'a') as fp:
+                json.dump(dict(nodeid=item.nodeid, garbage=has_garbage), fp)
+                fp.write('\n')
+        if has_garbage and config._yagot_rerun is not None and \
+                not config._yagot_rerun.reproduces(
+                    item, location, tracker.summary()):
+            return
+        # Only the cycles of failing test cases are reported
+        known_cycles = config._yagot_cycles.add(tracker.cycles, location) \
+            if has_garbage else {}
+        # Without a budget, the assertion message does not mention it
+        budget_message = budget.format_violations(violations) \
+            if has_budget(settings) else u""
+        assert not has_garbage, budget_message + \
+            tracker.assert_message(location, known_cycles=known_cycles)
+
+
+def pytest_collection_modifyitems(config, items):
+    # pylint: disable=unused-argument
+    """
+    py.test hook that is called after the test items have been collected.
+
+    We use this hook to resolve the settings of each test item from its yagot
+    markers once, so that the other hooks use the cached settings.
+    """
+    for item in items:
+        item_settings(item)
+
+
+@pytest.hookimpl(tryfirst=True)
+def pytest_runtestloop(session):
+    """
+    py.test hook that is called to run the test cases of the session.
+
+    We use this hook to perform the bisection instead of running the test
+    cases, if requested.
+    """
+    config = session.config
+    enabled = config.getvalue('yagot')
+    target = config.getvalue('yagot_bisect')
+    if not enabled or not target:
+        return None
+    nodeids = [item.nodeid for item in session.items]
+    if target not in nodeids:
+        raise pytest.UsageError(
+            "Test case for --yagot-bisect was not collected: {}".
+            format(target))
+    bisect = ContaminationBisect(
+        config, target, nodeids[:nodeids.index(target)])
+    bisect.run()
+    config._yagot_bisect = bisect  # pylint: disable=protected-access
+    return True
+
+
+@pytest.hookimpl(hookwrapper=True)
+def pytest_runtest_protocol(item, nextitem):
+    # pylint: disable=unused-argument
+    """
+    py.test hook wrapper around the hook that runs the setup, call and
+    teardown phases of a test item.
+
+    We use this hook to detect the retained objects of the test item after
+    all of its phases have completed, so that the objects used by pytest to
+    run the phases and the objects of fixtures have been released.
+    """
+    yield  # causes the setup, call and teardown phases to be run
+    config = item.config
+    settings = item_settings(item)
+    if settings['enabled'] and settings['retained']:
+        import yagot
+        tracker = yagot.GarbageTracker.get_tracker()
+        tracker.detect_retained()
+        location = "{file}::{func}". \
+            format(file=item.location[0], func=item.name)
+        message = tracker.retained_message(
+            location, exclude_modules=RETAINED_EXCLUDE_MODULES)
+        if message:
+            # pylint: disable=protected-access
+            config._yagot_retained.append(message)
+
+
+def pytest_terminal_summary(terminalreporter, config):
+    """
+    py.test hook that is called to add sections to the terminal summary.
+
+    We use this hook to list the reference cycles that were detected in more
+    than one test case, the number of reference cycles by pattern, the
+    garbage collections per generation if automatic garbage collection was
+    kept active, the slowest finalizers if they were measured, the result of
+    the bisection, and the test cases whose garbage was not reproduced when
+    rerun in isolation.
+    """
+    enabled = config.getvalue('yagot')
+    if enabled:
+        # pylint: disable=protected-access
+        if config.getvalue('yagot_auto_collect'):
+            generations = config._yagot_generations
+            terminalreporter.section("yagot garbage collections by generation")
+            for gen, total in enumerate(generations.totals):
+                terminalreporter.line(
+                    "Generation {gen}: {c} collection(s), {n} collected, "
+                    "{u} uncollectable".
+                    format(gen=gen, c=total['collections'],
+                           n=total['collected'], u=total['uncollectable']))
+            older = sorted(generations.older, key=lambda lo: -lo[1])
+            for loc, num in older[:10]:
+                terminalreporter.line(
+                    "{num} object(s) collected in generation 1 or 2 in "
+                    "function {loc}".format(num=num, loc=loc))
+        slowest = config._yagot_finalizers.slowest()
+        if slowest:
+            terminalreporter.section("yagot slowest finalizers")
+            for type_name, loc, entry in slowest:
+                terminalreporter.line(
+                    "{total:.6f} s in {count} call(s) of finalizer for "
+                    "{type} at {loc} (slowest call: {max:.6f} s in function "
+                    "{test})".
+                    format(total=entry['total'], count=entry['count'],
+                           type=type_name, loc=loc, max=entry['max'],
+                           test=entry['max_location']))
+        bisect = config._yagot_bisect
+        if bisect is not None:
+            terminalreporter.section("yagot contamination bisection")
+            if bisect.minimal is not None:
+                terminalreporter.line(
+                    "Function {t} has garbage after running {n} test "
+                    "case(s) ({r} subprocess runs):".
+                    format(t=bisect.target, n=len(bisect.minimal),
+                           r=bisect.num_runs))
+                for nodeid in bisect.minimal:
+                    terminalreporter.line("  {}".format(nodeid))
+            elif bisect.results.get(()):
+                terminalreporter.line(
+                    "Function {t} has garbage also when run alone".
+                    format(t=bisect.target))
+            else:
+                terminalreporter.line(
+                    "Function {t} has no garbage when run after all {n} "
+                    "preceding test case(s)".
+                    format(t=bisect.target, n=len(bisect.predecessors)))
+        rerun = config._yagot_rerun
+        if rerun is not None and rerun.not_reproduced:
+            terminalreporter.section("yagot isolation reruns")
+            for loc, cached in rerun.not_reproduced:
+                terminalreporter.line(
+                    "Garbage of function {loc} was not reproduced in "
+                    "isolation{cached}".
+                    format(loc=loc, cached=" (cached)" if cached else ""))
+        if config._yagot_retained:
+            terminalreporter.section("yagot retained objects")
+            for message in config._yagot_retained:
+                for line in message.strip().splitlines():
+                    terminalreporter.line(line)
+        by_pattern = config._yagot_cycles.by_pattern()
+        if by_pattern:
+            terminalreporter.section("yagot garbage cycles by pattern")
+            for pattern, num_cycles, num_tests in by_pattern:
+                terminalreporter.line(
+                    "Pattern {p}: {c} distinct cycle(s) in {t} test(s)".
+                    format(p=pattern, c=num_cycles, t=num_tests))
+        recurring = config._yagot_cycles.recurring()
+        if recurring:
+            terminalreporter.section("yagot recurring garbage cycles")
+            for fp, entry in recurring:
+                terminalreporter.line(
+                    "Cycle {fp} ({p}) with {num} object(s) of type(s) "
+                    "{types}: first reported for function {loc}, also seen "
+                    "in {n} test(s)".
+                    format(fp=fp, p=entry['pattern'], num=entry['size'],
+                           types=', '.join(entry['type_names']),
+                           loc=entry['locations'][0],
+                           n=len(entry['locations']) - 1))